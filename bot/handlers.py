@@ -1,6 +1,7 @@
 """
 Обработчики команд и callback-кнопок Telegram бота
 """
+import asyncio
 import sys
 import os
 
@@ -14,8 +15,13 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.exceptions import TelegramBadRequest
 
-from database.crud import AnnouncementCRUD, ManagerActionCRUD
-from database.models import get_session, Announcement
+from database.async_crud import (
+    AsyncAnnouncementCRUD, AsyncManagerActionCRUD, AsyncNotificationMessageCRUD, AsyncDashboardCounterCRUD,
+    AsyncLotCRUD,
+    get_async_engine, commit_async_unit_of_work
+)
+from database.crud import AnnouncementCRUD
+from database.models import engine
 from bot.messages import (
     START_MESSAGE,
     HELP_MESSAGE,
@@ -25,14 +31,14 @@ from bot.messages import (
     format_stats_message,
     format_admin_dashboard,
     format_work_announcements_list,
-    format_announcement_details,
     format_manager_menu,
     format_manager_statistics,
     format_problem_announcements,
     format_active_announcements,
     format_manager_actions,
     format_coordinator_announcements_list,
-    format_coordinator_announcement_details
+    format_perf_stats,
+    render_announcement
 )
 from bot.keyboards import (
     get_admin_dashboard_keyboard,
@@ -41,6 +47,7 @@ from bot.keyboards import (
     get_manager_main_keyboard,
     get_admin_main_keyboard,
     get_announcement_keyboard,
+    get_almaty_claim_keyboard,
     get_manager_menu_keyboard,
     get_manager_back_keyboard,
     get_problem_announcements_keyboard,
@@ -51,8 +58,9 @@ from bot.keyboards import (
     get_coordinator_announcement_detail_keyboard
 )
 from config import TELEGRAM_BOT_TOKEN, ADMIN_TELEGRAM_ID, COORDINATOR_TELEGRAM_ID, MANAGERS
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from utils.metrics import get_metrics, install_db_hooks
+from bot.middlewares import HandlerMetricsMiddleware, DbSessionMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 async def safe_callback_answer(callback: CallbackQuery, text: str = None, show_alert: bool = False):
@@ -163,42 +171,13 @@ async def cmd_stats(message: Message):
         await message.answer("❌ Вы не зарегистрированы как менеджер в системе.")
         return
 
-    # Получить статистику из БД
-    session = get_session()
-    try:
-        total = session.query(Announcement).filter(
-            Announcement.manager_id == manager_id
-        ).count()
-
-        pending = session.query(Announcement).filter(
-            Announcement.manager_id == manager_id,
-            Announcement.status == 'pending'
-        ).count()
-
-        accepted = session.query(Announcement).filter(
-            Announcement.manager_id == manager_id,
-            Announcement.status == 'accepted'
-        ).count()
+    # Получить статистику из БД (один агрегирующий запрос)
+    stats = await AsyncAnnouncementCRUD.get_manager_statistics(manager_id)
 
-        rejected = session.query(Announcement).filter(
-            Announcement.manager_id == manager_id,
-            Announcement.status == 'rejected'
-        ).count()
-
-        stats = {
-            'total': total,
-            'pending': pending,
-            'accepted': accepted,
-            'rejected': rejected
-        }
-
-        # Используем inline клавиатуру с кнопкой "Назад"
-        from bot.keyboards import get_stats_keyboard
-        keyboard = get_stats_keyboard()
-        await message.answer(format_stats_message(stats), parse_mode='HTML', reply_markup=keyboard)
-
-    finally:
-        session.close()
+    # Используем inline клавиатуру с кнопкой "Назад"
+    from bot.keyboards import get_stats_keyboard
+    keyboard = get_stats_keyboard()
+    await message.answer(format_stats_message(stats), parse_mode='HTML', reply_markup=keyboard)
 
 
 @router.message(Command("my_work"))
@@ -223,7 +202,7 @@ async def cmd_my_work(message: Message):
         return
 
     # Получить принятые объявления из БД
-    announcements = AnnouncementCRUD.get_accepted_for_manager(manager_id)
+    announcements = await AsyncAnnouncementCRUD.get_accepted_for_manager(manager_id)
 
     # Отправить список объявлений
     # Инлайн-клавиатура для объявлений (всегда есть кнопка "Назад")
@@ -263,98 +242,36 @@ async def cmd_pending(message: Message):
         return
 
     # Получить не принятые объявления из БД
-    session = get_session()
-    try:
-        announcements = session.query(Announcement).filter(
-            Announcement.manager_id == manager_id,
-            Announcement.status == 'pending'
-        ).order_by(Announcement.created_at.desc()).all()
+    announcements = await AsyncAnnouncementCRUD.get_pending_for_manager(manager_id)
 
-        # Отправить список объявлений
-        from bot.keyboards import get_pending_announcements_keyboard, get_stats_keyboard
-        from bot.messages import format_pending_announcements_list
+    # Отправить список объявлений
+    from bot.keyboards import get_pending_announcements_keyboard, get_stats_keyboard
+    from bot.messages import format_pending_announcements_list
 
-        if announcements:
-            inline_keyboard = get_pending_announcements_keyboard(announcements)
-        else:
-            # Если нет объявлений, все равно показываем кнопку "Назад"
-            inline_keyboard = get_stats_keyboard()
+    if announcements:
+        inline_keyboard = get_pending_announcements_keyboard(announcements)
+    else:
+        # Если нет объявлений, все равно показываем кнопку "Назад"
+        inline_keyboard = get_stats_keyboard()
 
-        await message.answer(
-            format_pending_announcements_list(announcements),
-            parse_mode='HTML',
-            reply_markup=inline_keyboard
-        )
-    finally:
-        session.close()
+    await message.answer(
+        format_pending_announcements_list(announcements),
+        parse_mode='HTML',
+        reply_markup=inline_keyboard
+    )
 
 
-def get_admin_dashboard_data() -> dict:
+async def get_admin_dashboard_data() -> dict:
     """
-    Получить данные для дашборда администратора из БД
+    Получить данные для дашборда администратора
+
+    Счетчики читаются из материализованных проекций (DashboardCounterCRUD),
+    а не пересчитываются по всей таблице объявлений.
 
     Returns:
         dict с данными для дашборда
     """
-    session = get_session()
-    try:
-        # Начало сегодняшнего дня
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Статистика объявлений
-        new = session.query(Announcement).filter(
-            Announcement.status == 'pending'
-        ).count()
-
-        in_progress = session.query(Announcement).filter(
-            Announcement.status == 'accepted',
-            Announcement.is_processed == False
-        ).count()
-
-        processed = session.query(Announcement).filter(
-            Announcement.status == 'accepted',
-            Announcement.is_processed == True
-        ).count()
-
-        rejected = session.query(Announcement).filter(
-            Announcement.status == 'rejected'
-        ).count()
-
-        total_today = session.query(Announcement).filter(
-            Announcement.created_at >= today_start
-        ).count()
-
-        # Критические зоны
-        # Зависли >24ч (pending более 24 часов)
-        stuck_24h_threshold = datetime.now() - timedelta(hours=24)
-        stuck_24h = session.query(Announcement).filter(
-            Announcement.status == 'pending',
-            Announcement.created_at < stuck_24h_threshold
-        ).count()
-
-        # Без ответа >2ч (pending более 2 часов)
-        no_response_2h_threshold = datetime.now() - timedelta(hours=2)
-        no_response_2h = session.query(Announcement).filter(
-            Announcement.status == 'pending',
-            Announcement.created_at < no_response_2h_threshold
-        ).count()
-
-        # Нужно внимание = зависшие + без ответа (уникальные)
-        needs_attention = stuck_24h + no_response_2h
-
-        return {
-            'new': new,
-            'in_progress': in_progress,
-            'processed': processed,
-            'rejected': rejected,
-            'total_today': total_today,
-            'stuck_24h': stuck_24h,
-            'no_response_2h': no_response_2h,
-            'needs_attention': needs_attention
-        }
-
-    finally:
-        session.close()
+    return await AsyncDashboardCounterCRUD.get_dashboard_data()
 
 
 @router.message(Command("admin"))
@@ -373,7 +290,7 @@ async def cmd_admin(message: Message):
         return
 
     # Получить данные для дашборда
-    dashboard_data = get_admin_dashboard_data()
+    dashboard_data = await get_admin_dashboard_data()
 
     # Отправить дашборд с клавиатурой
     await message.answer(
@@ -383,8 +300,28 @@ async def cmd_admin(message: Message):
     )
 
 
+@router.message(Command("perf"))
+async def cmd_perf(message: Message):
+    """Обработчик команды /perf - метрики обработчиков (/perf reset - сбросить)"""
+    user_id = message.from_user.id
+
+    # Проверка прав администратора
+    if ADMIN_TELEGRAM_ID and str(user_id) != str(ADMIN_TELEGRAM_ID):
+        await message.answer("❌ У вас нет прав администратора.")
+        return
+
+    metrics = get_metrics()
+
+    if message.text.strip().endswith("reset"):
+        metrics.reset()
+        await message.answer("🔄 Метрики сброшены.")
+        return
+
+    await message.answer(format_perf_stats(metrics.snapshot()), parse_mode='HTML')
+
+
 @router.callback_query(F.data.startswith("accept_"))
-async def callback_accept(callback: CallbackQuery, bot: Bot):
+async def callback_accept(callback: CallbackQuery, bot: Bot, session: AsyncSession):
     """Обработчик нажатия кнопки 'Беру в работу'"""
     announcement_id = int(callback.data.split("_")[1])
     user_id = callback.from_user.id
@@ -402,59 +339,57 @@ async def callback_accept(callback: CallbackQuery, bot: Bot):
         await callback.answer("❌ Вы не авторизованы", show_alert=True)
         return
 
-    # Ответить на callback сразу, чтобы не истек таймаут
-    await callback.answer("✅ Объявление принято в работу!", show_alert=True)
-
-    # Обновить статус в БД
-    AnnouncementCRUD.update_status(announcement_id, 'accepted')
+    # Обновить статус в БД (только из pending и только своему менеджеру)
+    if not await AsyncAnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=manager_id,
+                                                     session=session):
+        await callback.answer("ℹ️ Объявление уже обработано или недоступно", show_alert=True)
+        return
 
     # Записать действие
-    ManagerActionCRUD.create({
+    await AsyncManagerActionCRUD.create({
         'announcement_id': announcement_id,
         'manager_id': manager_id,
         'manager_name': manager_name,
         'telegram_id': user_id,
         'action': 'accepted'
-    })
+    }, session=session)
 
-    # Получить данные объявления для уведомлений
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id
-        ).first()
-
-        if announcement:
-            # Уведомить админа
-            if ADMIN_TELEGRAM_ID and ADMIN_TELEGRAM_ID != 'YOUR_ADMIN_ID':
-                admin_message = format_accepted_notification(
-                    announcement.announcement_number,
-                    manager_name
-                )
-                try:
-                    await bot.send_message(
-                        int(ADMIN_TELEGRAM_ID),
-                        admin_message,
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    print(f"⚠️ Не удалось отправить уведомление админу: {e}")
-
-            # Уведомить координатора
-            from bot.notifier import TelegramNotifier
-            notifier = TelegramNotifier()
+    # Объявление уже загружено в сессию при смене статуса - повторного запроса нет
+    announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id, session=session)
+
+    # Одна транзакция на принятие; фиксируем до запросов к Telegram
+    await commit_async_unit_of_work(session)
+
+    await callback.answer("✅ Объявление принято в работу!", show_alert=True)
+
+    if announcement:
+        # Уведомить админа
+        if ADMIN_TELEGRAM_ID and ADMIN_TELEGRAM_ID != 'YOUR_ADMIN_ID':
+            admin_message = format_accepted_notification(
+                announcement.announcement_number,
+                manager_name
+            )
             try:
-                await notifier.send_to_coordinator(
-                    announcement_number=announcement.announcement_number,
-                    announcement_url=announcement.announcement_url,
-                    manager_name=manager_name,
-                    application_deadline=announcement.application_deadline
+                await bot.send_message(
+                    int(ADMIN_TELEGRAM_ID),
+                    admin_message,
+                    parse_mode='HTML'
                 )
             except Exception as e:
-                print(f"⚠️ Не удалось отправить уведомление координатору: {e}")
+                print(f"⚠️ Не удалось отправить уведомление админу: {e}")
 
-    finally:
-        session.close()
+        # Уведомить координатора
+        from bot.notifier import TelegramNotifier
+        notifier = TelegramNotifier()
+        try:
+            await notifier.send_to_coordinator(
+                announcement_number=announcement.announcement_number,
+                announcement_url=announcement.announcement_url,
+                manager_name=manager_name,
+                application_deadline=announcement.application_deadline
+            )
+        except Exception as e:
+            print(f"⚠️ Не удалось отправить уведомление координатору: {e}")
 
     # Обновить сообщение
     await callback.message.edit_text(
@@ -481,7 +416,7 @@ async def callback_reject(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(StateFilter(RejectionState.waiting_for_reason))
-async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot):
+async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot, session: AsyncSession):
     """Обработчик причины отказа"""
     reason = message.text
     data = await state.get_data()
@@ -509,45 +444,44 @@ async def process_rejection_reason(message: Message, state: FSMContext, bot: Bot
         await state.clear()
         return
 
-    # Обновить статус в БД
-    AnnouncementCRUD.update_status(announcement_id, 'rejected', reason)
+    # Обновить статус в БД (только из pending и только своему менеджеру)
+    if not await AsyncAnnouncementCRUD.update_status(announcement_id, 'rejected', reason, manager_id=manager_id,
+                                                     session=session):
+        await message.answer("ℹ️ Объявление уже обработано или недоступно, отказ не сохранен")
+        await state.clear()
+        return
 
     # Записать действие
-    ManagerActionCRUD.create({
+    await AsyncManagerActionCRUD.create({
         'announcement_id': announcement_id,
         'manager_id': manager_id,
         'manager_name': manager_name,
         'telegram_id': user_id,
         'action': 'rejected',
         'comment': reason
-    })
+    }, session=session)
 
-    # Получить данные объявления для уведомления админа
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id
-        ).first()
-
-        if announcement:
-            # Уведомить админа
-            if ADMIN_TELEGRAM_ID and ADMIN_TELEGRAM_ID != 'YOUR_ADMIN_ID':
-                admin_message = format_rejected_notification(
-                    announcement.announcement_number,
-                    manager_name,
-                    reason
+    announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id, session=session)
+
+    # Одна транзакция на отказ; фиксируем до запросов к Telegram
+    await commit_async_unit_of_work(session)
+
+    if announcement:
+        # Уведомить админа
+        if ADMIN_TELEGRAM_ID and ADMIN_TELEGRAM_ID != 'YOUR_ADMIN_ID':
+            admin_message = format_rejected_notification(
+                announcement.announcement_number,
+                manager_name,
+                reason
+            )
+            try:
+                await bot.send_message(
+                    int(ADMIN_TELEGRAM_ID),
+                    admin_message,
+                    parse_mode='HTML'
                 )
-                try:
-                    await bot.send_message(
-                        int(ADMIN_TELEGRAM_ID),
-                        admin_message,
-                        parse_mode='HTML'
-                    )
-                except Exception as e:
-                    print(f"⚠️ Не удалось отправить уведомление админу: {e}")
-
-    finally:
-        session.close()
+            except Exception as e:
+                print(f"⚠️ Не удалось отправить уведомление админу: {e}")
 
     await message.answer(
         f"❌ Объявление отклонено.\n\n📝 Причина: {reason}",
@@ -637,8 +571,6 @@ async def process_lot_details(message: Message, state: FSMContext):
 @router.callback_query(F.data.startswith("lot_cancel_"))
 async def callback_lot_cancel(callback: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Назад' при выборе лота"""
-    import json
-
     announcement_id = int(callback.data.split("_")[2])
     user_id = callback.from_user.id
 
@@ -657,60 +589,23 @@ async def callback_lot_cancel(callback: CallbackQuery, state: FSMContext):
         return
 
     # Получить объявление из БД
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id,
-            Announcement.manager_id == manager_id
-        ).first()
-
-        if not announcement:
-            await callback.answer("❌ Объявление не найдено", show_alert=True)
-            return
-
-        # Обработка информации о лотах
-        lot_info = 'N/A'
+    announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
 
-        if announcement.lots:
-            try:
-                lots_data = json.loads(announcement.lots) if isinstance(announcement.lots, str) else announcement.lots
-                if lots_data and isinstance(lots_data, list):
-                    if len(lots_data) == 1:
-                        # Один лот - показать название
-                        lot_info = lots_data[0].get('name', 'N/A')
-                    else:
-                        # Несколько лотов - показать количество
-                        lot_info = f"Лотов: {len(lots_data)}"
-            except:
-                # Если ошибка парсинга - fallback на старое поле
-                lot_info = announcement.lot_name or 'N/A'
-        else:
-            # Старый формат - одно поле lot_name
-            lot_info = announcement.lot_name or 'N/A'
-
-        # Обрезать если слишком длинное
-        if isinstance(lot_info, str) and len(lot_info) > 100:
-            lot_info = lot_info[:100] + '...'
-
-        # Показать краткую информацию с кнопками действий
-        message_text = (
-            f"{'✅' if announcement.is_processed else '📄'} <b>{announcement.announcement_number}</b>\n\n"
-            f"📍 {announcement.region or 'N/A'}\n"
-            f"🏢 {announcement.organization_name or 'N/A'}\n\n"
-            f"💼 {lot_info}"
-        )
+    if not announcement or announcement.manager_id != manager_id:
+        await callback.answer("❌ Объявление не найдено", show_alert=True)
+        return
 
-        from bot.keyboards import get_announcement_actions_keyboard
+    # Показать краткую информацию с кнопками действий
+    message_text = render_announcement(announcement, 'summary')
 
-        await callback.message.edit_text(
-            message_text,
-            parse_mode='HTML',
-            reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
-        )
-        await callback.answer()
+    from bot.keyboards import get_announcement_actions_keyboard
 
-    finally:
-        session.close()
+    await callback.message.edit_text(
+        message_text,
+        parse_mode='HTML',
+        reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
+    )
+    await callback.answer()
 
 
 @router.callback_query(F.data == "admin_refresh_dashboard")
@@ -724,7 +619,7 @@ async def callback_refresh_dashboard(callback: CallbackQuery):
         return
 
     # Получить свежие данные
-    dashboard_data = get_admin_dashboard_data()
+    dashboard_data = await get_admin_dashboard_data()
 
     # Обновить сообщение
     try:
@@ -756,66 +651,26 @@ async def callback_work_view(callback: CallbackQuery):
         return
 
     # Получить объявление из БД
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id,
-            Announcement.manager_id == manager_id
-        ).first()
-
-        if not announcement:
-            await callback.answer("❌ Объявление не найдено", show_alert=True)
-            return
+    announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
 
-        # Обработка информации о лотах
-        import json
-        lot_info = 'N/A'
+    if not announcement or announcement.manager_id != manager_id:
+        await callback.answer("❌ Объявление не найдено", show_alert=True)
+        return
 
-        if announcement.lots:
-            try:
-                lots_data = json.loads(announcement.lots) if isinstance(announcement.lots, str) else announcement.lots
-                if lots_data and isinstance(lots_data, list):
-                    if len(lots_data) == 1:
-                        # Один лот - показать название
-                        lot_info = lots_data[0].get('name', 'N/A')
-                    else:
-                        # Несколько лотов - показать количество
-                        lot_info = f"Лотов: {len(lots_data)}"
-            except:
-                # Если ошибка парсинга - fallback на старое поле
-                lot_info = announcement.lot_name or 'N/A'
-        else:
-            # Старый формат - одно поле lot_name
-            lot_info = announcement.lot_name or 'N/A'
-
-        # Обрезать если слишком длинное
-        if isinstance(lot_info, str) and len(lot_info) > 100:
-            lot_info = lot_info[:100] + '...'
-
-        # Показать краткую информацию с кнопками действий
-        message_text = (
-            f"{'✅' if announcement.is_processed else '📄'} <b>{announcement.announcement_number}</b>\n\n"
-            f"📍 {announcement.region or 'N/A'}\n"
-            f"🏢 {announcement.organization_name or 'N/A'}\n\n"
-            f"💼 {lot_info}"
-        )
+    # Показать краткую информацию с кнопками действий
+    message_text = render_announcement(announcement, 'summary')
 
-        await callback.message.edit_text(
-            message_text,
-            parse_mode='HTML',
-            reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
-        )
-        await callback.answer()
-
-    finally:
-        session.close()
+    await callback.message.edit_text(
+        message_text,
+        parse_mode='HTML',
+        reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
+    )
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("work_processed_"))
 async def callback_work_processed(callback: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Обработал'"""
-    import json
-
     announcement_id = int(callback.data.split("_")[2])
     user_id = callback.from_user.id
 
@@ -832,60 +687,31 @@ async def callback_work_processed(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Вы не авторизованы", show_alert=True)
         return
 
-    # Получить объявление из БД
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id
-        ).first()
-
-        if not announcement:
-            await callback.answer("❌ Объявление не найдено", show_alert=True)
-            return
-
-        # Десериализовать лоты
-        lots_data = []
-        if announcement.lots:
-            try:
-                lots_data = json.loads(announcement.lots) if isinstance(announcement.lots, str) else announcement.lots
-            except:
-                pass
-
-        # Граничный случай: lots = None или []
-        if not lots_data:
-            lots_data = [{
-                'number': None,
-                'name': announcement.lot_name or 'N/A',
-                'description': announcement.lot_description or '',
-                'keyword': announcement.keyword_matched or ''
-            }]
-
-        # Проверить наличие частично заполненных данных
-        filled_lots = {}
-        if announcement.participation_details_draft:
-            filled_lots = parse_existing_participation_details(
-                announcement.participation_details_draft,
-                lots_data
-            )
+    # Лоты объявления (у объявления без строк лотов создаются из снимка лотов или устаревших полей);
+    # введенные ранее детали хранятся черновиками по каждому лоту
+    lots = await AsyncLotCRUD.ensure_for_announcement(announcement_id)
+    if not lots:
+        await callback.answer("❌ Объявление не найдено", show_alert=True)
+        return
 
-        # Сохранить в state
-        await state.update_data(
-            announcement_id=announcement_id,
-            manager_id=manager_id,
-            manager_name=manager_name,
-            all_lots=lots_data,
-            filled_lots=filled_lots
-        )
+    lots_data = [lot.to_dict() for lot in lots]
+    filled_lots = {i: lot.participation_draft for i, lot in enumerate(lots) if lot.participation_draft}
 
-        # Перейти в состояние выбора лота
-        await state.set_state(LotParticipationState.selecting_lot)
+    # Сохранить в state
+    await state.update_data(
+        announcement_id=announcement_id,
+        manager_id=manager_id,
+        manager_name=manager_name,
+        all_lots=lots_data,
+        filled_lots=filled_lots
+    )
 
-        # Показать клавиатуру с лотами
-        await show_lot_selection(callback.message, state, announcement_id, lots_data, filled_lots)
-        await callback.answer()
+    # Перейти в состояние выбора лота
+    await state.set_state(LotParticipationState.selecting_lot)
 
-    finally:
-        session.close()
+    # Показать клавиатуру с лотами
+    await show_lot_selection(callback.message, state, announcement_id, lots_data, filled_lots)
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("work_details_"))
@@ -906,27 +732,19 @@ async def callback_work_details(callback: CallbackQuery):
         return
 
     # Получить объявление из БД
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id,
-            Announcement.manager_id == manager_id
-        ).first()
+    announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
 
-        if not announcement:
-            await callback.answer("❌ Объявление не найдено", show_alert=True)
-            return
-
-        # Показать полную информацию
-        await callback.message.edit_text(
-            format_announcement_details(announcement),
-            parse_mode='HTML',
-            reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
-        )
-        await callback.answer()
+    if not announcement or announcement.manager_id != manager_id:
+        await callback.answer("❌ Объявление не найдено", show_alert=True)
+        return
 
-    finally:
-        session.close()
+    # Показать полную информацию
+    await callback.message.edit_text(
+        render_announcement(announcement, 'details'),
+        parse_mode='HTML',
+        reply_markup=get_announcement_actions_keyboard(announcement_id, announcement.is_processed)
+    )
+    await callback.answer()
 
 
 @router.callback_query(F.data == "work_back_to_list")
@@ -946,7 +764,7 @@ async def callback_work_back_to_list(callback: CallbackQuery):
         return
 
     # Получить список объявлений
-    announcements = AnnouncementCRUD.get_accepted_for_manager(manager_id)
+    announcements = await AsyncAnnouncementCRUD.get_accepted_for_manager(manager_id)
 
     # Вернуться к списку
     await callback.message.edit_text(
@@ -1035,60 +853,91 @@ async def callback_pending_view(callback: CallbackQuery, bot: Bot):
             return
 
         # Получить объявление из БД
-        session = get_session()
-        try:
-            announcement = session.query(Announcement).filter(
-                Announcement.id == announcement_id,
-                Announcement.manager_id == manager_id,
-                Announcement.status == 'pending'
-            ).first()
-
-            if not announcement:
-                await callback.answer("❌ Объявление не найдено или уже обработано.", show_alert=True)
-                return
-
-            # Подготовить данные объявления для отправки
-            from bot.messages import format_announcement_message
-            announcement_data = {
-                'announcement_number': announcement.announcement_number,
-                'announcement_url': announcement.announcement_url,
-                'organization_name': announcement.organization_name,
-                'organization_bin': announcement.organization_bin,
-                'legal_address': announcement.legal_address,
-                'region': announcement.region,
-                'lot_name': announcement.lot_name,
-                'lot_description': announcement.lot_description,
-                'keyword_matched': announcement.keyword_matched,
-                'manager_id': announcement.manager_id,
-                'manager_name': announcement.manager_name,
-                'application_deadline': announcement.application_deadline,
-                'procurement_method': announcement.procurement_method,
-                'lots': announcement.lots
-            }
-
-            # Форматировать сообщение и добавить кнопки "Беру в работу" и "Отклонить"
-            message_text = format_announcement_message(announcement_data, for_manager=True)
-            keyboard = get_announcement_keyboard(announcement.id)
+        announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
 
-            # Отправить новое сообщение с объявлением через bot
-            await bot.send_message(
-                chat_id=callback.from_user.id,
-                text=message_text,
-                parse_mode='HTML',
-                reply_markup=keyboard,
-                disable_web_page_preview=True
-            )
+        if not announcement or announcement.manager_id != manager_id or announcement.status != 'pending':
+            await callback.answer("❌ Объявление не найдено или уже обработано.", show_alert=True)
+            return
 
-            await callback.answer()
+        # Форматировать сообщение и добавить кнопки "Беру в работу" и "Отклонить"
+        message_text = render_announcement(announcement, 'manager')
+        keyboard = get_announcement_keyboard(announcement.id)
+
+        # Отправить новое сообщение с объявлением через bot
+        await bot.send_message(
+            chat_id=callback.from_user.id,
+            text=message_text,
+            parse_mode='HTML',
+            reply_markup=keyboard,
+            disable_web_page_preview=True
+        )
 
-        finally:
-            session.close()
+        await callback.answer()
 
     except Exception as e:
         print(f"❌ Ошибка в callback_pending_view: {e}")
         await callback.answer("❌ Произошла ошибка при загрузке объявления.", show_alert=True)
 
 
+@router.callback_query(F.data.startswith("digest_view_"))
+async def callback_digest_view(callback: CallbackQuery, bot: Bot):
+    """Обработчик открытия объявления из дайджеста"""
+    try:
+        announcement_id = int(callback.data.split("_")[2])
+        user_id = callback.from_user.id
+
+        # Найти ID менеджера по Telegram ID
+        manager_id = None
+        for mid, mdata in MANAGERS.items():
+            if mdata['telegram_id'] == user_id:
+                manager_id = mid
+                break
+
+        if not manager_id:
+            await callback.answer("❌ Вы не зарегистрированы как менеджер в системе.", show_alert=True)
+            return
+
+        announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
+
+        if not announcement:
+            await callback.answer("❌ Объявление не найдено.", show_alert=True)
+            return
+
+        # Выбор клавиатуры: общее объявление еще не забрано - кнопка "Мой район"
+        if announcement.manager_id is None:
+            keyboard = get_almaty_claim_keyboard(announcement.id)
+        elif announcement.manager_id != manager_id:
+            await callback.answer("❌ Это объявление уже забрал другой менеджер", show_alert=True)
+            return
+        elif announcement.status != 'pending':
+            await callback.answer("ℹ️ Объявление уже обработано.", show_alert=True)
+            return
+        else:
+            keyboard = get_announcement_keyboard(announcement.id)
+
+        message_text = render_announcement(announcement, 'manager')
+
+        sent_message = await bot.send_message(
+            chat_id=callback.from_user.id,
+            text=message_text,
+            parse_mode='HTML',
+            reply_markup=keyboard,
+            disable_web_page_preview=True
+        )
+
+        # Копию с кнопкой "Мой район" нужно будет отредактировать после захвата
+        if announcement.manager_id is None:
+            await AsyncNotificationMessageCRUD.create(
+                announcement.id, user_id, sent_message.message_id, manager_id
+            )
+
+        await callback.answer()
+
+    except Exception as e:
+        print(f"❌ Ошибка в callback_digest_view: {e}")
+        await callback.answer("❌ Произошла ошибка при загрузке объявления.", show_alert=True)
+
+
 @router.callback_query(F.data.startswith("postpone_"))
 async def callback_postpone(callback: CallbackQuery):
     """Обработчик кнопки 'Отложить' - удаляет сообщение"""
@@ -1100,8 +949,87 @@ async def callback_postpone(callback: CallbackQuery):
         await callback.answer("Объявление отложено", show_alert=False)
 
 
+async def update_almaty_copies(bot: Bot, announcement, manager_id: int, manager_name: str,
+                               current_chat_id: int, current_message_id: int):
+    """
+    Отредактировать на месте копии общего объявления после захвата
+
+    У всех сохраненных копий (кроме сообщения, в котором нажали "Мой район") убираются
+    кнопки и показывается, кто забрал объявление. Правки отправляются параллельно.
+    Менеджерам, у которых копии нет (или ее не удалось изменить), отправляется
+    отдельное уведомление, как раньше.
+
+    Args:
+        bot: Экземпляр бота
+        announcement: Объект Announcement (уже с manager_id/manager_name)
+        manager_id: ID менеджера, забравшего объявление
+        manager_name: Имя менеджера
+        current_chat_id: Чат, в котором нажата кнопка
+        current_message_id: Сообщение, в котором нажата кнопка
+    """
+    copies = [
+        record for record in await AsyncNotificationMessageCRUD.get_by_announcement(announcement.id)
+        if not (record.telegram_id == current_chat_id and record.message_id == current_message_id)
+    ]
+    claimed_text = render_announcement(announcement, 'claimed')
+
+    async def edit_copy(record) -> bool:
+        try:
+            await bot.edit_message_text(
+                text=claimed_text,
+                chat_id=record.telegram_id,
+                message_id=record.message_id,
+                parse_mode='HTML',
+                reply_markup=None,
+                disable_web_page_preview=True
+            )
+            return True
+        except TelegramBadRequest as e:
+            # Сообщение удалено менеджером или уже отредактировано
+            print(f"⚠️ Не удалось изменить копию объявления у {record.telegram_id}: {e}")
+            return False
+        except Exception as e:
+            print(f"❌ Ошибка изменения копии объявления у {record.telegram_id}: {e}")
+            return False
+
+    results = await asyncio.gather(*(edit_copy(record) for record in copies))
+    edited_chats = {record.telegram_id for record, edited in zip(copies, results) if edited}
+    print(f"✏️ Обновлено копий объявления {announcement.announcement_number}: {len(edited_chats)}")
+
+    # Копии больше не нужны - кнопок в них нет
+    await AsyncNotificationMessageCRUD.delete_by_announcement(announcement.id)
+
+    # Уведомить менеджеров из Алматы (1, 3, 4), у которых не было копии
+    almaty_managers = [1, 3, 4]
+
+    for mid in almaty_managers:
+        if mid == manager_id:
+            continue  # Пропустить текущего менеджера
+
+        other_telegram_id = MANAGERS[mid]['telegram_id']
+        if not other_telegram_id or other_telegram_id in edited_chats:
+            continue
+
+        try:
+            notification_text = (
+                f"📍 <b>Объявление из Алматы забрано</b>\n\n"
+                f"Менеджер <b>{manager_name}</b> забрал объявление:\n"
+                f"📋 {announcement.announcement_number}\n\n"
+                f"🔗 <a href='{announcement.announcement_url}'>Ссылка на объявление</a>"
+            )
+            await bot.send_message(
+                chat_id=other_telegram_id,
+                text=notification_text,
+                parse_mode='HTML',
+                disable_web_page_preview=True
+            )
+            print(f"✅ Уведомление отправлено менеджеру {MANAGERS[mid]['name']}")
+        except Exception as e:
+            print(f"❌ Ошибка отправки уведомления менеджеру {MANAGERS[mid]['name']}: {e}")
+
+
 @router.callback_query(F.data.startswith("claim_almaty_"))
-async def callback_claim_almaty(callback: CallbackQuery):
+async def callback_claim_almaty(callback: CallbackQuery, session: AsyncSession):
     """Обработчик кнопки 'Мой район' для объявлений из Алматы"""
     try:
         user_id = callback.from_user.id
@@ -1122,67 +1050,28 @@ async def callback_claim_almaty(callback: CallbackQuery):
             await callback.answer("❌ Вы не зарегистрированы как менеджер", show_alert=True)
             return
 
-        # Ответить на callback сразу, чтобы не истек таймаут
-        await callback.answer(f"✅ Объявление назначено вам")
-
-        # Получить объявление из БД
-        session = get_session()
-        try:
-            announcement = session.query(Announcement).filter(
-                Announcement.id == announcement_id
-            ).first()
-
-            if not announcement:
-                await callback.answer("❌ Объявление не найдено", show_alert=True)
-                return
-
-            # Проверить, не забрано ли уже объявление
-            if announcement.manager_id is not None:
-                await callback.answer("❌ Это объявление уже забрал другой менеджер", show_alert=True)
-                return
+        # Атомарный захват: UPDATE ... WHERE manager_id IS NULL
+        if not await AsyncAnnouncementCRUD.claim(announcement_id, manager_id, manager_name, session=session):
+            await callback.answer("❌ Это объявление уже забрал другой менеджер", show_alert=True)
+            return
 
-            # Установить manager_id
-            announcement.manager_id = manager_id
-            announcement.manager_name = manager_name
-            session.commit()
+        announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id, session=session)
+        await commit_async_unit_of_work(session)
 
-            print(f"✅ Объявление {announcement.announcement_number} забрал менеджер {manager_name}")
+        await callback.answer(f"✅ Объявление назначено вам")
 
-        finally:
-            session.close()
+        print(f"✅ Объявление {announcement.announcement_number} забрал менеджер {manager_name}")
 
         # Изменить клавиатуру на обычную
         keyboard = get_announcement_keyboard(announcement_id)
         await callback.message.edit_reply_markup(reply_markup=keyboard)
 
-        # Уведомить других менеджеров из Алматы (1, 3, 4)
-        almaty_managers = [1, 3, 4]
-        bot = callback.bot
-
-        for mid in almaty_managers:
-            if mid == manager_id:
-                continue  # Пропустить текущего менеджера
-
-            other_telegram_id = MANAGERS[mid]['telegram_id']
-            if not other_telegram_id:
-                continue
-
-            try:
-                notification_text = (
-                    f"📍 <b>Объявление из Алматы забрано</b>\n\n"
-                    f"Менеджер <b>{manager_name}</b> забрал объявление:\n"
-                    f"📋 {announcement.announcement_number}\n\n"
-                    f"🔗 <a href='{announcement.announcement_url}'>Ссылка на объявление</a>"
-                )
-                await bot.send_message(
-                    chat_id=other_telegram_id,
-                    text=notification_text,
-                    parse_mode='HTML',
-                    disable_web_page_preview=True
-                )
-                print(f"✅ Уведомление отправлено менеджеру {MANAGERS[mid]['name']}")
-            except Exception as e:
-                print(f"❌ Ошибка отправки уведомления менеджеру {MANAGERS[mid]['name']}: {e}")
+        # Обновить копии объявления у других менеджеров из Алматы
+        await update_almaty_copies(
+            callback.bot, announcement, manager_id, manager_name,
+            current_chat_id=callback.message.chat.id,
+            current_message_id=callback.message.message_id
+        )
 
     except Exception as e:
         print(f"❌ Ошибка в callback_claim_almaty: {e}")
@@ -1248,8 +1137,9 @@ async def callback_manager_stats(callback: CallbackQuery):
         # Получить имя менеджера
         manager_name = MANAGERS.get(manager_id, {}).get('name', 'Неизвестный')
 
-        # Получить статистику
-        stats = AnnouncementCRUD.get_manager_statistics(manager_id)
+        # Статистика всех менеджеров считается одним запросом и кэшируется
+        all_stats = await AsyncAnnouncementCRUD.get_all_manager_statistics()
+        stats = all_stats.get(manager_id) or AnnouncementCRUD.empty_statistics()
 
         # Форматировать сообщение
         text = format_manager_statistics(manager_name, stats)
@@ -1282,7 +1172,7 @@ async def callback_manager_problems(callback: CallbackQuery):
         manager_name = MANAGERS.get(manager_id, {}).get('name', 'Неизвестный')
 
         # Получить проблемные объявления
-        problems = AnnouncementCRUD.get_problem_announcements(manager_id)
+        problems = await AsyncAnnouncementCRUD.get_problem_announcements(manager_id)
 
         # Форматировать сообщение
         text = format_problem_announcements(manager_name, problems)
@@ -1315,7 +1205,7 @@ async def callback_manager_active(callback: CallbackQuery):
         manager_name = MANAGERS.get(manager_id, {}).get('name', 'Неизвестный')
 
         # Получить активные объявления
-        active = AnnouncementCRUD.get_active_announcements(manager_id)
+        active = await AsyncAnnouncementCRUD.get_active_announcements(manager_id)
 
         # Форматировать сообщение
         text = format_active_announcements(manager_name, active)
@@ -1348,7 +1238,7 @@ async def callback_manager_actions(callback: CallbackQuery):
         manager_name = MANAGERS.get(manager_id, {}).get('name', 'Неизвестный')
 
         # Получить последние действия менеджера
-        actions = ManagerActionCRUD.get_by_manager(manager_id, limit=20)
+        actions = await AsyncManagerActionCRUD.get_by_manager(manager_id, limit=20)
 
         # Форматировать сообщение
         text = format_manager_actions(manager_name, actions)
@@ -1378,47 +1268,19 @@ async def callback_manager_view_announcement(callback: CallbackQuery):
         manager_id = int(parts[1])
         announcement_id = int(parts[3])
 
-        session = get_session()
-        try:
-            # Получить объявление из базы данных
-            announcement = session.query(Announcement).filter(
-                Announcement.id == announcement_id
-            ).first()
-
-            if not announcement:
-                await callback.answer("❌ Объявление не найдено.", show_alert=True)
-                return
-
-            # Подготовить данные объявления для отправки
-            from bot.messages import format_announcement_details
-            announcement_data = {
-                'announcement_number': announcement.announcement_number,
-                'announcement_url': announcement.announcement_url,
-                'organization_name': announcement.organization_name,
-                'organization_bin': announcement.organization_bin,
-                'legal_address': announcement.legal_address,
-                'region': announcement.region,
-                'lot_name': announcement.lot_name,
-                'lot_description': announcement.lot_description,
-                'keyword_matched': announcement.keyword_matched,
-                'manager_id': announcement.manager_id,
-                'manager_name': announcement.manager_name,
-                'status': announcement.status,
-                'is_processed': announcement.is_processed,
-                'created_at': announcement.created_at,
-                'response_at': announcement.response_at,
-                'rejection_reason': announcement.rejection_reason
-            }
-
-            # Форматировать детали объявления
-            text = format_announcement_details(announcement_data)
-            keyboard = get_announcement_detail_keyboard(manager_id, announcement_id)
-
-            await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard, disable_web_page_preview=True)
-            await callback.answer()
-
-        finally:
-            session.close()
+        # Получить объявление из базы данных
+        announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
+
+        if not announcement:
+            await callback.answer("❌ Объявление не найдено.", show_alert=True)
+            return
+
+        # Форматировать детали объявления
+        text = render_announcement(announcement, 'details')
+        keyboard = get_announcement_detail_keyboard(manager_id, announcement_id)
+
+        await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard, disable_web_page_preview=True)
+        await callback.answer()
 
     except Exception as e:
         print(f"❌ Ошибка в callback_manager_view_announcement: {e}")
@@ -1476,7 +1338,7 @@ async def button_coordinator_work_announcements(message: Message):
         return await button_my_work(message)
 
     # Получить объявления со статусом accepted и действующим дедлайном
-    announcements = AnnouncementCRUD.get_accepted_with_valid_deadline()
+    announcements = await AsyncAnnouncementCRUD.get_accepted_with_valid_deadline()
 
     # Форматировать сообщение
     text = format_coordinator_announcements_list(announcements)
@@ -1503,29 +1365,19 @@ async def callback_coordinator_view_announcement(callback: CallbackQuery):
         # Извлечь announcement_id из callback.data (coord_view_123)
         announcement_id = int(callback.data.split("_")[2])
 
-        session = get_session()
-        try:
-            # Получить объявление из базы данных
-            announcement = session.query(Announcement).filter(
-                Announcement.id == announcement_id
-            ).first()
-
-            if not announcement:
-                await callback.answer("❌ Объявление не найдено.", show_alert=True)
-                return
-
-            # Получить имя менеджера
-            manager_name = announcement.manager_name or "Неизвестный"
+        # Получить объявление из базы данных
+        announcement = await AsyncAnnouncementCRUD.get_by_id(announcement_id)
 
-            # Форматировать детали объявления для координатора
-            text = format_coordinator_announcement_details(announcement, manager_name)
-            keyboard = get_coordinator_announcement_detail_keyboard()
+        if not announcement:
+            await callback.answer("❌ Объявление не найдено.", show_alert=True)
+            return
 
-            await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard, disable_web_page_preview=True)
-            await callback.answer()
+        # Форматировать детали объявления для координатора
+        text = render_announcement(announcement, 'coordinator')
+        keyboard = get_coordinator_announcement_detail_keyboard()
 
-        finally:
-            session.close()
+        await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard, disable_web_page_preview=True)
+        await callback.answer()
 
     except Exception as e:
         print(f"❌ Ошибка в callback_coordinator_view_announcement: {e}")
@@ -1546,7 +1398,7 @@ async def callback_coordinator_back_to_list(callback: CallbackQuery):
             return
 
         # Получить объявления со статусом accepted и действующим дедлайном
-        announcements = AnnouncementCRUD.get_accepted_with_valid_deadline()
+        announcements = await AsyncAnnouncementCRUD.get_accepted_with_valid_deadline()
 
         # Форматировать сообщение
         text = format_coordinator_announcements_list(announcements)
@@ -1562,46 +1414,6 @@ async def callback_coordinator_back_to_list(callback: CallbackQuery):
         await callback.answer("❌ Произошла ошибка.", show_alert=True)
 
 
-def parse_existing_participation_details(details_text: str, lots_data: list) -> dict:
-    """
-    Распарсить существующие данные для восстановления filled_lots
-
-    Args:
-        details_text: Существующий текст с деталями участия
-        lots_data: Список всех лотов
-
-    Returns:
-        Словарь заполненных лотов {index: details}
-    """
-    filled_lots = {}
-    if not details_text:
-        return filled_lots
-
-    lines = details_text.split('\n')
-    for line in lines:
-        if 'Лот №' in line and ':' in line:
-            try:
-                parts = line.split(':', 1)
-                # Убираем эмодзи 📦 и "Лот №"
-                lot_part = parts[0].replace('📦', '').replace('Лот №', '').strip()
-                details_part = parts[1].strip()
-
-                # Номер лота может быть строкой (например, 83848645-ЗЦП1) или числом
-                lot_number_str = lot_part
-
-                # Найти индекс в lots_data
-                for i, lot in enumerate(lots_data):
-                    # Сравниваем как строки
-                    lot_api_number = str(lot.get('number')) if lot.get('number') else str(i + 1)
-                    if lot_api_number == lot_number_str:
-                        filled_lots[i] = details_part
-                        break
-            except:
-                continue
-
-    return filled_lots
-
-
 async def save_participation_draft(announcement_id: int, all_lots: list, filled_lots: dict):
     """
     Сохранить черновик для восстановления после прерывания
@@ -1611,24 +1423,10 @@ async def save_participation_draft(announcement_id: int, all_lots: list, filled_
         all_lots: Список всех лотов
         filled_lots: Словарь заполненных лотов {index: details}
     """
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id
-        ).first()
-
-        if announcement:
-            # Сформировать черновик
-            draft_lines = []
-            for i, details in filled_lots.items():
-                lot = all_lots[i]
-                lot_number = lot.get('number') or (i + 1)
-                draft_lines.append(f"📦 Лот №{lot_number}: {details}")
-
-            announcement.participation_details_draft = '\n\n'.join(draft_lines)
-            session.commit()
-    finally:
-        session.close()
+    await AsyncLotCRUD.save_drafts(
+        announcement_id,
+        {all_lots[i]['id']: details for i, details in filled_lots.items()}
+    )
 
 
 async def show_lot_selection(message, state, announcement_id, lots_data, filled_lots):
@@ -1681,57 +1479,35 @@ async def finalize_participation_details(message, state):
     all_lots = data['all_lots']
     filled_lots = data['filled_lots']
 
-    # Сформировать строку с реальными переносами
-    lines = []
-    for i in range(len(all_lots)):
-        lot = all_lots[i]
-        lot_number = lot.get('number') or (i + 1)
-        details = filled_lots.get(i, '')
-        lines.append(f"📦 Лот №{lot_number}: {details}")
+    # Сохранить в БД: детали по каждому лоту, текст по всем лотам и отметку "обработано"
+    participation_details = await AsyncAnnouncementCRUD.save_participation(
+        announcement_id,
+        {all_lots[i]['id']: details for i, details in filled_lots.items()}
+    )
 
-    participation_details = '\n\n'.join(lines)  # Двойной перенос для пустой строки между лотами
+    if participation_details is not None:
+        lines = participation_details.split('\n\n')
 
-    # Сохранить в БД
-    session = get_session()
-    try:
-        announcement = session.query(Announcement).filter(
-            Announcement.id == announcement_id
-        ).first()
-
-        if announcement:
-            announcement.participation_details = participation_details
-            announcement.participation_details_draft = None  # Очистить черновик
-            announcement.is_processed = True
-            session.commit()
-
-            # Обновить Google Sheets
-            from utils.google_sheets import get_sheets_manager
-            sheets_manager = get_sheets_manager()
-            if sheets_manager.enabled:
-                sheets_manager.update_announcement(announcement)
-
-            # Записать действие
-            ManagerActionCRUD.create({
-                'announcement_id': announcement_id,
-                'manager_id': manager_id,
-                'manager_name': manager_name,
-                'telegram_id': message.from_user.id,
-                'action': 'processed',
-                'comment': f'Отработал. Заполнено {len(filled_lots)} лотов.'
-            })
-
-            # Показать подтверждение
-            preview = '\n'.join(lines[:3])
-            if len(lines) > 3:
-                preview += f"\n... и еще {len(lines) - 3}"
-
-            await message.answer(
-                f"✅ <b>Объявление отмечено как обработанное!</b>\n\n"
-                f"📝 <b>Информация сохранена:</b>\n{preview}",
-                parse_mode='HTML'
-            )
-    finally:
-        session.close()
+        # Записать действие
+        await AsyncManagerActionCRUD.create({
+            'announcement_id': announcement_id,
+            'manager_id': manager_id,
+            'manager_name': manager_name,
+            'telegram_id': message.from_user.id,
+            'action': 'processed',
+            'comment': f'Отработал. Заполнено {len(filled_lots)} лотов.'
+        })
+
+        # Показать подтверждение
+        preview = '\n'.join(lines[:3])
+        if len(lines) > 3:
+            preview += f"\n... и еще {len(lines) - 3}"
+
+        await message.answer(
+            f"✅ <b>Объявление отмечено как обработанное!</b>\n\n"
+            f"📝 <b>Информация сохранена:</b>\n{preview}",
+            parse_mode='HTML'
+        )
 
     # Очистить состояние
     await state.clear()
@@ -1742,4 +1518,14 @@ def get_dispatcher() -> Dispatcher:
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
     dp.include_router(router)
+
+    # Одна сессия БД на обновление
+    dp.update.outer_middleware(DbSessionMiddleware())
+
+    # Метрики обработчиков: время, SQL-запросы, вызовы Telegram
+    install_db_hooks(engine)
+    install_db_hooks(get_async_engine().sync_engine)
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
     return dp
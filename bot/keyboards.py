@@ -58,6 +58,42 @@ def get_almaty_claim_keyboard(announcement_id: int) -> InlineKeyboardMarkup:
     return keyboard
 
 
+def get_digest_keyboard(items: list, offset: int = 0) -> InlineKeyboardMarkup:
+    """
+    Компактная клавиатура для дайджеста новых объявлений
+
+    Args:
+        items: Список элементов страницы (dict с ключами announcement, announcement_db_id, is_shared)
+        offset: Сквозной номер первого элемента страницы минус 1
+
+    Returns:
+        InlineKeyboardMarkup с кнопкой на каждое объявление
+    """
+    buttons = []
+    row = []
+
+    for i, item in enumerate(items, offset + 1):
+        emoji = "📍" if item.get('is_shared') else "📄"
+
+        row.append(
+            InlineKeyboardButton(
+                text=f"{emoji} {i}",
+                callback_data=f"digest_view_{item['announcement_db_id']}"
+            )
+        )
+
+        # По 5 кнопок в ряд
+        if len(row) == 5:
+            buttons.append(row)
+            row = []
+
+    if row:
+        buttons.append(row)
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    return keyboard
+
+
 def get_admin_dashboard_keyboard() -> InlineKeyboardMarkup:
     """
     Клавиатура для главного дашборда администратора
@@ -38,8 +38,6 @@ def format_announcement_message(announcement: dict, for_manager: bool = True) ->
     Returns:
         Отформатированное сообщение
     """
-    import json
-
     # Поддержка как dict, так и объекта Announcement
     def get_value(key, default='N/A'):
         if isinstance(announcement, dict):
@@ -61,16 +59,9 @@ def format_announcement_message(announcement: dict, for_manager: bool = True) ->
     # Способ закупки
     procurement_method = get_value('procurement_method', 'Не указан')
 
-    # Получаем данные лотов
+    # Получаем данные лотов (список словарей: колонка JSON декодируется ORM)
     lots_data = get_value('lots', None)
 
-    # Если lots - строка JSON, десериализуем
-    if lots_data and isinstance(lots_data, str):
-        try:
-            lots_data = json.loads(lots_data)
-        except:
-            lots_data = None
-
     # Форматируем секцию лотов
     if lots_data and isinstance(lots_data, list) and len(lots_data) > 0:
         # Несколько лотов
@@ -131,6 +122,62 @@ def format_announcement_message(announcement: dict, for_manager: bool = True) ->
     return message
 
 
+def format_digest_message(items: list, page: int, total_pages: int, total: int, offset: int = 0) -> str:
+    """
+    Форматирование дайджеста новых объявлений для менеджера
+
+    Args:
+        items: Список элементов страницы (dict с ключами announcement, announcement_db_id, is_shared)
+        page: Номер страницы (с 1)
+        total_pages: Всего страниц в дайджесте
+        total: Всего новых объявлений в дайджесте
+        offset: Сквозной номер первого элемента страницы минус 1
+
+    Returns:
+        Отформатированное сообщение
+    """
+    header = f"🗂 <b>Дайджест новых объявлений</b>"
+    if total_pages > 1:
+        header += f" ({page}/{total_pages})"
+
+    message = f"{header}\n\n📥 Всего новых: <b>{total}</b>\n\n"
+
+    for i, item in enumerate(items, offset + 1):
+        announcement = item['announcement']
+
+        # Краткая информация о лотах
+        lots_data = announcement.get('lots')
+
+        if lots_data and isinstance(lots_data, list):
+            if len(lots_data) == 1:
+                lot_info = lots_data[0].get('name') or 'N/A'
+            else:
+                lot_info = f"Лотов: {len(lots_data)}"
+        else:
+            lot_info = announcement.get('lot_name') or 'N/A'
+
+        if len(lot_info) > 80:
+            lot_info = lot_info[:80] + "..."
+
+        deadline = ensure_datetime(announcement.get('application_deadline'))
+        deadline_str = deadline.strftime('%d.%m.%Y %H:%M') if deadline else 'Не указан'
+
+        shared_mark = " 📍" if item.get('is_shared') else ""
+
+        message += (
+            f"<b>{i}.</b> 📋 <b>{announcement.get('announcement_number', 'N/A')}</b>{shared_mark}\n"
+            f"🏢 {announcement.get('organization_name') or 'N/A'}\n"
+            f"💼 {lot_info}\n"
+            f"⏰ {deadline_str}\n\n"
+        )
+
+    message += "💡 Нажмите на объявление, чтобы открыть его и взять в работу"
+    if any(item.get('is_shared') for item in items):
+        message += "\n📍 - общее объявление (Алматы)"
+
+    return message
+
+
 def format_accepted_notification(announcement_number: str, manager_name: str) -> str:
     """Уведомление админу о принятии объявления"""
     return (
@@ -192,6 +239,74 @@ def format_stats_message(stats: dict) -> str:
     )
 
 
+def format_perf_stats(snapshot: dict, limit: int = 15) -> str:
+    """
+    Форматирование метрик обработчиков для администратора
+
+    Args:
+        snapshot: Снимок метрик (MetricsRegistry.snapshot)
+        limit: Сколько обработчиков показать (самые затратные по суммарному времени)
+
+    Returns:
+        Отформатированное сообщение
+    """
+    from datetime import datetime
+
+    since = datetime.fromtimestamp(snapshot['since']).strftime('%d.%m.%Y %H:%M')
+    message = f"⏱ <b>Метрики обработчиков</b>\n<i>с {since}</i>\n\n"
+
+    handlers = list(snapshot['handlers'].items())
+    if not handlers:
+        message += "Пока нет данных.\n"
+
+    for name, stats in handlers[:limit]:
+        p95 = f"{stats['p95_ms']}" if stats['p95_ms'] is not None else f">{stats['max_ms']:.0f}"
+        errors = f" (ошибок: {stats['errors']})" if stats['errors'] else ""
+        message += (
+            f"<b>{name}</b> × {stats['count']}{errors}\n"
+            f"   ср. {stats['avg_ms']} мс, p50 ≤{stats['p50_ms'] or '—'} мс, p95 ≤{p95} мс, макс. {stats['max_ms']} мс\n"
+            f"   SQL: {stats['db_queries_per_call']}/вызов ({stats['db_time_ms']} мс всего), "
+            f"Telegram: {stats['tg_calls_per_call']}/вызов\n"
+        )
+
+    if len(handlers) > limit:
+        message += f"... и еще {len(handlers) - limit}\n"
+
+    background = snapshot['background']
+    message += (
+        f"\n🔧 <b>Фоновые задачи:</b> SQL {background['db_queries']} ({background['db_time_ms']} мс), "
+        f"Telegram {background['tg_calls']}\n"
+    )
+
+    if snapshot['tg_methods']:
+        methods = ', '.join(f"{method} {count}" for method, count in list(snapshot['tg_methods'].items())[:8])
+        message += f"📡 <b>Вызовы API:</b> {methods}\n"
+
+    outbox = snapshot.get('gauges', {}).get('sheet_outbox')
+    if outbox:
+        failing = f", с ошибками {outbox['failing']}" if outbox['failing'] else ""
+        message += (
+            f"📤 <b>Google Sheets:</b> в очереди {outbox['pending']}{failing}, "
+            f"отставание {outbox['oldest_seconds']} с\n"
+        )
+
+    quota = snapshot.get('gauges', {}).get('sheets_quota')
+    if quota:
+        message += "📊 <b>Квоты Sheets (в минуту):</b> " + ", ".join(
+            f"{'чтение' if kind == 'read' else 'запись'} {stats['used']}/{stats['quota']}"
+            f" (ожидание {stats['throttled_seconds']} с, 429: {stats['rate_limited']})"
+            for kind, stats in quota.items()
+        ) + "\n"
+
+    edits = snapshot.get('gauges', {}).get('sheet_edits')
+    if edits:
+        message += (
+            f"📥 <b>Правки из Sheets:</b> перенесено {edits['imported']}, конфликтов {edits['conflicts']}\n"
+        )
+
+    return message
+
+
 def format_admin_dashboard(dashboard_data: dict) -> str:
     """
     Форматирование главного дашборда администратора
@@ -402,7 +517,8 @@ def format_manager_statistics(manager_name: str, stats: dict) -> str:
         f"📊 <b>ЭФФЕКТИВНОСТЬ</b>\n"
         f"✅ Процент принятия: <b>{stats['acceptance_rate']}%</b>\n"
         f"🔄 Процент обработки: <b>{stats['processing_rate']}%</b>\n"
-        f"⏱ Среднее время реакции: <b>{stats['avg_response_time']} ч</b>"
+        f"⏱ Среднее время реакции: <b>{stats['avg_response_time']} ч</b>\n"
+        f"⏱ Медиана / 90%: <b>{stats['median_response_time']} ч</b> / <b>{stats['p90_response_time']} ч</b>"
     )
 
 
@@ -611,6 +727,43 @@ def format_deadline_reminder(announcement, hours_left: int) -> str:
     return message
 
 
+def format_announcement_summary(announcement) -> str:
+    """
+    Краткая информация об объявлении в работе (номер, регион, организация, лоты)
+
+    Args:
+        announcement: Объект объявления из БД
+
+    Returns:
+        Отформатированное сообщение
+    """
+    # Обработка информации о лотах
+    lot_info = 'N/A'
+
+    lots_data = announcement.lots
+    if lots_data and isinstance(lots_data, list):
+        if len(lots_data) == 1:
+            # Один лот - показать название
+            lot_info = lots_data[0].get('name', 'N/A')
+        else:
+            # Несколько лотов - показать количество
+            lot_info = f"Лотов: {len(lots_data)}"
+    else:
+        # Старый формат - одно поле lot_name
+        lot_info = announcement.lot_name or 'N/A'
+
+    # Обрезать если слишком длинное
+    if isinstance(lot_info, str) and len(lot_info) > 100:
+        lot_info = lot_info[:100] + '...'
+
+    return (
+        f"{'✅' if announcement.is_processed else '📄'} <b>{announcement.announcement_number}</b>\n\n"
+        f"📍 {announcement.region or 'N/A'}\n"
+        f"🏢 {announcement.organization_name or 'N/A'}\n\n"
+        f"💼 {lot_info}"
+    )
+
+
 def format_coordinator_announcements_list(announcements: list) -> str:
     """
     Форматирование списка объявлений в работе для координатора
@@ -644,8 +797,6 @@ def format_coordinator_announcement_details(announcement, manager_name: str) ->
     Returns:
         Отформатированное сообщение
     """
-    import json
-
     # Форматируем дату окончания приема заявок
     deadline = ensure_datetime(announcement.application_deadline)
     if deadline:
@@ -659,13 +810,6 @@ def format_coordinator_announcement_details(announcement, manager_name: str) ->
     # Получаем данные лотов
     lots_data = announcement.lots
 
-    # Если lots - строка JSON, десериализуем
-    if lots_data and isinstance(lots_data, str):
-        try:
-            lots_data = json.loads(lots_data)
-        except:
-            lots_data = None
-
     # Форматируем секцию лотов (короткая версия)
     if lots_data and isinstance(lots_data, list) and len(lots_data) > 0:
         lots_section = f"📦 <b>Лотов:</b> {len(lots_data)}\n"
@@ -711,3 +855,71 @@ COORDINATOR_START_MESSAGE = """
 
 Удачи в работе!
 """
+
+
+def format_claimed_announcement(announcement) -> str:
+    """
+    Сообщение об общем объявлении (Алматы), которое уже забрал менеджер
+
+    Этим текстом заменяются копии объявления у остальных менеджеров
+
+    Args:
+        announcement: Объект Announcement (с заполненным manager_name)
+
+    Returns:
+        Отформатированное сообщение
+    """
+    message = format_announcement_message(announcement, for_manager=True)
+    message += f"\n\n📍 <b>Объявление забрал(а): {announcement.manager_name}</b>"
+    return message
+
+
+def render_announcement(announcement, variant: str = 'manager', announcement_id: int = None) -> str:
+    """
+    Получить отрендеренное сообщение об объявлении через кэш
+
+    Вместо повторного разбора JSON лотов и сборки HTML при каждом показе сообщение
+    берется из кэша по ключу (объявление, вариант). Версией служит updated_at,
+    поэтому изменения статуса и деталей объявления автоматически сбрасывают кэш.
+
+    Args:
+        announcement: Объект Announcement или dict с данными объявления
+        variant: manager, admin, details, summary, claimed или coordinator
+        announcement_id: ID объявления (если announcement - dict без id)
+
+    Returns:
+        Отформатированное сообщение
+    """
+    from utils.message_cache import get_message_cache
+
+    def get_value(key):
+        if isinstance(announcement, dict):
+            return announcement.get(key)
+        return getattr(announcement, key, None)
+
+    if announcement_id is None:
+        announcement_id = get_value('id')
+    version = get_value('updated_at')
+
+    renderers = {
+        'manager': lambda: format_announcement_message(announcement, for_manager=True),
+        'admin': lambda: format_announcement_message(announcement, for_manager=False),
+        'details': lambda: format_announcement_details(announcement),
+        'summary': lambda: format_announcement_summary(announcement),
+        'claimed': lambda: format_claimed_announcement(announcement),
+        'coordinator': lambda: format_coordinator_announcement_details(
+            announcement, announcement.manager_name or "Неизвестный"
+        )
+    }
+
+    # Без ID кэшировать не по чему - просто рендерим
+    if announcement_id is None:
+        return renderers[variant]()
+
+    cache = get_message_cache()
+    message = cache.get(announcement_id, variant, version)
+    if message is None:
+        message = renderers[variant]()
+        cache.set(announcement_id, variant, message, version)
+
+    return message
@@ -0,0 +1,93 @@
+"""
+Middleware бота: сессия БД на обновление, сбор метрик обработчиков и вызовов Telegram API
+"""
+import sys
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+
+from database.async_crud import get_async_session, commit_async_unit_of_work
+from utils.metrics import get_metrics
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: время обработчика, SQL-запросы и вызовы Telegram за обновление
+
+    Регистрируется на message/callback_query диспетчера, поэтому в data уже есть
+    выбранный обработчик и метрики собираются по имени его функции.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get('handler')
+        handler_name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+
+        metrics = get_metrics()
+        token = metrics.start_update()
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            metrics.finish_update(token, handler_name, time.perf_counter() - started, failed)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: одна асинхронная сессия БД (единица работы) на обновление
+
+    Сессия передается обработчику как аргумент session и в асинхронные CRUD-методы.
+    Обработчик может зафиксировать ее раньше (commit_async_unit_of_work), чтобы не
+    держать блокировку БД во время запросов к Telegram; оставшиеся изменения
+    фиксируются после обработки.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with get_async_session() as session:
+            data['session'] = session
+            try:
+                result = await handler(event, data)
+                await commit_async_unit_of_work(session)
+                return result
+            except Exception:
+                await session.rollback()
+                session.sync_session.info.pop('after_commit', None)
+                raise
+
+
+class TelegramCallsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: подсчет исходящих вызовов Telegram Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        get_metrics().record_telegram_call(type(method).__name__)
+        return await make_request(bot, method)
+
+
+def install_bot_metrics(bot):
+    """
+    Подключить подсчет вызовов Telegram API к экземпляру бота
+
+    Args:
+        bot: Экземпляр aiogram Bot
+    """
+    if not any(isinstance(middleware, TelegramCallsMiddleware) for middleware in bot.session.middleware):
+        bot.session.middleware(TelegramCallsMiddleware())
@@ -1,6 +1,7 @@
 """
 Модуль для отправки уведомлений через Telegram
 """
+import asyncio
 import sys
 import os
 
@@ -8,16 +9,32 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup
-from bot.messages import format_announcement_message, format_coordinator_notification, format_deadline_reminder
-from bot.keyboards import get_announcement_keyboard, get_almaty_claim_keyboard
+from bot.messages import (
+    format_announcement_message,
+    format_coordinator_notification,
+    format_deadline_reminder,
+    format_digest_message,
+    render_announcement
+)
+from bot.keyboards import get_announcement_keyboard, get_almaty_claim_keyboard, get_digest_keyboard
+from bot.middlewares import install_bot_metrics
+from database.async_crud import AsyncNotificationMessageCRUD
 from config import TELEGRAM_BOT_TOKEN, ADMIN_TELEGRAM_ID, COORDINATOR_TELEGRAM_ID
 
+# Режим дайджеста: если за один запуск парсинга менеджеру пришло столько или больше
+# новых объявлений, они отправляются сводкой вместо отдельных сообщений (0 - отключено)
+DIGEST_THRESHOLD = int(os.getenv('DIGEST_THRESHOLD', '5'))
+
+# Количество объявлений на одной странице дайджеста
+DIGEST_PAGE_SIZE = int(os.getenv('DIGEST_PAGE_SIZE', '10'))
+
 
 class TelegramNotifier:
     """Класс для отправки уведомлений в Telegram"""
 
     def __init__(self):
         self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        install_bot_metrics(self.bot)
 
     async def send_to_manager(self, telegram_id: int, announcement: dict, announcement_db_id: int, is_shared: bool = False):
         """
@@ -31,7 +48,7 @@ class TelegramNotifier:
         """
         print(f"📤 Попытка отправки уведомления менеджеру {announcement.get('manager_name', 'N/A')} (ID: {telegram_id})")
 
-        message_text = format_announcement_message(announcement, for_manager=True)
+        message_text = render_announcement(announcement, 'manager', announcement_db_id)
 
         # Выбор клавиатуры в зависимости от типа объявления
         if is_shared:
@@ -41,7 +58,7 @@ class TelegramNotifier:
             keyboard = get_announcement_keyboard(announcement_db_id)
 
         try:
-            await self.bot.send_message(
+            sent_message = await self.bot.send_message(
                 chat_id=telegram_id,
                 text=message_text,
                 reply_markup=keyboard,
@@ -49,6 +66,11 @@ class TelegramNotifier:
                 disable_web_page_preview=True
             )
             print(f"✅ Уведомление успешно отправлено менеджеру (ID: {telegram_id})")
+
+            # Запомнить сообщение общего объявления, чтобы после захвата отредактировать его
+            if is_shared:
+                await self.remember_shared_message(announcement_db_id, telegram_id, sent_message.message_id)
+
             return True
 
         except Exception as e:
@@ -56,6 +78,70 @@ class TelegramNotifier:
             print(f"   ⚠️ Возможно, менеджер не запустил бота (/start)")
             return False
 
+    @staticmethod
+    async def remember_shared_message(announcement_db_id: int, telegram_id: int, message_id: int,
+                                      manager_id: int = None):
+        """
+        Сохранить message_id копии общего объявления (Алматы)
+
+        Args:
+            announcement_db_id: ID объявления в базе данных
+            telegram_id: Telegram ID менеджера (chat_id)
+            message_id: ID отправленного сообщения
+            manager_id: ID менеджера (если известен)
+        """
+        try:
+            await AsyncNotificationMessageCRUD.create(announcement_db_id, telegram_id, message_id, manager_id)
+        except Exception as e:
+            # Не прерываем отправку: в худшем случае копия не будет отредактирована
+            print(f"⚠️ Не удалось сохранить message_id для объявления {announcement_db_id}: {e}")
+
+    async def send_digest_to_manager(self, telegram_id: int, items: list) -> list:
+        """
+        Отправить менеджеру дайджест новых объявлений (одно или несколько сообщений)
+
+        Args:
+            telegram_id: Telegram ID менеджера
+            items: Список словарей с ключами announcement (данные объявления),
+                   announcement_db_id (ID в базе данных) и is_shared (общее объявление)
+
+        Returns:
+            ID объявлений с отправленных страниц (пустой список - не отправлено ничего)
+        """
+        if not items:
+            return []
+
+        pages = [items[i:i + DIGEST_PAGE_SIZE] for i in range(0, len(items), DIGEST_PAGE_SIZE)]
+        print(f"📤 Отправка дайджеста менеджеру (ID: {telegram_id}): {len(items)} объявлений, страниц: {len(pages)}")
+
+        delivered = []
+        for page_number, page_items in enumerate(pages, 1):
+            offset = (page_number - 1) * DIGEST_PAGE_SIZE
+            message_text = format_digest_message(page_items, page_number, len(pages), len(items), offset)
+            keyboard = get_digest_keyboard(page_items, offset)
+
+            try:
+                await self.bot.send_message(
+                    chat_id=telegram_id,
+                    text=message_text,
+                    reply_markup=keyboard,
+                    parse_mode='HTML',
+                    disable_web_page_preview=True
+                )
+                delivered += [item['announcement_db_id'] for item in page_items]
+
+            except Exception as e:
+                print(f"❌ ОШИБКА отправки дайджеста менеджеру (ID: {telegram_id}), страница {page_number}: {e}")
+
+            # Небольшая задержка между страницами
+            if page_number < len(pages):
+                await asyncio.sleep(1)
+
+        if delivered:
+            print(f"✅ Дайджест успешно отправлен менеджеру (ID: {telegram_id})")
+
+        return delivered
+
     async def send_to_admin(self, announcement: dict):
         """
         Отправить уведомление администратору
@@ -0,0 +1,203 @@
+"""
+Очередь напоминаний о дедлайнах
+
+Расписание хранится в таблице deadline_reminders (ReminderCRUD). В памяти - куча
+(heapq) по due_at: очередь спит до ближайшего срока и просыпается ровно к нему, а
+не сканирует объявления раз в час. Новые напоминания приходят от ReminderCRUD
+после commit, при старте куча восстанавливается из БД.
+
+В тихие часы (по времени Астаны) напоминание не теряется, а переносится на их
+окончание; если дедлайн наступит раньше, оно отправляется сразу.
+"""
+import asyncio
+import heapq
+import math
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MANAGERS
+from database.crud import ReminderCRUD, DEADLINE_UTC_OFFSET
+from database.async_crud import AsyncReminderCRUD
+from utils.logger import logger
+
+# Тихие часы по времени Астаны: с QUIET_HOURS_START:00 до QUIET_HOURS_END:00 напоминания не отправляются
+QUIET_HOURS_START = int(os.getenv('QUIET_HOURS_START', '23'))
+QUIET_HOURS_END = int(os.getenv('QUIET_HOURS_END', '8'))
+
+# Повтор отправки после ошибки (минуты) и пауза между напоминаниями (секунды)
+REMINDER_RETRY_MINUTES = int(os.getenv('REMINDER_RETRY_MINUTES', '5'))
+REMINDER_SEND_DELAY = float(os.getenv('REMINDER_SEND_DELAY', '1'))
+
+# Сколько наступивших напоминаний читать из БД за раз
+REMINDER_BATCH_SIZE = 100
+
+
+def is_quiet_time(moment: datetime) -> bool:
+    """Попадает ли момент (naive UTC) в тихие часы по Астане"""
+    hour = (moment + DEADLINE_UTC_OFFSET).hour
+    if QUIET_HOURS_START > QUIET_HOURS_END:
+        return hour >= QUIET_HOURS_START or hour < QUIET_HOURS_END
+    return QUIET_HOURS_START <= hour < QUIET_HOURS_END
+
+
+def quiet_hours_end(moment: datetime) -> datetime:
+    """Окончание тихих часов, в которые попадает момент (naive UTC)"""
+    local = moment + DEADLINE_UTC_OFFSET
+    end = local.replace(hour=QUIET_HOURS_END, minute=0, second=0, microsecond=0)
+    if end <= local:
+        end += timedelta(days=1)
+    return end - DEADLINE_UTC_OFFSET
+
+
+class ReminderScheduler:
+    """Отправка напоминаний о дедлайнах точно в срок"""
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self._heap = []  # (due_at, reminder_id)
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+
+    async def start(self):
+        """Дополнить расписание из БД, восстановить кучу и запустить очередь"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        created = await AsyncReminderCRUD.rebuild()
+        if created:
+            logger.info(f"⏰ Добавлено напоминаний в расписание: {created}")
+
+        self._heap = await AsyncReminderCRUD.get_pending()
+        heapq.heapify(self._heap)
+        ReminderCRUD.add_listener(self.push)
+
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"⏰ Очередь напоминаний запущена, в расписании: {len(self._heap)}")
+
+    async def stop(self):
+        """Остановить очередь"""
+        ReminderCRUD.remove_listener(self.push)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def push(self, entries: list):
+        """
+        Добавить напоминания в кучу и разбудить очередь
+
+        Вызывается после commit, в том числе из потоков (run_after_commit).
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._push, entries)
+
+    def _push(self, entries: list):
+        for entry in entries:
+            heapq.heappush(self._heap, tuple(entry))
+        self._wakeup.set()
+
+    def next_due_at(self):
+        """Время ближайшего напоминания в куче"""
+        return self._heap[0][0] if self._heap else None
+
+    async def _run(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                timeout = None
+                if self._heap:
+                    timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                now = datetime.utcnow()
+                if self._heap and self._heap[0][0] <= now:
+                    # Записи кучи - только будильник; актуальное состояние читается из БД
+                    while self._heap and self._heap[0][0] <= now:
+                        heapq.heappop(self._heap)
+                    await self.process_due(now)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка очереди напоминаний: {e}")
+                await asyncio.sleep(60)
+
+    async def process_due(self, now: datetime = None) -> int:
+        """
+        Обработать наступившие напоминания
+
+        По объявлению отправляется одно, самое срочное напоминание (остальные, если
+        их время тоже прошло, например после простоя, отмечаются пропущенными).
+
+        Returns:
+            Количество отправленных напоминаний
+        """
+        now = now or datetime.utcnow()
+        sent = 0
+
+        while True:
+            reminders = await AsyncReminderCRUD.get_due(now, limit=REMINDER_BATCH_SIZE)
+            if not reminders:
+                return sent
+
+            by_announcement = {}
+            for reminder in reminders:
+                by_announcement.setdefault(reminder.announcement_id, []).append(reminder)
+
+            for group in by_announcement.values():
+                group.sort(key=lambda reminder: reminder.hours_before)
+                reminder, skipped = group[0], group[1:]
+
+                if skipped:
+                    await AsyncReminderCRUD.mark_sent([r.id for r in skipped], now=now)
+                if await self._handle(reminder, now) == 'sent':
+                    sent += 1
+                    await asyncio.sleep(REMINDER_SEND_DELAY)
+
+            # Каждое напоминание отправлено, удалено или перенесено в будущее - следующая пачка новая
+            if len(reminders) < REMINDER_BATCH_SIZE:
+                return sent
+
+    async def _handle(self, reminder, now: datetime) -> str:
+        """Отправить, отложить или отбросить одно напоминание: 'sent', 'deferred', 'dropped'"""
+        announcement = reminder.announcement
+        deadline = ReminderCRUD.deadline_utc(announcement) if announcement else None
+
+        manager = MANAGERS.get(announcement.manager_id) if announcement else None
+        telegram_id = manager.get('telegram_id') if manager else None
+
+        if announcement is None or announcement.status != 'accepted' or deadline is None \
+                or deadline <= now or not telegram_id:
+            await AsyncReminderCRUD.drop([reminder.id])
+            return 'dropped'
+
+        # Тихие часы: перенести на их окончание, если дедлайн позже
+        if is_quiet_time(now):
+            wake_at = quiet_hours_end(now)
+            if wake_at < deadline:
+                await self._defer(reminder, wake_at)
+                return 'deferred'
+
+        hours_left = min(reminder.hours_before, math.ceil((deadline - now).total_seconds() / 3600))
+        if not await self.notifier.send_deadline_reminder(telegram_id, announcement, hours_left):
+            await self._defer(reminder, now + timedelta(minutes=REMINDER_RETRY_MINUTES))
+            return 'deferred'
+
+        await AsyncReminderCRUD.mark_sent([reminder.id], now=now)
+        return 'sent'
+
+    async def _defer(self, reminder, due_at: datetime):
+        await AsyncReminderCRUD.defer(reminder.id, due_at)
+        heapq.heappush(self._heap, (due_at, reminder.id))
@@ -0,0 +1,213 @@
+"""
+Режим webhook: прием обновлений Telegram встроенным aiohttp-сервером
+
+Включается переменной WEBHOOK_URL (публичный адрес за reverse proxy).
+Сервер проверяет секретный токен, отбрасывает повторно доставленные обновления,
+обрабатывает их в фоне и при остановке дожидается завершения уже принятых.
+На том же сервере доступны /health и /metrics для мониторинга.
+"""
+import asyncio
+import hmac
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import logger
+from utils.metrics import get_metrics
+
+# Публичный адрес бота (например https://bot.example.com). Пусто - режим polling
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+
+# Путь, на который Telegram присылает обновления
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+# Адрес, который слушает встроенный сервер (за reverse proxy)
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+
+# Сколько последних update_id помнить для отсеивания повторов
+WEBHOOK_DEDUP_SIZE = int(os.getenv('WEBHOOK_DEDUP_SIZE', '10000'))
+
+# Сколько секунд ждать завершения принятых обновлений при остановке
+WEBHOOK_DRAIN_TIMEOUT = int(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """Встроенный aiohttp-сервер для приема обновлений Telegram"""
+
+    def __init__(self, dp: Dispatcher, bot: Bot, secret: str = WEBHOOK_SECRET,
+                 path: str = WEBHOOK_PATH, dedup_size: int = WEBHOOK_DEDUP_SIZE,
+                 drain_timeout: int = WEBHOOK_DRAIN_TIMEOUT):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.path = path
+        self.dedup_size = dedup_size
+        self.drain_timeout = drain_timeout
+
+        self.draining = False
+        self.started_at = time.monotonic()
+
+        self._seen_updates = OrderedDict()
+        self._tasks = set()
+        self._runner = None
+
+        # Счетчики для /health
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def build_app(self) -> web.Application:
+        """Создать aiohttp-приложение с маршрутами webhook, /health и /metrics"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    def _check_secret(self, request: web.Request) -> bool:
+        """Проверить секретный токен из заголовка запроса"""
+        if not self.secret:
+            return True
+        token = request.headers.get(SECRET_HEADER, '')
+        return hmac.compare_digest(token, self.secret)
+
+    def _is_duplicate(self, update_id: int) -> bool:
+        """Проверить и запомнить update_id (Telegram повторяет доставку при таймаутах)"""
+        if update_id in self._seen_updates:
+            return True
+
+        self._seen_updates[update_id] = None
+        while len(self._seen_updates) > self.dedup_size:
+            self._seen_updates.popitem(last=False)
+        return False
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Принять обновление от Telegram"""
+        if not self._check_secret(request):
+            self.rejected += 1
+            return web.Response(status=401)
+
+        # Во время остановки просим Telegram повторить позже
+        if self.draining:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except Exception as e:
+            logger.warning(f"⚠️ Некорректное обновление webhook: {e}")
+            return web.Response(status=400)
+
+        if self._is_duplicate(update.update_id):
+            self.duplicates += 1
+            return web.Response()
+
+        self.received += 1
+
+        # Ответить Telegram сразу, обработка идет в фоне
+        task = asyncio.create_task(self._process_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return web.Response()
+
+    async def _process_update(self, update: Update):
+        """Передать обновление диспетчеру"""
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Состояние сервера для мониторинга"""
+        return web.json_response({
+            'status': 'draining' if self.draining else 'ok',
+            'mode': 'webhook',
+            'uptime_seconds': int(time.monotonic() - self.started_at),
+            'in_flight': len(self._tasks),
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'failed': self.failed
+        }, status=503 if self.draining else 200)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Метрики обработчиков (то же, что команда /perf)"""
+        if not self._check_secret(request):
+            return web.Response(status=401)
+        return web.json_response(get_metrics().snapshot())
+
+    async def drain(self):
+        """Дождаться завершения принятых обновлений"""
+        self.draining = True
+
+        if self._tasks:
+            logger.info(f"⏳ Ожидание обработки {len(self._tasks)} обновлений...")
+            done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+            if pending:
+                logger.warning(f"⚠️ Не дождались {len(pending)} обновлений, отменяем")
+                for task in pending:
+                    task.cancel()
+
+    async def start(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT):
+        """Запустить HTTP-сервер"""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        logger.info(f"🌐 Webhook-сервер слушает {host}:{port}{self.path}")
+
+    async def stop(self):
+        """Остановить сервер с ожиданием принятых обновлений"""
+        await self.drain()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info("🌐 Webhook-сервер остановлен")
+
+    async def run(self, webhook_url: str = WEBHOOK_URL):
+        """
+        Зарегистрировать webhook в Telegram и обслуживать его до сигнала остановки
+
+        Args:
+            webhook_url: Публичный адрес бота (без пути)
+        """
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: остановка по KeyboardInterrupt
+
+        await self.start()
+        await self.bot.set_webhook(
+            url=f"{webhook_url}{self.path}",
+            secret_token=self.secret or None,
+            allowed_updates=self.dp.resolve_used_update_types(),
+            drop_pending_updates=False
+        )
+        await self.dp.emit_startup(bot=self.bot, **self.dp.workflow_data)
+        logger.info(f"🤖 Бот работает в режиме webhook: {webhook_url}{self.path}")
+
+        try:
+            await stop_event.wait()
+        finally:
+            # Webhook не удаляем: Telegram накопит обновления до следующего запуска
+            await self.stop()
+            await self.dp.emit_shutdown(bot=self.bot, **self.dp.workflow_data)
@@ -0,0 +1,197 @@
+"""
+Асинхронные CRUD операции для бота и планировщика
+
+API совпадает с database/crud.py (AnnouncementCRUD, LotCRUD, ManagerActionCRUD, ParsingLogCRUD,
+NotificationMessageCRUD, DashboardCounterCRUD, ReminderCRUD), но методы - корутины и не блокируют
+event loop: запросы идут через SQLAlchemy asyncio (aiosqlite для SQLite, asyncpg для PostgreSQL).
+
+Запросы не дублируются: каждый метод выполняет соответствующий синхронный CRUD-метод
+внутри AsyncSession.run_sync. Синхронные классы остаются для скриптов.
+"""
+import asyncio
+import sys
+import os
+from functools import wraps
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import DATABASE_URL
+from .engine import get_engine_options, apply_sqlite_pragmas
+from .crud import (
+    AnnouncementCRUD, ManagerActionCRUD, ParsingLogCRUD, NotificationMessageCRUD, DashboardCounterCRUD, LotCRUD,
+    ReminderCRUD
+)
+from .models import run_after_commit
+
+# Асинхронные драйверы для синхронных URL
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg'
+}
+
+
+def to_async_url(database_url: str) -> str:
+    """
+    Преобразовать URL базы данных в URL с асинхронным драйвером
+
+    Args:
+        database_url: URL для синхронного движка (sqlite:///..., postgresql://...)
+
+    Returns:
+        URL для create_async_engine
+    """
+    scheme, separator, rest = database_url.partition('://')
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+# URL асинхронного движка (по умолчанию - тот же DATABASE_URL с асинхронным драйвером)
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or to_async_url(DATABASE_URL)
+
+# Движок создается при первом обращении: скриптам aiosqlite/asyncpg не нужны
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    """Получить асинхронный движок БД"""
+    global _async_engine
+
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, echo=False, **get_engine_options(ASYNC_DATABASE_URL)
+        )
+        apply_sqlite_pragmas(_async_engine.sync_engine)
+
+    return _async_engine
+
+
+def get_async_session() -> AsyncSession:
+    """
+    Получить асинхронную сессию
+
+    expire_on_commit=False: объекты остаются доступными после commit без
+    повторных запросов (ленивая загрузка в асинхронной сессии невозможна).
+    """
+    global _async_session_factory
+
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+
+    return _async_session_factory()
+
+
+async def commit_async_unit_of_work(session: AsyncSession):
+    """
+    Зафиксировать асинхронную единицу работы
+
+    Отложенные действия (синхронизация с Google Sheets, сброс кэша сообщений)
+    выполняются в отдельном потоке, чтобы не блокировать event loop.
+    """
+    await session.commit()
+    if session.sync_session.info.get('after_commit'):
+        await asyncio.to_thread(run_after_commit, session.sync_session)
+
+
+def _async_method(sync_method):
+    """
+    Обернуть синхронный CRUD-метод в корутину
+
+    С переданной сессией метод выполняется в ней (фиксирует вызывающий),
+    без сессии - в собственной, которая фиксируется сразу.
+    """
+    @wraps(sync_method)
+    async def method(*args, session: AsyncSession = None, **kwargs):
+        def call(sync_session):
+            return sync_method(*args, session=sync_session, **kwargs)
+
+        if session is not None:
+            return await session.run_sync(call)
+
+        async with get_async_session() as own_session:
+            result = await own_session.run_sync(call)
+            await commit_async_unit_of_work(own_session)
+            return result
+
+    return staticmethod(method)
+
+
+class AsyncAnnouncementCRUD:
+    """Асинхронные CRUD операции для объявлений (API как у AnnouncementCRUD)"""
+
+    create = _async_method(AnnouncementCRUD.create)
+    get_by_id = _async_method(AnnouncementCRUD.get_by_id)
+    get_by_number = _async_method(AnnouncementCRUD.get_by_number)
+    exists = _async_method(AnnouncementCRUD.exists)
+    update_status = _async_method(AnnouncementCRUD.update_status)
+    claim = _async_method(AnnouncementCRUD.claim)
+    get_pending_for_manager = _async_method(AnnouncementCRUD.get_pending_for_manager)
+    get_all_by_status = _async_method(AnnouncementCRUD.get_all_by_status)
+    get_all_for_report = _async_method(AnnouncementCRUD.get_all_for_report)
+    get_accepted_for_manager = _async_method(AnnouncementCRUD.get_accepted_for_manager)
+    mark_as_processed = _async_method(AnnouncementCRUD.mark_as_processed)
+    save_participation = _async_method(AnnouncementCRUD.save_participation)
+    get_unnotified = _async_method(AnnouncementCRUD.get_unnotified)
+    mark_notified = _async_method(AnnouncementCRUD.mark_notified)
+    get_manager_statistics = _async_method(AnnouncementCRUD.get_manager_statistics)
+    get_all_manager_statistics = _async_method(AnnouncementCRUD.get_all_manager_statistics)
+    get_problem_announcements = _async_method(AnnouncementCRUD.get_problem_announcements)
+    get_active_announcements = _async_method(AnnouncementCRUD.get_active_announcements)
+    get_accepted_with_valid_deadline = _async_method(AnnouncementCRUD.get_accepted_with_valid_deadline)
+    expire_overdue = _async_method(AnnouncementCRUD.expire_overdue)
+
+
+class AsyncDashboardCounterCRUD:
+    """Асинхронные операции со счетчиками дашборда (API как у DashboardCounterCRUD)"""
+
+    get_dashboard_data = _async_method(DashboardCounterCRUD.get_dashboard_data)
+    check = _async_method(DashboardCounterCRUD.check)
+    rebuild = _async_method(DashboardCounterCRUD.rebuild)
+
+
+class AsyncReminderCRUD:
+    """Асинхронные операции с расписанием напоминаний (API как у ReminderCRUD)"""
+
+    schedule = _async_method(ReminderCRUD.schedule)
+    rebuild = _async_method(ReminderCRUD.rebuild)
+    get_pending = _async_method(ReminderCRUD.get_pending)
+    get_due = _async_method(ReminderCRUD.get_due)
+    mark_sent = _async_method(ReminderCRUD.mark_sent)
+    defer = _async_method(ReminderCRUD.defer)
+    drop = _async_method(ReminderCRUD.drop)
+
+
+class AsyncLotCRUD:
+    """Асинхронные CRUD операции для лотов (API как у LotCRUD)"""
+
+    get_by_announcement = _async_method(LotCRUD.get_by_announcement)
+    ensure_for_announcement = _async_method(LotCRUD.ensure_for_announcement)
+    save_drafts = _async_method(LotCRUD.save_drafts)
+    save_details = _async_method(LotCRUD.save_details)
+
+
+class AsyncManagerActionCRUD:
+    """Асинхронные CRUD операции для действий менеджеров (API как у ManagerActionCRUD)"""
+
+    create = _async_method(ManagerActionCRUD.create)
+    get_by_announcement = _async_method(ManagerActionCRUD.get_by_announcement)
+    get_by_manager = _async_method(ManagerActionCRUD.get_by_manager)
+
+
+class AsyncNotificationMessageCRUD:
+    """Асинхронные CRUD операции для сообщений об общих объявлениях"""
+
+    create = _async_method(NotificationMessageCRUD.create)
+    get_by_announcement = _async_method(NotificationMessageCRUD.get_by_announcement)
+    delete_by_announcement = _async_method(NotificationMessageCRUD.delete_by_announcement)
+
+
+class AsyncParsingLogCRUD:
+    """Асинхронные CRUD операции для логов парсинга (API как у ParsingLogCRUD)"""
+
+    create = _async_method(ParsingLogCRUD.create)
+    update = _async_method(ParsingLogCRUD.update)
+    get_last = _async_method(ParsingLogCRUD.get_last)
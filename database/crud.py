@@ -1,105 +1,319 @@
 """
 CRUD операции для работы с базой данных
 """
-from datetime import datetime, timezone
-from sqlalchemy import and_, or_, desc
-from typing import Optional, List
+import heapq
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, desc, case, func, select, insert, literal, DateTime
+from typing import Optional, List, Iterator
 import json
 import sys
 import os
+import threading
+import time
 
 # Добавляем путь к корневой директории
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from .models import Announcement, ManagerAction, ParsingLog, get_session
-from utils.google_sheets import get_sheets_manager
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .models import (
+    Announcement, Lot, ManagerAction, ParsingLog, NotificationMessage, RenderedMessage, StatusCounter, DailyCounter,
+    ArchivedAnnouncement, ArchivedLot, ArchivedManagerAction, DeadlineReminder, SheetOutbox,
+    use_session, release_session, commit_session, after_commit, commit_unit_of_work
+)
+from config import GOOGLE_SHEETS_ENABLED
+from utils.message_cache import get_message_cache
+
+
+# Допустимые переходы статусов объявления: текущий статус -> возможные новые
+STATUS_TRANSITIONS = {
+    'pending': {'accepted', 'rejected', 'expired'},
+    'accepted': {'expired'},
+    'rejected': {'expired'},
+    'expired': set()
+}
+
+# Время жизни кэша статистики всех менеджеров в секундах (0 - без кэша)
+STATISTICS_CACHE_TTL = int(os.getenv('STATISTICS_CACHE_TTL', '60'))
+
+# Через сколько дней после истечения объявление переносится в архив и размер пачки переноса
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+# Сколько строк отчета читать из БД за раз (iter_for_report)
+REPORT_BATCH_SIZE = int(os.getenv('REPORT_BATCH_SIZE', '1000'))
+
+# За сколько часов до окончания приема заявок напоминать менеджеру
+REMINDER_HOURS = (48, 24, 2)
+
+# application_deadline хранится по времени Астаны (как на портале), расписание - в UTC
+DEADLINE_UTC_OFFSET = timedelta(hours=5)
+
+# Повторы выгрузки в Google Sheets после ошибки: первая пауза и максимальная (секунды)
+SHEET_OUTBOX_RETRY_BASE = int(os.getenv('SHEET_OUTBOX_RETRY_BASE', '30'))
+SHEET_OUTBOX_RETRY_MAX = int(os.getenv('SHEET_OUTBOX_RETRY_MAX', '1800'))
+
+_statistics_cache = {'expires_at': 0.0, 'data': None}
+_statistics_lock = threading.Lock()
+
+
+def invalidate_statistics_cache():
+    """Сбросить кэш статистики менеджеров"""
+    with _statistics_lock:
+        _statistics_cache['expires_at'] = 0.0
+        _statistics_cache['data'] = None
+
+
+def sync_announcement(announcement, created: bool = False):
+    """
+    Сбросить кэши после изменения объявления
+
+    Запись в Google Sheets сюда не входит: строка ставится в очередь sheet_outbox
+    в той же транзакции (SheetOutboxCRUD.enqueue) и выгружается фоновым воркером.
+
+    Args:
+        announcement: Объект Announcement
+        created: True для нового объявления (кэш сообщений еще пуст)
+    """
+    if not created:
+        get_message_cache().invalidate(announcement.id)
+    invalidate_statistics_cache()
 
 
 class AnnouncementCRUD:
     """CRUD операции для объявлений"""
 
     @staticmethod
-    def create(announcement_data: dict) -> Announcement:
+    def create(announcement_data: dict, session: Session = None) -> Announcement:
         """Создать новое объявление"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
-            # Сериализуем массив лотов в JSON, если есть
             data = announcement_data.copy()
-            if 'lots' in data and isinstance(data['lots'], list):
-                data['lots'] = json.dumps(data['lots'], ensure_ascii=False)
+            if isinstance(data.get('lots'), str):
+                # Старый формат - лоты уже сериализованы в JSON
+                data['lots'] = json.loads(data['lots'])
 
             announcement = Announcement(**data)
+            announcement.lot_items = LotCRUD.build(data)
             session.add(announcement)
-            session.commit()
-            session.refresh(announcement)
-
-            # Синхронизация с Google Sheets
-            try:
-                sheets_manager = get_sheets_manager()
-                sheets_manager.add_announcement(announcement)
-            except Exception as e:
-                # Не прерываем работу при ошибке синхронизации
-                from utils.logger import logger
-                logger.error(f"Ошибка синхронизации с Google Sheets при создании: {e}")
+            session.flush()
+            DashboardCounterCRUD.record_transition(session, None, DashboardCounterCRUD.state_of(announcement))
+            SheetOutboxCRUD.enqueue(session, announcement.id)
+            commit_session(session, owned, announcement)
+
+            after_commit(session, owned, lambda: sync_announcement(announcement, created=True))
 
             return announcement
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_by_number(announcement_number: str) -> Optional[Announcement]:
+    def get_by_id(announcement_id: int, session: Session = None) -> Optional[Announcement]:
+        """Получить объявление по ID (в общей сессии - из identity map без повторного запроса)"""
+        session, owned = use_session(session)
+        try:
+            return session.get(Announcement, announcement_id)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_by_number(announcement_number: str, session: Session = None) -> Optional[Announcement]:
         """Получить объявление по номеру"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 Announcement.announcement_number == announcement_number
             ).first()
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def exists(announcement_number: str) -> bool:
+    def exists(announcement_number: str, session: Session = None) -> bool:
         """Проверить существование объявления"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 Announcement.announcement_number == announcement_number
             ).count() > 0
         finally:
-            session.close()
+            release_session(session, owned)
+
+    @staticmethod
+    def update_status(announcement_id: int, status: str, rejection_reason: str = None,
+                      manager_id: int = None, session: Session = None) -> bool:
+        """
+        Обновить статус объявления
+
+        Статус меняется одним условным UPDATE: только если текущий статус допускает
+        переход (см. STATUS_TRANSITIONS) и, если указан manager_id, объявление
+        закреплено за этим менеджером. Повторное нажатие кнопки или гонка двух
+        запросов не перезапишут уже принятое решение.
+
+        Args:
+            announcement_id: ID объявления
+            status: Новый статус
+            rejection_reason: Причина отказа (для rejected)
+            manager_id: ID менеджера, которому должно принадлежать объявление
+            session: Сессия единицы работы (если не указана - открывается своя)
+
+        Returns:
+            True если статус изменен, False если переход недопустим
+        """
+        allowed_from = [current for current, targets in STATUS_TRANSITIONS.items() if status in targets]
+
+        values = {
+            'status': status,
+            'response_at': datetime.now(timezone.utc)
+        }
+        if rejection_reason:
+            values['rejection_reason'] = rejection_reason
+
+        values['updated_at'] = datetime.utcnow()
+
+        session, owned = use_session(session)
+        try:
+            # Одна выборка строки: дальше в этой сессии объявление берется из identity map
+            announcement = session.get(Announcement, announcement_id)
+            if announcement is None:
+                return False
+
+            current = DashboardCounterCRUD.state_of(announcement)
+            if current[1] not in allowed_from:
+                return False
+            if manager_id is not None and current[0] != manager_id:
+                return False
+
+            # Условие фиксирует прочитанное состояние: если строку успели изменить, UPDATE не сработает
+            updated = DashboardCounterCRUD.filter_state(
+                session.query(Announcement).filter(Announcement.id == announcement_id), current
+            ).update(values, synchronize_session=False)
+
+            if not updated:
+                commit_session(session, owned)
+                return False
+
+            DashboardCounterCRUD.record_transition(session, current, (current[0], status) + current[2:])
+            for key, value in values.items():
+                if isinstance(value, datetime):
+                    value = value.replace(tzinfo=None)
+                set_committed_value(announcement, key, value)
+
+            # Принятое объявление - в расписание напоминаний о дедлайне
+            reminders = ReminderCRUD._build(announcement, datetime.utcnow()) if status == 'accepted' else []
+            entries = ReminderCRUD._add(session, reminders)
+            SheetOutboxCRUD.enqueue(session, announcement_id)
+            commit_session(session, owned)
+
+            def on_commit():
+                # Сброс кэша сообщений и статистики
+                sync_announcement(announcement)
+                if entries:
+                    ReminderCRUD._notify(entries)
+
+            after_commit(session, owned, on_commit)
+
+            return True
+        finally:
+            release_session(session, owned)
 
     @staticmethod
-    def update_status(announcement_id: int, status: str, rejection_reason: str = None):
-        """Обновить статус объявления"""
-        session = get_session()
+    def apply_sheet_edit(announcement_id: int, status: str = None, rejection_reason: str = None,
+                         participation_details: str = None, session: Session = None) -> bool:
+        """
+        Перенести в БД правку, сделанную в Google Sheets вручную
+
+        Статус меняется через update_status (те же допустимые переходы, без проверки
+        менеджера), причина отказа и детали участия записываются как есть. Объявление
+        ставится в очередь выгрузки: строка листа перезаписывается с новым хэшем.
+
+        Args:
+            announcement_id: ID объявления
+            status: Новый статус (None - не менять)
+            rejection_reason: Причина отказа (None - не менять)
+            participation_details: Детали участия (None - не менять)
+            session: Сессия единицы работы (если не указана - открывается своя)
+
+        Returns:
+            True если правка применена, False если объявления нет или переход статуса недопустим
+        """
+        session, owned = use_session(session)
         try:
-            announcement = session.query(Announcement).filter(
-                Announcement.id == announcement_id
-            ).first()
+            announcement = session.get(Announcement, announcement_id)
+            if announcement is None:
+                return False
 
-            if announcement:
-                announcement.status = status
-                announcement.response_at = datetime.now(timezone.utc)
-                if rejection_reason:
-                    announcement.rejection_reason = rejection_reason
-                session.commit()
-                session.refresh(announcement)
-
-                # Синхронизация с Google Sheets
-                try:
-                    sheets_manager = get_sheets_manager()
-                    sheets_manager.update_announcement(announcement)
-                except Exception as e:
-                    # Не прерываем работу при ошибке синхронизации
-                    from utils.logger import logger
-                    logger.error(f"Ошибка синхронизации с Google Sheets при обновлении: {e}")
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_pending_for_manager(manager_id: int) -> List[Announcement]:
+            # update_status в переданной сессии только делает flush, а действия после commit откладывает
+            if status is not None and status != announcement.status:
+                if not AnnouncementCRUD.update_status(announcement_id, status, rejection_reason, session=session):
+                    return False
+
+            values = {}
+            if rejection_reason is not None:
+                values['rejection_reason'] = rejection_reason or None
+            if participation_details is not None:
+                values['participation_details'] = participation_details or None
+            if values:
+                values['updated_at'] = datetime.utcnow()
+                for key, value in values.items():
+                    setattr(announcement, key, value)
+
+            SheetOutboxCRUD.enqueue(session, announcement_id)
+            after_commit(session, False, lambda: sync_announcement(announcement))
+            if owned:
+                commit_unit_of_work(session)
+            else:
+                session.flush()
+            return True
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def claim(announcement_id: int, manager_id: int, manager_name: str, session: Session = None) -> bool:
+        """
+        Забрать общее объявление (Алматы)
+
+        Выполняется одним условным UPDATE ... WHERE manager_id IS NULL, поэтому при
+        одновременных нажатиях "Мой район" объявление достается ровно одному менеджеру.
+
+        Args:
+            announcement_id: ID объявления
+            manager_id: ID менеджера
+            manager_name: Имя менеджера
+            session: Сессия единицы работы (если не указана - открывается своя)
+
+        Returns:
+            True если объявление назначено этому менеджеру, False если его уже забрали
+        """
+        session, owned = use_session(session)
+        try:
+            current = DashboardCounterCRUD.current_state(announcement_id, session)
+            if current is None or current[0] is not None or current[1] != 'pending':
+                return False
+
+            updated = DashboardCounterCRUD.filter_state(
+                session.query(Announcement).filter(Announcement.id == announcement_id), current
+            ).update({
+                'manager_id': manager_id,
+                'manager_name': manager_name
+            }, synchronize_session=False)
+
+            if updated:
+                DashboardCounterCRUD.record_transition(session, current, (manager_id,) + current[1:])
+            commit_session(session, owned)
+
+            if updated:
+                after_commit(session, owned, lambda: get_message_cache().invalidate(announcement_id))
+
+            return updated == 1
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_pending_for_manager(manager_id: int, session: Session = None) -> List[Announcement]:
         """Получить ожидающие объявления для менеджера"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 and_(
@@ -108,44 +322,99 @@ class AnnouncementCRUD:
                 )
             ).order_by(desc(Announcement.created_at)).all()
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_all_by_status(status: str) -> List[Announcement]:
+    def get_all_by_status(status: str, session: Session = None) -> List[Announcement]:
         """Получить все объявления по статусу"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 Announcement.status == status
             ).order_by(desc(Announcement.created_at)).all()
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_all_for_report(start_date=None, end_date=None, manager_id=None) -> List[Announcement]:
-        """Получить объявления для отчета с фильтрами"""
-        session = get_session()
+    def get_all_for_report(start_date=None, end_date=None, manager_id=None, include_archive: bool = False,
+                           session: Session = None) -> List[Announcement]:
+        """
+        Получить объявления для отчета с фильтрами
+
+        Args:
+            include_archive: Добавить объявления из архива (ArchivedAnnouncement с теми же полями)
+        """
+        session, owned = use_session(session)
         try:
-            query = session.query(Announcement)
+            models = (Announcement, ArchivedAnnouncement) if include_archive else (Announcement,)
+
+            results = []
+            for model in models:
+                results.extend(AnnouncementCRUD._report_query(session, model, start_date, end_date, manager_id).all())
+
+            if include_archive:
+                results.sort(key=lambda announcement: announcement.created_at or datetime.min, reverse=True)
+            return results
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def _report_query(session: Session, model, start_date=None, end_date=None, manager_id=None, columns=None):
+        """Запрос объявлений отчета (model или только columns модели), новые первыми"""
+        query = session.query(*[getattr(model, name) for name in columns]) if columns else session.query(model)
+
+        # Фильтр по дате
+        if start_date:
+            query = query.filter(model.created_at >= start_date)
+        if end_date:
+            query = query.filter(model.created_at <= end_date)
+
+        # Фильтр по менеджеру
+        if manager_id:
+            query = query.filter(model.manager_id == manager_id)
 
-            # Фильтр по дате
-            if start_date:
-                query = query.filter(Announcement.created_at >= start_date)
-            if end_date:
-                query = query.filter(Announcement.created_at <= end_date)
+        return query.order_by(desc(model.created_at))
 
-            # Фильтр по менеджеру
-            if manager_id:
-                query = query.filter(Announcement.manager_id == manager_id)
+    @staticmethod
+    def iter_for_report(start_date=None, end_date=None, manager_id=None, include_archive: bool = False,
+                        columns: List[str] = None, batch_size: int = None, session: Session = None) -> Iterator:
+        """
+        Объявления для отчета потоком (как get_all_for_report, но без загрузки всех строк)
+
+        Строки читаются пачками по batch_size (yield_per). Объявления и архив - два
+        упорядоченных потока, которые сливаются по дате создания, поэтому в памяти
+        остается не больше пачки из каждого. Сессия открыта, пока итератор не исчерпан
+        или не закрыт.
+
+        Args:
+            columns: Имена нужных полей (строки с этими атрибутами вместо объектов модели)
+            batch_size: Размер пачки (по умолчанию REPORT_BATCH_SIZE)
+        """
+        batch_size = batch_size or REPORT_BATCH_SIZE
+        models = (Announcement, ArchivedAnnouncement) if include_archive else (Announcement,)
+        if columns and 'created_at' not in columns:
+            columns = list(columns) + ['created_at']
 
-            return query.order_by(desc(Announcement.created_at)).all()
+        session, owned = use_session(session)
+        try:
+            streams = [
+                AnnouncementCRUD._report_query(session, model, start_date, end_date, manager_id, columns)
+                .yield_per(batch_size)
+                for model in models
+            ]
+            if len(streams) == 1:
+                yield from streams[0]
+            else:
+                yield from heapq.merge(
+                    *streams, key=lambda row: row.created_at or datetime.min, reverse=True
+                )
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_accepted_for_manager(manager_id: int) -> List[Announcement]:
+    def get_accepted_for_manager(manager_id: int, session: Session = None) -> List[Announcement]:
         """Получить принятые объявления для менеджера (в работе)"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 and_(
@@ -154,113 +423,293 @@ class AnnouncementCRUD:
                 )
             ).order_by(desc(Announcement.created_at)).all()
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def mark_as_processed(announcement_id: int):
+    def mark_as_processed(announcement_id: int, session: Session = None):
         """Отметить объявление как обработанное"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             announcement = session.query(Announcement).filter(
                 Announcement.id == announcement_id
             ).first()
 
             if announcement:
+                old_state = DashboardCounterCRUD.state_of(announcement)
                 announcement.is_processed = True
-                session.commit()
-                session.refresh(announcement)
+                DashboardCounterCRUD.record_transition(session, old_state, DashboardCounterCRUD.state_of(announcement))
+                SheetOutboxCRUD.enqueue(session, announcement_id)
+                commit_session(session, owned)
 
-                # Синхронизация с Google Sheets
-                try:
-                    sheets_manager = get_sheets_manager()
-                    sheets_manager.update_announcement(announcement)
-                except Exception as e:
-                    from utils.logger import logger
-                    logger.error(f"Ошибка синхронизации с Google Sheets при обработке: {e}")
+                # Сброс кэша сообщений и статистики
+                after_commit(session, owned, lambda: sync_announcement(announcement))
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_manager_statistics(manager_id: int) -> dict:
+    def save_participation(announcement_id: int, details: dict, session: Session = None) -> Optional[str]:
         """
-        Получить статистику для конкретного менеджера
+        Сохранить детали участия по лотам и отметить объявление обработанным
 
         Args:
-            manager_id: ID менеджера
+            announcement_id: ID объявления
+            details: {lot_id: детали}
 
         Returns:
-            Словарь со статистикой: total, pending, accepted, processed, rejected,
-            acceptance_rate, processing_rate, avg_response_time
+            Текст деталей участия по всем лотам или None, если объявления нет
         """
-        session = get_session()
+        session, owned = use_session(session)
         try:
-            from datetime import timedelta
+            announcement = session.get(Announcement, announcement_id)
+            if announcement is None:
+                return None
 
-            # Общее количество
-            total = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id
-            ).count()
+            # Детали по каждому лоту + текст по всем лотам для Google Sheets и отчетов
+            participation_details = LotCRUD.save_details(announcement_id, details, session=session)
 
-            # По статусам
-            pending = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id,
-                Announcement.status == 'pending'
-            ).count()
+            old_state = DashboardCounterCRUD.state_of(announcement)
+            announcement.participation_details = participation_details
+            announcement.participation_details_draft = None
+            announcement.is_processed = True
+            DashboardCounterCRUD.record_transition(session, old_state, DashboardCounterCRUD.state_of(announcement))
+            SheetOutboxCRUD.enqueue(session, announcement_id)
+            commit_session(session, owned)
 
-            accepted = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id,
-                Announcement.status == 'accepted'
-            ).count()
+            # Сброс кэша сообщений (строка для Google Sheets уже в очереди sheet_outbox)
+            after_commit(session, owned, lambda: sync_announcement(announcement))
+            return participation_details
+        finally:
+            release_session(session, owned)
 
-            processed = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id,
-                Announcement.status == 'accepted',
-                Announcement.is_processed == True
-            ).count()
+    @staticmethod
+    def get_unnotified(created_before: datetime, limit: int = 10, session: Session = None) -> List[Announcement]:
+        """
+        Ожидающие объявления, уведомление о которых не отправлено
 
-            rejected = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id,
-                Announcement.status == 'rejected'
-            ).count()
+        Args:
+            created_before: Только созданные раньше (naive UTC)
+            limit: Сколько объявлений вернуть
+        """
+        session, owned = use_session(session)
+        try:
+            return session.query(Announcement).filter(
+                Announcement.status == 'pending',
+                Announcement.notification_sent == False,
+                Announcement.created_at < created_before
+            ).limit(limit).all()
+        finally:
+            release_session(session, owned)
 
-            # Процент принятия (accepted / (accepted + rejected))
-            total_responded = accepted + rejected
-            acceptance_rate = (accepted / total_responded * 100) if total_responded > 0 else 0
+    @staticmethod
+    def mark_notified(announcement_ids: List[int], session: Session = None) -> int:
+        """Отметить уведомления объявлений отправленными"""
+        if not announcement_ids:
+            return 0
+        session, owned = use_session(session)
+        try:
+            updated = session.query(Announcement).filter(
+                Announcement.id.in_(announcement_ids)
+            ).update({'notification_sent': True}, synchronize_session=False)
+            commit_session(session, owned)
+            return updated
+        finally:
+            release_session(session, owned)
 
-            # Процент обработки (processed / accepted)
-            processing_rate = (processed / accepted * 100) if accepted > 0 else 0
+    @staticmethod
+    def expire_overdue(now: datetime, session: Session = None) -> int:
+        """
+        Пометить истекшими объявления с прошедшим сроком приема заявок
 
-            # Среднее время реакции (для объявлений с ответом)
-            announcements_with_response = session.query(Announcement).filter(
-                Announcement.manager_id == manager_id,
-                Announcement.response_at.isnot(None)
-            ).all()
+        Обновление идет по группам (менеджер, статус, обработка), чтобы счетчики
+        дашборда изменились ровно на число обновленных строк.
 
-            if announcements_with_response:
-                total_response_time = sum([
-                    (ann.response_at - ann.created_at).total_seconds() / 3600
-                    for ann in announcements_with_response
-                ])
-                avg_response_time = total_response_time / len(announcements_with_response)
-            else:
-                avg_response_time = 0
+        Args:
+            now: Текущее время в naive UTC (срок сравнивается по времени Астаны)
 
-            return {
-                'total': total,
-                'pending': pending,
-                'accepted': accepted,
-                'processed': processed,
-                'rejected': rejected,
-                'acceptance_rate': round(acceptance_rate, 1),
-                'processing_rate': round(processing_rate, 1),
-                'avg_response_time': round(avg_response_time, 1)
-            }
+        Returns:
+            Количество помеченных объявлений
+        """
+        session, owned = use_session(session)
+        try:
+            overdue = session.query(Announcement).filter(
+                Announcement.application_deadline < now + DEADLINE_UTC_OFFSET,
+                Announcement.status != 'expired'
+            )
+            groups = overdue.with_entities(
+                Announcement.manager_id, Announcement.status, Announcement.is_processed
+            ).distinct().all()
+
+            expired_count = 0
+            for manager_id, status, is_processed in groups:
+                state = (manager_id, status, is_processed, None)
+                updated = DashboardCounterCRUD.filter_state(overdue, state).update({
+                    'status': 'expired',
+                    'expired_at': now
+                }, synchronize_session=False)
+
+                if updated:
+                    DashboardCounterCRUD.record_transition(
+                        session, state, (manager_id, 'expired', is_processed, None), amount=updated
+                    )
+                    expired_count += updated
+
+            commit_session(session, owned)
+            return expired_count
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def _statistics_query(dialect_name: str, manager_id: int = None):
+        """
+        Запрос статистики менеджеров: одна агрегация с GROUP BY manager_id
+
+        Время реакции (response_at - created_at) считается в БД. Медиана и 90-й
+        перцентиль - по рангу ответа внутри менеджера (оконные функции), поэтому
+        в Python не загружаются отдельные объявления.
+        """
+        if dialect_name == 'postgresql':
+            seconds = func.extract('epoch', Announcement.response_at - Announcement.created_at)
+        else:
+            seconds = (func.julianday(Announcement.response_at) - func.julianday(Announcement.created_at)) * 86400
+
+        ranked = select(
+            Announcement.manager_id,
+            Announcement.status,
+            Announcement.is_processed,
+            seconds.label('seconds'),
+            func.row_number().over(
+                partition_by=(Announcement.manager_id, Announcement.response_at.is_(None)),
+                order_by=seconds
+            ).label('rank'),
+            func.count(seconds).over(partition_by=Announcement.manager_id).label('responded')
+        )
+        if manager_id is not None:
+            ranked = ranked.where(Announcement.manager_id == manager_id)
+        else:
+            ranked = ranked.where(Announcement.manager_id.isnot(None))
+        ranked = ranked.subquery()
+
+        def count_if(*conditions):
+            return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+
+        def percentile(percent: int):
+            # Ближайший ранг: наименьшее значение с rank >= percent% от числа ответов
+            return func.min(case(
+                (and_(ranked.c.seconds.isnot(None), ranked.c.rank * 100 >= ranked.c.responded * percent),
+                 ranked.c.seconds)
+            ))
+
+        return select(
+            ranked.c.manager_id,
+            func.count().label('total'),
+            count_if(ranked.c.status == 'pending').label('pending'),
+            count_if(ranked.c.status == 'accepted').label('accepted'),
+            count_if(ranked.c.status == 'accepted', ranked.c.is_processed == True).label('processed'),
+            count_if(ranked.c.status == 'rejected').label('rejected'),
+            func.avg(ranked.c.seconds).label('avg_seconds'),
+            percentile(50).label('median_seconds'),
+            percentile(90).label('p90_seconds')
+        ).group_by(ranked.c.manager_id)
+
+    @staticmethod
+    def _statistics_from_row(row) -> dict:
+        """Словарь статистики из строки агрегата (или пустой статистики для None)"""
+        total = pending = accepted = processed = rejected = 0
+        avg_seconds = median_seconds = p90_seconds = None
+        if row is not None:
+            total, pending, accepted, processed, rejected = (
+                row.total, row.pending, row.accepted, row.processed, row.rejected
+            )
+            avg_seconds, median_seconds, p90_seconds = row.avg_seconds, row.median_seconds, row.p90_seconds
+
+        # Процент принятия (accepted / (accepted + rejected))
+        total_responded = accepted + rejected
+        acceptance_rate = (accepted / total_responded * 100) if total_responded > 0 else 0
+
+        # Процент обработки (processed / accepted)
+        processing_rate = (processed / accepted * 100) if accepted > 0 else 0
+
+        def hours(seconds):
+            return round(float(seconds) / 3600, 1) if seconds is not None else 0
+
+        return {
+            'total': total,
+            'pending': pending,
+            'accepted': accepted,
+            'processed': processed,
+            'rejected': rejected,
+            'acceptance_rate': round(acceptance_rate, 1),
+            'processing_rate': round(processing_rate, 1),
+            'avg_response_time': hours(avg_seconds),
+            'median_response_time': hours(median_seconds),
+            'p90_response_time': hours(p90_seconds)
+        }
+
+    @staticmethod
+    def get_manager_statistics(manager_id: int, session: Session = None) -> dict:
+        """
+        Получить статистику для конкретного менеджера (один запрос)
+
+        Args:
+            manager_id: ID менеджера
+
+        Returns:
+            Словарь со статистикой: total, pending, accepted, processed, rejected,
+            acceptance_rate, processing_rate, avg_response_time, median_response_time,
+            p90_response_time (время - в часах)
+        """
+        session, owned = use_session(session)
+        try:
+            query = AnnouncementCRUD._statistics_query(session.get_bind().dialect.name, manager_id)
+            row = session.execute(query).first()
+            return AnnouncementCRUD._statistics_from_row(row)
 
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_problem_announcements(manager_id: int) -> dict:
+    def get_all_manager_statistics(use_cache: bool = True, session: Session = None) -> dict:
+        """
+        Получить статистику всех менеджеров одним запросом
+
+        Результат кэшируется на STATISTICS_CACHE_TTL секунд; кэш сбрасывается
+        при изменении объявлений (sync_announcement).
+
+        Args:
+            use_cache: Использовать кэш
+
+        Returns:
+            Словарь {manager_id: статистика как в get_manager_statistics}
+        """
+        if use_cache and STATISTICS_CACHE_TTL > 0:
+            with _statistics_lock:
+                if _statistics_cache['data'] is not None and _statistics_cache['expires_at'] > time.monotonic():
+                    return dict(_statistics_cache['data'])
+
+        session, owned = use_session(session)
+        try:
+            query = AnnouncementCRUD._statistics_query(session.get_bind().dialect.name)
+            statistics = {
+                row.manager_id: AnnouncementCRUD._statistics_from_row(row)
+                for row in session.execute(query)
+            }
+        finally:
+            release_session(session, owned)
+
+        if STATISTICS_CACHE_TTL > 0:
+            with _statistics_lock:
+                _statistics_cache['data'] = statistics
+                _statistics_cache['expires_at'] = time.monotonic() + STATISTICS_CACHE_TTL
+
+        return dict(statistics)
+
+    @staticmethod
+    def empty_statistics() -> dict:
+        """Статистика менеджера без объявлений"""
+        return AnnouncementCRUD._statistics_from_row(None)
+
+    @staticmethod
+    def get_problem_announcements(manager_id: int, session: Session = None) -> dict:
         """
         Получить проблемные объявления менеджера
 
@@ -271,7 +720,7 @@ class AnnouncementCRUD:
             Словарь с ключами pending_24h (список объявлений pending > 24ч)
             и accepted_48h (список объявлений accepted не обработаны > 48ч)
         """
-        session = get_session()
+        session, owned = use_session(session)
         try:
             from datetime import timedelta
 
@@ -304,10 +753,10 @@ class AnnouncementCRUD:
             }
 
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_active_announcements(manager_id: int) -> List[Announcement]:
+    def get_active_announcements(manager_id: int, session: Session = None) -> List[Announcement]:
         """
         Получить активные объявления менеджера (accepted и не обработаны)
 
@@ -317,7 +766,7 @@ class AnnouncementCRUD:
         Returns:
             Список активных объявлений
         """
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(Announcement).filter(
                 and_(
@@ -328,106 +777,1010 @@ class AnnouncementCRUD:
             ).order_by(Announcement.created_at).all()
 
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_accepted_with_valid_deadline() -> List[Announcement]:
+    def get_accepted_with_valid_deadline(session: Session = None) -> List[Announcement]:
         """
         Получить все принятые объявления, срок окончания которых еще не наступил
         (для координатора)
 
         Returns:
-            Список объявлений со статусом accepted и deadline_at > now
+            Список объявлений со статусом accepted, срок которых (по времени Астаны) не прошел
         """
-        session = get_session()
+        session, owned = use_session(session)
         try:
-            now = datetime.now(timezone.utc)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
             return session.query(Announcement).filter(
                 and_(
                     Announcement.status == 'accepted',
-                    Announcement.deadline_at > now
+                    Announcement.application_deadline > now + DEADLINE_UTC_OFFSET
                 )
-            ).order_by(desc(Announcement.deadline_at)).all()
+            ).order_by(desc(Announcement.application_deadline)).all()
 
         finally:
-            session.close()
+            release_session(session, owned)
+
+
+class DashboardCounterCRUD:
+    """
+    Материализованные счетчики для дашборда администратора
+
+    status_counters - число объявлений по (менеджер, статус, обработано),
+    daily_counters - число новых объявлений по (день создания, менеджер).
+    Счетчики меняются в той же транзакции, что и объявления (create, update_status,
+    claim, mark_as_processed, expire_overdue), поэтому дашборд читает несколько
+    строк независимо от размера таблицы announcements. При расхождении (ручные
+    правки БД) - check() и rebuild(), см. scripts/rebuild_dashboard_counters.py.
+
+    Состояние объявления для счетчиков - кортеж (manager_id, status, is_processed, created_day).
+    """
+
+    @staticmethod
+    def state_of(announcement: Announcement) -> tuple:
+        """Состояние объявления для счетчиков"""
+        created_day = announcement.created_at.date() if announcement.created_at else None
+        return announcement.manager_id, announcement.status, announcement.is_processed, created_day
+
+    @staticmethod
+    def current_state(announcement_id: int, session: Session) -> Optional[tuple]:
+        """Прочитать состояние объявления из БД (без загрузки объекта)"""
+        row = session.query(
+            Announcement.manager_id, Announcement.status, Announcement.is_processed, Announcement.created_at
+        ).filter(Announcement.id == announcement_id).first()
+
+        if row is None:
+            return None
+        return row.manager_id, row.status, row.is_processed, row.created_at.date() if row.created_at else None
+
+    @staticmethod
+    def filter_state(query, state: tuple):
+        """Ограничить запрос объявлениями с указанными manager_id, status и is_processed"""
+        for column, value in zip((Announcement.manager_id, Announcement.status, Announcement.is_processed), state):
+            query = query.filter(column.is_(None) if value is None else column == value)
+        return query
+
+    @staticmethod
+    def _upsert(session: Session, model, keys: dict, increments: dict):
+        """Прибавить значения к счетчикам строки (создав ее при отсутствии)"""
+        dialect = session.get_bind().dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            statement = insert(model).values(**keys, **increments)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={name: getattr(model, name) + value for name, value in increments.items()}
+            )
+            session.execute(statement)
+            return
+
+        updated = session.query(model).filter_by(**keys).update(
+            {getattr(model, name): getattr(model, name) + value for name, value in increments.items()},
+            synchronize_session=False
+        )
+        if not updated:
+            session.add(model(**keys, **increments))
+            session.flush()
+
+    @staticmethod
+    def record_transition(session: Session, old: Optional[tuple], new: Optional[tuple], amount: int = 1):
+        """
+        Отразить изменение объявления в счетчиках
+
+        Args:
+            old: Состояние до изменения (None - объявление создано)
+            new: Состояние после изменения (None - объявление удалено)
+            amount: Сколько объявлений изменилось так же
+        """
+        if old == new or not amount:
+            return
+
+        for state, delta in ((old, -amount), (new, amount)):
+            if state is None:
+                continue
+            manager_id, status, is_processed, _ = state
+            DashboardCounterCRUD._upsert(session, StatusCounter, {
+                'manager_id': manager_id or 0,
+                'status': status or 'pending',
+                'is_processed': bool(is_processed)
+            }, {'count': delta})
+
+        # Новые по дням: учитываются за менеджером, которому объявление принадлежит сейчас
+        old_daily = (old[3], old[0] or 0) if old and old[3] else None
+        new_daily = (new[3], new[0] or 0) if new and new[3] else None
+        if old and new and ((old[0] or 0) == (new[0] or 0) or not old[3] or not new[3]):
+            # Менеджер не изменился (или день не известен) - дневные счетчики не трогаем
+            return
+        for daily, delta in ((old_daily, -amount), (new_daily, amount)):
+            if daily is not None:
+                DashboardCounterCRUD._upsert(session, DailyCounter, {
+                    'day': daily[0], 'manager_id': daily[1]
+                }, {'created': delta})
+
+    @staticmethod
+    def get_dashboard_data(now: datetime = None, session: Session = None) -> dict:
+        """
+        Данные для дашборда администратора
+
+        Счетчики статусов и новых за сегодня берутся из проекций; зависшие
+        объявления (зависят от текущего времени) считаются одним запросом
+        по ожидающим объявлениям.
+
+        Returns:
+            dict: new, in_progress, processed, rejected, total_today,
+            stuck_24h, no_response_2h, needs_attention
+        """
+        from datetime import timedelta
+
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            counts = {}
+            for status, is_processed, count in session.query(
+                StatusCounter.status, StatusCounter.is_processed, func.sum(StatusCounter.count)
+            ).group_by(StatusCounter.status, StatusCounter.is_processed):
+                counts[(status, bool(is_processed))] = int(count or 0)
+
+            total_today = session.query(func.coalesce(func.sum(DailyCounter.created), 0)).filter(
+                DailyCounter.day == now.date()
+            ).scalar()
+
+            stuck_24h_threshold = now - timedelta(hours=24)
+            no_response_2h_threshold = now - timedelta(hours=2)
+            stuck_24h, no_response_2h = session.query(
+                func.coalesce(func.sum(case((Announcement.created_at < stuck_24h_threshold, 1), else_=0)), 0),
+                func.count()
+            ).filter(
+                Announcement.status == 'pending',
+                Announcement.created_at < no_response_2h_threshold
+            ).one()
+
+            return {
+                'new': counts.get(('pending', False), 0) + counts.get(('pending', True), 0),
+                'in_progress': counts.get(('accepted', False), 0),
+                'processed': counts.get(('accepted', True), 0),
+                'rejected': counts.get(('rejected', False), 0) + counts.get(('rejected', True), 0),
+                'total_today': int(total_today),
+                'stuck_24h': int(stuck_24h),
+                'no_response_2h': int(no_response_2h),
+                # Зависшие >24ч уже входят в "без ответа >2ч"
+                'needs_attention': int(no_response_2h)
+            }
+
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def _expected_counters(session: Session) -> tuple:
+        """Посчитать счетчики по таблице announcements (эталон для rebuild и check)"""
+        status_counts = {}
+        for manager_id, status, is_processed, count in session.query(
+            func.coalesce(Announcement.manager_id, 0),
+            func.coalesce(Announcement.status, 'pending'),
+            func.coalesce(Announcement.is_processed, False),
+            func.count()
+        ).group_by(
+            func.coalesce(Announcement.manager_id, 0),
+            func.coalesce(Announcement.status, 'pending'),
+            func.coalesce(Announcement.is_processed, False)
+        ):
+            key = (manager_id, status, bool(is_processed))
+            status_counts[key] = status_counts.get(key, 0) + count
+
+        daily_counts = {}
+        created_day = func.date(Announcement.created_at)
+        for day, manager_id, count in session.query(
+            created_day, func.coalesce(Announcement.manager_id, 0), func.count()
+        ).filter(Announcement.created_at.isnot(None)).group_by(
+            created_day, func.coalesce(Announcement.manager_id, 0)
+        ):
+            if isinstance(day, str):
+                day = datetime.strptime(day, '%Y-%m-%d').date()
+            daily_counts[(day, manager_id)] = count
+
+        return status_counts, daily_counts
+
+    @staticmethod
+    def _stored_counters(session: Session) -> tuple:
+        """Прочитать сохраненные счетчики (без нулевых)"""
+        status_counts = {
+            (row.manager_id, row.status, bool(row.is_processed)): row.count
+            for row in session.query(StatusCounter).all() if row.count
+        }
+        daily_counts = {
+            (row.day, row.manager_id): row.created
+            for row in session.query(DailyCounter).all() if row.created
+        }
+        return status_counts, daily_counts
+
+    @staticmethod
+    def check(session: Session = None) -> List[dict]:
+        """
+        Сверить счетчики с таблицей announcements
+
+        Returns:
+            Список расхождений: {'table', 'key', 'expected', 'actual'} (пустой - все сходится)
+        """
+        session, owned = use_session(session)
+        try:
+            expected = DashboardCounterCRUD._expected_counters(session)
+            stored = DashboardCounterCRUD._stored_counters(session)
+
+            mismatches = []
+            for table, expected_counts, stored_counts in zip(
+                (StatusCounter.__tablename__, DailyCounter.__tablename__), expected, stored
+            ):
+                for key in sorted(set(expected_counts) | set(stored_counts), key=str):
+                    if expected_counts.get(key, 0) != stored_counts.get(key, 0):
+                        mismatches.append({
+                            'table': table,
+                            'key': key,
+                            'expected': expected_counts.get(key, 0),
+                            'actual': stored_counts.get(key, 0)
+                        })
+            return mismatches
+
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def rebuild(session: Session = None) -> dict:
+        """
+        Пересчитать счетчики по таблице announcements
+
+        Returns:
+            Количество строк счетчиков: {'status_counters': N, 'daily_counters': M}
+        """
+        session, owned = use_session(session)
+        try:
+            status_counts, daily_counts = DashboardCounterCRUD._expected_counters(session)
+
+            session.query(StatusCounter).delete(synchronize_session=False)
+            session.query(DailyCounter).delete(synchronize_session=False)
+
+            session.add_all([
+                StatusCounter(manager_id=manager_id, status=status, is_processed=is_processed, count=count)
+                for (manager_id, status, is_processed), count in status_counts.items()
+            ])
+            session.add_all([
+                DailyCounter(day=day, manager_id=manager_id, created=count)
+                for (day, manager_id), count in daily_counts.items()
+            ])
+            commit_session(session, owned)
+
+            return {
+                StatusCounter.__tablename__: len(status_counts),
+                DailyCounter.__tablename__: len(daily_counts)
+            }
+
+        finally:
+            release_session(session, owned)
+
+
+class LotCRUD:
+    """CRUD операции для лотов объявлений"""
+
+    @staticmethod
+    def build(announcement_data: dict) -> List[Lot]:
+        """
+        Создать строки лотов из данных объявления
+
+        Args:
+            announcement_data: Данные объявления (lots - список словарей; без него -
+                один лот из устаревших полей lot_name/lot_description/keyword_matched)
+
+        Returns:
+            Список Lot (без announcement_id - проставится при сохранении объявления)
+        """
+        lots = announcement_data.get('lots') or []
+        if not lots:
+            return [Lot(
+                position=0,
+                name=announcement_data.get('lot_name') or 'N/A',
+                description=announcement_data.get('lot_description'),
+                keyword=announcement_data.get('keyword_matched')
+            )]
+
+        return [
+            Lot(
+                position=position,
+                number=str(lot['number']) if lot.get('number') is not None else None,
+                name=lot.get('name'),
+                description=lot.get('description'),
+                keyword=lot.get('keyword'),
+                amount=lot.get('amount')
+            )
+            for position, lot in enumerate(lots)
+        ]
+
+    @staticmethod
+    def get_by_announcement(announcement_id: int, session: Session = None) -> List[Lot]:
+        """Получить лоты объявления по порядку"""
+        session, owned = use_session(session)
+        try:
+            return session.query(Lot).filter(
+                Lot.announcement_id == announcement_id
+            ).order_by(Lot.position).all()
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def ensure_for_announcement(announcement_id: int, session: Session = None) -> List[Lot]:
+        """
+        Получить лоты объявления, создав их при необходимости
+
+        У объявления без строк лотов они создаются из снимка lots или устаревших
+        полей (lot_name, lot_description, keyword_matched).
+
+        Returns:
+            Лоты по порядку (пустой список, если объявления нет)
+        """
+        session, owned = use_session(session)
+        try:
+            lots = LotCRUD.get_by_announcement(announcement_id, session=session)
+            if lots:
+                return lots
+
+            announcement = session.get(Announcement, announcement_id)
+            if announcement is None:
+                return []
+
+            announcement.lot_items = LotCRUD.build({
+                'lots': announcement.lots,
+                'lot_name': announcement.lot_name,
+                'lot_description': announcement.lot_description,
+                'keyword_matched': announcement.keyword_matched
+            })
+            commit_session(session, owned)
+            return LotCRUD.get_by_announcement(announcement_id, session=session)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def save_drafts(announcement_id: int, drafts: dict, session: Session = None):
+        """
+        Сохранить введенные детали участия как черновик
+
+        Args:
+            announcement_id: ID объявления
+            drafts: {lot_id: детали} - заполненные лоты (у остальных черновик очищается)
+        """
+        session, owned = use_session(session)
+        try:
+            for lot in session.query(Lot).filter(Lot.announcement_id == announcement_id):
+                lot.participation_draft = drafts.get(lot.id)
+            commit_session(session, owned)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def save_details(announcement_id: int, details: dict, session: Session = None) -> str:
+        """
+        Сохранить итоговые детали участия по лотам
+
+        Черновики очищаются. Возвращаемый текст сохраняется вызывающим в
+        Announcement.participation_details (для Google Sheets и отчетов).
+
+        Args:
+            announcement_id: ID объявления
+            details: {lot_id: детали}
+
+        Returns:
+            Текст деталей участия по всем лотам
+        """
+        session, owned = use_session(session)
+        try:
+            lots = session.query(Lot).filter(
+                Lot.announcement_id == announcement_id
+            ).order_by(Lot.position).all()
+
+            lines = []
+            for lot in lots:
+                lot.participation_details = details.get(lot.id, '')
+                lot.participation_draft = None
+                lines.append(f"📦 Лот №{lot.display_number}: {lot.participation_details}")
+
+            commit_session(session, owned)
+
+            return '\n\n'.join(lines)  # Пустая строка между лотами
+        finally:
+            release_session(session, owned)
+
+
+class ReminderCRUD:
+    """
+    Расписание напоминаний о дедлайнах (таблица deadline_reminders)
+
+    Строки создаются при принятии объявления; очередь напоминаний (bot/reminders.py)
+    узнает о них через слушателей (add_listener) и при старте - из get_pending().
+    Актуальность (статус, срок) проверяется при отправке, поэтому при отказе или
+    истечении строки не трогаются.
+    """
+
+    # Слушатели новых напоминаний: callback([(due_at, reminder_id), ...]), вызываются после commit
+    _listeners = []
+
+    @staticmethod
+    def add_listener(callback):
+        """Подписаться на новые напоминания"""
+        ReminderCRUD._listeners.append(callback)
+
+    @staticmethod
+    def remove_listener(callback):
+        """Отписаться от новых напоминаний"""
+        if callback in ReminderCRUD._listeners:
+            ReminderCRUD._listeners.remove(callback)
+
+    @staticmethod
+    def _notify(entries: list):
+        for callback in list(ReminderCRUD._listeners):
+            callback(entries)
+
+    @staticmethod
+    def deadline_utc(announcement) -> Optional[datetime]:
+        """Срок окончания приема заявок в naive UTC"""
+        if announcement.application_deadline is None:
+            return None
+        return announcement.application_deadline.replace(tzinfo=None) - DEADLINE_UTC_OFFSET
+
+    @staticmethod
+    def _build(announcement, now: datetime, skip_hours=()) -> List[DeadlineReminder]:
+        """Напоминания объявления со сроком отправки в будущем"""
+        deadline = ReminderCRUD.deadline_utc(announcement)
+        if deadline is None or announcement.manager_id is None:
+            return []
+
+        reminders = []
+        for hours in REMINDER_HOURS:
+            due_at = deadline - timedelta(hours=hours)
+            if due_at <= now or hours in skip_hours or getattr(announcement, f"reminder_{hours}h_sent", False):
+                continue
+            reminders.append(DeadlineReminder(announcement_id=announcement.id, hours_before=hours, due_at=due_at))
+        return reminders
+
+    @staticmethod
+    def _add(session: Session, reminders: List[DeadlineReminder]) -> List[tuple]:
+        """Добавить напоминания в сессию; возвращает [(due_at, reminder_id), ...] для слушателей"""
+        if not reminders:
+            return []
+        session.add_all(reminders)
+        session.flush()
+        return [(reminder.due_at, reminder.id) for reminder in reminders]
+
+    @staticmethod
+    def schedule(announcement: Announcement, now: datetime = None, session: Session = None) -> List[DeadlineReminder]:
+        """
+        Запланировать напоминания для принятого объявления
+
+        Напоминания, время которых уже прошло (объявление принято позже чем
+        за 48 или 24 часа), не создаются.
+
+        Returns:
+            Созданные напоминания
+        """
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            reminders = ReminderCRUD._build(announcement, now)
+            if not reminders:
+                return []
+
+            entries = ReminderCRUD._add(session, reminders)
+            commit_session(session, owned)
+
+            after_commit(session, owned, lambda: ReminderCRUD._notify(entries))
+            return reminders
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def rebuild(now: datetime = None, session: Session = None) -> int:
+        """
+        Дополнить расписание по принятым объявлениям с будущим сроком
+
+        Нужно для объявлений, принятых до появления таблицы или в обход
+        update_status. Существующие строки (в том числе отложенные) не меняются.
+
+        Returns:
+            Количество созданных напоминаний
+        """
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            scheduled = {}
+            for announcement_id, hours in session.query(
+                DeadlineReminder.announcement_id, DeadlineReminder.hours_before
+            ):
+                scheduled.setdefault(announcement_id, set()).add(hours)
+
+            announcements = session.query(Announcement).filter(
+                Announcement.status == 'accepted',
+                Announcement.manager_id.isnot(None),
+                Announcement.application_deadline > now + DEADLINE_UTC_OFFSET
+            ).all()
+
+            reminders = []
+            for announcement in announcements:
+                reminders.extend(ReminderCRUD._build(announcement, now, scheduled.get(announcement.id, ())))
+
+            session.add_all(reminders)
+            commit_session(session, owned)
+            return len(reminders)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_pending(session: Session = None) -> List[tuple]:
+        """Все неотправленные напоминания: [(due_at, reminder_id), ...] по возрастанию due_at"""
+        session, owned = use_session(session)
+        try:
+            return [
+                (due_at, reminder_id)
+                for due_at, reminder_id in session.query(DeadlineReminder.due_at, DeadlineReminder.id).filter(
+                    DeadlineReminder.sent_at.is_(None)
+                ).order_by(DeadlineReminder.due_at)
+            ]
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_due(now: datetime, limit: int = 100, session: Session = None) -> List[DeadlineReminder]:
+        """Неотправленные напоминания, время которых наступило (с объявлениями)"""
+        session, owned = use_session(session)
+        try:
+            return session.query(DeadlineReminder).options(
+                joinedload(DeadlineReminder.announcement)
+            ).filter(
+                DeadlineReminder.sent_at.is_(None),
+                DeadlineReminder.due_at <= now
+            ).order_by(DeadlineReminder.due_at).limit(limit).all()
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def mark_sent(reminder_ids: List[int], now: datetime = None, session: Session = None):
+        """
+        Отметить напоминания отправленными (или пропущенными)
+
+        Флаги reminder_XXh_sent объявления тоже выставляются - для отчетов и старого кода.
+        """
+        if not reminder_ids:
+            return
+
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            reminders = session.query(DeadlineReminder.announcement_id, DeadlineReminder.hours_before).filter(
+                DeadlineReminder.id.in_(reminder_ids)
+            ).all()
+
+            session.query(DeadlineReminder).filter(
+                DeadlineReminder.id.in_(reminder_ids)
+            ).update({'sent_at': now}, synchronize_session=False)
+
+            for hours in {reminder.hours_before for reminder in reminders}:
+                if hours not in REMINDER_HOURS:
+                    continue
+                announcement_ids = [r.announcement_id for r in reminders if r.hours_before == hours]
+                session.query(Announcement).filter(
+                    Announcement.id.in_(announcement_ids)
+                ).update({f"reminder_{hours}h_sent": True}, synchronize_session=False)
+
+            commit_session(session, owned)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def defer(reminder_id: int, due_at: datetime, session: Session = None):
+        """Перенести напоминание на другое время (тихие часы, ошибка отправки)"""
+        session, owned = use_session(session)
+        try:
+            session.query(DeadlineReminder).filter(
+                DeadlineReminder.id == reminder_id
+            ).update({'due_at': due_at}, synchronize_session=False)
+            commit_session(session, owned)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def drop(reminder_ids: List[int], session: Session = None) -> int:
+        """Удалить неактуальные напоминания (объявление отклонено, истекло или без менеджера)"""
+        if not reminder_ids:
+            return 0
+
+        session, owned = use_session(session)
+        try:
+            deleted = session.query(DeadlineReminder).filter(
+                DeadlineReminder.id.in_(reminder_ids)
+            ).delete(synchronize_session=False)
+            commit_session(session, owned)
+            return deleted
+        finally:
+            release_session(session, owned)
+
+
+class SheetOutboxCRUD:
+    """
+    Очередь выгрузки в Google Sheets (outbox)
+
+    enqueue вызывается в транзакции изменения объявления: строка очереди
+    фиксируется вместе с изменением или не фиксируется вовсе, а путь записи в БД
+    не ждет Google. Одна строка на объявление - повторные изменения до выгрузки
+    схлопываются. Выгружает SheetOutboxWorker (utils/sheet_outbox.py).
+    """
+
+    @staticmethod
+    def enqueue(session: Session, announcement_id: int, now: datetime = None):
+        """
+        Поставить объявление в очередь выгрузки (в транзакции вызывающего, без commit)
+
+        Один INSERT ... ON CONFLICT: уже стоящая в очереди строка получает новый
+        changed_at и выгружается сразу, без накопленной паузы повтора.
+        """
+        if not GOOGLE_SHEETS_ENABLED:
+            return
+
+        now = now or datetime.utcnow()
+        dialect = session.get_bind().dialect.name
+        values = dict(announcement_id=announcement_id, created_at=now, changed_at=now, attempts=0, next_attempt_at=now)
+
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+            stmt = dialect_insert(SheetOutbox).values(**values)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[SheetOutbox.announcement_id],
+                set_={'changed_at': now, 'next_attempt_at': now}
+            ))
+            return
+
+        entry = session.get(SheetOutbox, announcement_id)
+        if entry is None:
+            session.add(SheetOutbox(**values))
+        else:
+            entry.changed_at = now
+            entry.next_attempt_at = now
+        session.flush()
+
+    @staticmethod
+    def get_batch(now: datetime = None, limit: int = 100, session: Session = None) -> List[tuple]:
+        """
+        Строки очереди, которые пора выгрузить (самые старые первыми)
+
+        Returns:
+            [(announcement_id, changed_at, attempts)]
+        """
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            return [tuple(row) for row in session.query(
+                SheetOutbox.announcement_id, SheetOutbox.changed_at, SheetOutbox.attempts
+            ).filter(
+                SheetOutbox.next_attempt_at <= now
+            ).order_by(SheetOutbox.next_attempt_at, SheetOutbox.announcement_id).limit(limit).all()]
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def complete(entries: List[tuple], session: Session = None) -> int:
+        """
+        Удалить выгруженные строки
+
+        Строка удаляется, только если changed_at не изменился: объявление, измененное
+        во время выгрузки, остается в очереди и выгрузится еще раз.
+
+        Args:
+            entries: [(announcement_id, changed_at)] из get_batch
+
+        Returns:
+            Количество удаленных строк
+        """
+        session, owned = use_session(session)
+        try:
+            deleted = 0
+            for announcement_id, changed_at in entries:
+                deleted += session.query(SheetOutbox).filter(
+                    SheetOutbox.announcement_id == announcement_id,
+                    SheetOutbox.changed_at == changed_at
+                ).delete(synchronize_session=False)
+            commit_session(session, owned)
+            return deleted
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def retry_delay(attempts: int) -> timedelta:
+        """Пауза перед повтором: экспоненциально от SHEET_OUTBOX_RETRY_BASE до SHEET_OUTBOX_RETRY_MAX"""
+        return timedelta(seconds=min(SHEET_OUTBOX_RETRY_MAX, SHEET_OUTBOX_RETRY_BASE * 2 ** max(attempts - 1, 0)))
+
+    @staticmethod
+    def fail(announcement_ids: List[int], error: str, now: datetime = None, session: Session = None) -> int:
+        """
+        Отложить строки после ошибки выгрузки
+
+        Returns:
+            Количество отложенных строк
+        """
+        if not announcement_ids:
+            return 0
+
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            entries = session.query(SheetOutbox).filter(SheetOutbox.announcement_id.in_(announcement_ids)).all()
+            for entry in entries:
+                entry.attempts = (entry.attempts or 0) + 1
+                entry.next_attempt_at = now + SheetOutboxCRUD.retry_delay(entry.attempts)
+                entry.last_error = str(error)[:1000]
+            commit_session(session, owned)
+            return len(entries)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_lag(now: datetime = None, session: Session = None) -> dict:
+        """
+        Отставание Google Sheets от БД
+
+        Returns:
+            {'pending': строк в очереди, 'failing': из них с ошибками,
+             'oldest_seconds': возраст самого старого невыгруженного изменения}
+        """
+        now = now or datetime.utcnow()
+        session, owned = use_session(session)
+        try:
+            pending, failing, oldest = session.query(
+                func.count(SheetOutbox.announcement_id),
+                func.coalesce(func.sum(case((SheetOutbox.attempts > 0, 1), else_=0)), 0),
+                func.min(SheetOutbox.created_at)
+            ).one()
+            return {
+                'pending': pending,
+                'failing': failing,
+                'oldest_seconds': round((now - oldest).total_seconds()) if oldest else 0
+            }
+        finally:
+            release_session(session, owned)
+
+
+class ArchiveCRUD:
+    """
+    Перенос истекших объявлений в архив
+
+    Объявления, истекшие больше ARCHIVE_AFTER_DAYS дней назад, переносятся пачками
+    вместе с лотами и действиями менеджеров в таблицы *_archive (id сохраняются);
+    сохраненные сообщения и кэш рендера удаляются. Каждая пачка - одна короткая
+    транзакция, счетчики дашборда уменьшаются в ней же.
+    """
+
+    # Рабочая таблица -> архивная (порядок вставки; удаление - в обратном порядке)
+    TABLES = (
+        (Announcement, ArchivedAnnouncement),
+        (Lot, ArchivedLot),
+        (ManagerAction, ArchivedManagerAction)
+    )
+
+    @staticmethod
+    def archive_batch(cutoff: datetime, batch_size: int = None, session: Session = None) -> int:
+        """
+        Перенести в архив одну пачку объявлений, истекших до cutoff
+
+        Args:
+            cutoff: Граница (naive UTC): переносятся объявления с expired_at раньше нее
+            batch_size: Размер пачки (по умолчанию ARCHIVE_BATCH_SIZE)
+
+        Returns:
+            Количество перенесенных объявлений
+        """
+        session, owned = use_session(session)
+        try:
+            # Объявления, помеченные истекшими до появления expired_at, - по updated_at
+            rows = session.query(
+                Announcement.id, Announcement.manager_id, Announcement.status,
+                Announcement.is_processed, Announcement.created_at
+            ).filter(
+                Announcement.status == 'expired',
+                func.coalesce(Announcement.expired_at, Announcement.updated_at) < cutoff
+            ).order_by(Announcement.id).limit(batch_size or ARCHIVE_BATCH_SIZE).all()
+
+            if not rows:
+                return 0
+
+            ids = [row.id for row in rows]
+            archived_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+            for model, archive_model in ArchiveCRUD.TABLES:
+                columns = [column.name for column in model.__table__.columns]
+                key = model.id if model is Announcement else model.announcement_id
+                source = select(*[model.__table__.c[name] for name in columns]).where(key.in_(ids))
+
+                if archive_model is ArchivedAnnouncement:
+                    columns = columns + ['archived_at']
+                    source = source.add_columns(literal(archived_at, DateTime))
+                session.execute(insert(archive_model).from_select(columns, source))
+
+            for model in (NotificationMessage, RenderedMessage, DeadlineReminder, ManagerAction, Lot):
+                session.query(model).filter(model.announcement_id.in_(ids)).delete(synchronize_session=False)
+            session.query(Announcement).filter(Announcement.id.in_(ids)).delete(synchronize_session=False)
+
+            # Объявления уходят из рабочей таблицы - и из счетчиков дашборда
+            states = Counter(
+                (row.manager_id, row.status, row.is_processed, row.created_at.date() if row.created_at else None)
+                for row in rows
+            )
+            for state, amount in states.items():
+                DashboardCounterCRUD.record_transition(session, state, None, amount=amount)
+
+            commit_session(session, owned)
+
+            def invalidate():
+                cache = get_message_cache()
+                for announcement_id in ids:
+                    cache.invalidate(announcement_id)
+                invalidate_statistics_cache()
+
+            after_commit(session, owned, invalidate)
+            return len(ids)
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def archive_expired(older_than_days: int = None, batch_size: int = None, now: datetime = None,
+                        session: Session = None) -> int:
+        """
+        Перенести в архив все объявления, истекшие больше older_than_days дней назад
+
+        Без переданной сессии каждая пачка фиксируется отдельно, поэтому перенос
+        не держит долгих блокировок.
+
+        Args:
+            older_than_days: Через сколько дней после истечения переносить (по умолчанию ARCHIVE_AFTER_DAYS)
+            batch_size: Размер пачки (по умолчанию ARCHIVE_BATCH_SIZE)
+            now: Текущее время (naive UTC)
+
+        Returns:
+            Количество перенесенных объявлений
+        """
+        days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        batch_size = batch_size or ARCHIVE_BATCH_SIZE
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        cutoff = now - timedelta(days=days)
+
+        total = 0
+        while True:
+            moved = ArchiveCRUD.archive_batch(cutoff, batch_size, session=session)
+            total += moved
+            if moved < batch_size:
+                return total
 
 
 class ManagerActionCRUD:
     """CRUD операции для действий менеджеров"""
 
     @staticmethod
-    def create(action_data: dict) -> ManagerAction:
+    def create(action_data: dict, session: Session = None) -> ManagerAction:
         """Создать запись о действии менеджера"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             action = ManagerAction(**action_data)
             session.add(action)
-            session.commit()
-            session.refresh(action)
+            commit_session(session, owned, action)
             return action
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_by_announcement(announcement_id: int) -> List[ManagerAction]:
+    def get_by_announcement(announcement_id: int, session: Session = None) -> List[ManagerAction]:
         """Получить все действия по объявлению"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(ManagerAction).filter(
                 ManagerAction.announcement_id == announcement_id
             ).order_by(ManagerAction.created_at).all()
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_by_manager(manager_id: int, limit: int = 10) -> List[ManagerAction]:
+    def get_by_manager(manager_id: int, limit: int = 10, session: Session = None) -> List[ManagerAction]:
         """Получить последние действия менеджера"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(ManagerAction).filter(
                 ManagerAction.manager_id == manager_id
             ).order_by(desc(ManagerAction.created_at)).limit(limit).all()
         finally:
-            session.close()
+            release_session(session, owned)
+
+
+class NotificationMessageCRUD:
+    """CRUD операции для отправленных сообщений об общих объявлениях"""
+
+    @staticmethod
+    def create(announcement_id: int, telegram_id: int, message_id: int, manager_id: int = None,
+               session: Session = None) -> NotificationMessage:
+        """Сохранить message_id отправленного сообщения"""
+        session, owned = use_session(session)
+        try:
+            notification_message = NotificationMessage(
+                announcement_id=announcement_id,
+                manager_id=manager_id,
+                telegram_id=telegram_id,
+                message_id=message_id
+            )
+            session.add(notification_message)
+            commit_session(session, owned, notification_message)
+            return notification_message
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def get_by_announcement(announcement_id: int, session: Session = None) -> List[NotificationMessage]:
+        """Получить все сообщения, отправленные по объявлению"""
+        session, owned = use_session(session)
+        try:
+            return session.query(NotificationMessage).filter(
+                NotificationMessage.announcement_id == announcement_id
+            ).order_by(NotificationMessage.created_at).all()
+        finally:
+            release_session(session, owned)
+
+    @staticmethod
+    def delete_by_announcement(announcement_id: int, session: Session = None) -> int:
+        """Удалить сохраненные сообщения объявления (после того как копии обновлены)"""
+        session, owned = use_session(session)
+        try:
+            deleted = session.query(NotificationMessage).filter(
+                NotificationMessage.announcement_id == announcement_id
+            ).delete(synchronize_session=False)
+            commit_session(session, owned)
+            return deleted
+        finally:
+            release_session(session, owned)
 
 
 class ParsingLogCRUD:
     """CRUD операции для логов парсинга"""
 
     @staticmethod
-    def create() -> ParsingLog:
+    def create(session: Session = None) -> ParsingLog:
         """Создать новый лог парсинга"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             log = ParsingLog(status='running')
             session.add(log)
-            session.commit()
-            session.refresh(log)
+            commit_session(session, owned, log)
             return log
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def update(log_id: int, **kwargs):
+    def update(log_id: int, session: Session = None, **kwargs):
         """Обновить лог парсинга"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             log = session.query(ParsingLog).filter(ParsingLog.id == log_id).first()
             if log:
                 for key, value in kwargs.items():
                     setattr(log, key, value)
-                session.commit()
+                commit_session(session, owned)
         finally:
-            session.close()
+            release_session(session, owned)
 
     @staticmethod
-    def get_last() -> Optional[ParsingLog]:
+    def get_last(session: Session = None) -> Optional[ParsingLog]:
         """Получить последний лог"""
-        session = get_session()
+        session, owned = use_session(session)
         try:
             return session.query(ParsingLog).order_by(
                 desc(ParsingLog.started_at)
             ).first()
         finally:
-            session.close()
+            release_session(session, owned)
@@ -0,0 +1,148 @@
+"""
+Настройка движков SQLAlchemy (профили подключения)
+
+Бот, задачи планировщика и скрипты работают с одним файлом goszakup.db. С настройками
+по умолчанию (журнал DELETE, synchronous=FULL, без busy timeout) читатели получают
+"database is locked" во время записи результатов парсинга. Профиль production включает
+WAL (читатели не блокируются писателем), synchronous=NORMAL, busy timeout, увеличенный
+кэш страниц и mmap, а также пул соединений, пригодный для потоков и executor'ов.
+"""
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+# Профиль подключения: production (рекомендуется) или default (настройки SQLAlchemy как есть)
+DB_PROFILE = os.getenv('DB_PROFILE', 'production').lower()
+
+# Параметры SQLite для профиля production
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '15000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))  # 64 МБ на соединение
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # 256 МБ
+
+# Пул соединений (для SQLite-файла и PostgreSQL)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+
+def is_sqlite(database_url: str) -> bool:
+    """Проверить, что URL указывает на SQLite"""
+    return database_url.startswith('sqlite')
+
+
+def is_sqlite_memory(database_url: str) -> bool:
+    """Проверить, что URL указывает на SQLite в памяти"""
+    return is_sqlite(database_url) and (':memory:' in database_url or database_url.rstrip('/').endswith(':'))
+
+
+def get_engine_options(database_url: str, profile: str = None) -> dict:
+    """
+    Параметры create_engine для URL и профиля
+
+    Args:
+        database_url: URL базы данных
+        profile: production или default (по умолчанию DB_PROFILE)
+
+    Returns:
+        Словарь именованных аргументов для create_engine / create_async_engine
+    """
+    profile = profile or DB_PROFILE
+    if profile != 'production':
+        return {}
+
+    if is_sqlite_memory(database_url):
+        # Одна общая БД в памяти для всех потоков
+        return {
+            'connect_args': {'check_same_thread': False},
+            'poolclass': StaticPool
+        }
+
+    if is_sqlite(database_url):
+        # Соединения используются из потоков (asyncio.to_thread, executor планировщика)
+        options = {
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000
+            },
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT
+        }
+        if 'aiosqlite' in database_url:
+            # aiosqlite по умолчанию открывает соединение на каждый запрос (NullPool)
+            options['poolclass'] = AsyncAdaptedQueuePool
+        return options
+
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
+
+
+def get_sqlite_pragmas(profile: str = None) -> list:
+    """PRAGMA, выполняемые на каждом новом соединении SQLite"""
+    profile = profile or DB_PROFILE
+    if profile != 'production':
+        return []
+
+    return [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY"
+    ]
+
+
+def apply_sqlite_pragmas(engine, profile: str = None):
+    """
+    Подключить выполнение PRAGMA при открытии соединений SQLite
+
+    Args:
+        engine: Синхронный Engine (для асинхронного - async_engine.sync_engine)
+        profile: production или default
+    """
+    if not is_sqlite(str(engine.url)):
+        return
+
+    pragmas = get_sqlite_pragmas(profile)
+    if not pragmas:
+        return
+
+    if is_sqlite_memory(str(engine.url)):
+        # WAL и mmap для БД в памяти не применяются
+        pragmas = [pragma for pragma in pragmas if 'journal_mode' not in pragma and 'mmap_size' not in pragma]
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def create_configured_engine(database_url: str, profile: str = None, **kwargs):
+    """
+    Создать синхронный движок с настройками профиля
+
+    Args:
+        database_url: URL базы данных
+        profile: production или default (по умолчанию DB_PROFILE)
+        **kwargs: Дополнительные аргументы create_engine
+
+    Returns:
+        Engine
+    """
+    options = get_engine_options(database_url, profile)
+    options.update(kwargs)
+
+    engine = create_engine(database_url, **options)
+    apply_sqlite_pragmas(engine, profile)
+    return engine
@@ -0,0 +1,10 @@
+"""
+Версионные миграции базы данных
+
+Миграции лежат в versions/ (vNNNN_описание.py) и применяются по порядку
+раннером runner.py. Применённые версии хранятся в таблице schema_migrations.
+Раннер работает с SQLite и PostgreSQL через DATABASE_URL.
+
+Скрипты migrate_*.py - старые разовые миграции только для SQLite; их изменения
+включены в базовую миграцию v0001.
+"""
@@ -0,0 +1,273 @@
+"""
+Раннер версионных миграций (SQLite и PostgreSQL)
+
+Каждая миграция - модуль versions/vNNNN_описание.py с функцией upgrade(ctx),
+где ctx - MigrationContext. Миграции должны быть идемпотентными: базовая
+миграция создает схему через create_all, и на новой БД последующие миграции
+видят уже существующие таблицы и индексы.
+
+DDL каждой миграции выполняется в своей транзакции. Заполнение данных
+(backfill) идет пачками с фиксацией после каждой пачки, чтобы не держать
+блокировку таблицы на время всего обновления.
+
+Использование:
+    python -m database.migrations.runner            # применить все миграции
+    python -m database.migrations.runner --status   # показать состояние
+    python -m database.migrations.runner --target 2 # применить до версии 2
+"""
+import argparse
+import importlib
+import os
+import pkgutil
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from loguru import logger
+from sqlalchemy import inspect, text
+
+from . import versions
+
+# Таблица с примененными версиями
+MIGRATIONS_TABLE = 'schema_migrations'
+
+# Размер пачки при заполнении данных
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))
+
+
+class Migration:
+    """Миграция из модуля versions/vNNNN_описание.py"""
+
+    def __init__(self, module):
+        self.module = module
+        self.version = module.VERSION
+        self.name = module.__name__.rsplit('.', 1)[-1]
+        doc = (module.__doc__ or '').strip()
+        self.description = doc.splitlines()[0] if doc else self.name
+
+    def upgrade(self, ctx):
+        self.module.upgrade(ctx)
+
+    def __repr__(self):
+        return f"<Migration {self.version} {self.name}>"
+
+
+class MigrationContext:
+    """Операции, доступные миграции"""
+
+    def __init__(self, engine, batch_size: int = None):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.batch_size = batch_size or MIGRATION_BATCH_SIZE
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == 'postgresql'
+
+    def has_table(self, table: str) -> bool:
+        """Проверить, существует ли таблица"""
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        """Проверить, существует ли колонка"""
+        return column in {col['name'] for col in inspect(self.engine).get_columns(table)}
+
+    def has_index(self, table: str, index: str) -> bool:
+        """Проверить, существует ли индекс"""
+        return index in {idx['name'] for idx in inspect(self.engine).get_indexes(table)}
+
+    def execute(self, sql: str, params: dict = None):
+        """Выполнить SQL в отдельной транзакции"""
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params or {})
+
+    def add_column(self, table: str, column: str, ddl: str) -> bool:
+        """
+        Добавить колонку, если ее нет
+
+        Args:
+            table: Таблица
+            column: Имя колонки
+            ddl: Тип и ограничения, например 'BOOLEAN DEFAULT FALSE'
+
+        Returns:
+            True если колонка добавлена
+        """
+        if self.has_column(table, column):
+            return False
+
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        logger.info(f"➕ {table}.{column} добавлена")
+        return True
+
+    def create_index(self, name: str, table: str, columns: list) -> bool:
+        """
+        Создать индекс, если его нет
+
+        В PostgreSQL индекс строится CONCURRENTLY (без блокировки записи),
+        что требует выполнения вне транзакции.
+
+        Returns:
+            True если индекс создан
+        """
+        if self.has_index(table, name):
+            return False
+
+        column_list = ', '.join(columns)
+        if self.is_postgres:
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})"))
+        else:
+            self.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})")
+
+        logger.info(f"📇 Индекс {name} ({column_list}) создан")
+        return True
+
+    def backfill(self, table: str, assignments: str, where: str, params: dict = None,
+                 batch_size: int = None, pause: float = 0.0) -> int:
+        """
+        Обновить строки пачками
+
+        Каждая пачка - отдельная короткая транзакция, поэтому бот и парсер
+        продолжают писать в таблицу между пачками. Условие where должно
+        перестать выполняться для обновленных строк, иначе цикл не завершится.
+
+        Args:
+            table: Таблица (с первичным ключом id)
+            assignments: SET-часть, например 'is_processed = :value'
+            where: Условие выборки строк, например 'is_processed IS NULL'
+            params: Параметры запроса
+            batch_size: Размер пачки (по умолчанию MIGRATION_BATCH_SIZE)
+            pause: Пауза между пачками в секундах
+
+        Returns:
+            Количество обновленных строк
+        """
+        batch_size = batch_size or self.batch_size
+        sql = (
+            f"UPDATE {table} SET {assignments} "
+            f"WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT :batch_size)"
+        )
+
+        total = 0
+        while True:
+            with self.engine.begin() as conn:
+                updated = conn.execute(text(sql), {**(params or {}), 'batch_size': batch_size}).rowcount
+
+            total += updated
+            if updated < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        if total:
+            logger.info(f"🔁 {table}: обновлено {total} строк ({where})")
+        return total
+
+
+def discover_migrations() -> list:
+    """Найти все миграции в versions/, отсортированные по версии"""
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        if not module_info.name.startswith('v'):
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(Migration(module))
+
+    migrations.sort(key=lambda migration: migration.version)
+
+    numbers = [migration.version for migration in migrations]
+    if len(numbers) != len(set(numbers)):
+        raise RuntimeError(f"Повторяющиеся версии миграций: {numbers}")
+
+    return migrations
+
+
+def ensure_migrations_table(engine):
+    """Создать таблицу schema_migrations, если ее нет"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def get_applied_versions(engine) -> set:
+    """Получить номера примененных миграций"""
+    ensure_migrations_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))}
+
+
+def run_migrations(engine=None, target: int = None, batch_size: int = None) -> list:
+    """
+    Применить непримененные миграции по порядку
+
+    Args:
+        engine: Движок БД (по умолчанию - engine из database.models)
+        target: Применить миграции до этой версии включительно
+        batch_size: Размер пачки для заполнения данных
+
+    Returns:
+        Список примененных миграций
+    """
+    if engine is None:
+        from database.models import engine
+
+    ctx = MigrationContext(engine, batch_size)
+    applied = get_applied_versions(engine)
+    done = []
+
+    for migration in discover_migrations():
+        if migration.version in applied:
+            continue
+        if target is not None and migration.version > target:
+            break
+
+        logger.info(f"🔄 Миграция {migration.version}: {migration.description}")
+        migration.upgrade(ctx)
+
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()}
+            )
+        done.append(migration)
+
+    if done:
+        logger.info(f"✅ Применено миграций: {len(done)}")
+    return done
+
+
+def print_status(engine):
+    """Показать применённые и ожидающие миграции"""
+    applied = get_applied_versions(engine)
+    for migration in discover_migrations():
+        mark = '✅' if migration.version in applied else '⏳'
+        print(f"{mark} {migration.version:04d} {migration.name} - {migration.description}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Версионные миграции БД')
+    parser.add_argument('--status', action='store_true', help='Показать состояние миграций')
+    parser.add_argument('--target', type=int, help='Применить миграции до версии включительно')
+    parser.add_argument('--batch-size', type=int, help='Размер пачки при заполнении данных')
+    args = parser.parse_args()
+
+    from database.models import engine
+
+    if args.status:
+        print_status(engine)
+        return
+
+    done = run_migrations(engine, target=args.target, batch_size=args.batch_size)
+    if not done:
+        print("✅ База данных в актуальном состоянии")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Версии миграций: модуль vNNNN_описание.py с функцией upgrade(ctx)"""
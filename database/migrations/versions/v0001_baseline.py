@@ -0,0 +1,37 @@
+"""
+Базовая схема: таблицы моделей и колонки из старых скриптов migrate_*.py
+
+На новой БД создает все таблицы. На существующей - досоздает недостающие
+таблицы и колонки и заменяет NULL в флагах на FALSE (колонки добавлялись
+без значения по умолчанию, и фильтры "== False" такие строки не находили).
+"""
+VERSION = 1
+
+# Колонки, которые добавлялись разовыми скриптами
+LEGACY_COLUMNS = [
+    ('lots', 'TEXT'),
+    ('participation_details_draft', 'TEXT'),
+    ('expired_at', 'TIMESTAMP'),
+    ('reminder_48h_sent', 'BOOLEAN DEFAULT FALSE'),
+    ('reminder_24h_sent', 'BOOLEAN DEFAULT FALSE'),
+    ('reminder_2h_sent', 'BOOLEAN DEFAULT FALSE')
+]
+
+# Флаги, в которых NULL означает FALSE
+BOOLEAN_FLAGS = [
+    'is_processed', 'notification_sent', 'admin_notified',
+    'reminder_48h_sent', 'reminder_24h_sent', 'reminder_2h_sent'
+]
+
+
+def upgrade(ctx):
+    from database.models import Base
+
+    # Недостающие таблицы (на новой БД - все)
+    Base.metadata.create_all(ctx.engine)
+
+    for column, ddl in LEGACY_COLUMNS:
+        ctx.add_column('announcements', column, ddl)
+
+    for flag in BOOLEAN_FLAGS:
+        ctx.backfill('announcements', f"{flag} = :value", f"{flag} IS NULL", {'value': False})
@@ -0,0 +1,25 @@
+"""
+Составные индексы для частых запросов к announcements
+
+- (manager_id, status, created_at): списки объявлений менеджера, статистика
+- (status, is_processed): дашборд "в работе" / "обработано"
+- (status, application_deadline): проверка дедлайнов и истечение
+- (status, notification_sent, created_at): повторная отправка уведомлений
+"""
+VERSION = 2
+
+INDEXES = [
+    ('ix_announcements_manager_status_created', ['manager_id', 'status', 'created_at']),
+    ('ix_announcements_status_processed', ['status', 'is_processed']),
+    ('ix_announcements_status_deadline', ['status', 'application_deadline']),
+    ('ix_announcements_status_notified_created', ['status', 'notification_sent', 'created_at'])
+]
+
+
+def upgrade(ctx):
+    for name, columns in INDEXES:
+        ctx.create_index(name, 'announcements', columns)
+
+    if not ctx.is_postgres:
+        # Обновить статистику планировщика SQLite для новых индексов
+        ctx.execute("ANALYZE announcements")
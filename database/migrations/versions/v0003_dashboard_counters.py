@@ -0,0 +1,20 @@
+"""
+Материализованные счетчики дашборда (status_counters, daily_counters)
+
+Создает таблицы и заполняет их по текущим объявлениям.
+"""
+VERSION = 3
+
+
+def upgrade(ctx):
+    from sqlalchemy.orm import Session
+
+    from database.crud import DashboardCounterCRUD
+    from database.models import StatusCounter, DailyCounter
+
+    StatusCounter.__table__.create(ctx.engine, checkfirst=True)
+    DailyCounter.__table__.create(ctx.engine, checkfirst=True)
+
+    with Session(ctx.engine) as session:
+        DashboardCounterCRUD.rebuild(session=session)
+        session.commit()
@@ -0,0 +1,123 @@
+"""
+Таблица lots: лоты из JSON-колонки announcements.lots и детали участия по лотам
+
+Для объявлений без строк в lots создает их из JSON (или из устаревших полей
+lot_name/lot_description/keyword_matched). Детали участия и черновик, сохраненные
+текстом "📦 Лот №N: ...", раскладываются по лотам. Некорректный JSON в
+announcements.lots заменяется на NULL (колонка теперь декодируется ORM). В PostgreSQL
+колонка, созданная как TEXT, после этого переводится в тип JSON: иначе драйвер
+возвращает строку, а код больше не вызывает json.loads.
+"""
+import json
+
+from sqlalchemy import inspect, text
+from sqlalchemy.sql import sqltypes
+
+VERSION = 4
+
+
+def _decode_lots(raw):
+    """Декодировать announcements.lots: (список лотов или None, корректен ли JSON)"""
+    if raw is None or isinstance(raw, list):
+        return raw, True
+    try:
+        value = json.loads(raw)
+    except (TypeError, ValueError):
+        return None, False
+    return (value if isinstance(value, list) else None), True
+
+
+def _parse_details(details_text: str, lot_numbers: list) -> dict:
+    """
+    Разобрать текст "📦 Лот №N: детали" по лотам
+
+    Args:
+        details_text: Текст деталей участия
+        lot_numbers: Номера лотов по порядку (номер с портала или порядковый)
+
+    Returns:
+        {позиция лота: детали}
+    """
+    details = {}
+    if not details_text:
+        return details
+
+    for line in details_text.split('\n'):
+        if 'Лот №' not in line or ':' not in line:
+            continue
+        lot_part, details_part = line.split(':', 1)
+        lot_number = lot_part.replace('📦', '').replace('Лот №', '').strip()
+        if lot_number in lot_numbers:
+            details[lot_numbers.index(lot_number)] = details_part.strip()
+
+    return details
+
+
+def _lots_is_json(ctx) -> bool:
+    """Объявлена ли колонка announcements.lots с типом JSON"""
+    column = next(col for col in inspect(ctx.engine).get_columns('announcements') if col['name'] == 'lots')
+    return isinstance(column['type'], sqltypes.JSON)
+
+
+def _convert_lots_column(ctx):
+    """PostgreSQL: TEXT -> JSON (после замены некорректного JSON на NULL приведение не падает)"""
+    if not ctx.is_postgres or _lots_is_json(ctx):
+        return
+    with ctx.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE announcements ALTER COLUMN lots TYPE JSON USING lots::json"))
+
+
+def upgrade(ctx):
+    from database.crud import LotCRUD
+    from database.models import Lot
+
+    Lot.__table__.create(ctx.engine, checkfirst=True)
+
+    last_id = 0
+    while True:
+        # Пачка объявлений без лотов - одна короткая транзакция
+        with ctx.engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, lots, lot_name, lot_description, keyword_matched, "
+                "participation_details, participation_details_draft "
+                "FROM announcements a WHERE id > :last_id "
+                "AND NOT EXISTS (SELECT 1 FROM lots l WHERE l.announcement_id = a.id) "
+                "ORDER BY id LIMIT :batch_size"
+            ), {'last_id': last_id, 'batch_size': ctx.batch_size}).fetchall()
+
+            if not rows:
+                break
+
+            lot_rows = []
+            for row in rows:
+                lots, valid = _decode_lots(row.lots)
+                if not valid:
+                    conn.execute(text("UPDATE announcements SET lots = NULL WHERE id = :id"), {'id': row.id})
+
+                lots = LotCRUD.build({
+                    'lots': lots,
+                    'lot_name': row.lot_name,
+                    'lot_description': row.lot_description,
+                    'keyword_matched': row.keyword_matched
+                })
+                lot_numbers = [lot.display_number for lot in lots]
+                final = _parse_details(row.participation_details, lot_numbers)
+                drafts = _parse_details(row.participation_details_draft, lot_numbers)
+
+                for lot in lots:
+                    lot_rows.append({
+                        'announcement_id': row.id,
+                        'position': lot.position,
+                        'number': lot.number,
+                        'name': lot.name,
+                        'description': lot.description,
+                        'keyword': lot.keyword,
+                        'amount': lot.amount,
+                        'participation_details': final.get(lot.position),
+                        'participation_draft': drafts.get(lot.position)
+                    })
+
+            conn.execute(Lot.__table__.insert(), lot_rows)
+            last_id = rows[-1].id
+
+    _convert_lots_column(ctx)
@@ -0,0 +1,14 @@
+"""
+Архив объявлений: announcements_archive, lots_archive, manager_actions_archive
+
+Создает таблицы архива с индексами. Перенос истекших объявлений выполняет
+ArchiveCRUD.archive_expired (задача планировщика, scripts/archive_expired.py).
+"""
+VERSION = 5
+
+
+def upgrade(ctx):
+    from database.models import ArchivedAnnouncement, ArchivedLot, ArchivedManagerAction
+
+    for model in (ArchivedAnnouncement, ArchivedLot, ArchivedManagerAction):
+        model.__table__.create(ctx.engine, checkfirst=True)
@@ -0,0 +1,20 @@
+"""
+Расписание напоминаний о дедлайнах (deadline_reminders)
+
+Создает таблицу и планирует напоминания для уже принятых объявлений с будущим сроком
+(уже отправленные по флагам reminder_XXh_sent пропускаются).
+"""
+VERSION = 6
+
+
+def upgrade(ctx):
+    from sqlalchemy.orm import Session
+
+    from database.crud import ReminderCRUD
+    from database.models import DeadlineReminder
+
+    DeadlineReminder.__table__.create(ctx.engine, checkfirst=True)
+
+    with Session(ctx.engine) as session:
+        ReminderCRUD.rebuild(session=session)
+        session.commit()
@@ -0,0 +1,12 @@
+"""
+Индекс строк Google Sheets (sheet_rows)
+
+Таблица заполняется при первой записи в лист (перестройка индекса по столбцу номеров).
+"""
+VERSION = 7
+
+
+def upgrade(ctx):
+    from database.models import SheetRow
+
+    SheetRow.__table__.create(ctx.engine, checkfirst=True)
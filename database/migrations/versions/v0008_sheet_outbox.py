@@ -0,0 +1,13 @@
+"""
+Очередь выгрузки в Google Sheets (sheet_outbox)
+
+Изменения, сделанные до миграции, уже ушли в таблицу прежним способом - очередь
+создается пустой.
+"""
+VERSION = 8
+
+
+def upgrade(ctx):
+    from database.models import SheetOutbox
+
+    SheetOutbox.__table__.create(ctx.engine, checkfirst=True)
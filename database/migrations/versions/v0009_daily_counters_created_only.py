@@ -0,0 +1,17 @@
+"""
+daily_counters: только число новых объявлений
+
+Колонки accepted, rejected и expired не заполнялись и не пересчитывались по таблице
+объявлений; они удаляются (у таблицы, созданной v0003 до этой правки).
+"""
+VERSION = 9
+
+DROPPED_COLUMNS = ('accepted', 'rejected', 'expired')
+
+
+def upgrade(ctx):
+    if not ctx.has_table('daily_counters'):
+        return
+    for column in DROPPED_COLUMNS:
+        if ctx.has_column('daily_counters', column):
+            ctx.execute(f"ALTER TABLE daily_counters DROP COLUMN {column}")
@@ -2,7 +2,9 @@
 Модели базы данных для системы мониторинга госзакупок
 """
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Date, DateTime, Text, Boolean, ForeignKey, Index, JSON, Numeric, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import sys
@@ -12,15 +14,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import DATABASE_URL
+from database.engine import create_configured_engine
 
 Base = declarative_base()
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_configured_engine(DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(bind=engine)
 
 
-class Announcement(Base):
-    """Объявления о госзакупках"""
-    __tablename__ = 'announcements'
+class AnnouncementColumns:
+    """Колонки объявления: общие для рабочей таблицы announcements и архива"""
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
@@ -39,13 +41,14 @@ class Announcement(Base):
     lot_description = Column(Text, nullable=True)
     keyword_matched = Column(String(200))  # Ключевое слово, по которому найдено
 
-    # Массив лотов (JSON) - новый формат
-    lots = Column(Text, nullable=True)  # JSON массив лотов: [{"name": "...", "description": "...", "keyword": "..."}]
+    # Снимок лотов (JSON, декодируется ORM): [{"number": ..., "name": "...", "description": "...", "keyword": "..."}]
+    # Нужен для отображения без дополнительных запросов; лоты и детали участия по ним - в таблице lots
+    lots = Column(JSON, nullable=True)
 
     application_deadline = Column(DateTime, nullable=True)  # Срок окончания приема заявок
     procurement_method = Column(String(200), nullable=True)  # Способ проведения закупки
-    participation_details = Column(Text, nullable=True)  # Информация о товаре для участия (финальная)
-    participation_details_draft = Column(Text, nullable=True)  # Черновик деталей участия (для восстановления)
+    participation_details = Column(Text, nullable=True)  # Информация о товаре для участия (текст по всем лотам)
+    participation_details_draft = Column(Text, nullable=True)  # Устарело: черновики хранятся в lots.participation_draft
 
     # Привязка к менеджеру
     manager_id = Column(Integer, index=True)
@@ -69,22 +72,81 @@ class Announcement(Base):
     reminder_24h_sent = Column(Boolean, default=False)  # Напоминание за 24 часа
     reminder_2h_sent = Column(Boolean, default=False)   # Напоминание за 2 часа
 
+
+class Announcement(AnnouncementColumns, Base):
+    """Объявления о госзакупках"""
+    __tablename__ = 'announcements'
+
     # Связь с действиями
     actions = relationship("ManagerAction", back_populates="announcement", cascade="all, delete-orphan")
 
+    # Лоты объявления
+    lot_items = relationship("Lot", back_populates="announcement", order_by="Lot.position",
+                             cascade="all, delete-orphan")
+
+    # Составные индексы для частых запросов (см. database/migrations/versions/v0002_composite_indexes.py)
+    __table_args__ = (
+        Index('ix_announcements_manager_status_created', 'manager_id', 'status', 'created_at'),
+        Index('ix_announcements_status_processed', 'status', 'is_processed'),
+        Index('ix_announcements_status_deadline', 'status', 'application_deadline'),
+        Index('ix_announcements_status_notified_created', 'status', 'notification_sent', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<Announcement {self.announcement_number} - {self.status}>"
 
 
-class ManagerAction(Base):
-    """История действий менеджеров"""
-    __tablename__ = 'manager_actions'
+class LotColumns:
+    """Колонки лота (без ссылки на объявление): общие для lots и архива"""
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
-    # Привязка к объявлению
-    announcement_id = Column(Integer, ForeignKey('announcements.id'), nullable=False)
-    announcement = relationship("Announcement", back_populates="actions")
+    position = Column(Integer, nullable=False, default=0)  # Порядок лота в объявлении (с 0)
+
+    # Данные лота из API
+    number = Column(String(100), nullable=True)  # Номер лота на портале (например, 83848645-ЗЦП1)
+    name = Column(Text, nullable=True)
+    description = Column(Text, nullable=True)
+    keyword = Column(String(200), nullable=True)
+    amount = Column(Numeric(18, 2, asdecimal=False), nullable=True)  # Сумма лота
+
+    # Детали участия, которые вводит менеджер
+    participation_details = Column(Text, nullable=True)
+    participation_draft = Column(Text, nullable=True)  # Введено, но объявление еще не отмечено обработанным
+
+    @property
+    def display_number(self) -> str:
+        """Номер лота для сообщений: номер с портала или порядковый"""
+        return self.number or str(self.position + 1)
+
+    def to_dict(self) -> dict:
+        """Лот в формате снимка Announcement.lots"""
+        return {
+            'id': self.id,
+            'number': self.number,
+            'name': self.name,
+            'description': self.description,
+            'keyword': self.keyword,
+            'amount': self.amount
+        }
+
+    def __repr__(self):
+        return f"<Lot {self.announcement_id}:{self.display_number}>"
+
+
+class Lot(LotColumns, Base):
+    """Лоты объявления (с деталями участия по каждому лоту)"""
+    __tablename__ = 'lots'
+
+    announcement_id = Column(Integer, ForeignKey('announcements.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    announcement = relationship("Announcement", back_populates="lot_items")
+
+
+class ManagerActionColumns:
+    """Колонки действия менеджера (без ссылки на объявление): общие для manager_actions и архива"""
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Данные менеджера
     manager_id = Column(Integer, nullable=False)
@@ -102,6 +164,82 @@ class ManagerAction(Base):
         return f"<ManagerAction {self.action} by {self.manager_name}>"
 
 
+class ManagerAction(ManagerActionColumns, Base):
+    """История действий менеджеров"""
+    __tablename__ = 'manager_actions'
+
+    # Привязка к объявлению
+    announcement_id = Column(Integer, ForeignKey('announcements.id'), nullable=False)
+    announcement = relationship("Announcement", back_populates="actions")
+
+
+class DeadlineReminder(Base):
+    """
+    Расписание напоминаний о дедлайне: одна строка на (объявление, за сколько часов)
+
+    due_at - когда отправить (naive UTC), sent_at - когда отправлено. Строки создаются
+    при принятии объявления (ReminderCRUD.schedule) и читаются очередью напоминаний
+    (bot/reminders.py), которая восстанавливается из этой таблицы при перезапуске.
+    """
+    __tablename__ = 'deadline_reminders'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    announcement_id = Column(Integer, ForeignKey('announcements.id', ondelete='CASCADE'), nullable=False)
+    hours_before = Column(Integer, nullable=False)  # 48, 24, 2
+
+    due_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    announcement = relationship("Announcement")
+
+    __table_args__ = (
+        UniqueConstraint('announcement_id', 'hours_before', name='uq_deadline_reminders_announcement_hours'),
+        Index('ix_deadline_reminders_sent_due', 'sent_at', 'due_at'),
+    )
+
+    def __repr__(self):
+        return f"<DeadlineReminder {self.announcement_id}:{self.hours_before}h at {self.due_at}>"
+
+
+class ArchivedAnnouncement(AnnouncementColumns, Base):
+    """
+    Архив объявлений: истекшие объявления, перенесенные из announcements
+
+    Переносятся пачками по расписанию (ArchiveCRUD.archive_expired), id сохраняется.
+    Рабочая таблица и ее индексы остаются небольшими; отчеты читают обе таблицы.
+    """
+    __tablename__ = 'announcements_archive'
+
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    # Отчеты фильтруют архив по дате создания и менеджеру
+    __table_args__ = (
+        Index('ix_announcements_archive_manager_created', 'manager_id', 'created_at'),
+        Index('ix_announcements_archive_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedAnnouncement {self.announcement_number} - {self.status}>"
+
+
+class ArchivedLot(LotColumns, Base):
+    """Лоты архивных объявлений"""
+    __tablename__ = 'lots_archive'
+
+    announcement_id = Column(Integer, ForeignKey('announcements_archive.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+
+
+class ArchivedManagerAction(ManagerActionColumns, Base):
+    """Действия менеджеров по архивным объявлениям"""
+    __tablename__ = 'manager_actions_archive'
+
+    announcement_id = Column(Integer, ForeignKey('announcements_archive.id'), nullable=False, index=True)
+
+
 class ParsingLog(Base):
     """Лог парсинга для отслеживания работы системы"""
     __tablename__ = 'parsing_logs'
@@ -124,16 +262,191 @@ class ParsingLog(Base):
         return f"<ParsingLog {self.started_at} - {self.status}>"
 
 
+class NotificationMessage(Base):
+    """Отправленные менеджерам сообщения об общих объявлениях (для редактирования на месте)"""
+    __tablename__ = 'notification_messages'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # Привязка к объявлению
+    announcement_id = Column(Integer, ForeignKey('announcements.id'), nullable=False, index=True)
+
+    # Куда отправлено
+    manager_id = Column(Integer, nullable=True)
+    telegram_id = Column(Integer, nullable=False)  # chat_id личного чата с менеджером
+    message_id = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<NotificationMessage {self.announcement_id} -> {self.telegram_id}:{self.message_id}>"
+
+
+class RenderedMessage(Base):
+    """Сохраненные отрендеренные сообщения об объявлениях (кэш, переживает перезапуск)"""
+    __tablename__ = 'rendered_messages'
+
+    announcement_id = Column(Integer, primary_key=True)
+    variant = Column(String(50), primary_key=True)  # manager, admin, details, summary, coordinator
+
+    version = Column(String(50), nullable=False)  # updated_at объявления на момент рендера
+    body = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RenderedMessage {self.announcement_id}:{self.variant}>"
+
+
+class SheetOutbox(Base):
+    """
+    Очередь выгрузки объявлений в Google Sheets (outbox)
+
+    Строка пишется в той же транзакции, что и изменение объявления; одна строка на
+    объявление, повторные изменения только сдвигают changed_at. Выгружает фоновый
+    воркер (utils/sheet_outbox.py), строка удаляется после успешной записи в лист.
+    """
+    __tablename__ = 'sheet_outbox'
+
+    announcement_id = Column(Integer, primary_key=True)
+
+    created_at = Column(DateTime, nullable=False)  # Первое невыгруженное изменение (для лага)
+    changed_at = Column(DateTime, nullable=False)  # Последнее изменение
+
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, index=True)
+    last_error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<SheetOutbox {self.announcement_id} attempts={self.attempts}>"
+
+
+class SheetRow(Base):
+    """Индекс строк Google Sheets: номер объявления -> номер строки листа (utils/sheet_index.py)"""
+    __tablename__ = 'sheet_rows'
+
+    worksheet = Column(String(200), primary_key=True)  # Название листа
+    announcement_number = Column(String(100), primary_key=True)
+
+    row = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<SheetRow {self.worksheet}:{self.announcement_number} -> {self.row}>"
+
+
+class StatusCounter(Base):
+    """
+    Счетчики объявлений по менеджеру, статусу и признаку обработки
+
+    Проекция таблицы announcements для дашборда; обновляется в той же транзакции,
+    что и объявление (DashboardCounterCRUD). manager_id = 0 - объявление не назначено.
+    """
+    __tablename__ = 'status_counters'
+
+    manager_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    is_processed = Column(Boolean, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StatusCounter {self.manager_id}:{self.status}:{self.is_processed} = {self.count}>"
+
+
+class DailyCounter(Base):
+    """
+    Число новых объявлений по дню создания (UTC) и менеджеру
+
+    Проекция для "новых за сегодня" на дашборде; пересчитывается по created_at
+    (DashboardCounterCRUD.rebuild), поэтому других событий здесь нет.
+    """
+    __tablename__ = 'daily_counters'
+
+    day = Column(Date, primary_key=True)
+    manager_id = Column(Integer, primary_key=True)  # 0 - объявление не назначено
+
+    created = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyCounter {self.day}:{self.manager_id}>"
+
+
 def init_database():
-    """Инициализация базы данных - создание всех таблиц"""
+    """Инициализация базы данных - создание таблиц и применение миграций"""
+    from database.migrations.runner import run_migrations
+
     Base.metadata.create_all(engine)
+    run_migrations(engine)
     print("✅ База данных инициализирована успешно!")
     print(f"📊 Созданы таблицы: {', '.join(Base.metadata.tables.keys())}")
 
 
-def get_session():
+def get_session(**kwargs):
     """Получить сессию для работы с БД"""
-    return SessionLocal()
+    return SessionLocal(**kwargs)
+
+
+def use_session(session=None):
+    """
+    Получить сессию для CRUD-операции
+
+    Если передана сессия единицы работы (одна на обновление бота), используется она,
+    иначе открывается своя короткая сессия, как раньше.
+
+    Returns:
+        (session, owned) - сессия и признак того, что ее нужно закрыть после операции
+    """
+    if session is not None:
+        return session, False
+    return get_session(), True
+
+
+def release_session(session, owned: bool):
+    """Закрыть сессию, если она была открыта самой операцией"""
+    if owned:
+        session.close()
+
+
+def commit_session(session, owned: bool, *refresh):
+    """
+    Зафиксировать изменения операции
+
+    Своя сессия - commit и перечитывание объектов. Общая сессия - только flush:
+    фиксирует тот, кто открыл единицу работы.
+    """
+    if owned:
+        session.commit()
+        for instance in refresh:
+            session.refresh(instance)
+    else:
+        session.flush()
+
+
+def after_commit(session, owned: bool, callback):
+    """
+    Выполнить действие после фиксации транзакции (синхронизация, сброс кэшей)
+
+    Для общей сессии действие откладывается до run_after_commit().
+    """
+    if owned:
+        callback()
+    else:
+        session.info.setdefault('after_commit', []).append(callback)
+
+
+def commit_unit_of_work(session):
+    """Зафиксировать единицу работы и выполнить отложенные действия"""
+    session.commit()
+    run_after_commit(session)
+
+
+def run_after_commit(session):
+    """Выполнить действия, отложенные до фиксации транзакции общей сессии"""
+    for callback in session.info.pop('after_commit', []):
+        try:
+            callback()
+        except Exception as e:
+            print(f"❌ Ошибка действия после фиксации транзакции: {e}")
 
 
 if __name__ == '__main__':
@@ -3,19 +3,26 @@
 """
 import asyncio
 import sys
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from config import TELEGRAM_BOT_TOKEN, PARSE_INTERVAL_HOURS, ALL_KEYWORDS, MANAGERS
-from database.models import init_database, get_session, Announcement
-from database.crud import AnnouncementCRUD, ParsingLogCRUD
+from config import TELEGRAM_BOT_TOKEN, PARSE_INTERVAL_HOURS, ALL_KEYWORDS, GOOGLE_SHEETS_ENABLED
+from database.models import init_database
+from database.crud import ArchiveCRUD, ARCHIVE_AFTER_DAYS
+from database.async_crud import AsyncAnnouncementCRUD, AsyncParsingLogCRUD, get_async_engine
 from parsers.goszakup import GoszakupParser
 from parsers.matcher import ManagerMatcher
 from bot.handlers import get_dispatcher
-from bot.notifier import TelegramNotifier
+from bot.notifier import TelegramNotifier, DIGEST_THRESHOLD
+from bot.reminders import ReminderScheduler
+from bot.webhook import WebhookServer, WEBHOOK_URL
+from bot.middlewares import install_bot_metrics
 from utils.logger import logger
+from utils.sheet_outbox import SheetOutboxWorker
+from utils.sheet_edits import SheetEditImporter, SHEETS_EDIT_CHECK_INTERVAL
 
 
 class GoszakupMonitoringSystem:
@@ -23,18 +30,25 @@ class GoszakupMonitoringSystem:
 
     def __init__(self):
         self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        install_bot_metrics(self.bot)
         self.dp = get_dispatcher()
         self.parser = GoszakupParser()
         self.matcher = ManagerMatcher()
         self.notifier = TelegramNotifier()
         self.scheduler = AsyncIOScheduler()
+        self.reminders = ReminderScheduler(self.notifier)
+        self.sheet_edits = SheetEditImporter()
+        self.sheet_outbox = SheetOutboxWorker(importer=self.sheet_edits)
 
     async def parse_and_notify(self):
         """Парсинг лотов и отправка уведомлений"""
         logger.info("🚀 Запуск парсинга...")
 
         # Создать лог парсинга
-        log = ParsingLogCRUD.create()
+        log = await AsyncParsingLogCRUD.create()
+
+        # Уведомления к отправке: telegram_id -> список объявлений
+        outgoing = defaultdict(list)
 
         try:
             # Парсинг объявлений (проверяем только за последние сутки)
@@ -53,7 +67,7 @@ class GoszakupMonitoringSystem:
                 logger.info(f"📦 Объявление {announcement_data['announcement_number']}: {lot_count} лот(ов)")
 
                 # Проверить на дубликат (не выводим в лог каждый дубликат)
-                if AnnouncementCRUD.exists(announcement_data['announcement_number']):
+                if await AsyncAnnouncementCRUD.exists(announcement_data['announcement_number']):
                     duplicates += 1
                     continue
 
@@ -79,24 +93,24 @@ class GoszakupMonitoringSystem:
                     announcement_data['manager_name'] = manager_info['manager_name']
 
                 # Сохранить в БД
-                announcement = AnnouncementCRUD.create(announcement_data)
+                announcement = await AsyncAnnouncementCRUD.create(announcement_data)
                 new_added += 1
 
                 logger.info(f"✅ Новое объявление добавлено: {announcement.announcement_number}")
 
-                # Отправить уведомления всем подходящим менеджерам
+                # Отложить уведомления до конца прохода, чтобы сгруппировать их по менеджерам
                 for manager_info in managers_info:
-                    await self.notifier.send_to_manager(
-                        telegram_id=manager_info['telegram_id'],
-                        announcement=announcement_data,
-                        announcement_db_id=announcement.id,
-                        is_shared=is_shared
-                    )
-                    # Небольшая задержка между уведомлениями
-                    await asyncio.sleep(1)
+                    outgoing[manager_info['telegram_id']].append({
+                        'announcement': announcement_data,
+                        'announcement_db_id': announcement.id,
+                        'is_shared': is_shared
+                    })
+
+            # Отправить уведомления: отдельными сообщениями или дайджестом
+            await self.deliver_notifications(outgoing)
 
             # Обновить лог парсинга
-            ParsingLogCRUD.update(
+            await AsyncParsingLogCRUD.update(
                 log.id,
                 finished_at=datetime.now(timezone.utc),
                 total_found=total_found,
@@ -110,41 +124,73 @@ class GoszakupMonitoringSystem:
         except Exception as e:
             logger.error(f"❌ Ошибка при парсинге: {e}")
 
+            # Уже сохраненные объявления не должны остаться без уведомлений
+            await self.deliver_notifications(outgoing)
+
             # Обновить лог с ошибкой
-            ParsingLogCRUD.update(
+            await AsyncParsingLogCRUD.update(
                 log.id,
                 finished_at=datetime.now(timezone.utc),
                 status='failed',
                 error_message=str(e)
             )
 
+    async def deliver_notifications(self, outgoing: dict):
+        """
+        Отправить накопленные за проход уведомления менеджерам
+
+        Если менеджеру пришло DIGEST_THRESHOLD или больше объявлений, они отправляются
+        одним дайджестом (с разбивкой на страницы), иначе - отдельными сообщениями.
+        Доставленные объявления отмечаются notification_sent, чтобы повторная отправка
+        (retry_failed_notifications) не присылала их снова по одному.
+
+        Args:
+            outgoing: Словарь telegram_id -> список элементов
+                      (announcement, announcement_db_id, is_shared)
+        """
+        # Словарь опустошается по мере отправки, чтобы повторный вызов не дублировал сообщения
+        while outgoing:
+            telegram_id, items = outgoing.popitem()
+
+            if DIGEST_THRESHOLD and len(items) >= DIGEST_THRESHOLD:
+                logger.info(f"🗂 Дайджест для {telegram_id}: {len(items)} объявлений")
+                delivered = await self.notifier.send_digest_to_manager(telegram_id, items)
+                await AsyncAnnouncementCRUD.mark_notified(delivered)
+                await asyncio.sleep(1)
+                continue
+
+            delivered = []
+            for item in items:
+                if await self.notifier.send_to_manager(
+                    telegram_id=telegram_id,
+                    announcement=item['announcement'],
+                    announcement_db_id=item['announcement_db_id'],
+                    is_shared=item['is_shared']
+                ):
+                    delivered.append(item['announcement_db_id'])
+                # Небольшая задержка между уведомлениями
+                await asyncio.sleep(1)
+            await AsyncAnnouncementCRUD.mark_notified(delivered)
+
     async def retry_failed_notifications(self):
         """Повторная отправка неудавшихся уведомлений"""
         logger.info("🔄 Проверка неотправленных уведомлений...")
 
-        session = get_session()
         try:
             # Найти объявления pending, где уведомление не отправлено
             # и прошло >30 минут с момента создания
-            cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=30)
+            cutoff_time = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=30)
 
-            announcements = session.query(Announcement).filter(
-                Announcement.status == 'pending',
-                Announcement.notification_sent == False,
-                Announcement.created_at < cutoff_time
-            ).limit(10).all()  # Макс 10 за раз
+            announcements = await AsyncAnnouncementCRUD.get_unnotified(cutoff_time, limit=10)  # Макс 10 за раз
 
             if not announcements:
                 logger.info("✓ Все уведомления отправлены")
                 return
 
             retries_sent = 0
-            max_attempts = 5
+            notified = []
 
             for announcement in announcements:
-                # Проверить количество попыток (если есть поле)
-                # Пока используем простую логику: если прошло 30 мин - попробовать еще раз
-
                 # Найти менеджеров для этого объявления
                 managers_info = self.matcher.find_managers({
                     'region': announcement.region,
@@ -154,7 +200,7 @@ class GoszakupMonitoringSystem:
                 if not managers_info:
                     logger.warning(f"⚠️ Менеджеры не найдены для повторной отправки: {announcement.announcement_number}")
                     # Пометить как отправленное чтобы не зависло
-                    announcement.notification_sent = True
+                    notified.append(announcement.id)
                     continue
 
                 # Определить is_shared
@@ -173,9 +219,11 @@ class GoszakupMonitoringSystem:
                             'legal_address': announcement.legal_address,
                             'region': announcement.region,
                             'lots': announcement.lots,
+                            'lot_name': announcement.lot_name,
                             'keyword_matched': announcement.keyword_matched,
                             'application_deadline': announcement.application_deadline,
-                            'procurement_method': announcement.procurement_method
+                            'procurement_method': announcement.procurement_method,
+                            'updated_at': announcement.updated_at
                         },
                         announcement_db_id=announcement.id,
                         is_shared=is_shared
@@ -185,110 +233,41 @@ class GoszakupMonitoringSystem:
                     await asyncio.sleep(1)
 
                 if success:
-                    announcement.notification_sent = True
+                    notified.append(announcement.id)
                     retries_sent += 1
                     logger.info(f"✓ Повторная отправка успешна: {announcement.announcement_number}")
 
-            session.commit()
+            await AsyncAnnouncementCRUD.mark_notified(notified)
             logger.info(f"✅ Повторно отправлено уведомлений: {retries_sent}")
 
         except Exception as e:
             logger.error(f"❌ Ошибка при повторной отправке: {e}")
-            session.rollback()
-        finally:
-            session.close()
 
     async def check_deadlines(self):
-        """Проверка дедлайнов и отправка напоминаний"""
-        logger.info("⏰ Проверка дедлайнов...")
-
-        # Текущее время (UTC)
-        now = datetime.now(timezone.utc)
-
-        # Время Астаны (UTC+5)
-        kazakhstan_time = now + timedelta(hours=5)
-        current_hour = kazakhstan_time.hour
+        """
+        Пометить истекшими объявления с прошедшим сроком
 
-        # Не отправлять уведомления ночью (с 23:00 до 8:00)
-        if current_hour >= 23 or current_hour < 8:
-            logger.info(f"⏸️ Ночное время ({current_hour:02d}:00 по Астане), напоминания не отправляются")
-            return
+        Напоминания о дедлайнах отправляет очередь напоминаний (bot/reminders.py) точно
+        в срок; здесь только смена статуса, поэтому задача работает и в тихие часы.
+        """
+        logger.info("⏰ Проверка дедлайнов...")
 
-        session = get_session()
+        now_naive = datetime.now(timezone.utc).replace(tzinfo=None)
         try:
-            # 1. Автоматическая очистка истекших объявлений
-            now_naive = now.replace(tzinfo=None)
-            expired_count = session.query(Announcement).filter(
-                Announcement.application_deadline < now_naive,
-                Announcement.status != 'expired'
-            ).update({
-                'status': 'expired',
-                'expired_at': now_naive
-            }, synchronize_session=False)
-
+            expired_count = await AsyncAnnouncementCRUD.expire_overdue(now_naive)
             if expired_count > 0:
-                session.commit()
                 logger.info(f"🗑️ Помечено как истекшие: {expired_count} объявлений")
-
-            # 2. Получить все принятые объявления с актуальным дедлайном
-            announcements = session.query(Announcement).filter(
-                Announcement.status == 'accepted',
-                Announcement.application_deadline.isnot(None),
-                Announcement.application_deadline >= now_naive,
-                Announcement.manager_id.isnot(None)
-            ).all()
-
-            reminders_sent = 0
-
-            for announcement in announcements:
-                # Вычислить время до дедлайна
-                time_left = announcement.application_deadline - now_naive
-                hours_left = time_left.total_seconds() / 3600
-
-                # Получить telegram_id менеджера
-                manager_id = announcement.manager_id
-                if manager_id not in MANAGERS:
-                    continue
-
-                telegram_id = MANAGERS[manager_id]['telegram_id']
-                if not telegram_id:
-                    continue
-
-                # Определить, какое напоминание отправить
-                reminder_sent = False
-
-                # Напоминание за 48 часов (±30 минут)
-                if 47.5 <= hours_left <= 48.5 and not announcement.reminder_48h_sent:
-                    await self.notifier.send_deadline_reminder(telegram_id, announcement, 48)
-                    announcement.reminder_48h_sent = True
-                    reminder_sent = True
-                    reminders_sent += 1
-
-                # Напоминание за 24 часа (±30 минут)
-                elif 23.5 <= hours_left <= 24.5 and not announcement.reminder_24h_sent:
-                    await self.notifier.send_deadline_reminder(telegram_id, announcement, 24)
-                    announcement.reminder_24h_sent = True
-                    reminder_sent = True
-                    reminders_sent += 1
-
-                # Напоминание за 2 часа (±15 минут)
-                elif 1.75 <= hours_left <= 2.25 and not announcement.reminder_2h_sent:
-                    await self.notifier.send_deadline_reminder(telegram_id, announcement, 2)
-                    announcement.reminder_2h_sent = True
-                    reminder_sent = True
-                    reminders_sent += 1
-
-                if reminder_sent:
-                    session.commit()
-                    await asyncio.sleep(1)  # Задержка между уведомлениями
-
-            logger.info(f"✅ Проверка дедлайнов завершена. Отправлено напоминаний: {reminders_sent}")
-
         except Exception as e:
             logger.error(f"❌ Ошибка при проверке дедлайнов: {e}")
-            session.rollback()
-        finally:
-            session.close()
+
+    async def archive_expired(self):
+        """Перенос давно истекших объявлений в архив (пачками, каждая - своя транзакция)"""
+        try:
+            archived = await asyncio.to_thread(ArchiveCRUD.archive_expired)
+            if archived:
+                logger.info(f"📦 Перенесено в архив: {archived} объявлений (истекли больше {ARCHIVE_AFTER_DAYS} дн. назад)")
+        except Exception as e:
+            logger.error(f"❌ Ошибка переноса объявлений в архив: {e}")
 
     async def start_parsing_schedule(self):
         """Запустить планировщик парсинга и проверки дедлайнов"""
@@ -301,7 +280,7 @@ class GoszakupMonitoringSystem:
             replace_existing=True
         )
 
-        # Добавить задачу проверки дедлайнов (каждый час)
+        # Добавить задачу пометки истекших объявлений (каждый час)
         self.scheduler.add_job(
             self.check_deadlines,
             'interval',
@@ -319,19 +298,46 @@ class GoszakupMonitoringSystem:
             replace_existing=True
         )
 
+        # Добавить задачу переноса истекших объявлений в архив (ежедневно ночью по Астане)
+        self.scheduler.add_job(
+            self.archive_expired,
+            'cron',
+            hour=21,  # 02:00 по Астане (UTC+5)
+            minute=0,
+            timezone='UTC',
+            id='archive_expired',
+            replace_existing=True
+        )
+
+        # Перенос ручных правок из Google Sheets в БД
+        if GOOGLE_SHEETS_ENABLED and SHEETS_EDIT_CHECK_INTERVAL > 0:
+            self.scheduler.add_job(
+                self.sheet_edits.check,
+                'interval',
+                minutes=SHEETS_EDIT_CHECK_INTERVAL,
+                id='sheet_edits',
+                replace_existing=True
+            )
+
+        # Фоновая выгрузка очереди изменений в Google Sheets
+        await self.sheet_outbox.start()
+
         # Запустить парсинг сразу при старте
         await self.parse_and_notify()
 
         # Запустить проверку дедлайнов сразу при старте
         await self.check_deadlines()
 
+        # Восстановить расписание напоминаний из БД и запустить очередь
+        await self.reminders.start()
+
         # Запустить проверку неотправленных уведомлений сразу при старте
         await self.retry_failed_notifications()
 
         # Запустить планировщик
         self.scheduler.start()
 
-        logger.info(f"⏰ Планировщик запущен. Парсинг: каждые {PARSE_INTERVAL_HOURS}ч, дедлайны: каждый час, повторные уведомления: каждые 30мин")
+        logger.info(f"⏰ Планировщик запущен. Парсинг: каждые {PARSE_INTERVAL_HOURS}ч, истечение сроков: каждый час, напоминания: точно в срок, повторные уведомления: каждые 30мин, архив: ежедневно")
 
     async def start(self):
         """Запуск системы"""
@@ -350,7 +356,13 @@ class GoszakupMonitoringSystem:
         # Запуск Telegram бота
         logger.info("🤖 Запуск Telegram бота...")
         try:
-            await self.dp.start_polling(self.bot, skip_updates=True)
+            if WEBHOOK_URL:
+                # Режим webhook: обновления приходят на встроенный HTTP-сервер
+                await WebhookServer(self.dp, self.bot).run(WEBHOOK_URL)
+            else:
+                # Снять webhook, если бот раньше работал в режиме webhook
+                await self.bot.delete_webhook(drop_pending_updates=True)
+                await self.dp.start_polling(self.bot, skip_updates=True)
         except Exception as e:
             logger.error(f"❌ Ошибка при запуске бота: {e}")
         finally:
@@ -360,8 +372,11 @@ class GoszakupMonitoringSystem:
         """Очистка ресурсов при завершении"""
         logger.info("🧹 Очистка ресурсов...")
         self.scheduler.shutdown()
+        await self.reminders.stop()
+        await self.sheet_outbox.stop()
         await self.notifier.close()
         await self.bot.session.close()
+        await get_async_engine().dispose()
 
 
 def main():
@@ -276,6 +276,7 @@ class GoszakupParser:
                         'lot_number': lot.get('lotNumber'),
                         'lot_name': lot_name or 'N/A',
                         'lot_description': lot_desc,
+                        'lot_amount': lot.get('amount'),
                         'keyword_matched': matched_keyword,
                         'application_deadline': application_deadline,
                         'procurement_method': procurement_method
@@ -381,7 +382,8 @@ class GoszakupParser:
                     'number': lot.get('lot_number'),
                     'name': lot['lot_name'],
                     'description': lot['lot_description'],
-                    'keyword': lot['keyword_matched']
+                    'keyword': lot['keyword_matched'],
+                    'amount': lot.get('lot_amount')
                 }
                 for lot in lot_list
             ]
@@ -1,17 +1,60 @@
 """
 Модуль для генерации Excel отчетов
+
+Отчет пишется потоком: строки читаются из БД пачками (AnnouncementCRUD.iter_for_report),
+книга открыта в режиме write_only (строки сразу уходят во временный файл), оформление -
+общие именованные стили книги. Память не растет с числом строк, поэтому отчет за год
+строится так же, как за неделю.
 """
 import sys
 import os
 from datetime import datetime, timedelta
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.crud import AnnouncementCRUD
-from typing import Optional
+from typing import Optional, List
+
+# В режиме write_only ширина столбцов записывается до строк, поэтому она считается
+# по самым длинным значениям первых REPORT_WIDTH_SAMPLE строк (остальные не ждут в памяти)
+REPORT_WIDTH_SAMPLE = int(os.getenv('REPORT_WIDTH_SAMPLE', '1000'))
+MAX_COLUMN_WIDTH = 50
+
+# Заголовки
+REPORT_HEADERS = [
+    'Дата создания',
+    'Номер объявления',
+    'Организация',
+    'Юридический адрес',
+    'Регион',
+    'Лот',
+    'Ключевое слово',
+    'Менеджер',
+    'Статус',
+    'Причина отказа',
+    'Дата ответа',
+    'Детали участия',
+    'Ссылка'
+]
+
+# Поля объявления, которые читаются из БД для отчета
+REPORT_FIELDS = [
+    'created_at', 'announcement_number', 'organization_name', 'legal_address', 'region', 'lot_name',
+    'keyword_matched', 'manager_name', 'status', 'rejection_reason', 'response_at',
+    'participation_details', 'announcement_url'
+]
+
+# Статус: (текст, именованный стиль ячейки, цвет заливки)
+STATUS_STYLES = {
+    'accepted': ('Принято', 'report_accepted', 'C6EFCE'),
+    'rejected': ('Отклонено', 'report_rejected', 'FFC7CE'),
+    'pending': ('Ожидает', 'report_pending', 'FFEB9C')
+}
 
 
 class ExcelReportGenerator:
@@ -40,6 +83,64 @@ class ExcelReportGenerator:
             return utc_dt + timedelta(hours=5)
         return None
 
+    @staticmethod
+    def _add_styles(wb: Workbook):
+        """Именованные стили отчета: одна запись на книгу вместо стиля на каждую ячейку"""
+        header = NamedStyle(name='report_header')
+        header.font = Font(bold=True, color="FFFFFF")
+        header.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        header.alignment = Alignment(horizontal="center", vertical="center")
+        wb.add_named_style(header)
+
+        for _, style_name, color in STATUS_STYLES.values():
+            style = NamedStyle(name=style_name)
+            style.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            wb.add_named_style(style)
+
+    def _row_values(self, announcement) -> List:
+        """Значения строки отчета (статус - ключ STATUS_STYLES, текст подставляется при записи)"""
+        # Конвертируем UTC время в местное время Казахстана
+        created_at_local = self._utc_to_local(announcement.created_at)
+        response_at_local = self._utc_to_local(announcement.response_at)
+
+        return [
+            created_at_local.strftime('%Y-%m-%d %H:%M') if created_at_local else '',
+            announcement.announcement_number,
+            announcement.organization_name,
+            announcement.legal_address,
+            announcement.region,
+            announcement.lot_name,
+            announcement.keyword_matched,
+            announcement.manager_name,
+            announcement.status if announcement.status in STATUS_STYLES else 'pending',
+            announcement.rejection_reason or '-',
+            response_at_local.strftime('%Y-%m-%d %H:%M') if response_at_local else '-',
+            announcement.participation_details or '-',
+            announcement.announcement_url
+        ]
+
+    @staticmethod
+    def _row_cells(ws, values: List) -> List:
+        """Строка для ws.append: статус - ячейка с цветовой индикацией"""
+        status_column = REPORT_HEADERS.index('Статус')
+        label, style_name, _ = STATUS_STYLES[values[status_column]]
+        status_cell = WriteOnlyCell(ws, value=label)
+        status_cell.style = style_name
+        return values[:status_column] + [status_cell] + values[status_column + 1:]
+
+    @staticmethod
+    def _column_widths(rows: List[List]) -> List[int]:
+        """Ширина столбцов по самым длинным значениям (вместе с заголовком), не больше MAX_COLUMN_WIDTH"""
+        lengths = [len(header) for header in REPORT_HEADERS]
+        status_column = REPORT_HEADERS.index('Статус')
+        for values in rows:
+            for col, value in enumerate(values):
+                if col == status_column:
+                    value = STATUS_STYLES[value][0]
+                if value:
+                    lengths[col] = max(lengths[col], len(str(value)))
+        return [min(length + 2, MAX_COLUMN_WIDTH) for length in lengths]
+
     def generate_report(
         self,
         start_date: Optional[datetime] = None,
@@ -57,96 +158,37 @@ class ExcelReportGenerator:
         Returns:
             Путь к созданному файлу
         """
-        # Получить данные
-        announcements = AnnouncementCRUD.get_all_for_report(
+        # Данные потоком (вместе с архивом: отчет может охватывать давно истекшие объявления)
+        announcements = AnnouncementCRUD.iter_for_report(
             start_date=start_date,
             end_date=end_date,
-            manager_id=manager_id
+            manager_id=manager_id,
+            include_archive=True,
+            columns=REPORT_FIELDS
         )
+        rows = (self._row_values(announcement) for announcement in announcements)
 
-        # Создать workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Отчет по объявлениям"
-
-        # Заголовки
-        headers = [
-            'Дата создания',
-            'Номер объявления',
-            'Организация',
-            'Юридический адрес',
-            'Регион',
-            'Лот',
-            'Ключевое слово',
-            'Менеджер',
-            'Статус',
-            'Причина отказа',
-            'Дата ответа',
-            'Детали участия',
-            'Ссылка'
-        ]
+        # Создать workbook (строки пишутся сразу во временный файл)
+        wb = Workbook(write_only=True)
+        self._add_styles(wb)
+        ws = wb.create_sheet("Отчет по объявлениям")
 
-        # Стиль заголовков
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
+        # Ширина столбцов - по первым строкам, до записи данных
+        sample = list(islice(rows, REPORT_WIDTH_SAMPLE))
+        for col, width in enumerate(self._column_widths(sample), start=1):
+            ws.column_dimensions[get_column_letter(col)].width = width
 
         # Записать заголовки
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
+        header_cells = []
+        for header in REPORT_HEADERS:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = 'report_header'
+            header_cells.append(cell)
+        ws.append(header_cells)
 
         # Записать данные
-        for row_idx, announcement in enumerate(announcements, start=2):
-            # Конвертируем UTC время в местное время Казахстана
-            created_at_local = self._utc_to_local(announcement.created_at)
-            response_at_local = self._utc_to_local(announcement.response_at)
-
-            ws.cell(row=row_idx, column=1, value=created_at_local.strftime('%Y-%m-%d %H:%M') if created_at_local else '')
-            ws.cell(row=row_idx, column=2, value=announcement.announcement_number)
-            ws.cell(row=row_idx, column=3, value=announcement.organization_name)
-            ws.cell(row=row_idx, column=4, value=announcement.legal_address)
-            ws.cell(row=row_idx, column=5, value=announcement.region)
-            ws.cell(row=row_idx, column=6, value=announcement.lot_name)
-            ws.cell(row=row_idx, column=7, value=announcement.keyword_matched)
-            ws.cell(row=row_idx, column=8, value=announcement.manager_name)
-
-            # Статус с цветовой индикацией
-            status_cell = ws.cell(row=row_idx, column=9)
-            if announcement.status == 'accepted':
-                status_cell.value = 'Принято'
-                status_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            elif announcement.status == 'rejected':
-                status_cell.value = 'Отклонено'
-                status_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            else:
-                status_cell.value = 'Ожидает'
-                status_cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-
-            ws.cell(row=row_idx, column=10, value=announcement.rejection_reason or '-')
-
-            if response_at_local:
-                ws.cell(row=row_idx, column=11, value=response_at_local.strftime('%Y-%m-%d %H:%M'))
-            else:
-                ws.cell(row=row_idx, column=11, value='-')
-
-            ws.cell(row=row_idx, column=12, value=announcement.participation_details or '-')
-            ws.cell(row=row_idx, column=13, value=announcement.announcement_url)
-
-        # Автоподбор ширины столбцов
-        for col in range(1, len(headers) + 1):
-            column_letter = get_column_letter(col)
-            max_length = 0
-
-            for row in range(1, ws.max_row + 1):
-                cell = ws[f"{column_letter}{row}"]
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-
-            adjusted_width = min(max_length + 2, 50)  # Максимум 50
-            ws.column_dimensions[column_letter].width = adjusted_width
+        for values in chain(sample, rows):
+            ws.append(self._row_cells(ws, values))
 
         # Сохранить файл
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
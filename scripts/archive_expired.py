@@ -0,0 +1,32 @@
+"""
+Перенос истекших объявлений в архив (announcements_archive, lots_archive, manager_actions_archive)
+
+То же делает ежедневная задача планировщика; скрипт - для ручного запуска.
+
+Примеры:
+    python scripts/archive_expired.py                  # истекшие больше ARCHIVE_AFTER_DAYS дней назад
+    python scripts/archive_expired.py --days 90 --batch-size 1000
+"""
+import argparse
+import sys
+import os
+# Добавить корень проекта в sys.path для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.crud import ArchiveCRUD, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перенос истекших объявлений в архив')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f'Через сколько дней после истечения переносить (по умолчанию {ARCHIVE_AFTER_DAYS})')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                        help=f'Объявлений в одной транзакции (по умолчанию {ARCHIVE_BATCH_SIZE})')
+    args = parser.parse_args()
+
+    archived = ArchiveCRUD.archive_expired(older_than_days=args.days, batch_size=args.batch_size)
+    print(f"📦 Перенесено в архив: {archived}")
+
+
+if __name__ == '__main__':
+    main()
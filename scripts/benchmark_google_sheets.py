@@ -0,0 +1,157 @@
+"""
+Бенчмарк синхронизации с Google Sheets на имитации таблицы (utils/fake_sheets.py)
+
+Считает вызовы API на одно объявление и время для сценариев:
+    add        - новые объявления пачками write_rows (как выгружает sheet_outbox)
+    update     - изменение статуса уже записанных объявлений пачками write_rows
+    resync     - полная сверка reconcile (часть строк изменена)
+    per-row    - старый путь add_announcement по одному объявлению (для сравнения)
+
+Задержка вызова имитирует сеть; сеть и учетные данные не нужны.
+
+Примеры:
+    python scripts/benchmark_google_sheets.py
+    python scripts/benchmark_google_sheets.py --rows 10000 --batch 100 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+# Добавить корень проекта в sys.path для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fake_sheets import FakeSheetsBackend, FakeSpreadsheet, create_fake_manager
+
+# Сколько объявлений гонять старым путем по одному (он медленный)
+PER_ROW_LIMIT = 200
+
+
+def _make_announcements(count: int, start: int = 0) -> list:
+    """Объявления с полями, которые попадают в строку листа"""
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(
+            announcement_number=f"BENCH-{index}",
+            announcement_url=f"https://goszakup.gov.kz/ru/announce/index/{index}",
+            organization_name=f"Организация {index % 97}",
+            legal_address='г. Алматы',
+            lots=[{'number': f"{index}-1", 'name': 'Поставка оборудования'}],
+            lot_name=None,
+            keyword_matched='оборудование',
+            manager_name=f"Менеджер {index % 4 + 1}",
+            status='pending',
+            rejection_reason=None,
+            participation_details=None,
+            created_at=now - timedelta(minutes=index),
+            response_at=None,
+            application_deadline=now + timedelta(days=index % 30)
+        )
+        for index in range(start, start + count)
+    ]
+
+
+def _rows(manager, announcements: list) -> dict:
+    return {
+        item.announcement_number: (manager._announcement_to_row(item), item.status)
+        for item in announcements
+    }
+
+
+def _measure(backend: FakeSheetsBackend, name: str, count: int, action) -> dict:
+    backend.reset()
+    started = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - started
+    return {
+        'scenario': name,
+        'announcements': count,
+        'api_calls': backend.total_calls,
+        'calls_per_announcement': round(backend.total_calls / count, 3) if count else 0,
+        'wall_time_s': round(elapsed, 3),
+        'calls': dict(backend.calls)
+    }
+
+
+def run_benchmark(rows: int = 1000, batch: int = 100, latency: float = 0.0, changed: float = 0.1,
+                  per_row: int = PER_ROW_LIMIT, sharding: str = 'none') -> list:
+    """
+    Запустить сценарии на одной имитированной таблице
+
+    Args:
+        rows: Сколько объявлений записать
+        batch: Размер пачки write_rows
+        latency: Задержка одного вызова API (секунды)
+        changed: Доля строк, измененных перед полной сверкой
+        per_row: Сколько объявлений записать старым путем по одному (0 - пропустить)
+        sharding: Режим разбиения на листы (none / month)
+
+    Returns:
+        Список результатов по сценариям
+    """
+    backend = FakeSheetsBackend(latency=latency)
+    manager = create_fake_manager(FakeSpreadsheet(backend), sharding=sharding)
+    announcements = _make_announcements(rows)
+    results = []
+
+    def add():
+        for start in range(0, rows, batch):
+            manager.write_rows(_rows(manager, announcements[start:start + batch]))
+
+    results.append(_measure(backend, 'add', rows, add))
+
+    def update():
+        for item in announcements:
+            item.status = 'accepted'
+        for start in range(0, rows, batch):
+            manager.write_rows(_rows(manager, announcements[start:start + batch]))
+
+    results.append(_measure(backend, 'update', rows, update))
+
+    def resync():
+        step = max(1, int(1 / changed)) if changed else 0
+        if step:
+            for item in announcements[::step]:
+                item.participation_details = 'Цена: 100 000 тг'
+        manager.reconcile(announcements)
+
+    results.append(_measure(backend, 'resync', rows, resync))
+
+    if per_row:
+        extra = _make_announcements(per_row, start=rows)
+
+        def add_per_row():
+            for item in extra:
+                manager.add_announcement(item)
+
+        results.append(_measure(backend, 'per-row', per_row, add_per_row))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк синхронизации с Google Sheets на имитации')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка вызова API, секунды')
+    parser.add_argument('--changed', type=float, default=0.1, help='Доля строк, измененных перед сверкой')
+    parser.add_argument('--per-row', type=int, default=PER_ROW_LIMIT,
+                        help='Сколько объявлений записать старым путем по одному (0 - пропустить)')
+    parser.add_argument('--sharding', default='none', choices=('none', 'month'), help='Разбиение на листы')
+    args = parser.parse_args()
+
+    print(f"Строк: {args.rows}, пачка: {args.batch}, задержка: {args.latency} с, листы: {args.sharding}\n")
+    header = f"{'сценарий':<10}{'объявлений':>12}{'вызовов':>10}{'на объявл.':>12}{'время, с':>10}"
+    print(header)
+    print('-' * len(header))
+
+    for result in run_benchmark(args.rows, args.batch, args.latency, args.changed, args.per_row, args.sharding):
+        print(
+            f"{result['scenario']:<10}{result['announcements']:>12}{result['api_calls']:>10}"
+            f"{result['calls_per_announcement']:>12}{result['wall_time_s']:>10}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Бенчмарк конкурентного доступа к SQLite: читатели против пакетного писателя
+
+Моделирует парсинг (один поток массово вставляет объявления пачками) на фоне
+работы бота (несколько потоков читают списки объявлений менеджеров).
+Сравнивает профили подключения default и production (database/engine.py).
+
+Примеры:
+    python scripts/benchmark_sqlite.py
+    python scripts/benchmark_sqlite.py --readers 8 --rows 20000 --batch 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+# Добавить корень проекта в sys.path для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.engine import create_configured_engine
+from database.models import Base, Announcement
+
+
+def _make_rows(start: int, count: int) -> list:
+    """Сгенерировать объявления для вставки"""
+    now = datetime.utcnow()
+    return [
+        {
+            'announcement_number': f"BENCH-{index}",
+            'organization_name': f"Организация {index % 97}",
+            'region': 'г. Алматы',
+            'manager_id': index % 4 + 1,
+            'manager_name': f"Менеджер {index % 4 + 1}",
+            'status': ('pending', 'accepted', 'rejected')[index % 3],
+            'application_deadline': now + timedelta(days=index % 30),
+            'created_at': now - timedelta(minutes=index)
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def run_benchmark(profile: str, readers: int = 4, rows: int = 10000, batch: int = 500,
+                  seed_rows: int = 2000, db_path: str = None) -> dict:
+    """
+    Запустить бенчмарк для одного профиля
+
+    Args:
+        profile: default или production
+        readers: Количество потоков-читателей
+        rows: Сколько строк вставляет писатель
+        batch: Размер пачки (одна транзакция)
+        seed_rows: Сколько строк в таблице до начала
+        db_path: Путь к файлу БД (по умолчанию - временный файл)
+
+    Returns:
+        Словарь с результатами: задержки чтения, ошибки блокировки, скорость записи
+    """
+    own_dir = None
+    if db_path is None:
+        own_dir = tempfile.mkdtemp(prefix='goszakup-bench-')
+        db_path = os.path.join(own_dir, 'bench.db')
+
+    engine = create_configured_engine(f"sqlite:///{db_path}", profile=profile)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(Announcement.__table__.insert(), _make_rows(0, seed_rows))
+
+    writer_done = threading.Event()
+    latencies = []
+    read_errors = []
+    write_errors = []
+    lock = threading.Lock()
+
+    def reader(manager_id: int):
+        while not writer_done.is_set():
+            session = Session()
+            started = time.perf_counter()
+            try:
+                session.query(Announcement).filter(
+                    Announcement.manager_id == manager_id,
+                    Announcement.status == 'pending'
+                ).order_by(Announcement.created_at.desc()).limit(50).all()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except OperationalError as e:
+                with lock:
+                    read_errors.append(str(e.orig))
+            finally:
+                session.close()
+
+    def writer():
+        try:
+            for start in range(seed_rows, seed_rows + rows, batch):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(Announcement.__table__.insert(), _make_rows(start, batch))
+                except OperationalError as e:
+                    write_errors.append(str(e.orig))
+        finally:
+            writer_done.set()
+
+    threads = [threading.Thread(target=reader, args=(index % 4 + 1,)) for index in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    write_started = time.perf_counter()
+    writer()
+    write_time = time.perf_counter() - write_started
+
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+    if own_dir:
+        for name in os.listdir(own_dir):
+            os.remove(os.path.join(own_dir, name))
+        os.rmdir(own_dir)
+
+    latencies.sort()
+    return {
+        'profile': profile,
+        'reads': len(latencies),
+        'read_p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'read_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+        'read_max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        'read_errors': len(read_errors),
+        'write_errors': len(write_errors),
+        'write_rows_per_sec': round(rows / write_time) if write_time else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк SQLite: читатели против пакетного писателя')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--profiles', default='default,production')
+    args = parser.parse_args()
+
+    print(f"Читателей: {args.readers}, строк: {args.rows}, пачка: {args.batch}\n")
+    header = f"{'профиль':<12}{'чтений':>8}{'p50 мс':>9}{'p95 мс':>9}{'макс мс':>10}{'locked':>8}{'строк/с':>10}"
+    print(header)
+    print('-' * len(header))
+
+    for profile in args.profiles.split(','):
+        result = run_benchmark(profile.strip(), args.readers, args.rows, args.batch)
+        print(
+            f"{result['profile']:<12}{result['reads']:>8}{result['read_p50_ms']!s:>9}"
+            f"{result['read_p95_ms']!s:>9}{result['read_max_ms']!s:>10}"
+            f"{result['read_errors'] + result['write_errors']:>8}{result['write_rows_per_sec']!s:>10}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Проверка и пересчет счетчиков дашборда (status_counters, daily_counters)
+
+Примеры:
+    python scripts/rebuild_dashboard_counters.py --check   # только сверить с announcements
+    python scripts/rebuild_dashboard_counters.py           # пересчитать
+"""
+import argparse
+import sys
+import os
+# Добавить корень проекта в sys.path для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.crud import DashboardCounterCRUD
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка и пересчет счетчиков дашборда')
+    parser.add_argument('--check', action='store_true', help='Только проверить, без пересчета')
+    args = parser.parse_args()
+
+    mismatches = DashboardCounterCRUD.check()
+    if not mismatches:
+        print("✅ Счетчики совпадают с таблицей объявлений")
+    else:
+        print(f"⚠️ Расхождений: {len(mismatches)}")
+        for mismatch in mismatches:
+            print(f"   {mismatch['table']} {mismatch['key']}: "
+                  f"ожидается {mismatch['expected']}, сохранено {mismatch['actual']}")
+
+    if args.check:
+        sys.exit(1 if mismatches else 0)
+
+    result = DashboardCounterCRUD.rebuild()
+    print(f"🔁 Пересчитано: {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Отправка поддельного обновления Telegram на локальный webhook-сервер
+Используется для проверки режима webhook без Telegram и reverse proxy
+
+Примеры:
+    python scripts/send_fake_update.py --text /start --user-id 123456
+    python scripts/send_fake_update.py --callback accept_15 --user-id 123456
+    python scripts/send_fake_update.py --text /help --repeat 3   # проверка дедупликации
+"""
+import argparse
+import sys
+import os
+import time
+from urllib.parse import urlparse
+# Добавить корень проекта в sys.path для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from bot.webhook import WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, SECRET_HEADER
+
+
+def build_message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Обновление с текстовым сообщением от пользователя"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Test'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': 'Test'},
+            'from': user,
+            'text': text
+        }
+    }
+
+
+def build_callback_update(update_id: int, user_id: int, data: str) -> dict:
+    """Обновление с нажатием inline-кнопки"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': 'Test'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private', 'first_name': 'Test'},
+                'text': 'fake'
+            }
+        }
+    }
+
+
+def send_fake_update():
+    """Собрать обновление из аргументов и отправить его на webhook"""
+    parser = argparse.ArgumentParser(description='Отправить поддельное обновление на webhook бота')
+    parser.add_argument('--url', default=f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    parser.add_argument('--secret', default=WEBHOOK_SECRET)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--update-id', type=int, default=int(time.time()))
+    parser.add_argument('--text', help='Текст сообщения (например /start)')
+    parser.add_argument('--callback', help='callback_data нажатой кнопки')
+    parser.add_argument('--repeat', type=int, default=1, help='Повторить то же обновление N раз')
+    args = parser.parse_args()
+
+    if args.callback:
+        update = build_callback_update(args.update_id, args.user_id, args.callback)
+    else:
+        update = build_message_update(args.update_id, args.user_id, args.text or '/start')
+
+    headers = {SECRET_HEADER: args.secret} if args.secret else {}
+
+    for attempt in range(1, args.repeat + 1):
+        response = requests.post(args.url, json=update, headers=headers, timeout=10)
+        print(f"#{attempt} update_id={args.update_id} -> HTTP {response.status_code}")
+
+    parsed = urlparse(args.url)
+    try:
+        print(requests.get(f"{parsed.scheme}://{parsed.netloc}/health", timeout=5).json())
+    except Exception as e:
+        print(f"⚠️ /health недоступен: {e}")
+
+
+if __name__ == '__main__':
+    send_fake_update()
@@ -1,7 +1,15 @@
 """
 Скрипт для ручной синхронизации принятых объявлений с Google Sheets
 Используется для восстановления синхронизации после сбоев сети
+
+Синхронизация идет сверкой (GoogleSheetsManager.reconcile): лист читается один раз,
+записываются только отличающиеся строки.
+
+Примеры:
+    python scripts/sync_google_sheets.py          # принятые с актуальным дедлайном
+    python scripts/sync_google_sheets.py --all    # все объявления
 """
+import argparse
 import sys
 import os
 # Добавить корень проекта в sys.path для импортов
@@ -13,9 +21,12 @@ from utils.google_sheets import GoogleSheetsManager
 from utils.logger import logger
 
 
-def sync_accepted_announcements():
+def sync_accepted_announcements(all_announcements: bool = False):
     """
     Синхронизировать все принятые объявления с актуальным дедлайном
+
+    Args:
+        all_announcements: Сверить все объявления, а не только принятые
     """
     logger.info("🔄 Запуск ручной синхронизации с Google Sheets...")
 
@@ -41,45 +52,35 @@ def sync_accepted_announcements():
         # Текущее время для фильтрации
         now = datetime.utcnow()
 
-        # Запросить все accepted объявления с актуальным дедлайном
-        announcements = session.query(Announcement).filter(
-            Announcement.status == 'accepted',
-            Announcement.application_deadline >= now
-        ).all()
+        query = session.query(Announcement).order_by(Announcement.id)
+        if not all_announcements:
+            # Все accepted объявления с актуальным дедлайном
+            query = query.filter(
+                Announcement.status == 'accepted',
+                Announcement.application_deadline >= now
+            )
+        announcements = query.all()
 
-        logger.info(f"📊 Найдено принятых объявлений с актуальным дедлайном: {len(announcements)}")
+        logger.info(f"📊 Объявлений для сверки: {len(announcements)}")
 
         if not announcements:
             logger.info("✅ Нет объявлений для синхронизации")
             return
 
-        # Синхронизация каждого объявления
-        success_count = 0
-        error_count = 0
-
-        for announcement in announcements:
-            try:
-                # Попытка синхронизации
-                result = sheets_manager.add_announcement(announcement)
-
-                if result:
-                    success_count += 1
-                    logger.info(f"✓ {announcement.announcement_number}")
-                else:
-                    error_count += 1
-                    logger.warning(f"✗ {announcement.announcement_number}")
-
-            except Exception as e:
-                error_count += 1
-                logger.error(f"✗ {announcement.announcement_number}: {e}")
+        # Сверка: одно чтение листа, запись только изменившихся строк
+        stats = sheets_manager.reconcile(announcements)
 
         # Вывод итоговой статистики
         logger.info("")
         logger.info("=" * 60)
         logger.success(f"✅ Синхронизация завершена!")
-        logger.info(f"   Успешно: {success_count}")
-        logger.info(f"   Ошибок:  {error_count}")
-        logger.info(f"   Всего:   {len(announcements)}")
+        logger.info(f"   Без изменений:    {stats['unchanged']}")
+        logger.info(f"   Обновлено:        {stats['updated']}")
+        logger.info(f"   Добавлено:        {stats['added']}")
+        logger.info(f"   Только в таблице: {stats['extra']}")
+        logger.info(f"   Дублей в таблице: {stats['duplicates']}")
+        logger.info(f"   Ошибок:           {stats['errors']}")
+        logger.info(f"   Всего:            {stats['total']}")
         logger.info("=" * 60)
 
     except Exception as e:
@@ -89,4 +90,8 @@ def sync_accepted_announcements():
 
 
 if __name__ == '__main__':
-    sync_accepted_announcements()
+    parser = argparse.ArgumentParser(description='Сверка объявлений с Google Sheets')
+    parser.add_argument('--all', action='store_true', help='Сверить все объявления, а не только принятые')
+    args = parser.parse_args()
+
+    sync_accepted_announcements(all_announcements=args.all)
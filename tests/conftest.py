@@ -5,6 +5,7 @@ import pytest
 import sys
 import os
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import Mock, AsyncMock, MagicMock
 import tempfile
 import shutil
@@ -47,6 +48,36 @@ def db_session(test_database_url):
     test_engine.dispose()
 
 
+@pytest.fixture
+def file_session_factory(tmp_path, monkeypatch):
+    """
+    File-based SQLite database shared between threads.
+    get_session() and the async session factory (so all CRUD calls) are redirected to it.
+    """
+    test_engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={'timeout': 30, 'check_same_thread': False}
+    )
+    Base.metadata.create_all(test_engine)
+    TestSessionLocal = sessionmaker(bind=test_engine)
+
+    import database.models as models
+    monkeypatch.setattr(models, 'SessionLocal', TestSessionLocal)
+
+    # Асинхронный CRUD работает с тем же файлом
+    import database.async_crud as async_crud
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    test_async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(async_crud, '_async_engine', test_async_engine)
+    monkeypatch.setattr(async_crud, '_async_session_factory',
+                        async_sessionmaker(test_async_engine, expire_on_commit=False))
+
+    yield TestSessionLocal
+
+    test_engine.dispose()
+    test_async_engine.sync_engine.dispose()
+
+
 @pytest.fixture
 def sample_announcement_data():
     """Sample announcement data for testing"""
@@ -171,6 +202,50 @@ def mock_google_sheets():
     return sheets
 
 
+@pytest.fixture
+def make_announcement():
+    """Factory of minimal announcement-like objects (enough to render a sheet row)"""
+    def make(number, status='pending', **kwargs):
+        data = dict(
+            announcement_number=number, status=status, created_at=None, response_at=None,
+            application_deadline=None, announcement_url=None, organization_name='Org', legal_address='',
+            lots=None, lot_name='Lot', keyword_matched='', manager_name='M', rejection_reason=None,
+            participation_details=None
+        )
+        data.update(kwargs)
+        return SimpleNamespace(**data)
+    return make
+
+
+@pytest.fixture
+def make_manager():
+    """
+    Factory of GoogleSheetsManager with a mocked worksheet
+
+    sheet_rows are returned by get_all_values below the header; column C
+    (col_values) holds existing_numbers.
+    """
+    from utils.google_sheets import GoogleSheetsManager
+    from utils.sheet_index import SheetRowIndex
+
+    def make(sheet_rows=(), existing_numbers=()):
+        manager = GoogleSheetsManager.__new__(GoogleSheetsManager)
+        manager.enabled = True
+        manager.client = MagicMock()
+        manager.spreadsheet = MagicMock()
+        manager.worksheet = MagicMock()
+        manager.worksheet.id = 0
+        manager.row_index = SheetRowIndex('Объявления', persist=False)
+        manager.worksheet.get_all_values.return_value = [list(GoogleSheetsManager.HEADERS)] + list(sheet_rows)
+        manager.worksheet.col_values.return_value = ['Номер объявления'] + list(existing_numbers)
+        last_row = max(len(sheet_rows), len(existing_numbers)) + 1
+        manager.worksheet.append_rows.return_value = {
+            'updates': {'updatedRange': f"'Объявления'!A{last_row + 1}:M{last_row + 5}"}
+        }
+        return manager
+    return make
+
+
 @pytest.fixture
 def mock_parser():
     """Mock GoszakupParser"""
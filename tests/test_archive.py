@@ -0,0 +1,155 @@
+"""
+Tests for moving expired announcements to the archive tables
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from database.crud import AnnouncementCRUD, ArchiveCRUD, DashboardCounterCRUD, ManagerActionCRUD, NotificationMessageCRUD
+from database.models import (
+    Announcement, Lot, ManagerAction, NotificationMessage,
+    ArchivedAnnouncement, ArchivedLot, ArchivedManagerAction
+)
+
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def create_expired(number, expired_days_ago, manager_id=1, **kwargs):
+    """Create an announcement through CRUD and expire it N days before NOW"""
+    data = {
+        'announcement_number': number,
+        'manager_id': manager_id,
+        'status': 'pending',
+        'created_at': NOW - timedelta(days=expired_days_ago + 5),
+        'application_deadline': NOW - timedelta(days=expired_days_ago),
+        'lots': [{'number': f"{number}-L1", 'name': 'Lot 1'}, {'number': f"{number}-L2", 'name': 'Lot 2'}]
+    }
+    data.update(kwargs)
+    announcement_id = AnnouncementCRUD.create(data).id
+    AnnouncementCRUD.expire_overdue(NOW - timedelta(days=expired_days_ago) + timedelta(minutes=1))
+    return announcement_id
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestArchiveExpired:
+    """Test ArchiveCRUD.archive_expired"""
+
+    def test_moves_only_old_expired(self, file_session_factory):
+        """Test that only announcements expired more than N days ago are moved"""
+        old_id = create_expired('OLD-1', expired_days_ago=40)
+        recent_id = create_expired('RECENT-1', expired_days_ago=5)
+        active_id = AnnouncementCRUD.create({'announcement_number': 'ACTIVE-1', 'manager_id': 1}).id
+
+        assert ArchiveCRUD.archive_expired(older_than_days=30, now=NOW) == 1
+
+        session = file_session_factory()
+        try:
+            assert {a.id for a in session.query(Announcement)} == {recent_id, active_id}
+            archived = session.query(ArchivedAnnouncement).one()
+            assert archived.id == old_id
+            assert archived.announcement_number == 'OLD-1'
+            assert archived.status == 'expired'
+            assert archived.archived_at is not None
+            assert archived.lots[0]['name'] == 'Lot 1'
+        finally:
+            session.close()
+
+    def test_moves_children(self, file_session_factory):
+        """Test that lots and actions move and saved messages are dropped"""
+        announcement_id = create_expired('CHILD-1', expired_days_ago=40)
+        ManagerActionCRUD.create({
+            'announcement_id': announcement_id, 'manager_id': 1, 'manager_name': 'M', 'action': 'viewed'
+        })
+        NotificationMessageCRUD.create(announcement_id, telegram_id=100, message_id=5)
+
+        ArchiveCRUD.archive_expired(older_than_days=30, now=NOW)
+
+        session = file_session_factory()
+        try:
+            assert session.query(Lot).count() == 0
+            assert session.query(ManagerAction).count() == 0
+            assert session.query(NotificationMessage).count() == 0
+
+            lots = session.query(ArchivedLot).order_by(ArchivedLot.position).all()
+            assert [lot.number for lot in lots] == ['CHILD-1-L1', 'CHILD-1-L2']
+            assert {lot.announcement_id for lot in lots} == {announcement_id}
+            assert session.query(ArchivedManagerAction).one().action == 'viewed'
+        finally:
+            session.close()
+
+    def test_batches(self, file_session_factory):
+        """Test that all rows are moved across several batches"""
+        for index in range(7):
+            create_expired(f"BATCH-{index}", expired_days_ago=40, manager_id=index % 2 + 1)
+
+        assert ArchiveCRUD.archive_expired(older_than_days=30, batch_size=3, now=NOW) == 7
+
+        session = file_session_factory()
+        try:
+            assert session.query(Announcement).count() == 0
+            assert session.query(ArchivedAnnouncement).count() == 7
+            assert session.query(ArchivedLot).count() == 14
+        finally:
+            session.close()
+
+    def test_counters_stay_consistent(self, file_session_factory):
+        """Test that dashboard counters follow the hot table"""
+        create_expired('CNT-1', expired_days_ago=40)
+        create_expired('CNT-2', expired_days_ago=40, manager_id=None)
+        AnnouncementCRUD.create({'announcement_number': 'CNT-3', 'manager_id': 1})
+
+        ArchiveCRUD.archive_expired(older_than_days=30, now=NOW)
+
+        assert DashboardCounterCRUD.check() == []
+        assert DashboardCounterCRUD.get_dashboard_data()['new'] == 1
+
+    def test_nothing_to_archive(self, file_session_factory):
+        """Test that a run without old expired announcements is a no-op"""
+        create_expired('NEW-1', expired_days_ago=1)
+
+        assert ArchiveCRUD.archive_expired(older_than_days=30, now=NOW) == 0
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestReportWithArchive:
+    """Test AnnouncementCRUD.get_all_for_report over hot and archive tables"""
+
+    def test_include_archive(self, file_session_factory):
+        """Test that reports can read hot and archived announcements together"""
+        create_expired('REP-OLD', expired_days_ago=40)
+        AnnouncementCRUD.create({'announcement_number': 'REP-NEW', 'manager_id': 1, 'created_at': NOW})
+        AnnouncementCRUD.create({'announcement_number': 'REP-OTHER', 'manager_id': 2, 'created_at': NOW})
+        ArchiveCRUD.archive_expired(older_than_days=30, now=NOW)
+
+        hot = AnnouncementCRUD.get_all_for_report(manager_id=1)
+        assert [a.announcement_number for a in hot] == ['REP-NEW']
+
+        combined = AnnouncementCRUD.get_all_for_report(manager_id=1, include_archive=True)
+        assert [a.announcement_number for a in combined] == ['REP-NEW', 'REP-OLD']
+
+        filtered = AnnouncementCRUD.get_all_for_report(
+            start_date=NOW - timedelta(days=1), include_archive=True
+        )
+        assert {a.announcement_number for a in filtered} == {'REP-NEW', 'REP-OTHER'}
+
+    def test_iter_for_report_merges_streams(self, file_session_factory):
+        """Test that the streaming report query returns the same rows in the same order"""
+        create_expired('ITER-OLD', expired_days_ago=40)
+        create_expired('ITER-MID', expired_days_ago=35)
+        for index in range(5):
+            AnnouncementCRUD.create({
+                'announcement_number': f"ITER-{index}", 'manager_id': 1, 'created_at': NOW - timedelta(days=index * 20)
+            })
+        ArchiveCRUD.archive_expired(older_than_days=30, now=NOW)
+
+        expected = [a.announcement_number for a in AnnouncementCRUD.get_all_for_report(include_archive=True)]
+        streamed = [
+            row.announcement_number for row in AnnouncementCRUD.iter_for_report(
+                include_archive=True, columns=['announcement_number'], batch_size=2
+            )
+        ]
+
+        assert streamed == expected
+        assert expected.index('ITER-OLD') > expected.index('ITER-2')
@@ -0,0 +1,119 @@
+"""
+Tests for atomic claim of shared announcements and guarded status transitions
+Fires many simultaneous claims at one row and checks that exactly one wins
+"""
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database.crud import AnnouncementCRUD
+from database.models import Announcement
+
+
+@pytest.fixture
+def shared_announcement_id(file_session_factory, sample_announcement_data):
+    """Unclaimed Almaty announcement"""
+    sample_announcement_data['manager_id'] = None
+    sample_announcement_data['manager_name'] = None
+
+    session = file_session_factory()
+    announcement = Announcement(**sample_announcement_data)
+    session.add(announcement)
+    session.commit()
+    announcement_id = announcement.id
+    session.close()
+
+    return announcement_id
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestAtomicClaim:
+    """Test AnnouncementCRUD.claim"""
+
+    def test_claim_unclaimed(self, file_session_factory, shared_announcement_id):
+        """Test claiming a free announcement"""
+        assert AnnouncementCRUD.claim(shared_announcement_id, 1, 'Manager 1') is True
+
+        session = file_session_factory()
+        announcement = session.get(Announcement, shared_announcement_id)
+        assert announcement.manager_id == 1
+        assert announcement.manager_name == 'Manager 1'
+        session.close()
+
+    def test_second_claim_fails(self, file_session_factory, shared_announcement_id):
+        """Test that already claimed announcement can't be claimed again"""
+        assert AnnouncementCRUD.claim(shared_announcement_id, 1, 'Manager 1') is True
+        assert AnnouncementCRUD.claim(shared_announcement_id, 3, 'Manager 3') is False
+
+        session = file_session_factory()
+        assert session.get(Announcement, shared_announcement_id).manager_id == 1
+        session.close()
+
+    @pytest.mark.slow
+    def test_simultaneous_claims_have_single_winner(self, file_session_factory, shared_announcement_id):
+        """Test that many simultaneous claims produce exactly one winner"""
+        claimants = 32
+        barrier = threading.Barrier(claimants)
+
+        def claim(manager_id):
+            barrier.wait()
+            return manager_id, AnnouncementCRUD.claim(shared_announcement_id, manager_id, f'Manager {manager_id}')
+
+        with ThreadPoolExecutor(max_workers=claimants) as executor:
+            results = list(executor.map(claim, range(1, claimants + 1)))
+
+        winners = [manager_id for manager_id, won in results if won]
+        assert len(winners) == 1
+
+        session = file_session_factory()
+        assert session.get(Announcement, shared_announcement_id).manager_id == winners[0]
+        session.close()
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestStatusTransitions:
+    """Test guarded AnnouncementCRUD.update_status"""
+
+    def test_accept_pending(self, file_session_factory, shared_announcement_id):
+        """Test pending -> accepted by the owner"""
+        AnnouncementCRUD.claim(shared_announcement_id, 1, 'Manager 1')
+
+        assert AnnouncementCRUD.update_status(shared_announcement_id, 'accepted', manager_id=1) is True
+
+        session = file_session_factory()
+        announcement = session.get(Announcement, shared_announcement_id)
+        assert announcement.status == 'accepted'
+        assert announcement.response_at is not None
+        session.close()
+
+    def test_reject_after_accept_is_refused(self, file_session_factory, shared_announcement_id):
+        """Test that accepted announcement can't be rejected"""
+        AnnouncementCRUD.claim(shared_announcement_id, 1, 'Manager 1')
+        AnnouncementCRUD.update_status(shared_announcement_id, 'accepted', manager_id=1)
+
+        assert AnnouncementCRUD.update_status(
+            shared_announcement_id, 'rejected', 'late click', manager_id=1
+        ) is False
+
+        session = file_session_factory()
+        announcement = session.get(Announcement, shared_announcement_id)
+        assert announcement.status == 'accepted'
+        assert announcement.rejection_reason is None
+        session.close()
+
+    def test_other_manager_cannot_accept(self, file_session_factory, shared_announcement_id):
+        """Test that status can't be changed by a manager who doesn't own the announcement"""
+        AnnouncementCRUD.claim(shared_announcement_id, 1, 'Manager 1')
+
+        assert AnnouncementCRUD.update_status(shared_announcement_id, 'accepted', manager_id=3) is False
+
+    def test_expired_is_final(self, file_session_factory, shared_announcement_id):
+        """Test that expired announcement can't be accepted"""
+        session = file_session_factory()
+        session.get(Announcement, shared_announcement_id).status = 'expired'
+        session.commit()
+        session.close()
+
+        assert AnnouncementCRUD.update_status(shared_announcement_id, 'accepted') is False
@@ -0,0 +1,165 @@
+"""
+Tests for materialized dashboard counters
+Counters must stay consistent with the announcements table after every CRUD transition
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+from database.crud import DEADLINE_UTC_OFFSET, AnnouncementCRUD, DashboardCounterCRUD
+from database.models import Announcement
+
+
+def create(number, manager_id=1, **kwargs):
+    """Create an announcement through CRUD (counters are updated)"""
+    data = {'announcement_number': number, 'manager_id': manager_id, 'status': 'pending'}
+    data.update(kwargs)
+    return AnnouncementCRUD.create(data).id
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestCounterMaintenance:
+    """Test that CRUD transitions keep counters consistent"""
+
+    def test_create(self, file_session_factory):
+        """Test counters after inserts"""
+        create('C-1')
+        create('C-2', manager_id=2)
+        create('C-3', manager_id=None)
+
+        data = DashboardCounterCRUD.get_dashboard_data()
+        assert data['new'] == 3
+        assert data['total_today'] == 3
+        assert DashboardCounterCRUD.check() == []
+
+    def test_status_transitions(self, file_session_factory):
+        """Test accept, process and reject"""
+        accepted_id = create('T-1')
+        rejected_id = create('T-2')
+        create('T-3')
+
+        assert AnnouncementCRUD.update_status(accepted_id, 'accepted', manager_id=1)
+        data = DashboardCounterCRUD.get_dashboard_data()
+        assert (data['new'], data['in_progress'], data['processed']) == (2, 1, 0)
+
+        AnnouncementCRUD.mark_as_processed(accepted_id)
+        assert AnnouncementCRUD.update_status(rejected_id, 'rejected', 'no stock', manager_id=1)
+
+        data = DashboardCounterCRUD.get_dashboard_data()
+        assert (data['new'], data['in_progress'], data['processed'], data['rejected']) == (1, 0, 1, 1)
+        assert DashboardCounterCRUD.check() == []
+
+    def test_refused_transition_keeps_counters(self, file_session_factory):
+        """Test that a refused transition doesn't change counters"""
+        announcement_id = create('R-1')
+        AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1)
+
+        assert AnnouncementCRUD.update_status(announcement_id, 'rejected', manager_id=1) is False
+        assert AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1) is False
+
+        data = DashboardCounterCRUD.get_dashboard_data()
+        assert (data['in_progress'], data['rejected']) == (1, 0)
+        assert DashboardCounterCRUD.check() == []
+
+    def test_claim_moves_manager(self, file_session_factory):
+        """Test that claiming a shared announcement moves per-manager counters"""
+        announcement_id = create('A-1', manager_id=None)
+
+        assert AnnouncementCRUD.claim(announcement_id, 3, 'Manager 3')
+        assert AnnouncementCRUD.claim(announcement_id, 4, 'Manager 4') is False
+
+        assert DashboardCounterCRUD.check() == []
+
+    def test_expire_overdue(self, file_session_factory):
+        """Test bulk expiration by deadline"""
+        past = datetime.utcnow() - timedelta(days=1)
+        create('E-1', application_deadline=past)
+        accepted_id = create('E-2', application_deadline=past)
+        create('E-3', application_deadline=datetime.utcnow() + timedelta(days=1))
+        AnnouncementCRUD.update_status(accepted_id, 'accepted', manager_id=1)
+
+        assert AnnouncementCRUD.expire_overdue(datetime.utcnow()) == 2
+
+        data = DashboardCounterCRUD.get_dashboard_data()
+        assert (data['new'], data['in_progress']) == (1, 0)
+        assert DashboardCounterCRUD.check() == []
+
+    def test_expire_overdue_uses_astana_deadline(self, file_session_factory):
+        """Test that a deadline of 17:00 Astana expires at 12:00 UTC, not at 17:00 UTC"""
+        create('B-1', application_deadline=datetime(2026, 3, 2, 17, 0))
+
+        assert AnnouncementCRUD.expire_overdue(datetime(2026, 3, 2, 11, 59)) == 0
+        assert AnnouncementCRUD.expire_overdue(datetime(2026, 3, 2, 12, 1)) == 1
+
+    def test_valid_deadline_uses_astana_deadline(self, file_session_factory):
+        """Test that the coordinator list drops announcements whose Astana deadline has passed"""
+        astana_now = datetime.utcnow() + DEADLINE_UTC_OFFSET
+        passed_id = create('B-2', application_deadline=astana_now - timedelta(minutes=5))
+        open_id = create('B-3', application_deadline=astana_now + timedelta(minutes=5))
+        for announcement_id in (passed_id, open_id):
+            AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1)
+
+        numbers = [a.announcement_number for a in AnnouncementCRUD.get_accepted_with_valid_deadline()]
+        assert numbers == ['B-3']
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestDashboardData:
+    """Test DashboardCounterCRUD.get_dashboard_data"""
+
+    def test_needs_attention_not_double_counted(self, file_session_factory):
+        """Test that announcements pending >24h are counted once"""
+        now = datetime.utcnow()
+        create('N-1', created_at=now - timedelta(hours=30))
+        create('N-2', created_at=now - timedelta(hours=3))
+        create('N-3', created_at=now)
+
+        data = DashboardCounterCRUD.get_dashboard_data(now=now)
+        assert data['stuck_24h'] == 1
+        assert data['no_response_2h'] == 2
+        assert data['needs_attention'] == 2
+
+    def test_constant_number_of_queries(self, file_session_factory):
+        """Test that dashboard reads don't depend on table size"""
+        for index in range(20):
+            create(f"Q-{index}")
+
+        session = file_session_factory()
+        statements = []
+
+        def counter(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(session.get_bind(), 'before_cursor_execute', counter)
+        try:
+            DashboardCounterCRUD.get_dashboard_data(session=session)
+        finally:
+            event.remove(session.get_bind(), 'before_cursor_execute', counter)
+            session.close()
+
+        assert len(statements) == 3
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestRebuild:
+    """Test consistency check and rebuild"""
+
+    def test_check_detects_drift_and_rebuild_fixes_it(self, file_session_factory):
+        """Test rows written around CRUD are reported and fixed by rebuild"""
+        create('D-1')
+
+        session = file_session_factory()
+        session.add(Announcement(announcement_number='D-2', manager_id=2, status='accepted'))
+        session.commit()
+        session.close()
+
+        mismatches = DashboardCounterCRUD.check()
+        assert {mismatch['table'] for mismatch in mismatches} == {'status_counters', 'daily_counters'}
+
+        DashboardCounterCRUD.rebuild()
+
+        assert DashboardCounterCRUD.check() == []
+        assert DashboardCounterCRUD.get_dashboard_data()['in_progress'] == 1
@@ -6,7 +6,7 @@ import pytest
 from datetime import datetime, timedelta
 import json
 
-from database.models import Announcement, ManagerAction, ParsingLog
+from database.models import Announcement, ManagerAction, ParsingLog, NotificationMessage
 
 
 @pytest.mark.database
@@ -78,3 +78,32 @@ class TestAnnouncementModel:
         assert announcement.created_at is not None
         assert before <= announcement.created_at <= after
         assert announcement.updated_at is not None
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestNotificationMessageModel:
+    """Test NotificationMessage model (copies of shared announcements)"""
+
+    def test_store_fan_out_messages(self, db_session, sample_announcement_data):
+        """Test storing message_id of every fan-out copy"""
+        sample_announcement_data['manager_id'] = None
+        announcement = Announcement(**sample_announcement_data)
+        db_session.add(announcement)
+        db_session.commit()
+
+        for telegram_id, message_id in [(11, 101), (33, 301), (44, 401)]:
+            db_session.add(NotificationMessage(
+                announcement_id=announcement.id,
+                telegram_id=telegram_id,
+                message_id=message_id
+            ))
+        db_session.commit()
+
+        copies = db_session.query(NotificationMessage).filter(
+            NotificationMessage.announcement_id == announcement.id
+        ).all()
+
+        assert len(copies) == 3
+        assert {copy.message_id for copy in copies} == {101, 301, 401}
+        assert all(copy.created_at is not None for copy in copies)
@@ -0,0 +1,243 @@
+"""
+Tests for digest notifications
+A manager with many new announcements gets paged digests instead of one message per announcement
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import bot.notifier as notifier_module
+import main
+from bot.handlers import callback_digest_view
+from bot.messages import format_digest_message
+from bot.notifier import TelegramNotifier
+from database.crud import AnnouncementCRUD, NotificationMessageCRUD
+
+
+def digest_items(count, start=1):
+    """Items as collected by parse_and_notify"""
+    return [
+        {
+            'announcement': {'announcement_number': f"D-{index}", 'organization_name': 'Org', 'lot_name': 'Lot'},
+            'announcement_db_id': index,
+            'is_shared': False
+        }
+        for index in range(start, start + count)
+    ]
+
+
+class FakeBot:
+    """Records sent messages"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self.sent.append({'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup})
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+
+class FakeNotifier:
+    """Records which delivery path was used; deliveries to telegram IDs in failing fail"""
+
+    def __init__(self, failing=()):
+        self.single = []
+        self.digests = []
+        self.failing = set(failing)
+
+    async def send_to_manager(self, telegram_id, announcement, announcement_db_id, is_shared=False):
+        self.single.append((telegram_id, announcement_db_id))
+        return telegram_id not in self.failing
+
+    async def send_digest_to_manager(self, telegram_id, items):
+        ids = [item['announcement_db_id'] for item in items]
+        self.digests.append((telegram_id, ids))
+        return [] if telegram_id in self.failing else ids
+
+
+def stored_items(count, prefix):
+    """Digest items backed by pending announcements created an hour ago (due for a retry)"""
+    items = []
+    for index in range(count):
+        announcement = AnnouncementCRUD.create({
+            'announcement_number': f"{prefix}-{index}", 'manager_id': 1, 'status': 'pending',
+            'created_at': datetime.utcnow() - timedelta(hours=1)
+        })
+        items.append({
+            'announcement': {'announcement_number': announcement.announcement_number},
+            'announcement_db_id': announcement.id,
+            'is_shared': False
+        })
+    return items
+
+
+def unnotified_ids():
+    return {announcement.id for announcement in AnnouncementCRUD.get_unnotified(datetime.utcnow(), limit=100)}
+
+
+def monitoring_system(notifier):
+    system = main.GoszakupMonitoringSystem.__new__(main.GoszakupMonitoringSystem)
+    system.notifier = notifier
+    return system
+
+
+class FakeCallback:
+    """CallbackQuery with the fields callback_digest_view uses"""
+
+    def __init__(self, data, telegram_id):
+        self.data = data
+        self.from_user = SimpleNamespace(id=telegram_id)
+        self.answers = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.answers.append(text)
+
+
+@pytest.fixture(autouse=True)
+def no_delay(monkeypatch):
+    """Skip pauses between messages"""
+    async def sleep(delay):
+        pass
+    monkeypatch.setattr(asyncio, 'sleep', sleep)
+
+
+def callback_data(keyboard):
+    return [button.callback_data for row in keyboard.inline_keyboard for button in row]
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestDigestThreshold:
+    """Test GoszakupMonitoringSystem.deliver_notifications"""
+
+    async def test_switches_to_digest_at_threshold(self, file_session_factory, monkeypatch):
+        """Test that THRESHOLD items go as a digest and fewer go one by one"""
+        monkeypatch.setattr(main, 'DIGEST_THRESHOLD', 3)
+        system = monitoring_system(FakeNotifier())
+        digest, single = stored_items(3, 'D'), stored_items(2, 'S')
+        outgoing = {11: digest, 22: single}
+
+        await system.deliver_notifications(outgoing)
+
+        assert system.notifier.digests == [(11, [item['announcement_db_id'] for item in digest])]
+        assert system.notifier.single == [(22, item['announcement_db_id']) for item in single]
+        assert outgoing == {}
+
+    async def test_zero_threshold_disables_digest(self, file_session_factory, monkeypatch):
+        """Test that DIGEST_THRESHOLD=0 always sends single messages"""
+        monkeypatch.setattr(main, 'DIGEST_THRESHOLD', 0)
+        system = monitoring_system(FakeNotifier())
+
+        await system.deliver_notifications({11: stored_items(6, 'Z')})
+
+        assert system.notifier.digests == []
+        assert len(system.notifier.single) == 6
+
+    async def test_delivered_items_are_not_retried(self, file_session_factory, monkeypatch):
+        """Test that digest and single deliveries are marked sent and failed ones stay due for a retry"""
+        monkeypatch.setattr(main, 'DIGEST_THRESHOLD', 3)
+        system = monitoring_system(FakeNotifier(failing={33, 44}))
+        digest, single = stored_items(4, 'D'), stored_items(1, 'S')
+        failed_digest, failed_single = stored_items(3, 'FD'), stored_items(1, 'FS')
+
+        await system.deliver_notifications({11: digest, 22: single, 33: failed_digest, 44: failed_single})
+
+        assert unnotified_ids() == {item['announcement_db_id'] for item in failed_digest + failed_single}
+
+
+@pytest.mark.unit
+class TestDigestPages:
+    """Test TelegramNotifier.send_digest_to_manager and format_digest_message"""
+
+    async def test_pages_are_sliced_by_page_size(self, monkeypatch):
+        """Test that 7 items with page size 3 go as pages of 3, 3 and 1 with running numbers"""
+        monkeypatch.setattr(notifier_module, 'DIGEST_PAGE_SIZE', 3)
+        notifier = TelegramNotifier.__new__(TelegramNotifier)
+        notifier.bot = FakeBot()
+
+        assert await notifier.send_digest_to_manager(11, digest_items(7)) == [1, 2, 3, 4, 5, 6, 7]
+
+        pages = notifier.bot.sent
+        assert len(pages) == 3
+        assert [page['text'].count('📋') for page in pages] == [3, 3, 1]
+        assert '(3/3)' in pages[2]['text'] and '<b>7.</b>' in pages[2]['text']
+        assert callback_data(pages[1]['reply_markup']) == ['digest_view_4', 'digest_view_5', 'digest_view_6']
+
+    async def test_empty_digest_sends_nothing(self):
+        notifier = TelegramNotifier.__new__(TelegramNotifier)
+        notifier.bot = FakeBot()
+
+        assert await notifier.send_digest_to_manager(11, []) == []
+        assert notifier.bot.sent == []
+
+    def test_single_page_has_no_page_counter(self):
+        """Test the header and numbering of a one-page digest"""
+        text = format_digest_message(digest_items(2), page=1, total_pages=1, total=2)
+
+        assert '(1/1)' not in text
+        assert 'Всего новых: <b>2</b>' in text
+        assert '<b>1.</b>' in text and '<b>2.</b>' in text
+
+    def test_offset_continues_numbering(self):
+        text = format_digest_message(digest_items(2), page=2, total_pages=2, total=12, offset=10)
+
+        assert '(2/2)' in text
+        assert '<b>11.</b>' in text and '<b>12.</b>' in text
+        assert '<b>1.</b>' not in text
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestDigestView:
+    """Test the digest_view_ callback"""
+
+    @staticmethod
+    def create(data, **overrides):
+        return AnnouncementCRUD.create({**data, **overrides}).id
+
+    async def test_own_pending_announcement_is_sent(self, file_session_factory, sample_announcement_data):
+        announcement_id = self.create(sample_announcement_data, manager_id=1)
+        callback = FakeCallback(f"digest_view_{announcement_id}", 11)
+        bot = FakeBot()
+
+        await callback_digest_view(callback, bot)
+
+        assert len(bot.sent) == 1
+        assert callback_data(bot.sent[0]['reply_markup'])[0] == f"accept_{announcement_id}"
+        assert callback.answers == [None]
+
+    async def test_shared_announcement_remembers_copy(self, file_session_factory, sample_announcement_data):
+        """Test that an unclaimed shared announcement gets the claim button and its copy is stored"""
+        announcement_id = self.create(sample_announcement_data, manager_id=None, manager_name=None)
+        bot = FakeBot()
+
+        await callback_digest_view(FakeCallback(f"digest_view_{announcement_id}", 33), bot)
+
+        assert callback_data(bot.sent[0]['reply_markup']) == [f"claim_almaty_{announcement_id}"]
+        copies = NotificationMessageCRUD.get_by_announcement(announcement_id)
+        assert [(copy.telegram_id, copy.message_id, copy.manager_id) for copy in copies] == [(33, 101, 3)]
+
+    @pytest.mark.parametrize('telegram_id, status, alert', [
+        (22, 'pending', '❌ Это объявление уже забрал другой менеджер'),
+        (11, 'accepted', 'ℹ️ Объявление уже обработано.'),
+        (999, 'pending', '❌ Вы не зарегистрированы как менеджер в системе.'),
+    ])
+    async def test_refused(self, file_session_factory, sample_announcement_data, telegram_id, status, alert):
+        """Test that someone else's, processed or unknown-user requests only get an alert"""
+        announcement_id = self.create(sample_announcement_data, manager_id=1, status=status)
+        callback = FakeCallback(f"digest_view_{announcement_id}", telegram_id)
+        bot = FakeBot()
+
+        await callback_digest_view(callback, bot)
+
+        assert bot.sent == []
+        assert callback.answers == [alert]
+
+    async def test_missing_announcement(self, file_session_factory):
+        callback = FakeCallback("digest_view_999999", 11)
+
+        await callback_digest_view(callback, FakeBot())
+
+        assert callback.answers == ['❌ Объявление не найдено.']
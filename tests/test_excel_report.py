@@ -0,0 +1,60 @@
+"""
+Tests for the streaming Excel report
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from openpyxl import load_workbook
+
+import reports.excel as excel
+from database.crud import AnnouncementCRUD
+from reports.excel import ExcelReportGenerator, REPORT_HEADERS
+
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def generator(tmp_path):
+    generator = ExcelReportGenerator()
+    generator.reports_dir = str(tmp_path)
+    return generator
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestExcelReport:
+    """Test ExcelReportGenerator.generate_report"""
+
+    def test_rows_statuses_and_widths(self, file_session_factory, generator, monkeypatch):
+        """Test report content, shared status styles and widths from the first rows"""
+        monkeypatch.setattr(excel, 'REPORT_WIDTH_SAMPLE', 2)
+        for index, status in enumerate(['accepted', 'rejected', 'pending', 'expired']):
+            AnnouncementCRUD.create({
+                'announcement_number': f"XL-{index}", 'manager_id': 1, 'manager_name': 'Manager',
+                'organization_name': 'O' * (10 if index < 3 else 80), 'status': status,
+                'created_at': NOW - timedelta(hours=index)
+            })
+
+        ws = load_workbook(generator.generate_report()).active
+
+        rows = list(ws.iter_rows(values_only=True))
+        assert list(rows[0]) == REPORT_HEADERS
+        assert [row[1] for row in rows[1:]] == ['XL-0', 'XL-1', 'XL-2', 'XL-3']
+        assert [row[8] for row in rows[1:]] == ['Принято', 'Отклонено', 'Ожидает', 'Ожидает']
+        assert rows[1][0] == (NOW + timedelta(hours=5)).strftime('%Y-%m-%d %H:%M')
+        assert rows[1][10] == '-'
+
+        assert ws['A1'].style == 'report_header' and ws['A1'].font.bold
+        assert ws['I2'].style == 'report_accepted' and ws['I2'].fill.start_color.rgb.endswith('C6EFCE')
+        assert ws['I4'].style == ws['I5'].style == 'report_pending'
+
+        # Ширина - по двум первым строкам: длинная организация в 5-й строке не учитывается
+        assert ws.column_dimensions['C'].width == len('Организация') + 2
+        assert ws.column_dimensions['B'].width == len('Номер объявления') + 2
+
+    def test_empty_report(self, file_session_factory, generator):
+        """Test that a report with no announcements has only the header"""
+        ws = load_workbook(generator.generate_report(manager_id=99)).active
+
+        assert list(ws.iter_rows(values_only=True)) == [tuple(REPORT_HEADERS)]
@@ -0,0 +1,203 @@
+"""
+Tests for the in-memory Google Sheets fake and the sync benchmarks built on it
+"""
+import os
+import sys
+
+import gspread
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from utils.fake_sheets import FakeSheetsBackend, FakeSpreadsheet, create_fake_manager, parse_a1
+from utils.sheets_quota import SheetsQuotaGovernor
+
+
+def make_items(count, status='pending'):
+    from benchmark_google_sheets import _make_announcements
+
+    items = _make_announcements(count)
+    for item in items:
+        item.status = status
+    return items
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestFakeSheets:
+    """Test the fake worksheet itself"""
+
+    def test_parse_a1(self):
+        """Test A1 range parsing"""
+        assert parse_a1('A3:M4') == (3, 1, 4, 13)
+        assert parse_a1("'Лист'!C5") == (5, 3, 5, 3)
+        assert parse_a1('1:1') == (1, None, 1, None)
+
+    def test_manager_initializes_sheet(self):
+        """Test that the manager creates the sheet, headers and status rules on the fake"""
+        spreadsheet = FakeSpreadsheet()
+        manager = create_fake_manager(spreadsheet)
+
+        worksheet = spreadsheet.sheets['Объявления']
+        assert worksheet.row_values(1) == manager.SHEET_HEADERS
+        assert spreadsheet.hidden_columns[worksheet.id] == {len(manager.HEADERS)}
+        assert worksheet.frozen_rows == 1
+        assert len(spreadsheet.conditional_formats[worksheet.id]) == 3
+
+        # Повторная инициализация не трогает ни заголовки, ни правила
+        spreadsheet.backend.reset()
+        create_fake_manager(spreadsheet)
+        assert spreadsheet.backend.calls == {'worksheet': 1, 'row_values': 1, 'fetch_sheet_metadata': 1}
+
+    def test_rows_round_trip(self):
+        """Test that written rows read back identically (reconcile finds nothing to do)"""
+        spreadsheet = FakeSpreadsheet()
+        manager = create_fake_manager(spreadsheet)
+        items = make_items(20)
+        manager.write_rows({item.announcement_number: (manager._announcement_to_row(item), item.status)
+                            for item in items})
+
+        assert spreadsheet.sheets['Объявления'].col_values(3)[1:] == [item.announcement_number for item in items]
+        stats = manager.reconcile(items)
+        assert stats['unchanged'] == 20 and stats['updated'] == 0 and stats['added'] == 0
+
+    def test_scheduled_errors_and_quota(self):
+        """Test simulated API errors"""
+        backend = FakeSheetsBackend(quota_per_minute=2)
+        worksheet = FakeSpreadsheet(backend).add_worksheet('Q')
+        worksheet.row_values(1)
+
+        with pytest.raises(gspread.exceptions.APIError) as error:
+            worksheet.row_values(1)
+        assert error.value.code == 429
+
+        backend.quota_per_minute = None
+        backend.fail_next(500)
+        with pytest.raises(gspread.exceptions.APIError):
+            worksheet.row_values(1)
+        worksheet.row_values(1)
+        assert backend.errors == {429: 1, 500: 1}
+
+    def test_governor_absorbs_quota_errors(self):
+        """Test that the quota governor retries a 429 from the fake"""
+        backend = FakeSheetsBackend()
+        waits = []
+        governor = SheetsQuotaGovernor(100, 100, sleep=waits.append)
+        manager = create_fake_manager(FakeSpreadsheet(backend), governor=governor)
+        item = make_items(1)[0]
+
+        backend.fail_next(429)
+        assert manager.write_rows({item.announcement_number: (manager._announcement_to_row(item), item.status)}) \
+            == {'added': 1, 'updated': 0}
+        assert governor.snapshot()['read']['rate_limited'] == 1
+        assert len(waits) == 1
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestSyncApiCalls:
+    """API calls per announcement on each sync path (regression guard)"""
+
+    def test_batched_paths_are_constant_per_batch(self):
+        """Test add/update/resync call counts from the benchmark"""
+        from benchmark_google_sheets import run_benchmark
+
+        results = {result['scenario']: result for result in run_benchmark(rows=500, batch=100, per_row=20)}
+
+        assert results['add']['api_calls'] == 5 * 2            # проверка столбца C + append_rows на пачку
+        assert results['update']['api_calls'] == 5 * 2         # проверка индекса + batch_update на пачку
+        assert results['resync']['api_calls'] == 2             # get_all_values + batch_update
+        assert results['per-row']['calls_per_announcement'] == 2  # проверка столбца C + append_row
+        assert 'format' not in results['update']['calls']
+
+
+@pytest.mark.google_sheets
+@pytest.mark.slow
+def test_benchmark_10k_rows():
+    """Test that a 10k-row sheet syncs with a bounded number of calls"""
+    from benchmark_google_sheets import run_benchmark
+
+    results = {result['scenario']: result for result in run_benchmark(rows=10000, batch=100, per_row=0)}
+
+    assert results['add']['calls_per_announcement'] <= 0.02
+    assert results['update']['calls_per_announcement'] <= 0.02
+    assert results['resync']['api_calls'] == 2
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestMonthSharding:
+    """Test SHEETS_SHARDING=month on the fake"""
+
+    @staticmethod
+    def make_split_items():
+        from datetime import datetime
+
+        items = make_items(6)
+        for index, item in enumerate(items):
+            item.created_at = datetime(2026, 9 if index < 4 else 10, 15, 6, 0)
+        return items
+
+    @staticmethod
+    def rows(manager, items):
+        return {item.announcement_number: (manager._announcement_to_row(item), item.status) for item in items}
+
+    def test_rows_go_to_month_sheets(self):
+        """Test that rows land on the sheet of their month with its own row index"""
+        spreadsheet = FakeSpreadsheet()
+        manager = create_fake_manager(spreadsheet, sharding='month')
+        items = self.make_split_items()
+
+        assert manager.write_rows(self.rows(manager, items)) == {'added': 6, 'updated': 0}
+
+        september = spreadsheet.sheets['Объявления 2026-09']
+        october = spreadsheet.sheets['Объявления 2026-10']
+        assert september.row_values(1) == manager.SHEET_HEADERS
+        assert september.col_values(3)[1:] == [item.announcement_number for item in items[:4]]
+        assert october.col_values(3)[1:] == [item.announcement_number for item in items[4:]]
+        assert spreadsheet.sheets['Объявления'].get_all_values() == [manager.SHEET_HEADERS]
+        assert len(spreadsheet.conditional_formats[october.id]) == 3
+
+        # Индексы листов независимы: обновление пишет в строку своего листа
+        items[5].status = 'accepted'
+        spreadsheet.backend.reset()
+        assert manager.write_rows(self.rows(manager, items[5:])) == {'added': 0, 'updated': 1}
+        assert spreadsheet.backend.calls == {'batch_get': 1, 'batch_update': 1}
+        assert october.row_values(3)[9] == manager._format_status('accepted')
+
+    def test_summary_has_formula_row_per_month(self):
+        """Test that the summary sheet gets one row of formulas per month sheet"""
+        spreadsheet = FakeSpreadsheet()
+        manager = create_fake_manager(spreadsheet, sharding='month')
+        items = self.make_split_items()
+        manager.write_rows(self.rows(manager, items[:2]))
+        manager.write_rows(self.rows(manager, items[2:]))
+
+        summary = spreadsheet.sheets['Сводка'].get_all_values()
+        assert summary[0] == manager.SUMMARY_HEADERS
+        assert [row[0] for row in summary[1:]] == ['Объявления 2026-09', 'Объявления 2026-10']
+        assert summary[1][1] == "=COUNTA('Объявления 2026-09'!C2:C)"
+        assert summary[1][2].startswith("=COUNTIF('Объявления 2026-09'!J2:J;")
+
+        # Новый менеджер не дублирует строки сводки и открывает существующие листы
+        spreadsheet.backend.reset()
+        again = create_fake_manager(spreadsheet, sharding='month')
+        again.write_rows(self.rows(again, items))
+        assert len(spreadsheet.sheets['Сводка'].get_all_values()) == 3
+        assert 'add_worksheet' not in spreadsheet.backend.calls
+
+    def test_reconcile_reads_each_month_once(self):
+        """Test that reconcile checks every month sheet with one read"""
+        spreadsheet = FakeSpreadsheet()
+        manager = create_fake_manager(spreadsheet, sharding='month')
+        items = self.make_split_items()
+        manager.write_rows(self.rows(manager, items[:5]))
+        items[0].participation_details = 'Цена: 100 000 тг'
+
+        spreadsheet.backend.reset()
+        stats = manager.reconcile(items)
+
+        assert stats['unchanged'] == 4 and stats['updated'] == 1 and stats['added'] == 1
+        assert spreadsheet.backend.calls['get_all_values'] == 2
+        assert spreadsheet.sheets['Объявления 2026-10'].col_values(3)[1:] == \
+            [item.announcement_number for item in items[4:]]
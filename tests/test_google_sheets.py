@@ -80,6 +80,79 @@ class TestGoogleSheetsManager:
         assert result is False
 
 
+def make_rules_manager(conditional_formats):
+    """Manager whose sheet metadata holds the given conditional format rules"""
+    manager = GoogleSheetsManager.__new__(GoogleSheetsManager)
+    manager.enabled = True
+    manager.spreadsheet = MagicMock()
+    manager.worksheet = MagicMock()
+    manager.worksheet.id = 7
+    manager.spreadsheet.fetch_sheet_metadata.return_value = {'sheets': [
+        {'properties': {'sheetId': 7}, 'conditionalFormats': conditional_formats}
+    ]}
+    return manager
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestStatusRules:
+    """Test conditional formatting of the status column"""
+
+    def test_installs_missing_rules_once(self):
+        """Test that rules are added in one request when the sheet has none"""
+        manager = make_rules_manager([])
+
+        assert manager._ensure_status_rules() is True
+
+        requests = manager.spreadsheet.batch_update.call_args[0][0]['requests']
+        assert [list(request) for request in requests] == [['addConditionalFormatRule']] * 3
+        status_column = GoogleSheetsManager.HEADERS.index('Статус')
+        assert requests[0]['addConditionalFormatRule']['rule']['ranges'][0]['startColumnIndex'] == status_column
+
+    def test_matching_rules_are_left_alone(self):
+        """Test that rules returned by the API with other color precision are accepted"""
+        manager = make_rules_manager([])
+        installed = manager._status_rules()
+        for rule in installed:
+            color = rule['booleanRule']['format']['backgroundColor']
+            rule['booleanRule']['format']['backgroundColor'] = {
+                channel: value + 0.001 for channel, value in color.items() if value
+            }
+        manager.spreadsheet.fetch_sheet_metadata.return_value['sheets'][0]['conditionalFormats'] = installed
+
+        assert manager._ensure_status_rules() is False
+        manager.spreadsheet.batch_update.assert_not_called()
+
+    def test_edited_rules_are_repaired(self):
+        """Test that hand-edited status rules are replaced and other columns keep theirs"""
+        manager = make_rules_manager([])
+        other = {'ranges': [{'sheetId': 7, 'startColumnIndex': 0, 'endColumnIndex': 1}],
+                 'booleanRule': {'condition': {'type': 'NOT_BLANK'}, 'format': {}}}
+        edited = manager._status_rules()
+        edited[0]['booleanRule']['format']['backgroundColor'] = {'red': 1.0}
+        manager.spreadsheet.fetch_sheet_metadata.return_value['sheets'][0]['conditionalFormats'] = [other] + edited
+
+        assert manager._ensure_status_rules() is True
+
+        requests = manager.spreadsheet.batch_update.call_args[0][0]['requests']
+        deleted = [request['deleteConditionalFormatRule']['index'] for request in requests
+                   if 'deleteConditionalFormatRule' in request]
+        assert deleted == [3, 2, 1]
+        assert sum('addConditionalFormatRule' in request for request in requests) == 3
+
+    def test_row_writes_do_not_format_cells(self):
+        """Test that add and update no longer send per-row format calls"""
+        manager = make_rules_manager([])
+        manager.row_index = MagicMock()
+        manager.row_index.locate.return_value = {'F-1': 5}
+        announcement = Mock(announcement_number='F-1', lots=None, application_deadline=None,
+                            created_at=None, response_at=None, status='accepted')
+
+        assert manager.update_announcement(announcement) is True
+        manager.worksheet.format.assert_not_called()
+        manager.spreadsheet.batch_update.assert_not_called()
+
+
 @pytest.mark.google_sheets
 @pytest.mark.integration
 class TestGoogleSheetsErrorHandling:
@@ -0,0 +1,152 @@
+"""
+Tests for the normalized lots table and its migration from the JSON column
+"""
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, text
+
+from database.crud import AnnouncementCRUD, LotCRUD
+from database.migrations.runner import MigrationContext
+from database.migrations.versions import v0004_lots_table
+from database.models import Base
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestLotCRUD:
+    """Test lot rows created with announcements"""
+
+    def test_create_with_lots(self, file_session_factory, sample_announcement_with_lots):
+        """Test that each lot gets a row and the JSON snapshot stays typed"""
+        sample_announcement_with_lots['lots'][0]['amount'] = 150000.5
+        announcement = AnnouncementCRUD.create(sample_announcement_with_lots)
+
+        lots = LotCRUD.get_by_announcement(announcement.id)
+        assert [lot.number for lot in lots] == ['1', '2']
+        assert [lot.name for lot in lots] == ['Lot 1 Name', 'Lot 2 Name']
+        assert lots[0].amount == 150000.5
+        assert lots[1].keyword == 'аренда'
+
+        loaded = AnnouncementCRUD.get_by_id(announcement.id)
+        assert isinstance(loaded.lots, list)
+
+    def test_create_legacy_single_lot(self, file_session_factory, sample_announcement_data):
+        """Test that an announcement without lots gets one row from lot_name"""
+        announcement = AnnouncementCRUD.create(sample_announcement_data)
+
+        lots = LotCRUD.get_by_announcement(announcement.id)
+        assert len(lots) == 1
+        assert lots[0].name == 'Test Lot'
+        assert lots[0].display_number == '1'
+
+    def test_drafts_and_details(self, file_session_factory, sample_announcement_with_lots):
+        """Test storing participation details per lot"""
+        announcement = AnnouncementCRUD.create(sample_announcement_with_lots)
+        first, second = LotCRUD.get_by_announcement(announcement.id)
+
+        LotCRUD.save_drafts(announcement.id, {first.id: 'Товар А'})
+        assert [lot.participation_draft for lot in LotCRUD.get_by_announcement(announcement.id)] == ['Товар А', None]
+
+        details = LotCRUD.save_details(announcement.id, {first.id: 'Товар А', second.id: 'Товар Б: 10 шт'})
+
+        lots = LotCRUD.get_by_announcement(announcement.id)
+        assert [lot.participation_details for lot in lots] == ['Товар А', 'Товар Б: 10 шт']
+        assert all(lot.participation_draft is None for lot in lots)
+        assert details == "📦 Лот №1: Товар А\n\n📦 Лот №2: Товар Б: 10 шт"
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestLotsMigration:
+    """Test v0004: JSON column -> lots table"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'lots.db'}")
+        Base.metadata.create_all(engine)
+        yield engine
+        engine.dispose()
+
+    def insert(self, engine, number, lots=None, **columns):
+        """Insert an announcement row directly (as written before the lots table existed)"""
+        values = {'announcement_number': number, 'lots': lots, 'status': 'accepted'}
+        values.update(columns)
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"INSERT INTO announcements ({', '.join(values)}) VALUES ({', '.join(':' + key for key in values)})"
+            ), values)
+
+    def test_migrates_json_and_details(self, engine):
+        """Test lots and participation details are split per lot"""
+        lots = [
+            {'number': '83848645-ЗЦП1', 'name': 'Перчатки', 'description': '', 'keyword': 'перчатки'},
+            {'number': '83848645-ЗЦП2', 'name': 'Маски', 'description': '', 'keyword': 'маски'}
+        ]
+        self.insert(
+            engine, 'M-1', json.dumps(lots, ensure_ascii=False),
+            participation_details="📦 Лот №83848645-ЗЦП1: есть на складе\n\n📦 Лот №83848645-ЗЦП2: под заказ"
+        )
+        self.insert(engine, 'M-2', None, lot_name='Старый лот',
+                    participation_details_draft="📦 Лот №1: черновик")
+        self.insert(engine, 'M-3', 'not json', lot_name='Битый JSON')
+
+        v0004_lots_table.upgrade(MigrationContext(engine, batch_size=2))
+
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT a.announcement_number, l.number, l.name, l.participation_details, l.participation_draft "
+                "FROM lots l JOIN announcements a ON a.id = l.announcement_id ORDER BY a.id, l.position"
+            )).fetchall()
+            broken = conn.execute(text("SELECT lots FROM announcements WHERE announcement_number = 'M-3'")).scalar()
+
+        assert [tuple(row) for row in rows] == [
+            ('M-1', '83848645-ЗЦП1', 'Перчатки', 'есть на складе', None),
+            ('M-1', '83848645-ЗЦП2', 'Маски', 'под заказ', None),
+            ('M-2', None, 'Старый лот', None, 'черновик'),
+            ('M-3', None, 'Битый JSON', None, None)
+        ]
+        assert broken is None
+
+    def test_idempotent(self, engine):
+        """Test that running the migration twice doesn't duplicate lots"""
+        self.insert(engine, 'I-1', json.dumps([{'number': 1, 'name': 'Лот'}]))
+
+        ctx = MigrationContext(engine)
+        v0004_lots_table.upgrade(ctx)
+        v0004_lots_table.upgrade(ctx)
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM lots")).scalar() == 1
+
+    def test_lots_column_type(self, engine, tmp_path):
+        """Test the JSON type check on a current schema and on a legacy TEXT column"""
+        assert v0004_lots_table._lots_is_json(MigrationContext(engine))
+
+        legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with legacy.begin() as conn:
+            conn.execute(text("CREATE TABLE announcements (id INTEGER PRIMARY KEY, lots TEXT)"))
+        assert not v0004_lots_table._lots_is_json(MigrationContext(legacy))
+        legacy.dispose()
+
+    def test_postgres_text_column_converted_to_json(self, monkeypatch):
+        """Test that PostgreSQL gets ALTER ... TYPE JSON only while the column is still TEXT"""
+        ctx = SimpleNamespace(is_postgres=True, engine=MagicMock())
+        conn = ctx.engine.begin.return_value.__enter__.return_value
+
+        monkeypatch.setattr(v0004_lots_table, '_lots_is_json', lambda ctx: False)
+        v0004_lots_table._convert_lots_column(ctx)
+        statement = str(conn.execute.call_args[0][0])
+        assert statement == "ALTER TABLE announcements ALTER COLUMN lots TYPE JSON USING lots::json"
+
+        conn.execute.reset_mock()
+        monkeypatch.setattr(v0004_lots_table, '_lots_is_json', lambda ctx: True)
+        v0004_lots_table._convert_lots_column(ctx)
+        conn.execute.assert_not_called()
+
+        # SQLite хранит JSON текстом - ALTER не нужен
+        ctx.is_postgres = False
+        monkeypatch.setattr(v0004_lots_table, '_lots_is_json', lambda ctx: False)
+        v0004_lots_table._convert_lots_column(ctx)
+        conn.execute.assert_not_called()
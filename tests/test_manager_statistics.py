@@ -0,0 +1,133 @@
+"""
+Tests for single-query manager statistics and the all-managers cache
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+import database.crud as crud
+from database.crud import AnnouncementCRUD
+from database.models import Announcement
+
+
+@pytest.fixture
+def statistics_data(db_session):
+    """
+    Manager 1: 10 answered (response 1..10 h), 2 pending, 1 processed
+    Manager 2: 1 rejected (response 4 h)
+    """
+    created = datetime(2026, 1, 1, 9, 0)
+    for index in range(1, 11):
+        db_session.add(Announcement(
+            announcement_number=f"STAT-1-{index}",
+            manager_id=1,
+            status='accepted' if index <= 7 else 'rejected',
+            is_processed=index == 1,
+            created_at=created,
+            response_at=created + timedelta(hours=index)
+        ))
+    for index in range(2):
+        db_session.add(Announcement(
+            announcement_number=f"STAT-1-P{index}", manager_id=1, status='pending', created_at=created
+        ))
+    db_session.add(Announcement(
+        announcement_number="STAT-2-1", manager_id=2, status='rejected',
+        created_at=created, response_at=created + timedelta(hours=4)
+    ))
+    db_session.add(Announcement(announcement_number="STAT-FREE", manager_id=None, status='pending'))
+    db_session.commit()
+
+    crud.invalidate_statistics_cache()
+    yield db_session
+    crud.invalidate_statistics_cache()
+
+
+def count_queries(session):
+    """Attach a SELECT counter to the session's engine"""
+    statements = []
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), 'before_cursor_execute', counter)
+    return statements, lambda: event.remove(session.get_bind(), 'before_cursor_execute', counter)
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestManagerStatistics:
+    """Test AnnouncementCRUD.get_manager_statistics"""
+
+    def test_counts_and_rates(self, statistics_data):
+        """Test counters and percentages"""
+        stats = AnnouncementCRUD.get_manager_statistics(1, session=statistics_data)
+
+        assert stats['total'] == 12
+        assert stats['pending'] == 2
+        assert stats['accepted'] == 7
+        assert stats['processed'] == 1
+        assert stats['rejected'] == 3
+        assert stats['acceptance_rate'] == 70.0
+        assert stats['processing_rate'] == 14.3
+
+    def test_response_times_in_sql(self, statistics_data):
+        """Test average, median and 90th percentile of response time (hours)"""
+        stats = AnnouncementCRUD.get_manager_statistics(1, session=statistics_data)
+
+        assert stats['avg_response_time'] == 5.5
+        assert stats['median_response_time'] == 5.0
+        assert stats['p90_response_time'] == 9.0
+
+    def test_single_query(self, statistics_data):
+        """Test that statistics are computed with one SQL statement"""
+        statements, detach = count_queries(statistics_data)
+        try:
+            AnnouncementCRUD.get_manager_statistics(1, session=statistics_data)
+        finally:
+            detach()
+
+        assert len(statements) == 1
+
+    def test_manager_without_announcements(self, statistics_data):
+        """Test empty statistics"""
+        stats = AnnouncementCRUD.get_manager_statistics(99, session=statistics_data)
+
+        assert stats == AnnouncementCRUD.empty_statistics()
+        assert stats['total'] == 0
+        assert stats['avg_response_time'] == 0
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestAllManagerStatistics:
+    """Test AnnouncementCRUD.get_all_manager_statistics"""
+
+    def test_matches_per_manager(self, statistics_data):
+        """Test that grouped statistics equal per-manager statistics"""
+        all_stats = AnnouncementCRUD.get_all_manager_statistics(use_cache=False, session=statistics_data)
+
+        assert set(all_stats) == {1, 2}
+        for manager_id, stats in all_stats.items():
+            assert stats == AnnouncementCRUD.get_manager_statistics(manager_id, session=statistics_data)
+
+    def test_cached_result_skips_query(self, statistics_data):
+        """Test that a second call within TTL doesn't query the database"""
+        AnnouncementCRUD.get_all_manager_statistics(session=statistics_data)
+
+        statements, detach = count_queries(statistics_data)
+        try:
+            AnnouncementCRUD.get_all_manager_statistics(session=statistics_data)
+        finally:
+            detach()
+
+        assert statements == []
+
+    def test_invalidate(self, statistics_data):
+        """Test that invalidation forces a fresh query"""
+        assert AnnouncementCRUD.get_all_manager_statistics(session=statistics_data)[2]['total'] == 1
+
+        statistics_data.add(Announcement(announcement_number="STAT-2-2", manager_id=2, status='pending'))
+        statistics_data.commit()
+        crud.invalidate_statistics_cache()
+
+        assert AnnouncementCRUD.get_all_manager_statistics(session=statistics_data)[2]['total'] == 2
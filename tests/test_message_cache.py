@@ -0,0 +1,102 @@
+"""
+Unit tests for rendered announcement message cache
+Tests LRU eviction, version-based invalidation and render_announcement integration
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from database.models import Announcement
+from utils.message_cache import RenderedMessageCache
+
+
+@pytest.mark.unit
+class TestRenderedMessageCache:
+    """Test RenderedMessageCache"""
+
+    def test_get_returns_cached_body(self):
+        """Test that stored message is returned for the same version"""
+        cache = RenderedMessageCache(max_size=10, persist=False)
+        version = datetime(2024, 1, 1, 12, 0)
+
+        cache.set(1, 'manager', '<b>text</b>', version)
+
+        assert cache.get(1, 'manager', version) == '<b>text</b>'
+        assert cache.hits == 1
+
+    def test_stale_version_is_miss(self):
+        """Test that changed updated_at invalidates the entry"""
+        cache = RenderedMessageCache(max_size=10, persist=False)
+        version = datetime(2024, 1, 1, 12, 0)
+
+        cache.set(1, 'manager', 'old', version)
+
+        assert cache.get(1, 'manager', version + timedelta(seconds=1)) is None
+        assert cache.misses == 1
+
+    def test_variants_are_separate(self):
+        """Test that variants of one announcement are cached independently"""
+        cache = RenderedMessageCache(max_size=10, persist=False)
+
+        cache.set(1, 'manager', 'manager text', 'v1')
+        cache.set(1, 'admin', 'admin text', 'v1')
+
+        assert cache.get(1, 'manager', 'v1') == 'manager text'
+        assert cache.get(1, 'admin', 'v1') == 'admin text'
+
+    def test_invalidate_removes_all_variants(self):
+        """Test explicit invalidation of an announcement"""
+        cache = RenderedMessageCache(max_size=10, persist=False)
+
+        cache.set(1, 'manager', 'a', 'v1')
+        cache.set(1, 'details', 'b', 'v1')
+        cache.set(2, 'manager', 'c', 'v1')
+
+        cache.invalidate(1)
+
+        assert cache.get(1, 'manager', 'v1') is None
+        assert cache.get(1, 'details', 'v1') is None
+        assert cache.get(2, 'manager', 'v1') == 'c'
+
+    def test_lru_eviction(self):
+        """Test that least recently used entry is evicted"""
+        cache = RenderedMessageCache(max_size=2, persist=False)
+
+        cache.set(1, 'manager', 'a', 'v1')
+        cache.set(2, 'manager', 'b', 'v1')
+        cache.get(1, 'manager', 'v1')  # 1 становится самым свежим
+        cache.set(3, 'manager', 'c', 'v1')
+
+        assert cache.get(2, 'manager', 'v1') is None
+        assert cache.get(1, 'manager', 'v1') == 'a'
+        assert cache.get(3, 'manager', 'v1') == 'c'
+
+
+@pytest.mark.unit
+class TestRenderAnnouncement:
+    """Test render_announcement with cache"""
+
+    def test_render_uses_cache_until_update(self, db_session, sample_announcement_data, monkeypatch):
+        """Test that rendered text is reused until updated_at changes"""
+        import utils.message_cache as message_cache
+        from bot.messages import render_announcement
+
+        cache = RenderedMessageCache(max_size=10, persist=False)
+        monkeypatch.setattr(message_cache, '_message_cache', cache)
+
+        announcement = Announcement(**sample_announcement_data)
+        db_session.add(announcement)
+        db_session.commit()
+
+        first = render_announcement(announcement, 'manager', announcement.id)
+        second = render_announcement(announcement, 'manager', announcement.id)
+
+        assert first == second
+        assert 'TEST-2024-001' in first
+        assert cache.hits == 1
+
+        announcement.organization_name = 'Renamed Organization'
+        announcement.updated_at = announcement.updated_at + timedelta(seconds=1)
+        db_session.commit()
+
+        third = render_announcement(announcement, 'manager', announcement.id)
+        assert 'Renamed Organization' in third
@@ -0,0 +1,110 @@
+"""
+Tests for handler metrics (utils/metrics.py, bot/middlewares.py)
+"""
+import time
+import pytest
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.methods import SendMessage
+from aiogram.types import Message, Update
+from sqlalchemy import create_engine, text
+
+from bot.middlewares import HandlerMetricsMiddleware, TelegramCallsMiddleware
+from bot.messages import format_perf_stats
+from utils.metrics import MetricsRegistry, install_db_hooks
+import utils.metrics as metrics_module
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Fresh metrics registry instead of the global one"""
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(metrics_module, '_metrics', fresh)
+    return fresh
+
+
+@pytest.fixture
+def metrics_engine():
+    """In-memory engine with query hooks"""
+    test_engine = create_engine("sqlite:///:memory:")
+    install_db_hooks(test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+def fake_update(update_id: int, text_value: str) -> Update:
+    return Update.model_validate({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': 42, 'type': 'private'},
+            'from': {'id': 42, 'is_bot': False, 'first_name': 'Test'},
+            'text': text_value
+        }
+    })
+
+
+@pytest.mark.unit
+class TestHandlerMetrics:
+    """Test per-handler metrics collection"""
+
+    async def test_counts_queries_per_handler(self, registry, metrics_engine):
+        """Test that SQL queries are attributed to the handler that ran them"""
+        router = Router()
+
+        @router.message()
+        async def three_queries(message: Message):
+            with metrics_engine.connect() as conn:
+                for _ in range(3):
+                    conn.execute(text("SELECT 1"))
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        dp.message.middleware(HandlerMetricsMiddleware())
+        bot = Bot(token='123456:TEST-token')
+
+        await dp.feed_update(bot, fake_update(1, 'a'))
+        await dp.feed_update(bot, fake_update(2, 'b'))
+
+        stats = registry.snapshot()['handlers']['three_queries']
+        assert stats['count'] == 2
+        assert stats['db_queries'] == 6
+        assert stats['db_queries_per_call'] == 3
+        assert sum(stats['buckets'].values()) == 2
+
+        await bot.session.close()
+
+    def test_background_queries(self, registry, metrics_engine):
+        """Test that queries outside handlers are counted as background"""
+        with metrics_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        assert registry.snapshot()['background']['db_queries'] == 1
+
+    async def test_counts_telegram_calls(self, registry):
+        """Test outbound Telegram call counting"""
+        middleware = TelegramCallsMiddleware()
+
+        async def make_request(bot, method):
+            return 'ok'
+
+        method = SendMessage(chat_id=1, text='hi')
+        assert await middleware(make_request, None, method) == 'ok'
+
+        snapshot = registry.snapshot()
+        assert snapshot['tg_methods'] == {'SendMessage': 1}
+        assert snapshot['background']['tg_calls'] == 1
+
+    def test_percentiles_and_format(self, registry):
+        """Test histogram percentiles and admin message"""
+        for elapsed in (0.005, 0.005, 0.005, 0.3):
+            token = registry.start_update()
+            registry.finish_update(token, 'cmd_stats', elapsed)
+
+        stats = registry.snapshot()['handlers']['cmd_stats']
+        assert stats['p50_ms'] == 10
+        assert stats['p95_ms'] == 500
+
+        message = format_perf_stats(registry.snapshot())
+        assert 'cmd_stats' in message
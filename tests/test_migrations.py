@@ -0,0 +1,257 @@
+"""
+Tests for the versioned migration runner and composite indexes
+EXPLAIN QUERY PLAN checks that hot queries use the composite indexes
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from database.crud import AnnouncementCRUD
+from database.migrations.runner import (
+    MigrationContext, discover_migrations, get_applied_versions, run_migrations
+)
+from database.models import Announcement
+
+# Схема announcements до разовых скриптов migrate_*.py
+LEGACY_SCHEMA = """
+CREATE TABLE announcements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    announcement_number VARCHAR(100) NOT NULL UNIQUE,
+    announcement_url VARCHAR(500),
+    organization_name VARCHAR(500),
+    organization_bin VARCHAR(50),
+    legal_address TEXT,
+    region VARCHAR(200),
+    lot_name TEXT,
+    lot_description TEXT,
+    keyword_matched VARCHAR(200),
+    application_deadline DATETIME,
+    procurement_method VARCHAR(200),
+    participation_details TEXT,
+    manager_id INTEGER,
+    manager_name VARCHAR(200),
+    status VARCHAR(50),
+    rejection_reason TEXT,
+    is_processed BOOLEAN,
+    created_at DATETIME,
+    updated_at DATETIME,
+    response_at DATETIME,
+    notification_sent BOOLEAN,
+    admin_notified BOOLEAN
+)
+"""
+
+
+@pytest.fixture
+def migration_engine(tmp_path):
+    """Empty file-based SQLite database"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def legacy_engine(migration_engine):
+    """Database with the pre-migration schema and NULL flags"""
+    with migration_engine.begin() as conn:
+        conn.execute(text(LEGACY_SCHEMA))
+        for index in range(25):
+            conn.execute(text(
+                "INSERT INTO announcements (announcement_number, status, is_processed, notification_sent) "
+                "VALUES (:number, 'accepted', NULL, NULL)"
+            ), {'number': f"LEGACY-{index}"})
+    return migration_engine
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestMigrationRunner:
+    """Test run_migrations"""
+
+    def test_versions_are_ordered(self):
+        """Test that migrations are discovered in version order"""
+        versions = [migration.version for migration in discover_migrations()]
+
+        assert versions == sorted(versions)
+        assert versions[:2] == [1, 2]
+
+    def test_fresh_database(self, migration_engine):
+        """Test migrating an empty database"""
+        applied = run_migrations(migration_engine)
+
+        assert [migration.version for migration in applied] == [
+            migration.version for migration in discover_migrations()
+        ]
+        assert inspect(migration_engine).has_table('announcements')
+        assert get_applied_versions(migration_engine) == {migration.version for migration in applied}
+
+    def test_second_run_is_noop(self, migration_engine):
+        """Test that applied migrations are not run again"""
+        run_migrations(migration_engine)
+
+        assert run_migrations(migration_engine) == []
+
+    def test_target_version(self, migration_engine):
+        """Test applying migrations up to a target version"""
+        run_migrations(migration_engine, target=1)
+
+        assert get_applied_versions(migration_engine) == {1}
+        assert [migration.version for migration in run_migrations(migration_engine)][0] == 2
+
+    def test_legacy_database_upgraded(self, legacy_engine):
+        """Test that legacy columns, NULL flags and indexes are fixed on an old database"""
+        run_migrations(legacy_engine, batch_size=10)
+
+        inspector = inspect(legacy_engine)
+        columns = {column['name'] for column in inspector.get_columns('announcements')}
+        assert {'lots', 'participation_details_draft', 'expired_at', 'reminder_2h_sent'} <= columns
+
+        indexes = {index['name'] for index in inspector.get_indexes('announcements')}
+        assert {
+            'ix_announcements_manager_status_created',
+            'ix_announcements_status_processed',
+            'ix_announcements_status_deadline',
+            'ix_announcements_status_notified_created'
+        } <= indexes
+
+        with legacy_engine.connect() as conn:
+            nulls = conn.execute(text(
+                "SELECT COUNT(*) FROM announcements WHERE is_processed IS NULL OR notification_sent IS NULL"
+            )).scalar()
+        assert nulls == 0
+
+    def test_unused_daily_columns_dropped(self, migration_engine):
+        """Test that daily_counters created with the event columns keeps only created"""
+        run_migrations(migration_engine, target=8)
+        with migration_engine.begin() as conn:
+            conn.execute(text("ALTER TABLE daily_counters ADD COLUMN accepted INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text("ALTER TABLE daily_counters ADD COLUMN expired INTEGER NOT NULL DEFAULT 0"))
+
+        run_migrations(migration_engine)
+
+        columns = {column['name'] for column in inspect(migration_engine).get_columns('daily_counters')}
+        assert columns == {'day', 'manager_id', 'created'}
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestBackfill:
+    """Test MigrationContext.backfill"""
+
+    def test_backfill_in_batches(self, legacy_engine):
+        """Test that backfill commits batch by batch and updates every row"""
+        statements = []
+
+        @event.listens_for(legacy_engine, 'before_cursor_execute')
+        def count_updates(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE'):
+                statements.append(statement)
+
+        ctx = MigrationContext(legacy_engine, batch_size=10)
+        updated = ctx.backfill('announcements', 'is_processed = :value', 'is_processed IS NULL', {'value': False})
+
+        assert updated == 25
+        assert len(statements) == 3  # 10 + 10 + 5
+
+
+@pytest.fixture
+def indexed_engine(migration_engine):
+    """Migrated database with enough rows for the planner to prefer indexes"""
+    run_migrations(migration_engine)
+
+    now = datetime.utcnow()
+    with migration_engine.begin() as conn:
+        conn.execute(Announcement.__table__.insert(), [
+            {
+                'announcement_number': f"PLAN-{index}",
+                'manager_id': index % 4 + 1,
+                'status': ('pending', 'accepted', 'rejected', 'expired')[index % 4],
+                'is_processed': index % 2 == 0,
+                'notification_sent': index % 3 == 0,
+                'application_deadline': now + timedelta(hours=index % 200),
+                'created_at': now - timedelta(minutes=index)
+            }
+            for index in range(2000)
+        ])
+        conn.execute(text("ANALYZE"))
+
+    return migration_engine
+
+
+def query_plan(engine, query) -> str:
+    """EXPLAIN QUERY PLAN for a SQLAlchemy query"""
+    statement = query.statement.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {statement}")).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def captured_plans(engine, func) -> list:
+    """Run a CRUD function and EXPLAIN every SELECT it issued against announcements"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM announcements' in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    session = sessionmaker(bind=engine)()
+    try:
+        func(session)
+    finally:
+        session.close()
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append(' | '.join(row[-1] for row in rows))
+    return plans
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestHotQueryPlans:
+    """EXPLAIN-based checks that hot queries use composite indexes"""
+
+    def test_manager_lists_use_manager_status_created(self, indexed_engine):
+        """Test get_pending_for_manager / get_accepted_for_manager"""
+        for func in (AnnouncementCRUD.get_pending_for_manager, AnnouncementCRUD.get_accepted_for_manager):
+            plans = captured_plans(indexed_engine, lambda session: func(1, session=session))
+
+            assert plans
+            assert all('ix_announcements_manager_status_created' in plan for plan in plans)
+            # Сортировка по created_at берется из индекса
+            assert all('TEMP B-TREE' not in plan for plan in plans)
+
+    def test_dashboard_uses_status_processed(self, indexed_engine):
+        """Test in-progress counter of the admin dashboard"""
+        session = sessionmaker(bind=indexed_engine)()
+        query = session.query(Announcement.id).filter(
+            Announcement.status == 'accepted',
+            Announcement.is_processed == False
+        )
+
+        assert 'ix_announcements_status_processed' in query_plan(indexed_engine, query)
+        session.close()
+
+    def test_deadline_check_uses_status_deadline(self, indexed_engine):
+        """Test accepted announcements with a valid deadline"""
+        plans = captured_plans(indexed_engine, lambda session: AnnouncementCRUD.get_accepted_with_valid_deadline(session=session))
+
+        assert plans
+        assert all('ix_announcements_status_deadline' in plan for plan in plans)
+
+    def test_notification_retry_uses_status_notified_created(self, indexed_engine):
+        """Test pending announcements without notification (retry job)"""
+        session = sessionmaker(bind=indexed_engine)()
+        query = session.query(Announcement).filter(
+            Announcement.status == 'pending',
+            Announcement.notification_sent == False,
+            Announcement.created_at < datetime.utcnow() - timedelta(minutes=30)
+        ).limit(10)
+
+        assert 'ix_announcements_status_notified_created' in query_plan(indexed_engine, query)
+        session.close()
@@ -0,0 +1,220 @@
+"""
+Tests for the persisted deadline reminder schedule and the heap-based runner
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+
+import bot.reminders as reminders
+from bot.reminders import ReminderScheduler, is_quiet_time, quiet_hours_end
+from database.crud import AnnouncementCRUD, ReminderCRUD, DEADLINE_UTC_OFFSET
+from database.models import Announcement, DeadlineReminder
+
+
+class FakeNotifier:
+    """Records reminders instead of sending them"""
+
+    def __init__(self, result=True):
+        self.sent = []
+        self.result = result
+
+    async def send_deadline_reminder(self, telegram_id, announcement, hours_left):
+        self.sent.append((telegram_id, announcement.announcement_number, hours_left))
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def no_quiet_hours(monkeypatch):
+    """Disable quiet hours and send delay unless a test sets them"""
+    monkeypatch.setattr(reminders, 'QUIET_HOURS_START', 0)
+    monkeypatch.setattr(reminders, 'QUIET_HOURS_END', 0)
+    monkeypatch.setattr(reminders, 'REMINDER_SEND_DELAY', 0)
+
+
+def accepted(number, deadline_utc, manager_id=1):
+    """Create an announcement and accept it; deadline is given in UTC and stored in Astana time"""
+    announcement_id = AnnouncementCRUD.create({
+        'announcement_number': number,
+        'manager_id': manager_id,
+        'application_deadline': deadline_utc + DEADLINE_UTC_OFFSET
+    }).id
+    assert AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=manager_id)
+    return announcement_id
+
+
+def schedule_of(session_factory, announcement_id):
+    """{hours_before: (due_at, sent_at)} for an announcement"""
+    session = session_factory()
+    try:
+        return {
+            reminder.hours_before: (reminder.due_at, reminder.sent_at)
+            for reminder in session.query(DeadlineReminder).filter(
+                DeadlineReminder.announcement_id == announcement_id
+            )
+        }
+    finally:
+        session.close()
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestReminderSchedule:
+    """Test ReminderCRUD"""
+
+    def test_accept_schedules_exact_due_times(self, file_session_factory):
+        """Test that accepting creates one row per offset, due in UTC"""
+        deadline = datetime.utcnow().replace(microsecond=0) + timedelta(days=5)
+        announcement_id = accepted('S-1', deadline)
+
+        schedule = schedule_of(file_session_factory, announcement_id)
+        assert {hours: due for hours, (due, _) in schedule.items()} == {
+            48: deadline - timedelta(hours=48),
+            24: deadline - timedelta(hours=24),
+            2: deadline - timedelta(hours=2)
+        }
+
+    def test_late_accept_skips_past_offsets(self, file_session_factory):
+        """Test that reminders whose time has passed are not created"""
+        announcement_id = accepted('S-2', datetime.utcnow() + timedelta(hours=30))
+
+        assert set(schedule_of(file_session_factory, announcement_id)) == {24, 2}
+
+    def test_listener_receives_new_reminders(self, file_session_factory):
+        """Test that listeners are called after commit with (due_at, id)"""
+        received = []
+        ReminderCRUD.add_listener(received.extend)
+        try:
+            accepted('S-3', datetime.utcnow() + timedelta(days=3))
+        finally:
+            ReminderCRUD.remove_listener(received.extend)
+
+        assert len(received) == 3
+        assert all(isinstance(due_at, datetime) and reminder_id for due_at, reminder_id in received)
+
+    def test_rebuild_fills_gaps(self, file_session_factory):
+        """Test that rebuild schedules accepted announcements without rows and respects sent flags"""
+        session = file_session_factory()
+        session.add(Announcement(
+            announcement_number='S-4', manager_id=1, status='accepted', reminder_48h_sent=True,
+            application_deadline=datetime.utcnow() + DEADLINE_UTC_OFFSET + timedelta(days=3)
+        ))
+        session.add(Announcement(
+            announcement_number='S-5', manager_id=1, status='rejected',
+            application_deadline=datetime.utcnow() + DEADLINE_UTC_OFFSET + timedelta(days=3)
+        ))
+        session.commit()
+        session.close()
+
+        assert ReminderCRUD.rebuild() == 2
+        assert ReminderCRUD.rebuild() == 0
+        assert len(ReminderCRUD.get_pending()) == 2
+
+
+@pytest.mark.unit
+class TestQuietHours:
+    """Test quiet hour helpers (Astana time, UTC+5)"""
+
+    def test_quiet_window(self, monkeypatch):
+        """Test 23:00-08:00 Astana window"""
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_START', 23)
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_END', 8)
+
+        assert is_quiet_time(datetime(2026, 1, 1, 18, 30))      # 23:30 Astana
+        assert is_quiet_time(datetime(2026, 1, 1, 2, 59))       # 07:59 Astana
+        assert not is_quiet_time(datetime(2026, 1, 1, 3, 0))    # 08:00 Astana
+        assert not is_quiet_time(datetime(2026, 1, 1, 17, 59))  # 22:59 Astana
+
+    def test_quiet_end(self, monkeypatch):
+        """Test that the end is the next 08:00 Astana"""
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_END', 8)
+
+        assert quiet_hours_end(datetime(2026, 1, 1, 18, 30)) == datetime(2026, 1, 2, 3, 0)
+        assert quiet_hours_end(datetime(2026, 1, 2, 1, 0)) == datetime(2026, 1, 2, 3, 0)
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestReminderRunner:
+    """Test ReminderScheduler"""
+
+    async def test_sends_most_urgent_and_skips_stale(self, file_session_factory):
+        """Test that after downtime only the most urgent due reminder is sent"""
+        now = datetime.utcnow()
+        announcement_id = accepted('R-1', now + timedelta(hours=50))
+        notifier = FakeNotifier()
+
+        # Простой: наступили и 48 ч, и 24 ч
+        sent = await ReminderScheduler(notifier).process_due(now + timedelta(hours=27))
+
+        assert sent == 1
+        assert notifier.sent == [(11, 'R-1', 23)]
+        schedule = schedule_of(file_session_factory, announcement_id)
+        assert schedule[48][1] is not None and schedule[24][1] is not None and schedule[2][1] is None
+
+        session = file_session_factory()
+        announcement = session.get(Announcement, announcement_id)
+        assert announcement.reminder_24h_sent and announcement.reminder_48h_sent
+        session.close()
+
+    async def test_quiet_hours_defer(self, file_session_factory, monkeypatch):
+        """Test that a reminder due in quiet hours moves to their end instead of being dropped"""
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_START', 23)
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_END', 8)
+
+        night = datetime.utcnow().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        announcement_id = accepted('R-2', night + timedelta(hours=48))
+        notifier = FakeNotifier()
+
+        assert await ReminderScheduler(notifier).process_due(night) == 0
+        assert notifier.sent == []
+        assert schedule_of(file_session_factory, announcement_id)[48] == (quiet_hours_end(night), None)
+
+    async def test_quiet_hours_send_when_deadline_first(self, file_session_factory, monkeypatch):
+        """Test that a reminder is sent at night if the deadline comes before quiet hours end"""
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_START', 23)
+        monkeypatch.setattr(reminders, 'QUIET_HOURS_END', 8)
+
+        night = datetime.utcnow().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        accepted('R-3', night + timedelta(hours=2))
+        notifier = FakeNotifier()
+
+        assert await ReminderScheduler(notifier).process_due(night) == 1
+
+    async def test_drops_irrelevant(self, file_session_factory):
+        """Test that reminders of expired announcements are removed"""
+        now = datetime.utcnow()
+        announcement_id = accepted('R-4', now + timedelta(hours=3))
+        AnnouncementCRUD.expire_overdue(now + timedelta(days=1))
+
+        notifier = FakeNotifier()
+        assert await ReminderScheduler(notifier).process_due(now + timedelta(hours=2)) == 0
+        assert notifier.sent == []
+        assert schedule_of(file_session_factory, announcement_id) == {}
+
+    async def test_failed_send_is_retried_later(self, file_session_factory):
+        """Test that a failed send is deferred, not lost"""
+        now = datetime.utcnow()
+        announcement_id = accepted('R-5', now + timedelta(hours=10))
+
+        scheduler = ReminderScheduler(FakeNotifier(result=False))
+        await scheduler.process_due(now + timedelta(hours=8, minutes=1))
+
+        due_at, sent_at = schedule_of(file_session_factory, announcement_id)[2]
+        assert sent_at is None
+        assert due_at == now + timedelta(hours=8, minutes=1 + reminders.REMINDER_RETRY_MINUTES)
+
+    async def test_wakes_at_due_time(self, file_session_factory):
+        """Test that the runner restores the heap from the DB and wakes exactly when due"""
+        notifier = FakeNotifier()
+        scheduler = ReminderScheduler(notifier)
+        await scheduler.start()
+        try:
+            accepted('R-6', datetime.utcnow() + timedelta(hours=2, seconds=0.3))
+            await asyncio.sleep(0.05)
+            assert scheduler.next_due_at() is not None
+            assert notifier.sent == []
+
+            await asyncio.sleep(0.6)
+            assert notifier.sent == [(11, 'R-6', 2)]
+        finally:
+            await scheduler.stop()
@@ -0,0 +1,150 @@
+"""
+Tests for importing manual Google Sheets edits back into the DB
+"""
+import pytest
+
+import database.crud as crud
+from database.crud import AnnouncementCRUD
+from database.models import Announcement, SheetOutbox
+from utils.fake_sheets import FakeSpreadsheet, create_fake_manager
+from utils.metrics import get_metrics
+from utils.sheet_edits import SheetEditImporter
+from utils.sheet_outbox import SheetOutboxWorker
+
+
+@pytest.fixture
+def sheet(file_session_factory, monkeypatch):
+    """Fake sheet filled by the outbox worker with three announcements"""
+    monkeypatch.setattr(crud, 'GOOGLE_SHEETS_ENABLED', True)
+    spreadsheet = FakeSpreadsheet()
+    manager = create_fake_manager(spreadsheet)
+    for index in range(3):
+        AnnouncementCRUD.create({
+            'announcement_number': f"E-{index}", 'manager_id': 1, 'manager_name': 'M', 'organization_name': 'Org'
+        })
+    worker = SheetOutboxWorker(manager=manager, importer=SheetEditImporter(manager))
+    worker.drain_once()
+    return manager, spreadsheet.sheets['Объявления'], worker
+
+
+def edit_cell(manager, worksheet, number, header, value):
+    """Change a cell the way a coordinator would (directly in the sheet)"""
+    row = worksheet.col_values(3).index(number) + 1
+    worksheet.rows[row - 1][manager.HEADERS.index(header)] = value
+
+
+def db_state(session_factory, number):
+    session = session_factory()
+    try:
+        announcement = session.query(Announcement).filter_by(announcement_number=number).one()
+        queued = session.get(SheetOutbox, announcement.id) is not None
+        return announcement.status, announcement.participation_details, queued
+    finally:
+        session.close()
+
+
+@pytest.mark.database
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestSheetEdits:
+    """Test SheetEditImporter and GoogleSheetsManager.read_sheet_edits"""
+
+    def test_rows_carry_hidden_hash(self, sheet):
+        """Test that written rows are not reported as edits and detection costs one read"""
+        manager, worksheet, _ = sheet
+        assert all(len(row) == len(manager.SHEET_HEADERS) for row in worksheet.get_all_values())
+
+        worksheet.backend.reset()
+        assert manager.read_sheet_edits() == []
+        assert worksheet.backend.calls == {'get_all_values': 1}
+
+    def test_imports_status_and_details(self, sheet, file_session_factory):
+        """Test that allowed edits reach the DB and the row is rewritten with a fresh hash"""
+        manager, worksheet, worker = sheet
+        edit_cell(manager, worksheet, 'E-1', 'Статус', 'Принято')
+        edit_cell(manager, worksheet, 'E-1', 'Детали участия', 'Цена 100')
+
+        importer = worker.importer
+
+        assert importer.run() == {'edits': 1, 'imported': 1, 'conflicts': 0}
+        assert db_state(file_session_factory, 'E-1') == ('accepted', 'Цена 100', True)
+
+        # Пока строка не перезаписана, правка видна, но повторно не переносится
+        assert importer.run() == {'edits': 1, 'imported': 0, 'conflicts': 0}
+
+        worker.drain_once()
+        assert manager.read_sheet_edits() == []
+        assert get_metrics().snapshot()['gauges']['sheet_edits']['imported'] == 1
+
+    def test_read_only_column_is_flagged_and_restored(self, sheet, file_session_factory):
+        """Test that an edit outside the allowed columns is a conflict and the DB value wins"""
+        manager, worksheet, worker = sheet
+        edit_cell(manager, worksheet, 'E-0', 'Организация', 'Другая')
+        importer = worker.importer
+
+        assert importer.run() == {'edits': 1, 'imported': 0, 'conflicts': 1}
+        assert 'Организация' in importer.conflicts[0]['reason']
+        assert db_state(file_session_factory, 'E-0')[2] is True
+
+        worker.drain_once()
+        row = worksheet.col_values(3).index('E-0')
+        assert worksheet.rows[row][manager.HEADERS.index('Организация')] == 'Org'
+
+    def test_concurrent_db_change_is_a_conflict(self, sheet, file_session_factory):
+        """Test that an edit is not imported when the DB changed since the row was written"""
+        manager, worksheet, _ = sheet
+        edit_cell(manager, worksheet, 'E-2', 'Статус', 'Принято')
+        session = file_session_factory()
+        announcement_id = session.query(Announcement.id).filter_by(announcement_number='E-2').scalar()
+        session.close()
+        AnnouncementCRUD.update_status(announcement_id, 'rejected', 'price')
+
+        result = SheetEditImporter(manager).run()
+
+        assert result['conflicts'] == 1 and result['imported'] == 0
+        assert db_state(file_session_factory, 'E-2')[0] == 'rejected'
+
+    def test_invalid_status_is_a_conflict(self, sheet, file_session_factory):
+        """Test that an unknown status text is not imported and is flagged once"""
+        manager, worksheet, _ = sheet
+        edit_cell(manager, worksheet, 'E-0', 'Статус', 'Может быть')
+        importer = SheetEditImporter(manager)
+
+        assert importer.run()['conflicts'] == 1
+        assert db_state(file_session_factory, 'E-0')[0] == 'pending'
+        # Тот же конфликт при следующей проверке не считается заново
+        assert importer.run()['conflicts'] == 0
+
+    def test_drain_keeps_edit_made_before_import(self, sheet, file_session_factory):
+        """Test that a queued DB change doesn't overwrite a sheet edit the importer hasn't seen yet"""
+        manager, worksheet, worker = sheet
+        edit_cell(manager, worksheet, 'E-1', 'Детали участия', 'Цена 100')
+        session = file_session_factory()
+        announcement_id = session.query(Announcement.id).filter_by(announcement_number='E-1').scalar()
+        session.close()
+        AnnouncementCRUD.mark_as_processed(announcement_id)
+
+        assert worker.drain_once() == {'written': 1, 'failed': 0}
+
+        # Правка перенесена в БД и осталась в таблице
+        assert db_state(file_session_factory, 'E-1')[1] == 'Цена 100'
+        row = worksheet.col_values(3).index('E-1')
+        assert worksheet.rows[row][manager.HEADERS.index('Детали участия')] == 'Цена 100'
+        assert worker.importer.run() == {'edits': 0, 'imported': 0, 'conflicts': 0}
+        assert worker.importer.stats['imported'] == 1
+
+    def test_drain_restores_conflicting_edit(self, sheet, file_session_factory):
+        """Test that a held row with a read-only edit is flagged and rewritten from the DB in the same drain"""
+        manager, worksheet, worker = sheet
+        edit_cell(manager, worksheet, 'E-2', 'Организация', 'Другая')
+        session = file_session_factory()
+        announcement_id = session.query(Announcement.id).filter_by(announcement_number='E-2').scalar()
+        session.close()
+        AnnouncementCRUD.mark_as_processed(announcement_id)
+
+        worker.drain_once()
+
+        assert worker.importer.stats['conflicts'] == 1
+        assert manager.read_sheet_edits() == []
+        row = worksheet.col_values(3).index('E-2')
+        assert worksheet.rows[row][manager.HEADERS.index('Организация')] == 'Org'
@@ -0,0 +1,105 @@
+"""
+Tests for the announcement number -> sheet row index
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from utils.sheet_index import SheetRowIndex
+
+
+HEADER = 'Номер объявления'
+
+
+def make_worksheet(numbers):
+    """Worksheet mock whose column C holds numbers (row 2 onwards)"""
+    column = [HEADER] + list(numbers)
+    worksheet = MagicMock()
+    worksheet.col_values.side_effect = lambda index: list(column)
+    worksheet.batch_get.side_effect = lambda ranges: [
+        [[column[int(cell[1:]) - 1]]] if int(cell[1:]) <= len(column) else [] for cell in ranges
+    ]
+    return worksheet, column
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestSheetRowIndex:
+    """Test SheetRowIndex"""
+
+    def test_first_lookup_builds_index(self):
+        """Test that an empty index reads column C once"""
+        worksheet, _ = make_worksheet(['A-1', 'A-2', 'A-3'])
+        index = SheetRowIndex('Sheet', persist=False)
+
+        assert index.locate(worksheet, ['A-2', 'X']) == {'A-2': 3}
+        assert worksheet.col_values.call_count == 1
+        worksheet.batch_get.assert_not_called()
+
+    def test_cached_lookup_verifies_only_target_cells(self):
+        """Test that later lookups read the cached cells, not the column"""
+        worksheet, _ = make_worksheet(['A-1', 'A-2', 'A-3'])
+        index = SheetRowIndex('Sheet', persist=False)
+        index.locate(worksheet, ['A-1'])
+
+        assert index.locate(worksheet, ['A-3', 'A-1']) == {'A-3': 4, 'A-1': 2}
+        assert worksheet.col_values.call_count == 1
+        assert worksheet.batch_get.call_args[0][0] == ['C4', 'C2']
+
+    def test_mismatch_triggers_rebuild(self):
+        """Test that a manually deleted row is detected and the index is rebuilt"""
+        worksheet, column = make_worksheet(['A-1', 'A-2', 'A-3'])
+        index = SheetRowIndex('Sheet', persist=False)
+        index.locate(worksheet, ['A-1'])
+
+        column.remove('A-2')  # строки ниже сдвинулись вверх
+
+        assert index.locate(worksheet, ['A-3']) == {'A-3': 3}
+        assert index.stats['mismatches'] == 1
+        assert worksheet.col_values.call_count == 2
+
+    def test_appended_rows_are_known_without_reads(self):
+        """Test that rows recorded after append are found by verification only"""
+        worksheet, column = make_worksheet(['A-1'])
+        index = SheetRowIndex('Sheet', persist=False)
+        index.locate(worksheet, ['A-1'])
+
+        column.extend(['B-1', 'B-2'])
+        index.set_many({'B-1': 3, 'B-2': 4})
+
+        assert index.locate(worksheet, ['B-2']) == {'B-2': 4}
+        assert worksheet.col_values.call_count == 1
+
+    @pytest.mark.database
+    def test_persisted_between_instances(self, file_session_factory):
+        """Test that the index survives a restart"""
+        worksheet, _ = make_worksheet(['P-1', 'P-2'])
+        SheetRowIndex('Sheet').locate(worksheet, ['P-1'])
+
+        restored = SheetRowIndex('Sheet')
+        assert restored.complete
+        assert restored.get('P-2') == 3
+        assert SheetRowIndex('Other').get('P-2') is None
+
+    def test_missing_number_checks_column_before_append(self):
+        """Test that a row pasted by hand after the index was built is found, not appended again"""
+        worksheet, column = make_worksheet(['A-1'])
+        index = SheetRowIndex('Sheet', persist=False)
+        index.locate(worksheet, ['A-1'])
+
+        column.append('M-1')
+
+        assert index.locate(worksheet, ['A-1', 'M-1']) == {'A-1': 2, 'M-1': 3}
+        assert worksheet.col_values.call_count == 2
+
+    @pytest.mark.database
+    def test_rows_added_by_other_process_are_reloaded(self, file_session_factory):
+        """Test that rows another process recorded in sheet_rows are found without reading the column"""
+        worksheet, column = make_worksheet(['P-1'])
+        index = SheetRowIndex('Sheet')
+        index.locate(worksheet, ['P-1'])
+
+        column.append('P-2')
+        SheetRowIndex('Sheet').set_many({'P-2': 3})
+
+        assert index.locate(worksheet, ['P-2']) == {'P-2': 3}
+        assert worksheet.col_values.call_count == 1
@@ -0,0 +1,137 @@
+"""
+Tests for the durable Google Sheets outbox and its background worker
+"""
+import pytest
+from datetime import datetime, timedelta
+
+import database.crud as crud
+from database.crud import AnnouncementCRUD, SheetOutboxCRUD
+from database.models import SheetOutbox
+from utils.metrics import get_metrics
+from utils.sheet_outbox import SheetOutboxWorker
+
+
+@pytest.fixture
+def sheets_enabled(monkeypatch):
+    """Enable outbox writes (Google Sheets is disabled in the test config)"""
+    monkeypatch.setattr(crud, 'GOOGLE_SHEETS_ENABLED', True)
+
+
+def outbox_of(session_factory):
+    """{announcement_id: SheetOutbox} snapshot"""
+    session = session_factory()
+    try:
+        return {entry.announcement_id: entry for entry in session.query(SheetOutbox)}
+    finally:
+        session.close()
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestWriteRows:
+    """Test GoogleSheetsManager.write_rows"""
+
+    def test_batch_uses_constant_number_of_calls(self, make_announcement, make_manager):
+        """Test that a batch costs one read, one append and one update (no format requests)"""
+        manager = make_manager(existing_numbers=['OLD-1', 'OLD-2'])
+        rows = {
+            f"NEW-{index}": (manager._announcement_to_row(make_announcement(f"NEW-{index}")), 'pending')
+            for index in range(5)
+        }
+        rows['OLD-2'] = (manager._announcement_to_row(make_announcement('OLD-2', status='accepted')), 'accepted')
+
+        assert manager.write_rows(rows) == {'added': 5, 'updated': 1}
+        assert manager.worksheet.col_values.call_count == 1
+        assert manager.worksheet.append_rows.call_count == 1
+        assert manager.worksheet.batch_update.call_count == 1
+        manager.spreadsheet.batch_update.assert_not_called()
+        manager.worksheet.append_row.assert_not_called()
+        manager.worksheet.format.assert_not_called()
+
+        updates = manager.worksheet.batch_update.call_args[0][0]
+        assert [update['range'] for update in updates] == ['A3:N3']
+
+
+@pytest.mark.database
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestSheetOutbox:
+    """Test SheetOutboxCRUD and SheetOutboxWorker"""
+
+    def test_changes_are_enqueued_in_transaction_and_coalesced(self, file_session_factory, sheets_enabled):
+        """Test that create and status changes leave one outbox row per announcement"""
+        announcement_id = AnnouncementCRUD.create({'announcement_number': 'O-1', 'manager_id': 1}).id
+        created = outbox_of(file_session_factory)[announcement_id]
+
+        assert AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1)
+        AnnouncementCRUD.mark_as_processed(announcement_id)
+
+        outbox = outbox_of(file_session_factory)
+        assert list(outbox) == [announcement_id]
+        assert outbox[announcement_id].created_at == created.created_at
+        assert outbox[announcement_id].changed_at > created.changed_at
+
+    def test_rolled_back_change_is_not_enqueued(self, file_session_factory, sheets_enabled):
+        """Test that the outbox row shares the fate of the change"""
+        session = file_session_factory()
+        AnnouncementCRUD.create({'announcement_number': 'O-2', 'manager_id': 1}, session=session)
+        session.rollback()
+        session.close()
+
+        assert outbox_of(file_session_factory) == {}
+
+    def test_disabled_sheets_skip_outbox(self, file_session_factory):
+        """Test that nothing is queued when Google Sheets is disabled"""
+        AnnouncementCRUD.create({'announcement_number': 'O-3', 'manager_id': 1})
+
+        assert outbox_of(file_session_factory) == {}
+
+    def test_worker_writes_batch_and_clears_queue(self, file_session_factory, sheets_enabled, make_manager):
+        """Test that one drain writes all queued rows in one batch and publishes the lag"""
+        for index in range(3):
+            AnnouncementCRUD.create({'announcement_number': f"W-{index}", 'manager_id': 1})
+        manager = make_manager()
+
+        assert SheetOutboxWorker(manager).drain() == 3
+        assert manager.worksheet.append_rows.call_count == 1
+        assert outbox_of(file_session_factory) == {}
+        assert get_metrics().snapshot()['gauges']['sheet_outbox']['pending'] == 0
+
+    def test_failed_write_backs_off(self, file_session_factory, sheets_enabled, make_manager):
+        """Test that an API error keeps rows with an exponential retry delay"""
+        announcement_id = AnnouncementCRUD.create({'announcement_number': 'F-1', 'manager_id': 1}).id
+        manager = make_manager()
+        manager.worksheet.append_rows.side_effect = Exception('429 quota')
+        worker = SheetOutboxWorker(manager)
+        now = datetime.utcnow() + timedelta(seconds=1)
+
+        assert worker.drain_once(now) == {'written': 0, 'failed': 1}
+        entry = outbox_of(file_session_factory)[announcement_id]
+        assert entry.attempts == 1
+        assert entry.next_attempt_at == now + timedelta(seconds=crud.SHEET_OUTBOX_RETRY_BASE)
+        assert '429' in entry.last_error
+
+        # До срока повтора пачка пуста
+        assert SheetOutboxCRUD.get_batch(now) == []
+        assert SheetOutboxCRUD.get_lag(now)['failing'] == 1
+
+        manager.worksheet.append_rows.side_effect = None
+        later = entry.next_attempt_at
+        assert worker.drain_once(later)['written'] == 1
+        assert outbox_of(file_session_factory) == {}
+
+    def test_retry_delay_is_capped(self):
+        """Test exponential backoff bounds"""
+        assert SheetOutboxCRUD.retry_delay(1) == timedelta(seconds=crud.SHEET_OUTBOX_RETRY_BASE)
+        assert SheetOutboxCRUD.retry_delay(2) == timedelta(seconds=crud.SHEET_OUTBOX_RETRY_BASE * 2)
+        assert SheetOutboxCRUD.retry_delay(50) == timedelta(seconds=crud.SHEET_OUTBOX_RETRY_MAX)
+
+    def test_change_during_write_stays_queued(self, file_session_factory, sheets_enabled):
+        """Test that a row changed after the batch was read is written again"""
+        announcement_id = AnnouncementCRUD.create({'announcement_number': 'C-1', 'manager_id': 1}).id
+        batch = SheetOutboxCRUD.get_batch()
+
+        assert AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1)
+
+        assert SheetOutboxCRUD.complete([(entry[0], entry[1]) for entry in batch]) == 0
+        assert list(outbox_of(file_session_factory)) == [announcement_id]
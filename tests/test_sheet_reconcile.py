@@ -0,0 +1,99 @@
+"""
+Tests for the diff-based full reconciliation of the sheet with the DB
+"""
+import pytest
+
+
+def sheet_row(manager, item):
+    """Row as stored in the sheet, with its hash (trailing empty cells trimmed like the API does)"""
+    row = manager._with_hash(manager._announcement_to_row(item))
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestReconcile:
+    """Test GoogleSheetsManager.reconcile"""
+
+    def test_writes_only_changed_rows_in_batches(self, make_announcement, make_manager):
+        """Test one read, one batch update with merged ranges and one append"""
+        stored = [make_announcement(f"R-{index}") for index in range(6)]
+        manager = make_manager([])
+        manager.worksheet.get_all_values.return_value = [list(manager.HEADERS)] + [
+            sheet_row(manager, item) for item in stored
+        ] + [['', '', 'ONLY-IN-SHEET']]
+
+        current = list(stored)
+        current[1] = make_announcement('R-1', status='accepted')
+        current[2] = make_announcement('R-2', participation_details='details')
+        current[5] = make_announcement('R-5', status='rejected', rejection_reason='price')
+        current += [make_announcement('N-1'), make_announcement('N-2')]
+
+        stats = manager.reconcile(current)
+
+        assert stats == {'total': 8, 'unchanged': 3, 'updated': 3, 'added': 2,
+                         'extra': 1, 'duplicates': 0, 'errors': 0}
+        assert manager.worksheet.get_all_values.call_count == 1
+        manager.worksheet.col_values.assert_not_called()
+        assert manager.worksheet.batch_update.call_count == 1
+        assert manager.worksheet.append_rows.call_count == 1
+        manager.worksheet.update.assert_not_called()
+        manager.worksheet.append_row.assert_not_called()
+
+        ranges = [update['range'] for update in manager.worksheet.batch_update.call_args[0][0]]
+        assert ranges == ['A3:N4', 'A7:N7']
+
+    def test_in_sync_sheet_costs_one_read(self, make_announcement, make_manager):
+        """Test that an unchanged sheet is only read"""
+        items = [make_announcement(f"S-{index}", status='accepted') for index in range(3)]
+        manager = make_manager([])
+        manager.worksheet.get_all_values.return_value = [list(manager.HEADERS)] + [
+            sheet_row(manager, item) for item in items
+        ]
+
+        stats = manager.reconcile(items)
+
+        assert stats['unchanged'] == 3 and stats['updated'] == 0 and stats['added'] == 0
+        manager.worksheet.batch_update.assert_not_called()
+        manager.worksheet.append_rows.assert_not_called()
+        manager.spreadsheet.batch_update.assert_not_called()
+
+    def test_rebuilds_row_index_from_read(self, make_announcement, make_manager):
+        """Test that the full read also refreshes the row index"""
+        items = [make_announcement('I-1'), make_announcement('I-2')]
+        manager = make_manager([])
+        manager.worksheet.get_all_values.return_value = [list(manager.HEADERS)] + [
+            sheet_row(manager, item) for item in items
+        ] + [sheet_row(manager, items[0])]
+
+        stats = manager.reconcile(items)
+
+        assert stats['duplicates'] == 1
+        assert manager.row_index.complete
+        assert manager.row_index.get('I-2') == 3
+
+    def test_sync_all_uses_reconcile(self, make_announcement, make_manager):
+        """Test that the full resync no longer goes row by row"""
+        manager = make_manager([])
+
+        stats = manager.sync_all_announcements([make_announcement(f"A-{index}") for index in range(10)])
+
+        assert stats['added'] == 10 and stats['errors'] == 0
+        assert manager.worksheet.append_rows.call_count == 1
+        manager.worksheet.append_row.assert_not_called()
+
+    def test_rows_without_hash_are_rewritten(self, make_announcement, make_manager):
+        """Test that rows written before the hash column get it on the next reconcile"""
+        item = make_announcement('H-1')
+        manager = make_manager([])
+        manager.worksheet.get_all_values.return_value = [list(manager.HEADERS)] + [
+            manager._announcement_to_row(item)
+        ]
+
+        stats = manager.reconcile([item])
+
+        assert stats['updated'] == 1
+        written = manager.worksheet.batch_update.call_args[0][0][0]['values'][0]
+        assert written[-1] == manager._row_hash(manager._announcement_to_row(item))
@@ -0,0 +1,90 @@
+"""
+Tests for the Google Sheets API quota governor
+"""
+import pytest
+from unittest.mock import MagicMock, Mock
+
+import gspread
+
+from utils.metrics import get_metrics
+from utils.sheets_quota import SheetsQuotaGovernor, GovernedProxy
+
+
+def api_error(code):
+    """gspread APIError with the given HTTP code"""
+    response = Mock()
+    response.json.return_value = {'error': {'code': code, 'message': 'error', 'status': 'ERROR'}}
+    return gspread.exceptions.APIError(response)
+
+
+def make_governor(read_quota=2, write_quota=5):
+    """Governor that records waits instead of sleeping"""
+    waits = []
+    return SheetsQuotaGovernor(read_quota, write_quota, period=60, sleep=waits.append), waits
+
+
+@pytest.mark.google_sheets
+@pytest.mark.unit
+class TestQuotaGovernor:
+    """Test SheetsQuotaGovernor"""
+
+    def test_queues_when_read_budget_is_exhausted(self):
+        """Test that calls beyond the budget wait for a refill instead of failing"""
+        governor, waits = make_governor(read_quota=2)
+
+        for _ in range(4):
+            governor.acquire('read')
+
+        assert len(waits) == 2
+        assert waits[0] == pytest.approx(30, abs=0.5)   # 2 запроса в минуту - токен раз в 30 с
+        assert waits[1] == pytest.approx(60, abs=0.5)   # следующий в очереди - еще через 30 с
+        stats = governor.snapshot()['read']
+        assert stats['calls'] == 4 and stats['throttled_calls'] == 2 and stats['remaining'] == 0
+
+    def test_read_and_write_budgets_are_separate(self):
+        """Test that reads do not consume the write budget"""
+        governor, waits = make_governor(read_quota=1, write_quota=5)
+
+        governor.acquire('read')
+        governor.acquire('read')
+
+        assert governor.remaining('write') == 5
+        assert governor.remaining('read') == 0
+        assert len(waits) == 1
+
+    def test_rate_limit_drains_bucket_and_retries(self):
+        """Test that a 429 empties the budget, waits and retries once"""
+        governor, waits = make_governor(write_quota=5)
+        func = Mock(side_effect=[api_error(429), 'ok'])
+
+        assert governor.call('write', func, 'A1') == 'ok'
+        assert func.call_count == 2
+        assert len(waits) == 1
+        assert governor.snapshot()['write']['rate_limited'] == 1
+
+    def test_other_api_errors_are_not_retried(self):
+        """Test that non-quota errors propagate immediately"""
+        governor, _ = make_governor()
+        func = Mock(side_effect=api_error(403))
+
+        with pytest.raises(gspread.exceptions.APIError):
+            governor.call('write', func)
+        assert func.call_count == 1
+
+    def test_proxy_classifies_methods(self):
+        """Test that the proxy charges API methods and passes attributes through"""
+        governor, _ = make_governor(read_quota=10, write_quota=10)
+        worksheet = MagicMock()
+        worksheet.id = 3
+        proxy = governor.wrap(worksheet)
+
+        proxy.col_values(3)
+        proxy.batch_update([])
+        proxy.append_rows([])
+
+        assert isinstance(proxy, GovernedProxy) and governor.wrap(proxy) is proxy
+        assert proxy.id == 3
+        worksheet.col_values.assert_called_once_with(3)
+        snapshot = governor.snapshot()
+        assert snapshot['read']['used'] == 1 and snapshot['write']['used'] == 2
+        assert get_metrics().snapshot()['gauges']['sheets_quota']['write']['calls'] == 2
@@ -0,0 +1,109 @@
+"""
+Tests for one DB session (unit of work) per bot update
+"""
+import time
+import pytest
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+from sqlalchemy import event
+
+from bot.middlewares import DbSessionMiddleware
+from database.async_crud import AsyncAnnouncementCRUD
+from database.crud import AnnouncementCRUD, ManagerActionCRUD
+from database.models import Announcement, ManagerAction, commit_unit_of_work
+
+
+@pytest.fixture
+def announcement_id(file_session_factory, sample_announcement_data):
+    """Pending announcement owned by manager 1"""
+    session = file_session_factory()
+    announcement = Announcement(**sample_announcement_data)
+    session.add(announcement)
+    session.commit()
+    announcement_id = announcement.id
+    session.close()
+    return announcement_id
+
+
+def count_statements(session):
+    """Collect SQL statements executed through the session's engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+@pytest.mark.database
+@pytest.mark.unit
+class TestUnitOfWork:
+    """Test CRUD calls sharing one session"""
+
+    def test_accept_is_one_transaction(self, file_session_factory, announcement_id):
+        """Test that accept = one conditional update, one row fetch, one commit"""
+        session = file_session_factory(expire_on_commit=False)
+        statements = count_statements(session)
+
+        assert AnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1, session=session)
+        ManagerActionCRUD.create({
+            'announcement_id': announcement_id,
+            'manager_id': 1,
+            'manager_name': 'Test Manager',
+            'action': 'accepted'
+        }, session=session)
+        announcement = AnnouncementCRUD.get_by_id(announcement_id, session=session)
+
+        selects = [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+        assert len(selects) == 1
+
+        # До фиксации другие сессии изменений не видят
+        other = file_session_factory()
+        assert other.get(Announcement, announcement_id).status == 'pending'
+        other.close()
+
+        commit_unit_of_work(session)
+
+        assert announcement.status == 'accepted'
+        session.close()
+
+        other = file_session_factory()
+        assert other.get(Announcement, announcement_id).status == 'accepted'
+        assert other.query(ManagerAction).count() == 1
+        other.close()
+
+    async def test_middleware_provides_and_commits_session(self, file_session_factory, announcement_id):
+        """Test that the middleware injects one session and commits it after the handler"""
+        router = Router()
+        seen_sessions = []
+
+        @router.message()
+        async def accept(message: Message, session):
+            seen_sessions.append(session)
+            await AsyncAnnouncementCRUD.update_status(announcement_id, 'accepted', manager_id=1, session=session)
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        dp.update.outer_middleware(DbSessionMiddleware())
+        bot = Bot(token='123456:TEST-token')
+
+        await dp.feed_update(bot, Update.model_validate({
+            'update_id': 1,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': 42, 'type': 'private'},
+                'from': {'id': 42, 'is_bot': False, 'first_name': 'Test'},
+                'text': 'accept'
+            }
+        }))
+
+        assert len(seen_sessions) == 1
+
+        other = file_session_factory()
+        assert other.get(Announcement, announcement_id).status == 'accepted'
+        other.close()
+
+        await bot.session.close()
@@ -0,0 +1,121 @@
+"""
+Tests for webhook mode (bot/webhook.py)
+Sends fake Telegram updates to the embedded aiohttp server
+"""
+import asyncio
+import time
+import pytest
+
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from bot.webhook import WebhookServer, SECRET_HEADER
+
+
+SECRET = 'test-secret'
+PATH = '/telegram/webhook'
+
+
+def fake_message_update(update_id: int, text: str = '/start') -> dict:
+    """Fake Telegram update with a private text message"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': 42, 'type': 'private'},
+            'from': {'id': 42, 'is_bot': False, 'first_name': 'Test'},
+            'text': text
+        }
+    }
+
+
+@pytest.fixture
+def handled():
+    """Texts of messages that reached the handler"""
+    return []
+
+
+@pytest.fixture
+def webhook_server(handled):
+    """Webhook server with a dispatcher that records incoming messages"""
+    router = Router()
+
+    @router.message()
+    async def record(message: Message):
+        await asyncio.sleep(0.05)
+        handled.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token='123456:TEST-token')
+
+    return WebhookServer(dp, bot, secret=SECRET, path=PATH, drain_timeout=5)
+
+
+@pytest.fixture
+async def client(webhook_server):
+    """aiohttp test client for the webhook app"""
+    test_client = TestClient(TestServer(webhook_server.build_app()))
+    await test_client.start_server()
+    yield test_client
+    await test_client.close()
+
+
+@pytest.mark.unit
+class TestWebhookServer:
+    """Test WebhookServer request handling"""
+
+    async def test_rejects_wrong_secret(self, client, webhook_server, handled):
+        """Test that updates without the secret token are rejected"""
+        response = await client.post(PATH, json=fake_message_update(1), headers={SECRET_HEADER: 'wrong'})
+
+        assert response.status == 401
+        assert webhook_server.rejected == 1
+
+        await webhook_server.drain()
+        assert handled == []
+
+    async def test_processes_update(self, client, webhook_server, handled):
+        """Test that a valid update reaches the dispatcher"""
+        response = await client.post(PATH, json=fake_message_update(1, '/help'), headers={SECRET_HEADER: SECRET})
+
+        assert response.status == 200
+
+        await webhook_server.drain()
+        assert handled == ['/help']
+
+    async def test_deduplicates_redelivered_update(self, client, webhook_server, handled):
+        """Test that Telegram re-delivery of the same update_id is processed once"""
+        for _ in range(3):
+            response = await client.post(PATH, json=fake_message_update(7), headers={SECRET_HEADER: SECRET})
+            assert response.status == 200
+
+        await webhook_server.drain()
+        assert handled == ['/start']
+        assert webhook_server.duplicates == 2
+
+    async def test_drain_waits_for_in_flight_updates(self, client, webhook_server, handled):
+        """Test graceful drain: accepted updates finish, new ones get 503"""
+        for update_id in range(1, 6):
+            await client.post(PATH, json=fake_message_update(update_id), headers={SECRET_HEADER: SECRET})
+
+        await webhook_server.drain()
+        assert len(handled) == 5
+
+        response = await client.post(PATH, json=fake_message_update(100), headers={SECRET_HEADER: SECRET})
+        assert response.status == 503
+
+    async def test_health(self, client, webhook_server):
+        """Test /health endpoint"""
+        await client.post(PATH, json=fake_message_update(1), headers={SECRET_HEADER: SECRET})
+
+        response = await client.get('/health')
+        data = await response.json()
+
+        assert response.status == 200
+        assert data['status'] == 'ok'
+        assert data['received'] == 1
+
+        await webhook_server.drain()
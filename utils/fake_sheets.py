@@ -0,0 +1,351 @@
+"""
+Имитация Google Sheets в памяти (для тестов и бенчмарков синхронизации)
+
+FakeSpreadsheet / FakeWorksheet реализуют те вызовы gspread, которыми пользуется
+GoogleSheetsManager (col_values, row_values, get_all_values, batch_get, append_row(s),
+update, batch_update, format, batch_clear, freeze, delete_columns,
+fetch_sheet_metadata, batch_update таблицы). Все вызовы считаются в общем
+FakeSheetsBackend, который умеет добавлять задержку на вызов и возвращать 429 при
+превышении квоты - так видно, сколько запросов делает путь синхронизации и как он
+ведет себя на десятках тысяч строк, без сети и учетных данных.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import List, Optional
+
+import gspread
+
+_A1_CELL = re.compile(r'^([A-Z]+)?(\d+)?$')
+
+
+def _column_index(letters: str) -> int:
+    """'A' -> 1, 'M' -> 13, 'AA' -> 27"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def parse_a1(range_name: str) -> tuple:
+    """
+    Диапазон A1 -> (первая строка, первый столбец, последняя строка, последний столбец)
+
+    Отсутствующие границы ('A:A', '1:1') - None.
+    """
+    range_name = range_name.split('!')[-1].replace("'", '')
+    start, _, end = range_name.partition(':')
+    end = end or start
+
+    bounds = []
+    for cell in (start, end):
+        match = _A1_CELL.match(cell)
+        if not match:
+            raise ValueError(f"Неверный диапазон: {range_name}")
+        letters, digits = match.groups()
+        bounds.append((int(digits) if digits else None, _column_index(letters) if letters else None))
+
+    (first_row, first_col), (last_row, last_col) = bounds
+    return first_row, first_col, last_row, last_col
+
+
+class _FakeResponse:
+    """Ответ API для gspread.exceptions.APIError"""
+
+    def __init__(self, code: int, message: str):
+        self.status_code = code
+        self.text = message
+        self._error = {'code': code, 'message': message, 'status': 'RESOURCE_EXHAUSTED' if code == 429 else 'ERROR'}
+
+    def json(self):
+        return {'error': self._error}
+
+
+class FakeSheetsBackend:
+    """
+    Общий счетчик вызовов и поведение "сервера"
+
+    Args:
+        latency: Задержка каждого вызова (секунды)
+        quota_per_minute: Сколько вызовов пропускать за 60 с (None - без лимита); сверх - 429
+        window: Окно квоты в секундах
+    """
+
+    def __init__(self, latency: float = 0.0, quota_per_minute: Optional[int] = None, window: float = 60.0):
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.window = window
+        self.calls = Counter()
+        self.errors = Counter()
+        self._recent = deque()
+        self._fail_next = []  # коды ошибок для ближайших вызовов
+        self._lock = threading.Lock()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        """Сбросить счетчики вызовов"""
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def fail_next(self, code: int = 429, times: int = 1):
+        """Следующие times вызовов завершатся ошибкой API с кодом code"""
+        with self._lock:
+            self._fail_next.extend([code] * times)
+
+    def record(self, method: str):
+        """Учесть вызов: задержка, квота, запланированные ошибки"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[method] += 1
+
+            if self._fail_next:
+                code = self._fail_next.pop(0)
+                self.errors[code] += 1
+                raise gspread.exceptions.APIError(_FakeResponse(code, f"Fake error {code} in {method}"))
+
+            if self.quota_per_minute is not None:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= self.window:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    self.errors[429] += 1
+                    raise gspread.exceptions.APIError(_FakeResponse(429, 'Quota exceeded'))
+                self._recent.append(now)
+
+
+class FakeWorksheet:
+    """Лист: строки хранятся списками строк (строка 1 - заголовок)"""
+
+    def __init__(self, backend: FakeSheetsBackend, title: str, sheet_id: int = 0, cols: int = 26):
+        self.backend = backend
+        self.title = title
+        self.id = sheet_id
+        self.col_count = cols
+        self.frozen_rows = 0
+        self.rows: List[List[str]] = []
+
+    # --- служебное ---
+
+    def _row(self, number: int) -> List[str]:
+        while len(self.rows) < number:
+            self.rows.append([])
+        row = self.rows[number - 1]
+        return row
+
+    def _set(self, first_row: int, first_col: int, values: List[list]):
+        for row_offset, row_values in enumerate(values):
+            row = self._row(first_row + row_offset)
+            for col_offset, value in enumerate(row_values):
+                col = first_col + col_offset
+                while len(row) < col:
+                    row.append('')
+                row[col - 1] = '' if value is None else value
+
+    @staticmethod
+    def _trim(row: list) -> list:
+        row = list(row)
+        while row and row[-1] == '':
+            row.pop()
+        return row
+
+    def _last_row(self) -> int:
+        for index in range(len(self.rows), 0, -1):
+            if any(value != '' for value in self.rows[index - 1]):
+                return index
+        return 0
+
+    def _appended(self, first_row: int, count: int, width: int) -> dict:
+        last_column = gspread.utils.rowcol_to_a1(1, max(width, 1)).rstrip('1')
+        return {'updates': {
+            'updatedRange': f"'{self.title}'!A{first_row}:{last_column}{first_row + count - 1}",
+            'updatedRows': count
+        }}
+
+    # --- чтение ---
+
+    def row_values(self, row: int, **kwargs) -> list:
+        self.backend.record('row_values')
+        return self._trim(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col: int, **kwargs) -> list:
+        self.backend.record('col_values')
+        values = [row[col - 1] if len(row) >= col else '' for row in self.rows[:self._last_row()]]
+        return self._trim(values)
+
+    def get_all_values(self, **kwargs) -> List[list]:
+        self.backend.record('get_all_values')
+        rows = self.rows[:self._last_row()]
+        width = max((len(self._trim(row)) for row in rows), default=0)
+        return [list(row[:width]) + [''] * (width - len(row[:width])) for row in rows]
+
+    def batch_get(self, ranges: List[str], **kwargs) -> list:
+        self.backend.record('batch_get')
+        result = []
+        for range_name in ranges:
+            first_row, first_col, last_row, last_col = parse_a1(range_name)
+            values = []
+            for number in range(first_row, (last_row or first_row) + 1):
+                row = self.rows[number - 1] if number <= len(self.rows) else []
+                values.append(self._trim(row[first_col - 1:(last_col or first_col)]))
+            while values and not values[-1]:
+                values.pop()
+            result.append(values)
+        return result
+
+    # --- запись ---
+
+    def append_row(self, values: list, **kwargs) -> dict:
+        self.backend.record('append_row')
+        first_row = self._last_row() + 1
+        self._set(first_row, 1, [values])
+        return self._appended(first_row, 1, len(values))
+
+    def append_rows(self, values: List[list], **kwargs) -> dict:
+        self.backend.record('append_rows')
+        first_row = self._last_row() + 1
+        self._set(first_row, 1, values)
+        return self._appended(first_row, len(values), max((len(row) for row in values), default=1))
+
+    def update(self, *args, **kwargs) -> dict:
+        """update(range, values) или update(values, range) - как допускает gspread"""
+        self.backend.record('update')
+        first, second = (list(args) + [None, None])[:2]
+        range_name, values = (first, second) if isinstance(first, str) else (second or kwargs.get('range_name'), first)
+        first_row, first_col, _, _ = parse_a1(range_name)
+        self._set(first_row or 1, first_col or 1, values)
+        return {'updatedRange': range_name}
+
+    def batch_update(self, data: List[dict], **kwargs) -> dict:
+        self.backend.record('batch_update')
+        for item in data:
+            first_row, first_col, _, _ = parse_a1(item['range'])
+            self._set(first_row or 1, first_col or 1, item['values'])
+        return {'totalUpdatedCells': sum(len(row) for item in data for row in item['values'])}
+
+    def batch_clear(self, ranges: List[str]) -> dict:
+        self.backend.record('batch_clear')
+        for range_name in ranges:
+            first_row, _, last_row, _ = parse_a1(range_name)
+            for number in range(first_row, (last_row or first_row) + 1):
+                if number <= len(self.rows):
+                    self.rows[number - 1] = []
+        return {}
+
+    def format(self, range_name: str, fmt: dict) -> dict:
+        self.backend.record('format')
+        return {}
+
+    def freeze(self, rows: int = None, cols: int = None) -> dict:
+        self.backend.record('freeze')
+        self.frozen_rows = rows or 0
+        return {}
+
+    def delete_columns(self, start_index: int, end_index: int = None) -> dict:
+        self.backend.record('delete_columns')
+        end_index = end_index or start_index
+        self.col_count -= end_index - start_index + 1
+        for row in self.rows:
+            del row[start_index - 1:end_index]
+        return {}
+
+
+class FakeSpreadsheet:
+    """Таблица: листы и правила условного форматирования"""
+
+    def __init__(self, backend: FakeSheetsBackend = None):
+        self.backend = backend or FakeSheetsBackend()
+        self.sheets = {}  # имя -> FakeWorksheet
+        self.conditional_formats = {}  # sheetId -> список правил
+        self.hidden_columns = {}  # sheetId -> скрытые столбцы (индексы с 0)
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.backend.record('worksheets')
+        return list(self.sheets.values())
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.backend.record('worksheet')
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self.backend.record('add_worksheet')
+        worksheet = FakeWorksheet(self.backend, title, sheet_id=len(self.sheets), cols=cols)
+        self.sheets[title] = worksheet
+        return worksheet
+
+    def fetch_sheet_metadata(self, params: dict = None) -> dict:
+        self.backend.record('fetch_sheet_metadata')
+        return {'sheets': [
+            {
+                'properties': {'sheetId': worksheet.id, 'title': worksheet.title},
+                'conditionalFormats': [dict(rule) for rule in self.conditional_formats.get(worksheet.id, [])]
+            }
+            for worksheet in self.sheets.values()
+        ]}
+
+    def batch_update(self, body: dict) -> dict:
+        self.backend.record('spreadsheet.batch_update')
+        for request in body.get('requests', []):
+            if 'addConditionalFormatRule' in request:
+                add = request['addConditionalFormatRule']
+                sheet_id = add['rule']['ranges'][0]['sheetId']
+                self.conditional_formats.setdefault(sheet_id, []).insert(add.get('index', 0), add['rule'])
+            elif 'deleteConditionalFormatRule' in request:
+                delete = request['deleteConditionalFormatRule']
+                del self.conditional_formats[delete['sheetId']][delete['index']]
+            elif 'updateDimensionProperties' in request:
+                update = request['updateDimensionProperties']
+                columns = self.hidden_columns.setdefault(update['range']['sheetId'], set())
+                indexes = set(range(update['range']['startIndex'], update['range']['endIndex']))
+                if update['properties'].get('hiddenByUser'):
+                    columns |= indexes
+                else:
+                    columns -= indexes
+        return {'replies': []}
+
+
+def create_fake_manager(spreadsheet: FakeSpreadsheet = None, title: str = 'Объявления', governor=None,
+                        sharding: str = 'none'):
+    """
+    GoogleSheetsManager поверх имитации (без учетных данных и сети)
+
+    Инициализация та же, что у настоящего: лист создается при отсутствии, ставятся
+    заголовки и правила цвета статуса. Индекс строк - только в памяти.
+
+    Args:
+        spreadsheet: Таблица (по умолчанию - новая, без задержек и квот)
+        title: Имя листа
+        governor: SheetsQuotaGovernor, через который пойдут вызовы (по умолчанию - напрямую)
+        sharding: Режим разбиения на листы (как SHEETS_SHARDING)
+    """
+    from utils.google_sheets import GoogleSheetsManager
+    from utils.sheet_index import SheetRowIndex
+
+    spreadsheet = spreadsheet or FakeSpreadsheet()
+    wrap = governor.wrap if governor else (lambda target: target)
+
+    manager = GoogleSheetsManager.__new__(GoogleSheetsManager)
+    manager.enabled = True
+    manager.client = object()
+    manager.sharding = sharding
+    manager.persist_index = False
+    manager._wrap = wrap
+    manager.spreadsheet = wrap(spreadsheet)
+    try:
+        manager.worksheet = wrap(manager.spreadsheet.worksheet(title))
+    except gspread.WorksheetNotFound:
+        manager.worksheet = wrap(manager.spreadsheet.add_worksheet(
+            title=title, rows=1000, cols=len(GoogleSheetsManager.SHEET_HEADERS)
+        ))
+    manager._initialize_headers()
+    manager.row_index = SheetRowIndex(title, persist=False)
+    manager._initialize_shards()
+    return manager
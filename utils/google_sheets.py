@@ -2,6 +2,7 @@
 Модуль для работы с Google Sheets API
 Обеспечивает синхронизацию данных из базы данных с Google таблицей
 """
+import hashlib
 import os
 import sys
 from datetime import datetime, timedelta
@@ -12,6 +13,8 @@ from loguru import logger
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.sheet_index import SheetRowIndex
+from utils.sheets_quota import get_sheets_quota
 from config import (
     GOOGLE_SHEETS_ENABLED,
     GOOGLE_SERVICE_ACCOUNT_FILE,
@@ -19,6 +22,11 @@ from config import (
     GOOGLE_SHEET_NAME
 )
 
+# Разбиение на листы: none - все объявления на одном листе GOOGLE_SHEET_NAME,
+# month - отдельный лист на месяц добавления ("<GOOGLE_SHEET_NAME> 2026-10") и сводный лист
+SHEETS_SHARDING = os.getenv('SHEETS_SHARDING', 'none').lower()
+SHEETS_SUMMARY_NAME = os.getenv('SHEETS_SUMMARY_NAME', 'Сводка')
+
 
 class GoogleSheetsManager:
     """Менеджер для работы с Google Sheets"""
@@ -46,12 +54,33 @@ class GoogleSheetsManager:
         'Дата ответа'
     ]
 
+    # Скрытый столбец N: хэш строки в том виде, в каком ее записал бот. Если содержимое
+    # строки с ним не совпадает, строку правили вручную (см. read_sheet_edits)
+    HASH_HEADER = 'Хэш строки'
+    SHEET_HEADERS = HEADERS + [HASH_HEADER]
+
+    # Цвет ячейки статуса
+    STATUS_COLORS = {
+        'accepted': {'red': 0.78, 'green': 0.94, 'blue': 0.81},  # Зеленый для принятых
+        'rejected': {'red': 1.0, 'green': 0.78, 'blue': 0.81},   # Красный для отклоненных
+        'pending': {'red': 1.0, 'green': 0.92, 'blue': 0.61}     # Желтый для ожидающих
+    }
+
+    # Заголовки сводного листа (при разбиении по месяцам)
+    SUMMARY_HEADERS = ['Лист', 'Всего', 'Принято', 'Отклонено', 'Ожидает']
+
+    # Режим разбиения, сохранение индекса строк в БД и обертка учета квот для новых листов
+    sharding = SHEETS_SHARDING
+    persist_index = True
+    _wrap = staticmethod(lambda target: target)
+
     def __init__(self):
         """Инициализация менеджера Google Sheets"""
         self.enabled = GOOGLE_SHEETS_ENABLED
         self.client = None
         self.spreadsheet = None
         self.worksheet = None
+        self.row_index = None  # Номер объявления -> строка листа
 
         if self.enabled:
             self._initialize()
@@ -74,23 +103,28 @@ class GoogleSheetsManager:
             )
             self.client = gspread.authorize(credentials)
 
-            # Открытие таблицы
-            self.spreadsheet = self.client.open_by_key(GOOGLE_SPREADSHEET_ID)
+            # Открытие таблицы; все вызовы API таблицы и листа идут через учет квот
+            quota = get_sheets_quota()
+            self.spreadsheet = quota.wrap(quota.call('read', self.client.open_by_key, GOOGLE_SPREADSHEET_ID))
+            self._wrap = quota.wrap
 
             # Получение или создание листа
             try:
-                self.worksheet = self.spreadsheet.worksheet(GOOGLE_SHEET_NAME)
+                self.worksheet = quota.wrap(self.spreadsheet.worksheet(GOOGLE_SHEET_NAME))
             except gspread.WorksheetNotFound:
                 logger.info(f"Создание нового листа: {GOOGLE_SHEET_NAME}")
-                self.worksheet = self.spreadsheet.add_worksheet(
+                self.worksheet = quota.wrap(self.spreadsheet.add_worksheet(
                     title=GOOGLE_SHEET_NAME,
                     rows=1000,
-                    cols=len(self.HEADERS)
-                )
+                    cols=len(self.SHEET_HEADERS)
+                ))
 
             # Инициализация заголовков
             self._initialize_headers()
 
+            self.row_index = SheetRowIndex(self.worksheet.title, persist=self.persist_index)
+            self._initialize_shards()
+
             logger.success("Google Sheets успешно инициализирован")
 
         except Exception as e:
@@ -102,23 +136,24 @@ class GoogleSheetsManager:
                 logger.error(f"Ошибка инициализации Google Sheets: {e}", exc_info=True)
             self.enabled = False
 
-    def _initialize_headers(self):
-        """Инициализация заголовков таблицы"""
+    def _initialize_headers(self, worksheet=None):
+        """Инициализация заголовков листа (по умолчанию - основного)"""
+        worksheet = worksheet or self.worksheet
         try:
             # Проверка, есть ли уже заголовки
-            existing_headers = self.worksheet.row_values(1)
+            existing_headers = worksheet.row_values(1)
 
-            if not existing_headers or existing_headers != self.HEADERS:
+            if not existing_headers or existing_headers != self.SHEET_HEADERS:
                 # Очистка всей первой строки (удаление старых заголовков)
-                self.worksheet.batch_clear(['1:1'])
+                worksheet.batch_clear(['1:1'])
 
                 # Установка новых заголовков
-                self.worksheet.update('A1', [self.HEADERS])
+                worksheet.update('A1', [self.SHEET_HEADERS])
 
                 # Форматирование заголовков (жирный шрифт, фон)
                 # Диапазон зависит от количества столбцов
                 header_range = f'A1:{chr(64 + len(self.HEADERS))}1'
-                self.worksheet.format(header_range, {
+                worksheet.format(header_range, {
                     'backgroundColor': {
                         'red': 0.27,
                         'green': 0.45,
@@ -138,21 +173,215 @@ class GoogleSheetsManager:
                 })
 
                 # Заморозить первую строку
-                self.worksheet.freeze(rows=1)
+                worksheet.freeze(rows=1)
 
                 # Удалить лишние столбцы если их больше чем нужно
-                current_col_count = self.worksheet.col_count
-                needed_col_count = len(self.HEADERS)
+                current_col_count = worksheet.col_count
+                needed_col_count = len(self.SHEET_HEADERS)
                 if current_col_count > needed_col_count:
                     # Удаляем столбцы справа от нужного количества
-                    self.worksheet.delete_columns(needed_col_count + 1, current_col_count)
+                    worksheet.delete_columns(needed_col_count + 1, current_col_count)
                     logger.info(f"Удалено {current_col_count - needed_col_count} лишних столбцов")
 
+                # Скрыть столбец хэша
+                hash_column = len(self.HEADERS)
+                self.spreadsheet.batch_update({'requests': [{
+                    'updateDimensionProperties': {
+                        'range': {
+                            'sheetId': worksheet.id,
+                            'dimension': 'COLUMNS',
+                            'startIndex': hash_column,
+                            'endIndex': hash_column + 1
+                        },
+                        'properties': {'hiddenByUser': True},
+                        'fields': 'hiddenByUser'
+                    }
+                }]})
+
                 logger.info("Заголовки инициализированы")
 
+            # Цвет статуса - правилами условного форматирования на весь столбец
+            self._ensure_status_rules(worksheet)
+
         except Exception as e:
             logger.error(f"Ошибка инициализации заголовков: {e}")
 
+    def _status_rules(self, worksheet=None) -> List[dict]:
+        """
+        Правила условного форматирования столбца статуса
+
+        Принятые - зеленым, отклоненные - красным, любой другой непустой статус - как
+        ожидающий (правила проверяются по порядку, срабатывает первое подходящее).
+        """
+        status_column = self.HEADERS.index('Статус')
+        cell_range = {
+            'sheetId': (worksheet or self.worksheet).id,
+            'startRowIndex': 1,
+            'startColumnIndex': status_column,
+            'endColumnIndex': status_column + 1
+        }
+        conditions = [
+            ('accepted', {'type': 'TEXT_EQ', 'values': [{'userEnteredValue': self._format_status('accepted')}]}),
+            ('rejected', {'type': 'TEXT_EQ', 'values': [{'userEnteredValue': self._format_status('rejected')}]}),
+            ('pending', {'type': 'NOT_BLANK'})
+        ]
+        return [{
+            'ranges': [dict(cell_range)],
+            'booleanRule': {
+                'condition': condition,
+                'format': {'backgroundColor': self.STATUS_COLORS[status]}
+            }
+        } for status, condition in conditions]
+
+    @staticmethod
+    def _rule_signature(rule: dict) -> tuple:
+        """Существенная часть правила для сравнения (цвета API возвращает с другой точностью)"""
+        boolean_rule = rule.get('booleanRule', {})
+        condition = boolean_rule.get('condition', {})
+        color = boolean_rule.get('format', {}).get('backgroundColor', {})
+        ranges = tuple(
+            tuple(cell_range.get(key) for key in ('startRowIndex', 'endRowIndex', 'startColumnIndex', 'endColumnIndex'))
+            for cell_range in rule.get('ranges', [])
+        )
+        return (
+            ranges,
+            condition.get('type'),
+            tuple(value.get('userEnteredValue') for value in condition.get('values', [])),
+            tuple(round(color.get(channel, 0.0), 2) for channel in ('red', 'green', 'blue'))
+        )
+
+    def _ensure_status_rules(self, worksheet=None) -> bool:
+        """
+        Проверить правила условного форматирования столбца статуса и восстановить их
+
+        Правила листа читаются одним запросом метаданных. Если правила, касающиеся
+        столбца статуса, отличаются от нужных (их нет, изменили или удалили вручную),
+        они заменяются одним batch_update; правила других столбцов не трогаются.
+
+        Returns:
+            True если правила пришлось установить заново
+        """
+        worksheet = worksheet or self.worksheet
+        status_column = self.HEADERS.index('Статус')
+        metadata = self.spreadsheet.fetch_sheet_metadata({
+            'fields': 'sheets(properties.sheetId,conditionalFormats)'
+        })
+        sheet = next(
+            (item for item in metadata.get('sheets', []) if item['properties']['sheetId'] == worksheet.id), {}
+        )
+
+        def touches_status(rule):
+            return any(
+                cell_range.get('startColumnIndex', 0) <= status_column < cell_range.get('endColumnIndex', status_column + 1)
+                for cell_range in rule.get('ranges', [])
+            )
+
+        existing = [(index, rule) for index, rule in enumerate(sheet.get('conditionalFormats', [])) if touches_status(rule)]
+        desired = self._status_rules(worksheet)
+        if [self._rule_signature(rule) for _, rule in existing] == [self._rule_signature(rule) for rule in desired]:
+            return False
+
+        # Удаление - с конца, чтобы индексы оставшихся правил не сдвигались
+        requests = [
+            {'deleteConditionalFormatRule': {'sheetId': worksheet.id, 'index': index}}
+            for index, _ in reversed(existing)
+        ]
+        requests += [
+            {'addConditionalFormatRule': {'rule': rule, 'index': position}}
+            for position, rule in enumerate(desired)
+        ]
+        self.spreadsheet.batch_update({'requests': requests})
+
+        logger.info(f"Правила цвета статуса {'восстановлены' if existing else 'установлены'}")
+        return True
+
+    def _initialize_shards(self):
+        """
+        Подготовка разбиения по месяцам: список листов таблицы и сводный лист
+
+        Листы месяцев создаются при первой записи в них. Сводный лист не копирует
+        строки: на каждый лист месяца в нем одна строка с формулами COUNTA/COUNTIF,
+        которые Google пересчитывает сам.
+        """
+        self._shards = {}
+        if self.sharding != 'month':
+            return
+
+        self._sheet_titles = {worksheet.title for worksheet in self.spreadsheet.worksheets()}
+        self.summary = self._open_worksheet(SHEETS_SUMMARY_NAME, len(self.SUMMARY_HEADERS))
+        titles = self.summary.col_values(1)
+        if titles[:1] != self.SUMMARY_HEADERS[:1]:
+            self.summary.update('A1', [self.SUMMARY_HEADERS])
+            titles = []
+        self._summary_titles = set(titles[1:])
+
+    def _open_worksheet(self, title: str, cols: int):
+        """Открыть лист по имени или создать его (без лишнего запроса, если известно, что его нет)"""
+        if title in self._sheet_titles:
+            return self._wrap(self.spreadsheet.worksheet(title))
+
+        logger.info(f"Создание нового листа: {title}")
+        worksheet = self._wrap(self.spreadsheet.add_worksheet(title=title, rows=1000, cols=cols))
+        self._sheet_titles.add(title)
+        return worksheet
+
+    def _shard_title(self, row_data: List[Any]) -> Optional[str]:
+        """
+        Лист для строки: при разбиении по месяцам - по дате добавления (столбец A),
+        иначе None (основной лист)
+        """
+        if self.sharding != 'month':
+            return None
+        month = str(row_data[0] or '')[:7] if row_data else ''
+        if not month:
+            month = self._utc_to_local(datetime.utcnow()).strftime('%Y-%m')
+        return f"{self.worksheet.title} {month}"
+
+    def _shard(self, title: Optional[str]) -> tuple:
+        """
+        Лист и его индекс строк
+
+        Args:
+            title: Имя листа из _shard_title (None - основной лист)
+
+        Returns:
+            (worksheet, SheetRowIndex)
+        """
+        if title is None:
+            return self.worksheet, self.row_index
+
+        shard = self._shards.get(title)
+        if shard is None:
+            worksheet = self._open_worksheet(title, len(self.SHEET_HEADERS))
+            self._initialize_headers(worksheet)
+            self._register_shard(title)
+            shard = self._shards[title] = (worksheet, SheetRowIndex(title, persist=self.persist_index))
+        return shard
+
+    def _register_shard(self, title: str):
+        """Добавить лист месяца в сводный лист (строка формул)"""
+        if title in self._summary_titles:
+            return
+
+        status_column = self._column_letter(self.HEADERS.index('Статус') + 1)
+        number_column = self._column_letter(self.HEADERS.index('Номер объявления') + 1)
+        source = f"'{title}'!"
+        self.summary.append_row([
+            title,
+            f'=COUNTA({source}{number_column}2:{number_column})',
+            f'=COUNTIF({source}{status_column}2:{status_column};"{self._format_status("accepted")}")',
+            f'=COUNTIF({source}{status_column}2:{status_column};"{self._format_status("rejected")}")',
+            f'=COUNTIF({source}{status_column}2:{status_column};"{self._format_status("pending")}")'
+        ], value_input_option='USER_ENTERED')
+        self._summary_titles.add(title)
+
+    def _group_by_shard(self, items: list, row_of) -> Dict[Optional[str], list]:
+        """Разложить элементы по листам: {имя листа: [элементы]}"""
+        groups = {}
+        for item in items:
+            groups.setdefault(self._shard_title(row_of(item)), []).append(item)
+        return groups
+
     def retry_initialization(self) -> bool:
         """
         Повторная инициализация Google Sheets после восстановления сети
@@ -175,6 +404,16 @@ class GoogleSheetsManager:
             logger.warning("⚠️ Не удалось переинициализировать Google Sheets")
             return False
 
+    @staticmethod
+    def quota_remaining(kind: str = 'write') -> int:
+        """
+        Сколько вызовов API можно сделать сейчас без ожидания квоты
+
+        Args:
+            kind: 'read' или 'write'
+        """
+        return get_sheets_quota().remaining(kind)
+
     def _utc_to_local(self, utc_dt: datetime) -> datetime:
         """
         Конвертация UTC времени в местное время Казахстана (UTC+5)
@@ -199,8 +438,6 @@ class GoogleSheetsManager:
         Returns:
             Список значений для строки
         """
-        import json
-
         # Конвертируем UTC время в местное время Казахстана
         created_at_local = self._utc_to_local(announcement.created_at)
         response_at_local = self._utc_to_local(announcement.response_at)
@@ -215,27 +452,20 @@ class GoogleSheetsManager:
         lots_str = ''
         keywords_str = announcement.keyword_matched or ''
 
-        if announcement.lots:
-            try:
-                # Десериализуем JSON
-                lots_data = json.loads(announcement.lots) if isinstance(announcement.lots, str) else announcement.lots
-
-                if lots_data and isinstance(lots_data, list):
-                    # Форматируем каждый лот
-                    lot_lines = []
-                    for i, lot in enumerate(lots_data, 1):
-                        lot_number = lot.get('number')  # Реальный номер лота
-                        lot_name = lot.get('name', 'N/A')
-
-                        # Используем реальный номер лота если есть, иначе порядковый
-                        lot_display = f"№{lot_number}" if lot_number else f"{i}"
-                        lot_lines.append(f"ЛОТ {lot_display}: {lot_name}")
-
-                    # Объединяем через перенос строки
-                    lots_str = '\n'.join(lot_lines)
-            except:
-                # Фолбэк на старый формат
-                lots_str = announcement.lot_name or ''
+        lots_data = announcement.lots
+        if lots_data and isinstance(lots_data, list):
+            # Форматируем каждый лот
+            lot_lines = []
+            for i, lot in enumerate(lots_data, 1):
+                lot_number = lot.get('number')  # Реальный номер лота
+                lot_name = lot.get('name', 'N/A')
+
+                # Используем реальный номер лота если есть, иначе порядковый
+                lot_display = f"№{lot_number}" if lot_number else f"{i}"
+                lot_lines.append(f"ЛОТ {lot_display}: {lot_name}")
+
+            # Объединяем через перенос строки
+            lots_str = '\n'.join(lot_lines)
         else:
             # Старый формат - один лот
             lots_str = announcement.lot_name or ''
@@ -270,31 +500,46 @@ class GoogleSheetsManager:
         }
         return status_map.get(status, status)
 
-    def _find_row_by_number(self, announcement_number: str) -> Optional[int]:
+    def _find_row_by_number(self, announcement_number: str, shard: tuple = None) -> Optional[int]:
         """
         Найти номер строки по номеру объявления
 
+        Строка берется из индекса (utils/sheet_index.py) и проверяется чтением одной
+        ячейки; весь столбец читается, если индекс не построен, устарел или номера в нем нет.
+
         Args:
             announcement_number: Номер объявления
+            shard: (лист, индекс строк) из _shard (по умолчанию - основной лист)
 
         Returns:
             Номер строки или None
         """
+        worksheet, row_index = shard or (self.worksheet, self.row_index)
         try:
-            # Получить все значения из столбца C (Номер объявления)
-            number_column = self.worksheet.col_values(3)
-
-            # Найти строку с нужным номером объявления
-            for idx, cell_value in enumerate(number_column[1:], start=2):  # Пропускаем заголовок
-                if cell_value and cell_value == announcement_number:
-                    return idx
-
-            return None
+            return row_index.locate(worksheet, [announcement_number]).get(announcement_number)
 
         except Exception as e:
             logger.error(f"Ошибка поиска строки по номеру {announcement_number}: {e}")
             return None
 
+    def _remember_appended(self, response, numbers: List[str], row_index: SheetRowIndex = None) -> Optional[int]:
+        """
+        Запомнить строки добавленных объявлений в индексе
+
+        Returns:
+            Номер первой добавленной строки или None, если его нет в ответе API
+        """
+        if row_index is None:
+            row_index = self.row_index
+        first_row = self._appended_first_row(response)
+        if first_row is None:
+            # Без номера строки индекс нельзя пополнить - перестроится при следующем поиске
+            row_index.invalidate()
+            return None
+
+        row_index.set_many({number: first_row + offset for offset, number in enumerate(numbers)})
+        return first_row
+
     def add_announcement(self, announcement) -> bool:
         """
         Добавить новое объявление в Google Sheets
@@ -310,21 +555,20 @@ class GoogleSheetsManager:
             return False
 
         try:
+            # Преобразование объявления в строку и выбор листа
+            row_data = self._announcement_to_row(announcement)
+            shard = self._shard(self._shard_title(row_data))
+
             # Проверка, не добавлено ли уже это объявление
-            existing_row = self._find_row_by_number(announcement.announcement_number)
+            existing_row = self._find_row_by_number(announcement.announcement_number, shard)
             if existing_row:
                 logger.warning(f"Объявление {announcement.announcement_number} уже существует в строке {existing_row}")
                 return self.update_announcement(announcement)
 
-            # Преобразование объявления в строку
-            row_data = self._announcement_to_row(announcement)
-
-            # Добавление строки
-            self.worksheet.append_row(row_data, value_input_option='USER_ENTERED')
-
-            # Применение цветового кодирования статуса
-            row_number = len(self.worksheet.col_values(1))
-            self._apply_status_formatting(row_number, announcement.status)
+            # Добавление строки (цвет статуса задают правила условного форматирования)
+            worksheet, row_index = shard
+            response = worksheet.append_row(self._with_hash(row_data), value_input_option='USER_ENTERED')
+            self._remember_appended(response, [announcement.announcement_number], row_index)
 
             logger.info(f"Объявление {announcement.announcement_number} добавлено в Google Sheets")
             return True
@@ -348,22 +592,20 @@ class GoogleSheetsManager:
             return False
 
         try:
+            # Преобразование объявления в строку и выбор листа
+            row_data = self._announcement_to_row(announcement)
+            shard = self._shard(self._shard_title(row_data))
+
             # Найти строку с этим объявлением
-            row_number = self._find_row_by_number(announcement.announcement_number)
+            row_number = self._find_row_by_number(announcement.announcement_number, shard)
 
             if not row_number:
                 logger.warning(f"Объявление {announcement.announcement_number} не найдено в Google Sheets, добавляем")
                 return self.add_announcement(announcement)
 
-            # Преобразование объявления в строку
-            row_data = self._announcement_to_row(announcement)
-
-            # Обновление строки (столбцы A-M: 13 столбцов)
-            range_name = f'A{row_number}:M{row_number}'
-            self.worksheet.update(range_name, [row_data], value_input_option='USER_ENTERED')
-
-            # Применение цветового кодирования статуса
-            self._apply_status_formatting(row_number, announcement.status)
+            # Обновление строки (столбцы A-M и хэш в N)
+            range_name = f'A{row_number}:N{row_number}'
+            shard[0].update(range_name, [self._with_hash(row_data)], value_input_option='USER_ENTERED')
 
             logger.info(f"Объявление {announcement.announcement_number} обновлено в Google Sheets (строка {row_number})")
             return True
@@ -372,105 +614,323 @@ class GoogleSheetsManager:
             logger.error(f"Ошибка обновления объявления {announcement.announcement_number} в Google Sheets: {e}")
             return False
 
-    def _apply_status_formatting(self, row_number: int, status: str):
+    @staticmethod
+    def _column_letter(index: int) -> str:
+        """Буква столбца по номеру (с 1)"""
+        return chr(64 + index)
+
+    @staticmethod
+    def _appended_first_row(response) -> Optional[int]:
+        """Номер первой добавленной строки из ответа append_rows ('Лист'!A10:M12 -> 10)"""
+        try:
+            updated_range = response['updates']['updatedRange']
+            start = updated_range.split('!')[-1].split(':')[0]
+            return int(''.join(ch for ch in start if ch.isdigit()))
+        except (KeyError, TypeError, ValueError, IndexError):
+            return None
+
+    def write_rows(self, rows: Dict[str, tuple], held: Optional[list] = None) -> Dict[str, int]:
         """
-        Применить цветовое форматирование в зависимости от статуса
+        Записать пачку строк: на каждый затронутый лист одна проверка индекса строк,
+        один append_rows и один batch_update значений (цвет статуса задают правила
+        условного форматирования)
 
         Args:
-            row_number: Номер строки
-            status: Статус объявления
+            rows: {номер объявления: (значения строки, статус)}
+            held: Если передан список, уже записанные строки сначала читаются одним
+                batch_get; строки, измененные в таблице вручную, не перезаписываются,
+                а добавляются в список в формате read_sheet_edits
+
+        Returns:
+            {'added': N, 'updated': M}
         """
-        try:
-            # Определение цвета в зависимости от статуса
-            if status == 'accepted':
-                # Зеленый для принятых
-                color = {
-                    'red': 0.78,
-                    'green': 0.94,
-                    'blue': 0.81
-                }
-            elif status == 'rejected':
-                # Красный для отклоненных
-                color = {
-                    'red': 1.0,
-                    'green': 0.78,
-                    'blue': 0.81
-                }
-            else:
-                # Желтый для ожидающих
-                color = {
-                    'red': 1.0,
-                    'green': 0.92,
-                    'blue': 0.61
-                }
+        result = {'added': 0, 'updated': 0}
+        if not self.enabled or not rows:
+            return result
+
+        groups = self._group_by_shard(list(rows.items()), lambda item: item[1][0])
+        for title, items in groups.items():
+            written = self._write_shard(self._shard(title), dict(items), held)
+            result['added'] += written['added']
+            result['updated'] += written['updated']
+
+        logger.info(f"Google Sheets: добавлено {result['added']}, обновлено {result['updated']} строк одной пачкой")
+        return result
+
+    def _write_shard(self, shard: tuple, rows: Dict[str, tuple], held: Optional[list] = None) -> Dict[str, int]:
+        """Записать строки одного листа (см. write_rows)"""
+        worksheet, row_index = shard
+
+        # Строки уже записанных объявлений (по индексу, с проверкой)
+        positions = row_index.locate(worksheet, rows.keys())
+        if held is not None and positions:
+            edits = self._find_edits(worksheet, positions)
+            held.extend(edits)
+            rows = {number: item for number, item in rows.items() if number not in {edit['number'] for edit in edits}}
+            positions = {number: row_number for number, row_number in positions.items() if number in rows}
+
+        last_column = self._column_letter(len(self.SHEET_HEADERS))
+        updates = [
+            (positions[number], row_data, status)
+            for number, (row_data, status) in rows.items() if number in positions
+        ]
+        appends = [
+            (number, row_data, status)
+            for number, (row_data, status) in rows.items() if number not in positions
+        ]
 
-            # Найти позицию столбца "Статус" в заголовках
-            status_column_index = self.HEADERS.index('Статус') + 1  # +1 так как индексация с 1
-            status_column_letter = chr(64 + status_column_index)  # A=65, поэтому 64+1=A
+        if updates:
+            worksheet.batch_update([
+                {'range': f'A{row_number}:{last_column}{row_number}', 'values': [self._with_hash(row_data)]}
+                for row_number, row_data, _ in updates
+            ], value_input_option='USER_ENTERED')
 
-            # Применение цвета к столбцу статуса
-            range_name = f'{status_column_letter}{row_number}'
-            self.worksheet.format(range_name, {
-                'backgroundColor': color
-            })
+        if appends:
+            response = worksheet.append_rows(
+                [self._with_hash(row_data) for _, row_data, _ in appends], value_input_option='USER_ENTERED'
+            )
+            self._remember_appended(response, [number for number, _, _ in appends], row_index)
 
-        except Exception as e:
-            logger.error(f"Ошибка применения форматирования к строке {row_number}: {e}")
+        return {'added': len(appends), 'updated': len(updates)}
 
-    def sync_all_announcements(self, announcements: List) -> Dict[str, int]:
+    def _find_edits(self, worksheet, positions: Dict[str, int]) -> List[Dict[str, Any]]:
         """
-        Синхронизация всех объявлений из БД с Google Sheets
+        Строки, измененные вручную, среди записанных (одним batch_get строк A-N)
 
         Args:
-            announcements: Список объектов Announcement
+            positions: {номер объявления: номер строки}
 
         Returns:
-            Словарь со статистикой: {'added': N, 'updated': N, 'errors': N}
+            Правки в формате read_sheet_edits
         """
-        if not self.enabled:
-            return {'added': 0, 'updated': 0, 'errors': 0}
+        last_column = self._column_letter(len(self.SHEET_HEADERS))
+        values = worksheet.batch_get(
+            [f'A{row_number}:{last_column}{row_number}' for row_number in positions.values()],
+            value_render_option='FORMULA', date_time_render_option='FORMATTED_STRING'
+        )
+
+        edits = []
+        for (number, row_number), cells in zip(positions.items(), values):
+            row = list(cells[0]) if cells else []
+            stored_hash = self._stored_hash(row)
+            if not stored_hash or stored_hash == self._row_hash(row):
+                continue
+            row = row[:len(self.HEADERS)]
+            edits.append({
+                'number': number,
+                'sheet': worksheet.title,
+                'row': row_number,
+                'values': row + [''] * (len(self.HEADERS) - len(row)),
+                'stored_hash': stored_hash
+            })
+        return edits
+
+    @staticmethod
+    def _cell_text(value) -> str:
+        """Значение ячейки в виде строки для сравнения (числа из API - без '.0')"""
+        if value is None:
+            return ''
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+
+    def _row_hash(self, values: List[Any]) -> str:
+        """Хэш содержимого строки (столбцы A-M; пустые хвостовые ячейки не различаются)"""
+        cells = [self._cell_text(value) for value in list(values)[:len(self.HEADERS)]]
+        cells += [''] * (len(self.HEADERS) - len(cells))
+        return hashlib.sha1('\x1f'.join(cells).encode('utf-8')).hexdigest()
+
+    def _with_hash(self, row_data: List[Any]) -> List[Any]:
+        """Значения строки для записи: столбцы A-M и их хэш в скрытом столбце N"""
+        return list(row_data) + [self._row_hash(row_data)]
+
+    def _stored_hash(self, row: List[Any]) -> str:
+        """Хэш из скрытого столбца строки листа ('' - строка записана без него)"""
+        return self._cell_text(row[len(self.HEADERS)]) if len(row) > len(self.HEADERS) else ''
+
+    @staticmethod
+    def _merge_ranges(row_numbers: List[int]) -> List[tuple]:
+        """Соседние строки - в диапазоны: [3, 4, 5, 9] -> [(3, 5), (9, 9)]"""
+        ranges = []
+        for row_number in sorted(row_numbers):
+            if ranges and ranges[-1][1] == row_number - 1:
+                ranges[-1] = (ranges[-1][0], row_number)
+            else:
+                ranges.append((row_number, row_number))
+        return ranges
 
-        stats = {'added': 0, 'updated': 0, 'errors': 0}
+    def reconcile(self, announcements: List) -> Dict[str, int]:
+        """
+        Сверка листа с БД по хэшам содержимого строк
 
-        try:
-            # Получить все существующие номера объявлений
-            existing_numbers = set()
-            number_column = self.worksheet.col_values(3)  # Столбец C - Номер объявления
+        Лист читается один раз (get_all_values, формулы и даты - как введены), строки
+        сравниваются с объявлениями по хэшу; перезаписываются только изменившиеся
+        строки (соседние - одним диапазоном, все - одним batch_update), недостающие
+        добавляются одним append_rows. Строки, которых нет в БД, не удаляются и только
+        считаются. Индекс строк перестраивается по прочитанному столбцу номеров.
+        При разбиении по месяцам так сверяется каждый лист, на который приходятся
+        объявления.
 
-            for cell_value in number_column[1:]:  # Пропускаем заголовок
-                if cell_value:
-                    existing_numbers.add(cell_value)
+        Args:
+            announcements: Объявления из БД (Announcement или архивные)
+
+        Returns:
+            {'total', 'unchanged', 'updated', 'added', 'extra', 'duplicates', 'errors'}
+        """
+        stats = {'total': len(announcements), 'unchanged': 0, 'updated': 0, 'added': 0,
+                 'extra': 0, 'duplicates': 0, 'errors': 0}
+        if not self.enabled:
+            return stats
 
-            # Обработка каждого объявления
+        try:
+            unique = {}
             for announcement in announcements:
-                try:
-                    if announcement.announcement_number in existing_numbers:
-                        if self.update_announcement(announcement):
-                            stats['updated'] += 1
-                        else:
-                            stats['errors'] += 1
-                    else:
-                        if self.add_announcement(announcement):
-                            stats['added'] += 1
-                        else:
-                            stats['errors'] += 1
-                except Exception as e:
-                    logger.error(f"Ошибка синхронизации объявления {announcement.announcement_number}: {e}")
-                    stats['errors'] += 1
-
-            logger.success(
-                f"Синхронизация завершена: "
-                f"добавлено {stats['added']}, "
-                f"обновлено {stats['updated']}, "
-                f"ошибок {stats['errors']}"
-            )
+                unique.setdefault(announcement.announcement_number, (announcement, self._announcement_to_row(announcement)))
 
-            return stats
+            groups = self._group_by_shard(list(unique.values()), lambda item: item[1])
+            for title, items in groups.items():
+                self._reconcile_shard(self._shard(title), items, stats)
 
         except Exception as e:
-            logger.error(f"Ошибка синхронизации всех объявлений: {e}")
+            logger.error(f"Ошибка сверки Google Sheets с БД: {e}")
+            stats['errors'] = stats['total'] - stats['unchanged'] - stats['updated'] - stats['added']
             return stats
 
+        logger.success(
+            f"Сверка Google Sheets: всего {stats['total']}, без изменений {stats['unchanged']}, "
+            f"обновлено {stats['updated']}, добавлено {stats['added']}, "
+            f"только в таблице {stats['extra']}, дублей {stats['duplicates']}"
+        )
+        return stats
+
+    def _reconcile_shard(self, shard: tuple, items: List[tuple], stats: Dict[str, int]):
+        """
+        Сверить один лист (см. reconcile)
+
+        Args:
+            shard: (лист, индекс строк)
+            items: [(объявление, значения строки)] с уникальными номерами
+            stats: Статистика, которая дополняется
+        """
+        worksheet, row_index = shard
+        values = worksheet.get_all_values(
+            value_render_option='FORMULA', date_time_render_option='FORMATTED_STRING'
+        )
+
+        number_index = self.HEADERS.index('Номер объявления')
+        existing = {}  # номер -> (строка, хэш содержимого, хэш из столбца N)
+        for row_number, row in enumerate(values[1:], start=2):
+            number = self._cell_text(row[number_index]) if len(row) > number_index else ''
+            if not number:
+                continue
+            if number in existing:
+                stats['duplicates'] += 1
+                continue
+            existing[number] = (row_number, self._row_hash(row), self._stored_hash(row))
+
+        row_index.rebuild([''] + [
+            self._cell_text(row[number_index]) if len(row) > number_index else '' for row in values[1:]
+        ])
+
+        changed = {}  # строка -> (значения, статус)
+        appends = []  # (номер, значения, статус)
+        for announcement, row_data in items:
+            number = announcement.announcement_number
+            if number not in existing:
+                appends.append((number, row_data, announcement.status))
+                continue
+
+            # Строка без хэша (записана до его появления) перезаписывается, чтобы его получить
+            row_number, sheet_hash, stored_hash = existing[number]
+            if sheet_hash == stored_hash == self._row_hash(row_data):
+                stats['unchanged'] += 1
+            else:
+                changed[row_number] = (row_data, announcement.status)
+
+        stats['extra'] += len(set(existing) - {announcement.announcement_number for announcement, _ in items})
+
+        last_column = self._column_letter(len(self.SHEET_HEADERS))
+        if changed:
+            worksheet.batch_update([
+                {
+                    'range': f'A{first}:{last_column}{last}',
+                    'values': [self._with_hash(changed[row_number][0]) for row_number in range(first, last + 1)]
+                }
+                for first, last in self._merge_ranges(list(changed))
+            ], value_input_option='USER_ENTERED')
+            stats['updated'] += len(changed)
+
+        if appends:
+            response = worksheet.append_rows(
+                [self._with_hash(row_data) for _, row_data, _ in appends], value_input_option='USER_ENTERED'
+            )
+            self._remember_appended(response, [number for number, _, _ in appends], row_index)
+            stats['added'] += len(appends)
+
+    def _edit_sheets(self) -> List[tuple]:
+        """Листы с объявлениями: основной и (при разбиении по месяцам) листы месяцев"""
+        shards = [self._shard(None)]
+        if self.sharding == 'month':
+            prefix = f"{self.worksheet.title} "
+            shards += [self._shard(title) for title in sorted(self._sheet_titles) if title.startswith(prefix)]
+        return shards
+
+    def read_sheet_edits(self) -> List[Dict[str, Any]]:
+        """
+        Найти строки, измененные в таблице вручную
+
+        Каждый лист читается одним get_all_values; строка считается измененной, если
+        хэш ее содержимого не совпадает с хэшем в скрытом столбце, который записал
+        бот. Строки без хэша (записаны до его появления) пропускаются. Индекс строк
+        перестраивается по прочитанному столбцу номеров.
+
+        Returns:
+            [{'number', 'sheet', 'row', 'values' (столбцы A-M), 'stored_hash'}]
+        """
+        if not self.enabled:
+            return []
+
+        number_index = self.HEADERS.index('Номер объявления')
+        edits = []
+        for worksheet, row_index in self._edit_sheets():
+            values = worksheet.get_all_values(
+                value_render_option='FORMULA', date_time_render_option='FORMATTED_STRING'
+            )
+            numbers = [''] + [
+                self._cell_text(row[number_index]) if len(row) > number_index else '' for row in values[1:]
+            ]
+            row_index.rebuild(numbers)
+
+            for row_number, row in enumerate(values[1:], start=2):
+                stored_hash = self._stored_hash(row)
+                if not numbers[row_number - 1] or not stored_hash or stored_hash == self._row_hash(row):
+                    continue
+                cells = list(row[:len(self.HEADERS)])
+                edits.append({
+                    'number': numbers[row_number - 1],
+                    'sheet': worksheet.title,
+                    'row': row_number,
+                    'values': cells + [''] * (len(self.HEADERS) - len(cells)),
+                    'stored_hash': stored_hash
+                })
+
+        return edits
+
+    def sync_all_announcements(self, announcements: List) -> Dict[str, int]:
+        """
+        Синхронизация всех объявлений из БД с Google Sheets
+
+        Выполняется сверкой (reconcile): одно чтение листа и несколько пакетных записей
+        вместо 3-4 вызовов API на объявление.
+
+        Args:
+            announcements: Список объектов Announcement
+
+        Returns:
+            Словарь со статистикой: {'added': N, 'updated': N, 'errors': N, ...}
+        """
+        return self.reconcile(announcements)
+
 
 # Глобальный экземпляр менеджера
 _sheets_manager = None
@@ -0,0 +1,189 @@
+"""
+Кэш отрендеренных сообщений об объявлениях
+Хранит готовый HTML по ключу (объявление, вариант), чтобы не разбирать JSON лотов
+и не собирать текст заново при каждом показе объявления
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from loguru import logger
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Максимальное количество сообщений в памяти
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', '2000'))
+
+# Сохранять отрендеренные сообщения в БД (переживают перезапуск бота)
+MESSAGE_CACHE_PERSIST = os.getenv('MESSAGE_CACHE_PERSIST', 'false').lower() in ('true', '1', 'yes')
+
+
+class RenderedMessageCache:
+    """
+    LRU-кэш отрендеренных сообщений
+
+    Ключ записи - (announcement_id, variant), вместе с телом хранится версия объявления
+    (updated_at). Запись с устаревшей версией считается промахом, поэтому изменения
+    строки в БД сбрасывают кэш даже без явного вызова invalidate().
+    """
+
+    def __init__(self, max_size: int = MESSAGE_CACHE_SIZE, persist: bool = MESSAGE_CACHE_PERSIST):
+        self.max_size = max_size
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version_key(version) -> str:
+        """Привести версию (updated_at) к строке для сравнения и хранения"""
+        return version.isoformat() if hasattr(version, 'isoformat') else str(version or '')
+
+    def get(self, announcement_id: int, variant: str, version=None) -> Optional[str]:
+        """
+        Получить сообщение из кэша
+
+        Args:
+            announcement_id: ID объявления
+            variant: Вариант рендера (manager, admin, details, summary, coordinator)
+            version: Версия объявления (updated_at)
+
+        Returns:
+            Текст сообщения или None при промахе
+        """
+        key = (announcement_id, variant)
+        version_key = self._version_key(version)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version_key:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if self.persist:
+            body = self._load(announcement_id, variant, version_key)
+            if body is not None:
+                self._store(key, version_key, body)
+                with self._lock:
+                    self.hits += 1
+                return body
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, announcement_id: int, variant: str, body: str, version=None):
+        """
+        Сохранить сообщение в кэш
+
+        Args:
+            announcement_id: ID объявления
+            variant: Вариант рендера
+            body: Отрендеренный текст
+            version: Версия объявления (updated_at)
+        """
+        version_key = self._version_key(version)
+        self._store((announcement_id, variant), version_key, body)
+
+        if self.persist:
+            self._save(announcement_id, variant, version_key, body)
+
+    def invalidate(self, announcement_id: int):
+        """
+        Удалить все варианты сообщения для объявления
+
+        Args:
+            announcement_id: ID объявления
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == announcement_id]:
+                del self._entries[key]
+
+        if self.persist:
+            self._delete(announcement_id)
+
+    def clear(self):
+        """Очистить кэш в памяти"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _store(self, key: tuple, version_key: str, body: str):
+        """Положить запись в LRU с вытеснением самых старых"""
+        with self._lock:
+            self._entries[key] = (version_key, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _load(self, announcement_id: int, variant: str, version_key: str) -> Optional[str]:
+        """Прочитать сообщение из БД"""
+        from database.models import get_session, RenderedMessage
+
+        session = get_session()
+        try:
+            row = session.query(RenderedMessage).filter(
+                RenderedMessage.announcement_id == announcement_id,
+                RenderedMessage.variant == variant,
+                RenderedMessage.version == version_key
+            ).first()
+            return row.body if row else None
+        except Exception as e:
+            logger.error(f"Ошибка чтения кэша сообщений из БД: {e}")
+            return None
+        finally:
+            session.close()
+
+    def _save(self, announcement_id: int, variant: str, version_key: str, body: str):
+        """Записать сообщение в БД (замена предыдущей версии)"""
+        from database.models import get_session, RenderedMessage
+
+        session = get_session()
+        try:
+            session.merge(RenderedMessage(
+                announcement_id=announcement_id,
+                variant=variant,
+                version=version_key,
+                body=body
+            ))
+            session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша сообщений в БД: {e}")
+            session.rollback()
+        finally:
+            session.close()
+
+    def _delete(self, announcement_id: int):
+        """Удалить сообщения объявления из БД"""
+        from database.models import get_session, RenderedMessage
+
+        session = get_session()
+        try:
+            session.query(RenderedMessage).filter(
+                RenderedMessage.announcement_id == announcement_id
+            ).delete(synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка очистки кэша сообщений в БД: {e}")
+            session.rollback()
+        finally:
+            session.close()
+
+
+# Глобальный экземпляр кэша
+_message_cache = None
+
+
+def get_message_cache() -> RenderedMessageCache:
+    """Получить глобальный экземпляр кэша сообщений"""
+    global _message_cache
+
+    if _message_cache is None:
+        _message_cache = RenderedMessageCache()
+
+    return _message_cache
@@ -0,0 +1,199 @@
+"""
+Метрики производительности обработчиков бота
+
+Для каждого обработчика собирается гистограмма времени выполнения, количество и
+время SQL-запросов (через события SQLAlchemy) и количество вызовов Telegram API.
+Текущие показатели фоновых процессов (например, отставание выгрузки в Google
+Sheets) хранятся как gauges. Запросы и вызовы привязываются к обработчику через contextvars, поэтому работа
+планировщика (парсинг, напоминания) учитывается отдельно - как "background".
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+# Границы корзин гистограммы времени обработчика (мс)
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Имя, под которым учитываются запросы и вызовы вне обработчиков
+BACKGROUND = 'background'
+
+# Счетчики текущего обновления (заполняются хуками БД и Telegram)
+_current_update: ContextVar[Optional[dict]] = ContextVar('current_update_metrics', default=None)
+
+
+def _new_counters() -> dict:
+    return {'db_queries': 0, 'db_time': 0.0, 'tg_calls': 0}
+
+
+class HandlerStats:
+    """Накопленная статистика одного обработчика"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # последняя корзина - больше максимума
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.tg_calls = 0
+
+    def observe(self, elapsed: float, counters: dict, failed: bool = False):
+        """Учесть один вызов обработчика"""
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+        elapsed_ms = elapsed * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+        self.db_queries += counters['db_queries']
+        self.db_time += counters['db_time']
+        self.tg_calls += counters['tg_calls']
+
+    def percentile(self, fraction: float) -> Optional[int]:
+        """Оценка перцентиля по гистограмме (верхняя граница корзины, мс)"""
+        if not self.count:
+            return None
+
+        threshold = self.count * fraction
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_time / self.count * 1000, 1) if self.count else 0,
+            'max_ms': round(self.max_time * 1000, 1),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': dict(zip([f"<={bound}" for bound in LATENCY_BUCKETS_MS] + ['>'], self.buckets)),
+            'db_queries': self.db_queries,
+            'db_queries_per_call': round(self.db_queries / self.count, 1) if self.count else 0,
+            'db_time_ms': round(self.db_time * 1000, 1),
+            'tg_calls': self.tg_calls,
+            'tg_calls_per_call': round(self.tg_calls / self.count, 1) if self.count else 0
+        }
+
+
+class MetricsRegistry:
+    """Хранилище метрик всех обработчиков"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.handlers = {}
+        self.background = _new_counters()
+        self.tg_methods = {}
+        self.gauges = {}
+        self.started_at = time.time()
+
+    def start_update(self):
+        """Начать учет нового обновления, вернуть токен для finish_update"""
+        return _current_update.set(_new_counters())
+
+    def finish_update(self, token, handler_name: str, elapsed: float, failed: bool = False):
+        """Закончить учет обновления и отнести счетчики к обработчику"""
+        counters = _current_update.get() or _new_counters()
+        _current_update.reset(token)
+
+        with self._lock:
+            stats = self.handlers.get(handler_name)
+            if stats is None:
+                stats = self.handlers[handler_name] = HandlerStats()
+            stats.observe(elapsed, counters, failed)
+
+    def record_query(self, elapsed: float):
+        """Учесть SQL-запрос"""
+        counters = _current_update.get()
+        if counters is not None:
+            counters['db_queries'] += 1
+            counters['db_time'] += elapsed
+        else:
+            with self._lock:
+                self.background['db_queries'] += 1
+                self.background['db_time'] += elapsed
+
+    def record_telegram_call(self, method_name: str):
+        """Учесть вызов Telegram Bot API"""
+        counters = _current_update.get()
+        with self._lock:
+            self.tg_methods[method_name] = self.tg_methods.get(method_name, 0) + 1
+            if counters is None:
+                self.background['tg_calls'] += 1
+        if counters is not None:
+            counters['tg_calls'] += 1
+
+    def set_gauge(self, name: str, value):
+        """Записать текущее значение показателя (например, отставание выгрузки)"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self) -> dict:
+        """Снимок метрик (обработчики отсортированы по суммарному времени)"""
+        with self._lock:
+            handlers = sorted(self.handlers.items(), key=lambda item: item[1].total_time, reverse=True)
+            return {
+                'since': self.started_at,
+                'handlers': {name: stats.to_dict() for name, stats in handlers},
+                'background': {
+                    'db_queries': self.background['db_queries'],
+                    'db_time_ms': round(self.background['db_time'] * 1000, 1),
+                    'tg_calls': self.background['tg_calls']
+                },
+                'tg_methods': dict(sorted(self.tg_methods.items(), key=lambda item: item[1], reverse=True)),
+                'gauges': dict(self.gauges)
+            }
+
+    def reset(self):
+        """Сбросить накопленные метрики"""
+        with self._lock:
+            self.handlers.clear()
+            self.background = _new_counters()
+            self.tg_methods.clear()
+            self.started_at = time.time()
+
+
+# Глобальный реестр метрик
+_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Получить глобальный реестр метрик"""
+    return _metrics
+
+
+def install_db_hooks(engine):
+    """
+    Подключить подсчет SQL-запросов к движку SQLAlchemy
+
+    Args:
+        engine: Engine, запросы которого нужно учитывать
+    """
+    if getattr(engine, '_metrics_hooks_installed', False):
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start_time'].pop()
+        _metrics.record_query(time.perf_counter() - started)
+
+    engine._metrics_hooks_installed = True
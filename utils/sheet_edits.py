@@ -0,0 +1,230 @@
+"""
+Перенос ручных правок Google Sheets в БД
+
+Координаторы иногда меняют статус или детали участия прямо в таблице, а следующая
+запись бота эти правки затирала. Теперь бот пишет в скрытый столбец N хэш каждой
+строки, и раз в SHEETS_EDIT_CHECK_INTERVAL минут read_sheet_edits одним чтением
+на лист находит строки, содержимое которых с этим хэшем не совпадает.
+
+Правка переносится в БД (AnnouncementCRUD.apply_sheet_edit), если изменены только
+разрешенные столбцы (EDITABLE_HEADERS), новый статус допустим и объявление в БД с
+момента записи строки не менялось. Остальное - конфликт: он пишется в лог и в
+gauge 'sheet_edits', а строка ставится в очередь выгрузки и перезаписывается
+данными из БД. Правки строк, которые воркер sheet_outbox собрался перезаписать
+раньше проверки, он передает сюда же (process).
+"""
+import asyncio
+import os
+import sys
+from collections import deque
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import GOOGLE_SHEETS_ENABLED
+from database.crud import AnnouncementCRUD, SheetOutboxCRUD
+from database.models import get_session, Announcement
+from utils.google_sheets import get_sheets_manager
+from utils.metrics import get_metrics
+
+# Как часто проверять таблицу на ручные правки (минуты, 0 - не проверять)
+SHEETS_EDIT_CHECK_INTERVAL = int(os.getenv('SHEETS_EDIT_CHECK_INTERVAL', '15'))
+
+# Столбцы, правки которых переносятся в БД
+EDITABLE_HEADERS = ('Статус', 'Причина отказа', 'Детали участия')
+
+# Столбцы, которые БД заполняет сама при переносе правки (дата ответа - при смене статуса)
+DERIVED_HEADERS = ('Дата ответа',)
+
+# Сколько последних конфликтов показывать в метриках
+CONFLICTS_KEPT = 20
+
+
+class SheetEditImporter:
+    """Поиск ручных правок в Google Sheets и перенос их в БД"""
+
+    def __init__(self, manager=None):
+        self._manager = manager
+        self.stats = {'runs': 0, 'edits': 0, 'imported': 0, 'conflicts': 0}
+        self.conflicts = deque(maxlen=CONFLICTS_KEPT)
+        self._flagged = set()  # уже учтенные конфликты: (лист, номер, хэш строки)
+
+    @property
+    def manager(self):
+        return self._manager or get_sheets_manager()
+
+    def _load(self, numbers: List[str]) -> Dict[str, tuple]:
+        """
+        Объявления по номерам и строки листа по их текущему состоянию в БД
+
+        Returns:
+            {номер объявления: (id, значения строки)}
+        """
+        manager = self.manager
+        session = get_session()
+        try:
+            return {
+                announcement.announcement_number: (announcement.id, manager._announcement_to_row(announcement))
+                for announcement in session.query(Announcement).filter(
+                    Announcement.announcement_number.in_(numbers)
+                )
+            }
+        finally:
+            session.close()
+
+    def _changed_columns(self, values: list, db_row: list) -> List[str]:
+        """Заголовки столбцов, в которых строка листа расходится с БД"""
+        cell_text = self.manager._cell_text
+        return [
+            header for header, sheet_value, db_value in zip(self.manager.HEADERS, values, db_row)
+            if cell_text(sheet_value).strip() != cell_text(db_value).strip()
+        ]
+
+    def _parse_status(self, text: str) -> Optional[str]:
+        """Статус по его названию в таблице ('Принято' -> 'accepted')"""
+        names = {self.manager._format_status(status): status for status in ('pending', 'accepted', 'rejected')}
+        return names.get(text.strip())
+
+    def _apply(self, edit: dict, found: Optional[tuple]) -> tuple:
+        """
+        Перенести одну правку
+
+        Returns:
+            ('imported', None), ('in_sync', None) если правка уже в БД, ('conflict', причина)
+        """
+        if found is None:
+            return 'conflict', 'объявления нет в БД (удалено или в архиве)'
+
+        announcement_id, db_row = found
+        changed = self._changed_columns(edit['values'], db_row)
+        if self.manager._row_hash(db_row) != edit['stored_hash']:
+            if all(header in DERIVED_HEADERS for header in changed):
+                # Правка уже в БД, строка ждет перезаписи из очереди
+                return 'in_sync', None
+            return 'conflict', f"объявление изменено и в БД, и в таблице ({', '.join(changed)})"
+
+        manager = self.manager
+
+        read_only = [header for header in changed if header not in EDITABLE_HEADERS]
+        if read_only:
+            return 'conflict', f"изменены столбцы, которые правятся только в боте: {', '.join(read_only)}"
+
+        def edited(header):
+            if header not in changed:
+                return None
+            return manager._cell_text(edit['values'][manager.HEADERS.index(header)]).strip()
+
+        status = None
+        if 'Статус' in changed:
+            status = self._parse_status(edited('Статус'))
+            if status is None:
+                return 'conflict', f"неизвестный статус «{edited('Статус')}»"
+
+        if not AnnouncementCRUD.apply_sheet_edit(
+            announcement_id,
+            status=status,
+            rejection_reason=edited('Причина отказа'),
+            participation_details=edited('Детали участия')
+        ):
+            return 'conflict', 'недопустимая смена статуса'
+
+        logger.info(f"Правка объявления {edit['number']} из Google Sheets перенесена в БД: {', '.join(changed)}")
+        return 'imported', None
+
+    def _restore(self, announcement_ids: List[int]):
+        """Поставить строки с конфликтами в очередь: их перезапишут данные из БД"""
+        if not announcement_ids:
+            return
+        session = get_session()
+        try:
+            for announcement_id in announcement_ids:
+                SheetOutboxCRUD.enqueue(session, announcement_id)
+            session.commit()
+        finally:
+            session.close()
+
+    def run(self) -> Dict[str, int]:
+        """
+        Проверить таблицу и перенести правки
+
+        Returns:
+            {'edits': N, 'imported': M, 'conflicts': K}
+        """
+        if not self.manager.enabled:
+            return {'edits': 0, 'imported': 0, 'conflicts': 0}
+
+        self.stats['runs'] += 1
+        return self.process(self.manager.read_sheet_edits())
+
+    def process(self, edits: List[dict], restore: bool = True) -> Dict[str, int]:
+        """
+        Перенести найденные правки
+
+        Args:
+            edits: Правки в формате read_sheet_edits
+            restore: Ставить ли строки с конфликтами в очередь выгрузки (воркер
+                sheet_outbox, отдавший правки, перезаписывает их сам)
+
+        Returns:
+            {'edits': N, 'imported': M, 'conflicts': K}
+        """
+        result = {'edits': len(edits), 'imported': 0, 'conflicts': 0}
+        if edits:
+            announcements = self._load([edit['number'] for edit in edits])
+            conflicting = []
+            for edit in edits:
+                found = announcements.get(edit['number'])
+                try:
+                    outcome, conflict = self._apply(edit, found)
+                except Exception as e:
+                    logger.error(f"Ошибка переноса правки объявления {edit['number']} из Google Sheets: {e}")
+                    continue
+
+                if outcome == 'imported':
+                    result['imported'] += 1
+                if outcome != 'conflict':
+                    continue
+
+                # Строку, которую нельзя перезаписать (архив), не отмечаем при каждой проверке заново
+                key = (edit['sheet'], edit['number'], self.manager._row_hash(edit['values']))
+                if key in self._flagged:
+                    continue
+                self._flagged.add(key)
+
+                result['conflicts'] += 1
+                logger.warning(
+                    f"Конфликт правки Google Sheets: объявление {edit['number']} "
+                    f"(лист «{edit['sheet']}», строка {edit['row']}): {conflict}"
+                )
+                self.conflicts.append({'number': edit['number'], 'sheet': edit['sheet'], 'reason': conflict})
+                if found is not None:
+                    conflicting.append(found[0])
+
+            if restore:
+                self._restore(conflicting)
+
+        for key, value in result.items():
+            self.stats[key] += value
+        self.publish()
+        return result
+
+    def publish(self):
+        """Обновить gauge правок в метриках"""
+        get_metrics().set_gauge('sheet_edits', {**self.stats, 'last_conflicts': list(self.conflicts)})
+
+    async def check(self):
+        """Задача планировщика: проверка в отдельном потоке (gspread и БД синхронные)"""
+        if not GOOGLE_SHEETS_ENABLED:
+            return
+        try:
+            result = await asyncio.to_thread(self.run)
+        except Exception as e:
+            logger.error(f"Ошибка проверки ручных правок Google Sheets: {e}")
+            return
+        if result['edits']:
+            logger.info(
+                f"📥 Правки Google Sheets: найдено {result['edits']}, перенесено {result['imported']}, "
+                f"конфликтов {result['conflicts']}"
+            )
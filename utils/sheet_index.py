@@ -0,0 +1,218 @@
+"""
+Индекс строк Google Sheets: номер объявления -> номер строки
+
+Хранится в памяти и в таблице sheet_rows (переживает перезапуск), поэтому поиск
+строки не скачивает весь столбец C. Индекс пополняется при добавлении строк
+(номера строк берутся из ответа append_rows) и проверяется лениво: перед записью
+по кэшированным строкам читаются только ячейки C этих строк. Номера, которых нет в
+памяти, сначала ищутся в sheet_rows (их мог добавить другой процесс). Полная
+перестройка (одно чтение столбца) - при несовпадении, если индекс еще не построен
+или номера нет и в sheet_rows (строку могли вставить вручную), чтобы не добавить
+дубликат.
+"""
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Столбец с номером объявления (C)
+NUMBER_COLUMN = 3
+
+
+class SheetRowIndex:
+    """Индекс строк одного листа"""
+
+    def __init__(self, worksheet_title: str, persist: bool = True):
+        self.worksheet_title = worksheet_title
+        self.persist = persist
+
+        self._rows: Dict[str, int] = {}
+        self._complete = False  # Индекс построен по всему листу
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'rebuilds': 0, 'mismatches': 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+    @property
+    def complete(self) -> bool:
+        self._load()
+        return self._complete
+
+    def get(self, announcement_number: str) -> Optional[int]:
+        """Кэшированная строка объявления (без проверки)"""
+        self._load()
+        with self._lock:
+            return self._rows.get(announcement_number)
+
+    def set_many(self, rows: Dict[str, int]):
+        """Запомнить строки (после добавления)"""
+        if not rows:
+            return
+        self._load()
+        with self._lock:
+            self._rows.update(rows)
+        self._save(rows)
+
+    def invalidate(self):
+        """Считать индекс неполным: следующий поиск перестроит его по листу"""
+        with self._lock:
+            self._complete = False
+            self._loaded = True
+
+    def rebuild(self, number_column: List[str]):
+        """
+        Перестроить индекс по столбцу номеров (первая строка - заголовок)
+
+        Args:
+            number_column: Значения столбца C, как их возвращает col_values
+        """
+        rows = {}
+        for idx, value in enumerate(number_column[1:], start=2):
+            if value and value not in rows:
+                rows[value] = idx
+
+        with self._lock:
+            self._rows = rows
+            self._complete = True
+            self._loaded = True
+        self.stats['rebuilds'] += 1
+        self._save(rows, replace=True)
+
+    def locate(self, worksheet, numbers: Iterable[str]) -> Dict[str, int]:
+        """
+        Найти строки объявлений на листе
+
+        Номера, которых нет в памяти, дочитываются из sheet_rows. Кэшированные строки
+        проверяются одним batch_get ячеек C; при расхождении (строки удалили или
+        переставили вручную) или если номер так и не найден, индекс перестраивается
+        по столбцу - отсутствие в индексе еще не значит, что строки на листе нет.
+
+        Returns:
+            {номер объявления: номер строки} для найденных
+        """
+        numbers = list(dict.fromkeys(numbers))
+        if not self.complete:
+            self.rebuild(worksheet.col_values(NUMBER_COLUMN))
+            return self._positions(numbers)
+
+        positions = self._positions(numbers)
+        if len(positions) < len(numbers):
+            self._reload([number for number in numbers if number not in positions])
+            positions = self._positions(numbers)
+
+        rebuilt = False
+        if positions and not self._verify(worksheet, positions):
+            self.stats['mismatches'] += 1
+            logger.warning(f"Индекс строк листа {self.worksheet_title} устарел, перестраиваем")
+            self.rebuild(worksheet.col_values(NUMBER_COLUMN))
+            positions = self._positions(numbers)
+            rebuilt = True
+
+        if len(positions) < len(numbers) and not rebuilt:
+            # Строку могли вставить вручную - проверяем столбец перед добавлением
+            self.rebuild(worksheet.col_values(NUMBER_COLUMN))
+            positions = self._positions(numbers)
+
+        self.stats['hits'] += len(positions)
+        self.stats['misses'] += len(numbers) - len(positions)
+        return positions
+
+    def _positions(self, numbers: List[str]) -> Dict[str, int]:
+        with self._lock:
+            return {number: self._rows[number] for number in numbers if number in self._rows}
+
+    @staticmethod
+    def _verify(worksheet, positions: Dict[str, int]) -> bool:
+        """Совпадают ли ячейки C кэшированных строк с номерами"""
+        column = chr(64 + NUMBER_COLUMN)
+        ranges = [f"{column}{row}" for row in positions.values()]
+        values = worksheet.batch_get(ranges)
+
+        for number, cell in zip(positions, values):
+            value = cell[0][0] if cell and cell[0] else ''
+            if value != number:
+                return False
+        return True
+
+    def _load(self):
+        """Загрузить индекс из БД при первом обращении"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.persist:
+                return
+            try:
+                from database.models import get_session, SheetRow
+
+                session = get_session()
+                try:
+                    rows = session.query(SheetRow.announcement_number, SheetRow.row).filter(
+                        SheetRow.worksheet == self.worksheet_title
+                    ).all()
+                finally:
+                    session.close()
+            except Exception as e:
+                logger.error(f"Ошибка загрузки индекса строк Google Sheets: {e}")
+                return
+
+            self._rows = {number: row for number, row in rows}
+            # Сохраненный индекс считается полным: найденные строки проверит первая запись,
+            # ненайденные номера дочитываются из sheet_rows и ищутся по столбцу (locate)
+            self._complete = bool(self._rows)
+
+    def _reload(self, numbers: List[str]):
+        """Дочитать из БД строки номеров, записанные другими процессами после загрузки"""
+        if not self.persist:
+            return
+        try:
+            from database.models import get_session, SheetRow
+
+            session = get_session()
+            try:
+                rows = session.query(SheetRow.announcement_number, SheetRow.row).filter(
+                    SheetRow.worksheet == self.worksheet_title,
+                    SheetRow.announcement_number.in_(numbers)
+                ).all()
+            finally:
+                session.close()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки индекса строк Google Sheets: {e}")
+            return
+
+        with self._lock:
+            self._rows.update({number: row for number, row in rows})
+
+    def _save(self, rows: Dict[str, int], replace: bool = False):
+        """Сохранить строки индекса в БД (ошибки не прерывают запись в таблицу)"""
+        if not self.persist:
+            return
+        try:
+            from database.models import get_session, SheetRow
+
+            session = get_session()
+            try:
+                query = session.query(SheetRow).filter(SheetRow.worksheet == self.worksheet_title)
+                if replace:
+                    query.delete(synchronize_session=False)
+                else:
+                    query.filter(SheetRow.announcement_number.in_(list(rows))).delete(synchronize_session=False)
+                session.add_all([
+                    SheetRow(worksheet=self.worksheet_title, announcement_number=number, row=row)
+                    for number, row in rows.items()
+                ])
+                session.commit()
+            finally:
+                session.close()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения индекса строк Google Sheets: {e}")
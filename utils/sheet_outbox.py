@@ -0,0 +1,206 @@
+"""
+Фоновая выгрузка очереди sheet_outbox в Google Sheets
+
+Изменения объявлений попадают в таблицу sheet_outbox в той же транзакции, что и
+само изменение (SheetOutboxCRUD.enqueue), поэтому запись в БД не ждет Google и не
+теряется при перезапуске. Воркер раз в SHEETS_FLUSH_INTERVAL секунд забирает до
+SHEETS_FLUSH_MAX_ROWS строк, формирует строки листа по текущему состоянию
+объявлений и пишет их одним write_rows. При ошибке строки откладываются с
+экспоненциальной паузой (SheetOutboxCRUD.fail). Отставание таблицы от БД
+публикуется в метриках как gauge 'sheet_outbox'.
+
+Строки, которые координатор успел изменить в таблице вручную, не перезаписываются
+вслепую: write_rows возвращает их, правки переносятся в БД (SheetEditImporter), и
+только затем строки пишутся заново по состоянию БД.
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict
+
+from loguru import logger
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import GOOGLE_SHEETS_ENABLED
+from database.crud import SheetOutboxCRUD
+from database.models import get_session, Announcement, ArchivedAnnouncement
+from utils.google_sheets import get_sheets_manager
+from utils.metrics import get_metrics
+from utils.sheet_edits import SheetEditImporter
+
+# Период выгрузки (секунды) и размер пачки
+SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '10'))
+SHEETS_FLUSH_MAX_ROWS = int(os.getenv('SHEETS_FLUSH_MAX_ROWS', '100'))
+
+# Как часто пробовать переподключиться к Google Sheets, если он недоступен (секунды)
+SHEETS_REINIT_INTERVAL = 300
+
+# Вызовов записи на одну пачку (batch_update + append_rows): меньше остатка квоты - следующая пачка ждет
+WRITES_PER_BATCH = 2
+
+
+class SheetOutboxWorker:
+    """Выгрузка очереди sheet_outbox в Google Sheets"""
+
+    def __init__(self, manager=None, interval: float = None, batch_size: int = None, importer=None):
+        self._manager = manager
+        self.importer = importer or SheetEditImporter(manager)
+        self.interval = SHEETS_FLUSH_INTERVAL if interval is None else interval
+        self.batch_size = batch_size or SHEETS_FLUSH_MAX_ROWS
+
+        self._task = None
+        self._last_reinit = 0.0
+
+        self.stats = {'batches': 0, 'rows_written': 0, 'errors': 0}
+
+    @property
+    def manager(self):
+        return self._manager or get_sheets_manager()
+
+    def _ensure_manager(self) -> bool:
+        """Доступен ли Google Sheets (с редкими попытками переподключения)"""
+        manager = self.manager
+        if manager.enabled:
+            return True
+        if time.monotonic() - self._last_reinit < SHEETS_REINIT_INTERVAL:
+            return False
+        self._last_reinit = time.monotonic()
+        return manager.retry_initialization()
+
+    def _load_rows(self, announcement_ids: list) -> Dict[int, tuple]:
+        """
+        Строки листа по текущему состоянию объявлений
+
+        Объявление, успевшее уйти в архив, берется из announcements_archive.
+
+        Returns:
+            {id объявления: (номер, значения строки, статус)}
+        """
+        manager = self.manager
+        session = get_session()
+        try:
+            found = {}
+            for model in (Announcement, ArchivedAnnouncement):
+                missing = [announcement_id for announcement_id in announcement_ids if announcement_id not in found]
+                if not missing:
+                    break
+                for announcement in session.query(model).filter(model.id.in_(missing)):
+                    found[announcement.id] = (
+                        announcement.announcement_number,
+                        manager._announcement_to_row(announcement),
+                        announcement.status
+                    )
+            return found
+        finally:
+            session.close()
+
+    def _write_held(self, held: list, rows: Dict[int, tuple]):
+        """
+        Перенести ручные правки строк пачки в БД и перезаписать эти строки
+
+        Разрешенная правка попадает в БД и остается в строке; конфликт пишется в лог
+        и метрики, а строка получает значения из БД.
+        """
+        result = self.importer.process(held, restore=False)
+        logger.info(
+            f"Google Sheets: {result['edits']} строк пачки изменены вручную, перенесено {result['imported']}, "
+            f"конфликтов {result['conflicts']}"
+        )
+
+        numbers = {edit['number'] for edit in held}
+        fresh = self._load_rows([announcement_id for announcement_id, (number, _, _) in rows.items() if number in numbers])
+        self.manager.write_rows({number: (row, status) for number, row, status in fresh.values()})
+
+    def drain_once(self, now: datetime = None) -> Dict[str, int]:
+        """
+        Выгрузить одну пачку очереди
+
+        Returns:
+            {'written': N, 'failed': M}
+        """
+        result = {'written': 0, 'failed': 0}
+        if not self._ensure_manager():
+            self.publish_lag(now)
+            return result
+
+        batch = SheetOutboxCRUD.get_batch(now, limit=self.batch_size)
+        if batch:
+            rows = self._load_rows([announcement_id for announcement_id, _, _ in batch])
+            try:
+                held = []
+                self.manager.write_rows({number: (row, status) for number, row, status in rows.values()}, held)
+                if held:
+                    self._write_held(held, rows)
+            except Exception as e:
+                logger.error(f"Ошибка выгрузки в Google Sheets ({len(batch)} строк): {e}")
+                self.stats['errors'] += 1
+                result['failed'] = SheetOutboxCRUD.fail([announcement_id for announcement_id, _, _ in batch], str(e), now=now)
+            else:
+                # Удаленные из БД объявления тоже снимаются с очереди
+                SheetOutboxCRUD.complete([(announcement_id, changed_at) for announcement_id, changed_at, _ in batch])
+                self.stats['batches'] += 1
+                self.stats['rows_written'] += len(rows)
+                result['written'] = len(rows)
+
+        self.publish_lag(now)
+        return result
+
+    def drain(self, now: datetime = None) -> int:
+        """
+        Выгружать пачки, пока очередь не опустеет или не случится ошибка
+
+        Следующая пачка откладывается до следующего цикла, если квоты записи на нее
+        не хватает: квота остается боту и другим задачам, а не уходит на ожидание.
+        """
+        written = 0
+        while True:
+            result = self.drain_once(now)
+            written += result['written']
+            if result['failed'] or result['written'] < self.batch_size:
+                return written
+            if self.manager.quota_remaining('write') < WRITES_PER_BATCH:
+                logger.info("Квота записи Google Sheets почти исчерпана, остаток очереди - в следующем цикле")
+                return written
+
+    @staticmethod
+    def publish_lag(now: datetime = None) -> dict:
+        """Обновить gauge отставания Google Sheets от БД"""
+        lag = SheetOutboxCRUD.get_lag(now)
+        get_metrics().set_gauge('sheet_outbox', lag)
+        return lag
+
+    async def start(self):
+        """Запустить фоновую выгрузку (если интеграция с Google Sheets включена)"""
+        if not GOOGLE_SHEETS_ENABLED:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📤 Выгрузка в Google Sheets запущена (раз в {self.interval:g} с)")
+
+    async def stop(self):
+        """Остановить выгрузку и выгрузить остаток очереди"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        try:
+            await asyncio.to_thread(self.drain)
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки в Google Sheets при остановке: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.drain)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка выгрузки в Google Sheets: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,188 @@
+"""
+Учет квот Google Sheets API (token bucket)
+
+Google ограничивает число запросов на чтение и на запись в минуту. Все вызовы
+gspread идут через SheetsQuotaGovernor: на чтение и запись - отдельные корзины
+токенов, пополняемые равномерно. Если токенов нет, вызов ждет своей очереди
+(токен резервируется сразу, поэтому ожидающие потоки обслуживаются по порядку),
+а не получает 429. Если 429 все же пришел (квоту расходует и другой клиент),
+корзина обнуляется и вызов повторяется один раз после паузы.
+
+Использованная и оставшаяся квота и время ожидания публикуются в метриках как
+gauge 'sheets_quota'; remaining() позволяет вызывающему подобрать размер записи.
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+import gspread
+from loguru import logger
+
+from utils.metrics import get_metrics
+
+# Квоты на минуту (по умолчанию - лимиты Google на одного пользователя)
+SHEETS_READ_QUOTA = int(os.getenv('SHEETS_READ_QUOTA', '60'))
+SHEETS_WRITE_QUOTA = int(os.getenv('SHEETS_WRITE_QUOTA', '60'))
+
+# Методы gspread по виду квоты (остальные атрибуты - без учета)
+READ_METHODS = frozenset({
+    'acell', 'batch_get', 'cell', 'col_values', 'fetch_sheet_metadata', 'get', 'get_all_records',
+    'get_all_values', 'get_values', 'open_by_key', 'row_values', 'worksheet', 'worksheets'
+})
+WRITE_METHODS = frozenset({
+    'add_worksheet', 'append_row', 'append_rows', 'batch_clear', 'batch_format', 'batch_update',
+    'clear', 'delete_columns', 'delete_rows', 'format', 'freeze', 'insert_row', 'insert_rows',
+    'resize', 'update', 'update_acell', 'update_cell'
+})
+
+
+class TokenBucket:
+    """Корзина токенов: capacity запросов за period секунд"""
+
+    def __init__(self, capacity: int, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        """Взять токены (в долг, если их нет) и вернуть, сколько секунд ждать"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def drain(self):
+        """Обнулить корзину (квота исчерпана по данным API)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+    def available(self) -> float:
+        """Сколько запросов можно сделать без ожидания"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self._tokens)
+
+
+class SheetsQuotaGovernor:
+    """Ограничение частоты вызовов Google Sheets API по квотам чтения и записи"""
+
+    def __init__(self, read_quota: int = None, write_quota: int = None, period: float = 60.0, sleep=time.sleep):
+        self.buckets = {
+            'read': TokenBucket(read_quota or SHEETS_READ_QUOTA, period),
+            'write': TokenBucket(write_quota or SHEETS_WRITE_QUOTA, period)
+        }
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {
+            kind: {'calls': 0, 'throttled_calls': 0, 'throttled_seconds': 0.0, 'rate_limited': 0}
+            for kind in self.buckets
+        }
+
+    def remaining(self, kind: str) -> int:
+        """Сколько вызовов вида kind ('read' / 'write') можно сделать сейчас без ожидания"""
+        return int(self.buckets[kind].available())
+
+    def acquire(self, kind: str):
+        """Дождаться токена на вызов"""
+        wait = self.buckets[kind].reserve()
+        with self._lock:
+            stats = self.stats[kind]
+            stats['calls'] += 1
+            if wait:
+                stats['throttled_calls'] += 1
+                stats['throttled_seconds'] += wait
+        if wait:
+            logger.debug(f"Квота Google Sheets ({kind}) исчерпана, ожидание {wait:.1f} с")
+            self._sleep(wait)
+        self.publish()
+
+    def call(self, kind: str, func, *args, **kwargs):
+        """Выполнить вызов API в пределах квоты (после 429 - один повтор)"""
+        self.acquire(kind)
+        try:
+            return func(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if getattr(e, 'code', None) != 429:
+                raise
+            with self._lock:
+                self.stats[kind]['rate_limited'] += 1
+            logger.warning(f"Google Sheets вернул 429 ({kind}), повтор после паузы")
+            self.buckets[kind].drain()
+            self.acquire(kind)
+            return func(*args, **kwargs)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Использовано и осталось в текущем окне, ожидания и 429 по видам квоты"""
+        result = {}
+        with self._lock:
+            stats = {kind: dict(values) for kind, values in self.stats.items()}
+        for kind, bucket in self.buckets.items():
+            remaining = self.remaining(kind)
+            result[kind] = {
+                'quota': bucket.capacity,
+                'used': bucket.capacity - remaining,
+                'remaining': remaining,
+                **stats[kind],
+                'throttled_seconds': round(stats[kind]['throttled_seconds'], 1)
+            }
+        return result
+
+    def publish(self):
+        """Обновить gauge квот в метриках"""
+        get_metrics().set_gauge('sheets_quota', self.snapshot())
+
+    def wrap(self, target):
+        """Обернуть объект gspread (Spreadsheet, Worksheet): его вызовы API пойдут через квоту"""
+        if target is None or isinstance(target, GovernedProxy):
+            return target
+        return GovernedProxy(target, self)
+
+
+class GovernedProxy:
+    """Обертка объекта gspread: методы API вызываются через SheetsQuotaGovernor"""
+
+    def __init__(self, target, governor: SheetsQuotaGovernor):
+        self._target = target
+        self._governor = governor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name in READ_METHODS:
+            kind = 'read'
+        elif name in WRITE_METHODS:
+            kind = 'write'
+        else:
+            return attribute
+
+        def governed(*args, **kwargs):
+            return self._governor.call(kind, attribute, *args, **kwargs)
+
+        return governed
+
+    def __repr__(self):
+        return f"<Governed {self._target!r}>"
+
+
+# Глобальный учет квот (квота общая для всех менеджеров процесса)
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_sheets_quota() -> SheetsQuotaGovernor:
+    """Получить глобальный учет квот Google Sheets"""
+    global _governor
+
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = SheetsQuotaGovernor()
+
+    return _governor